@@ -4,6 +4,10 @@
 # See: http://fledge-iot.readthedocs.io/
 # FLEDGE_END
 
+import asyncio
+from collections import deque
+
+from fledge.common import utils as common_utils
 from fledge.common.logger import FLCoreLogger
 from fledge.common.storage_client.payload_builder import PayloadBuilder
 from fledge.common.storage_client.storage_client import StorageClientAsync
@@ -16,6 +20,15 @@ __version__ = "${VERSION}"
 
 _logger = FLCoreLogger().get_logger(__name__)
 
+DEFAULT_FLUSH_INTERVAL = 1
+""" Number of seconds between two writes of the queued audit trail entries """
+
+DEFAULT_FLUSH_SIZE = 100
+""" Number of queued audit trail entries written by a single insert, and above which they are written immediately """
+
+DEFAULT_QUEUE_SIZE = 10000
+""" Number of audit trail entries held while storage is not available, the entries logged beyond are dropped """
+
 
 class AuditLoggerSingleton(object):
     """ AuditLoggerSingleton
@@ -28,6 +41,136 @@ class AuditLoggerSingleton(object):
         self.__dict__ = self._shared_state
 
 
+class AuditWriter(object):
+    """ Write-behind audit trail
+
+    Entries are queued and written to the log table with multi-row inserts of up to flush_size entries, every
+    flush_interval seconds or as soon as flush_size entries are queued. The time of an entry is the time it is
+    queued. Entries which can not be written are kept, in order, for the next flush; up to queue_size entries are
+    held, the entries logged beyond are dropped and counted. The entries refused by storage are logged and counted,
+    the callers which need to know that an entry is refused write it with wait=True instead. Entries are only queued
+    from the event loop, hence no lock is needed to queue them. :meth:`stop` writes what is queued.
+    """
+
+    def __init__(self, storage, flush_interval=DEFAULT_FLUSH_INTERVAL, flush_size=DEFAULT_FLUSH_SIZE,
+                 queue_size=DEFAULT_QUEUE_SIZE):
+        if not isinstance(flush_interval, (int, float)) or flush_interval <= 0:
+            raise ValueError('flush_interval must be a positive number')
+        if not isinstance(flush_size, int) or flush_size < 1:
+            raise ValueError('flush_size must be a positive integer')
+        if not isinstance(queue_size, int) or queue_size < flush_size:
+            raise ValueError('queue_size must be an integer not less than flush_size')
+        self._storage = storage
+        self._flush_interval = flush_interval
+        self._flush_size = flush_size
+        self._queue_size = queue_size
+        self._entries = deque()
+        self._flush_requested = None
+        self._flush_task = None
+        self._flush_lock = None
+        self._stopping = False
+        self.dropped = 0
+        """ Entries dropped as the queue was full """
+        self.refused = 0
+        """ Entries refused by storage, such as those with an unknown code """
+        self.flushes = 0
+        self.failures = 0
+
+    @property
+    def depth(self):
+        """ Number of entries waiting to be written """
+        return len(self._entries)
+
+    def append(self, level, code, log):
+        """ Queues an audit trail entry
+
+        Returns:
+            False if the entry has been dropped as the queue is full
+        """
+        if len(self._entries) >= self._queue_size:
+            self.dropped += 1
+            _logger.warning("Audit trail queue is full, entry '%s' dropped.", code)
+            return False
+        entry = {"code": code, "level": level, "ts": common_utils.local_timestamp()}
+        if log is not None:
+            entry["log"] = log
+        self._entries.append(entry)
+        if len(self._entries) >= self._flush_size and self._flush_requested is not None:
+            self._flush_requested.set()
+        return True
+
+    def start(self):
+        """ Starts the periodic write of the queued entries """
+        if self._flush_task is None:
+            self._stopping = False
+            self._flush_requested = asyncio.Event()
+            self._flush_task = asyncio.ensure_future(self._flush_loop())
+
+    async def stop(self):
+        """ Stops the periodic write and writes the queued entries """
+        if self._flush_task is not None:
+            self._stopping = True
+            self._flush_requested.set()
+            await self._flush_task
+            self._flush_task = None
+            self._flush_requested = None
+        return await self.flush()
+
+    async def _flush_loop(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
+
+    async def flush(self):
+        """ Writes the queued entries to the log table
+
+        Returns:
+            True if they have been written, False if some are kept to be written at the next flush or have been
+            refused by storage
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            refused = self.refused
+            while self._entries:
+                batch = [self._entries.popleft() for _ in range(min(self._flush_size, len(self._entries)))]
+                try:
+                    await self._storage.insert_into_tbl("log", {"inserts": batch})
+                except StorageServerError:
+                    # An entry refused by storage, such as one with an unknown code, fails the whole insert
+                    if not await self._insert_each(batch):
+                        return False
+                except Exception as ex:
+                    self._requeue(batch)
+                    self.failures += 1
+                    _logger.error(ex, "Failed to write {} audit trail entries.".format(len(batch)))
+                    return False
+                self.flushes += 1
+            return self.refused == refused
+
+    async def _insert_each(self, batch):
+        for index, entry in enumerate(batch):
+            try:
+                await self._storage.insert_into_tbl("log", {"inserts": [entry]})
+            except StorageServerError as ex:
+                self.refused += 1
+                _logger.error(ex, "Failed to log audit trail entry '{}'.".format(entry["code"]))
+            except Exception as ex:
+                self._requeue(batch[index:])
+                self.failures += 1
+                _logger.error(ex, "Failed to write {} audit trail entries.".format(len(batch) - index))
+                return False
+        return True
+
+    def _requeue(self, entries):
+        # Entries queued meanwhile are written after them
+        self._entries.extendleft(reversed(entries))
+
+
 class AuditLogger(AuditLoggerSingleton):
     """ Audit Logger
 
@@ -43,6 +186,9 @@ class AuditLogger(AuditLoggerSingleton):
     _storage = None
     """ The storage client we should use to talk to the storage service """
 
+    _writer = None
+    """ The AuditWriter queuing the entries once started, None to write every entry as it is logged """
+
     def __init__(self, storage=None):
         AuditLoggerSingleton.__init__(self)
         if self._storage is None:
@@ -50,7 +196,46 @@ class AuditLogger(AuditLoggerSingleton):
                 raise TypeError('Must be a valid Storage object')
             self._storage = storage
 
-    async def _log(self, level, code, log):
+    def start_writer(self, flush_interval=DEFAULT_FLUSH_INTERVAL, flush_size=DEFAULT_FLUSH_SIZE,
+                     queue_size=DEFAULT_QUEUE_SIZE):
+        """ Queues the entries logged from now on, and writes them in batches from the event loop """
+        if self._writer is None:
+            self._writer = AuditWriter(self._storage, flush_interval, flush_size, queue_size)
+            self._writer.start()
+        return self._writer
+
+    async def stop_writer(self):
+        """ Writes the queued entries and writes every entry logged from now on as it is logged
+
+        Returns:
+            True if all the queued entries have been written, False if some have been refused by storage or could
+            not be written
+        """
+        writer, self._writer = self._writer, None
+        if writer is None:
+            return True
+        written = await writer.stop()
+        if writer.depth:
+            _logger.warning("%s audit trail entries could not be written and are lost.", writer.depth)
+        return written
+
+    @property
+    def queue_depth(self):
+        """ Number of entries waiting to be written """
+        return 0 if self._writer is None else self._writer.depth
+
+    @property
+    def dropped(self):
+        """ Number of entries lost by the writer, as its queue was full or as storage refused them """
+        return 0 if self._writer is None else self._writer.dropped + self._writer.refused
+
+    async def _log(self, level, code, log, wait=False):
+        """ Queues the entry when the writer is started, unless wait is set: the entry is then written before
+        returning, and the storage errors are raised to the caller
+        """
+        if self._writer is not None and not wait:
+            self._writer.append(level, code, log)
+            return
         try:
             if log is None:
                 payload = PayloadBuilder().INSERT(code=code, level=level).payload()
@@ -63,14 +248,14 @@ class AuditLogger(AuditLoggerSingleton):
             _logger.error(ex, "Failed to log audit trail entry '{}'.".format(code))
             raise ex
 
-    async def success(self, code, log):
-        await self._log(self._success, code, log)
+    async def success(self, code, log, wait=False):
+        await self._log(self._success, code, log, wait)
 
-    async def failure(self, code, log):
-        await self._log(self._failure, code, log)
+    async def failure(self, code, log, wait=False):
+        await self._log(self._failure, code, log, wait)
 
-    async def warning(self, code, log):
-        await self._log(self._warning, code, log)
+    async def warning(self, code, log, wait=False):
+        await self._log(self._warning, code, log, wait)
 
-    async def information(self, code, log):
-        await self._log(self._information, code, log)
+    async def information(self, code, log, wait=False):
+        await self._log(self._information, code, log, wait)
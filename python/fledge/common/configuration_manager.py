@@ -43,69 +43,110 @@ RESERVED_CATG = ['South', 'North', 'General', 'Advanced', 'Utilities', 'rest_api
 
 
 class ConfigurationCache(object):
-    """Configuration Cache Manager"""
+    """Configuration Cache Manager
 
-    MAX_CACHE_SIZE = 10
+    Least recently used cache of the categories: lookups, updates and evictions do not depend on the cache size.
+    Categories can also expire a number of seconds after they were read from the storage layer.
+    """
 
-    def __init__(self):
+    MAX_CACHE_SIZE = 100
+    TTL = 0
+
+    def __init__(self, max_cache_size=MAX_CACHE_SIZE, ttl=TTL):
         """
-        cache: value stored in dictionary as per category_name
-        max_cache_size: Hold the 10 recently requested categories in the cache
+        cache: value stored in dictionary as per category_name, from the least to the most recently used
+        max_cache_size: Hold the max_cache_size recently requested categories in the cache
+        ttl: number of seconds after which a category is read again from the storage layer, 0 never expires
         hit: number of times an item is read from the cache
         miss: number of times an item was not found in the cache and a read of the storage layer was required
+        evictions: number of items removed from the cache to make room for another one
+        expirations: number of items removed from the cache as older than ttl
         """
-        self.cache = {}
-        self.max_cache_size = self.MAX_CACHE_SIZE
+        self._cache = collections.OrderedDict()
+        self._cached_at = {}
+        self.max_cache_size = max_cache_size
+        self.ttl = ttl
         self.hit = 0
         self.miss = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def cache(self):
+        return self._cache
+
+    @cache.setter
+    def cache(self, value):
+        self._cache = collections.OrderedDict(value)
+        self._cached_at = {}
+
+    def configure(self, max_cache_size, ttl=TTL):
+        """Set the cache capacity and time to live, removing the least recently used items if needed"""
+        if not isinstance(max_cache_size, int) or max_cache_size < 1:
+            raise ValueError('max_cache_size must be a positive integer')
+        if not isinstance(ttl, int) or ttl < 0:
+            raise ValueError('ttl must be a non negative integer')
+        self.max_cache_size = max_cache_size
+        self.ttl = ttl
+        while len(self._cache) > self.max_cache_size:
+            self.remove_oldest()
 
     def __contains__(self, category_name):
         """Returns True or False depending on whether or not the key is in the cache
         and update the hit and data_accessed"""
-        if category_name in self.cache:
+        if category_name in self._cache:
+            if self.ttl and category_name in self._cached_at and \
+                    (datetime.datetime.now() - self._cached_at[category_name]).total_seconds() > self.ttl:
+                self.remove(category_name)
+                self.expirations += 1
+                self.miss += 1
+                return False
             try:
-                current_hit = self.cache[category_name]['hit']
+                current_hit = self._cache[category_name]['hit']
             except KeyError:
                 current_hit = 0
 
             self.hit += 1
-            self.cache[category_name].update({'date_accessed': datetime.datetime.now(), 'hit': current_hit + 1})
+            self._cache[category_name].update({'date_accessed': datetime.datetime.now(), 'hit': current_hit + 1})
+            self._cache.move_to_end(category_name)
             return True
         self.miss += 1
         return False
 
     def update(self, category_name, category_description, category_val, display_name=None):
-        """Update the cache dictionary and remove the oldest item"""
-        if category_name not in self.cache and len(self.cache) >= self.max_cache_size:
-            self.remove_oldest()
+        """Update the cache dictionary and remove the least recently used item"""
+        now = datetime.datetime.now()
+        if category_name not in self._cache:
+            if len(self._cache) >= self.max_cache_size:
+                self.remove_oldest()
+        self._cached_at[category_name] = now
         display_name = category_name if display_name is None else display_name
-        self.cache[category_name] = {'date_accessed': datetime.datetime.now(), 'description': category_description,
-                                     'value': category_val, 'displayName': display_name}
-        _logger.debug("Updated Configuration Cache %s", self.cache)
+        self._cache[category_name] = {'date_accessed': now, 'description': category_description,
+                                      'value': category_val, 'displayName': display_name}
+        self._cache.move_to_end(category_name)
+        _logger.debug("Updated Configuration Cache %s", category_name)
 
     def remove_oldest(self):
-        """Remove the entry that has the oldest accessed date"""
-        oldest_entry = None
-        for category_name in self.cache:
-            if oldest_entry is None:
-                oldest_entry = category_name
-            elif self.cache[category_name].get('date_accessed') and self.cache[oldest_entry].get('date_accessed') \
-                    and self.cache[category_name]['date_accessed'] < self.cache[oldest_entry]['date_accessed']:
-                oldest_entry = category_name
-        if oldest_entry:
-            self.cache.pop(oldest_entry)
+        """Remove the least recently used entry"""
+        if self._cache:
+            category_name, _ = self._cache.popitem(last=False)
+            self._cached_at.pop(category_name, None)
+            self.evictions += 1
 
     def remove(self, key):
         """Remove the entry with given key name"""
-        for category_name in self.cache:
-            if key == category_name:
-                self.cache.pop(key)
-                break
+        self._cache.pop(key, None)
+        self._cached_at.pop(key, None)
 
     @property
     def size(self):
         """Return the size of the cache"""
-        return len(self.cache)
+        return len(self._cache)
+
+    def stats(self):
+        """Return the cache counters"""
+        return {'size': len(self._cache), 'maxSize': self.max_cache_size, 'ttl': self.ttl, 'hit': self.hit,
+                'miss': self.miss, 'evictions': self.evictions, 'expirations': self.expirations}
 
 
 class ConfigurationManagerSingleton(object):
@@ -745,9 +786,7 @@ class ConfigurationManager(ConfigurationManagerSingleton):
                 self._cacheManager.cache[category_name]['value'] = new_category_val_db
                 self._cacheManager.cache[category_name]['displayName'] = display_name
             else:
-                self._cacheManager.cache.update({category_name: {"description": category_description,
-                                                                 "value": new_category_val_db,
-                                                                 "displayName": display_name}})
+                self._cacheManager.update(category_name, category_description, new_category_val_db, display_name)
         except KeyError:
             raise ValueError(result['message'])
         except StorageServerError as ex:
@@ -818,20 +857,15 @@ class ConfigurationManager(ConfigurationManagerSingleton):
         None
         """
         try:
-            if category_name in self._cacheManager:
-                if item_name not in self._cacheManager.cache[category_name]['value']:
+            if category_name not in self._cacheManager:
+                # Reads the whole category, once cached all of its items are served from the cache
+                category = await self._read_category(category_name)
+                if category is None:
                     return None
-                return self._cacheManager.cache[category_name]['value'][item_name]
-            else:
-                cat_item = await self._read_item_val(category_name, item_name)
-                if cat_item is not None:
-                    category = await self._read_category(category_name)  # await self._read_category_val(category_name)
-                    if category is not None:
-                        category_value = self._handle_script_type(category_name, category["value"])
-                        self._cacheManager.update(category_name, category["description"], category_value,
-                                                  category["display_name"])
-                        cat_item = category_value[item_name]
-                return cat_item
+                category_value = self._handle_script_type(category_name, category["value"])
+                self._cacheManager.update(category_name, category["description"], category_value,
+                                          category["display_name"])
+            return self._cacheManager.cache[category_name]['value'].get(item_name)
         except:
             _logger.exception(
                 'Unable to get category item based on category_name %s and item_name %s', category_name, item_name)
@@ -23,6 +23,9 @@ import tempfile
 import time
 import logging
 import mmap
+import asyncio
+import queue
+from concurrent.futures import ThreadPoolExecutor
 
 
 sys.path.append(os.path.dirname(__file__))
@@ -72,11 +75,18 @@ def is_server_process():
 #
 # Arguments are sent in an encoded dict: {'method': <method-name>, 'args': <list of arguments>}
 #
-# In the mapped file implementation, there is a tmpfile of ARGFILE_SIZE mapped into client and
-# server where the arguments are written using pickle. Results are written back the same way.
+# In the mapped file implementation, there is a tmpfile mapped into client and server where the
+# arguments are written using pickle. Results are written back the same way. The file starts at
+# ARGFILE_SIZE and is grown by the writer when a message does not fit; the reader maps it again
+# at its new size.
+#
+# With pickle protocol 5 (python 3.8 and later), the large buffers of the arguments, such as the
+# data of a numpy array, are not copied into the pickle stream. They are written out-of-band in the
+# mapped file right after the pickle stream, and their sizes follow the length on the signal line:
+#   <len> [<buffer size> ...]\n
 #
 # For the process receiving the results, the length indicates a couple of special things:
-# >0 -> standard dict
+# >0 -> standard dict, the length is the size of the pickle stream
 # =0 -> None
 # <0 -> exception, which is re-constituted and re-raised, so the client receives it
 #
@@ -89,19 +99,28 @@ def is_server_process():
 # stderr (usually before the server starts) aren't lost.
 #
 # The IPCModuleClient derives from InterProcessRPCClient and  specifically
-# invokes a named python module as a server.
+# invokes a named python module as a server. AsyncIPCModuleClient proxies the calls as coroutines
+# and IPCModuleClientPool spreads the calls over several servers of the same module.
 
 
 ARGFILE_SIZE = 1024*1024*20
 
+PICKLE_PROTOCOL = pickle.HIGHEST_PROTOCOL
+OUT_OF_BAND = PICKLE_PROTOCOL >= 5
+
 
 class InterProcessRPC:
     def __init__(self,
-                 infd=io.BufferedReader(io.FileIO(os.dup(sys.stdin.fileno()))),
-                 outfd=io.BufferedWriter(io.FileIO(os.dup(sys.stdout.fileno()), mode='w')),
+                 infd=None,
+                 outfd=None,
                  errfd=sys.stderr,
                  name="",
                  argfile_fd=None):
+        # the server talks to the client on its stdin/stdout, duplicated when it starts rather than on import
+        if infd is None:
+            infd = io.BufferedReader(io.FileIO(os.dup(sys.stdin.fileno())))
+        if outfd is None:
+            outfd = io.BufferedWriter(io.FileIO(os.dup(sys.stdout.fileno()), mode='w'))
         self.infd = infd    # for direct i/o between client/server
         self.outfd = outfd
 
@@ -123,7 +142,8 @@ class InterProcessRPC:
             # client process opens the file then passes it up to superclass
             self.argfile_fd = argfile_fd
 
-        self.mfile = mmap.mmap(self.argfile_fd, ARGFILE_SIZE)  # assume input > output
+        # the client sizes the file, it grows when a message does not fit
+        self.mfile = mmap.mmap(self.argfile_fd, os.fstat(self.argfile_fd).st_size)
 
     def call(self, rpcobj):
         """ call - local instance of rpc call """
@@ -135,12 +155,63 @@ class InterProcessRPC:
         _args = rpcobj['args']
         return _method(*_args)
 
+    def _map_argfile(self, size, grow=False):
+        """ _map_argfile - make sure size bytes of the arg file are mapped, growing the file if we are the writer """
+        if size <= len(self.mfile):
+            return
+        if grow:
+            _size = max(size, 2 * len(self.mfile))
+            os.ftruncate(self.argfile_fd, _size)
+        else:
+            _size = os.fstat(self.argfile_fd).st_size
+            if _size < size:
+                raise ValueError("rpc message of {} bytes exceeds the arg file size {}".format(size, _size))
+        self.mfile.close()
+        self.mfile = mmap.mmap(self.argfile_fd, _size)
+
+    def _load(self, size, buffer_sizes):
+        """ _load - unpickle an object and its out-of-band buffers from the arg file """
+        self._map_argfile(size + sum(buffer_sizes))
+        _data = self.mfile[:size]
+        if not buffer_sizes:
+            return pickle.loads(_data)
+
+        # the buffers are copied out once, so that the objects do not share the arg file used by the next call
+        _buffers = []
+        _offset = size
+        with memoryview(self.mfile) as _view:
+            for _size in buffer_sizes:
+                with _view[_offset:_offset + _size] as _part:
+                    _buffers.append(bytearray(_part))
+                _offset += _size
+        return pickle.loads(_data, buffers=_buffers)
+
+    def _dump(self, obj):
+        """ _dump - pickle an object into the arg file, returns the signal line sizes """
+        _buffers = []
+        if OUT_OF_BAND:
+            _data = pickle.dumps(obj, protocol=PICKLE_PROTOCOL, buffer_callback=_buffers.append)
+        else:
+            _data = pickle.dumps(obj, protocol=PICKLE_PROTOCOL)
+        _raws = [_buffer.raw() for _buffer in _buffers]
+        _sizes = [len(_data)] + [_raw.nbytes for _raw in _raws]
+        self._map_argfile(sum(_sizes), grow=True)
+
+        self.mfile[:len(_data)] = _data
+        _offset = len(_data)
+        for _raw in _raws:
+            # straight from the object memory into the shared memory
+            self.mfile[_offset:_offset + _raw.nbytes] = _raw
+            _offset += _raw.nbytes
+            _raw.release()
+        return _sizes
+
     def rpc_read(self):
         """ rpc_read - read len/buf from the remote host
         protocol:
-        each call is preceded by an ascii - <len>\n
+        each call is preceded by an ascii - <len> [<buffer size> ...]\n
           len == '' : EOF from remote side
-          len > 0   : len sized buffer with json method + args follows
+          len > 0   : len sized buffer with json method + args follows, then the out-of-band buffers
           len == 0  : None
           len < 0   : len sized buffer with named exception plus arg follows
         Returns:
@@ -151,24 +222,24 @@ class InterProcessRPC:
         """
 
         # protocol: pipe produces a length of next object
-        _len = self.infd.readline()  # assume small enough to not deadlock
-        self.mfile.seek(0)
+        _line = self.infd.readline()  # assume small enough to not deadlock
 
-        if _len == b'':
+        if _line == b'':
             # closed fd on one side or the other of the pipe
             raise EOFError
 
-        _len = int(_len)
+        _sizes = [int(_size) for _size in _line.split()]
+        _len = _sizes[0]
         if _len > 0:
             # len > 0 -> json object
 
             # eprint("read >0")
-            obj = pickle.loads(self.mfile)
+            obj = self._load(_len, _sizes[1:])
             return obj
 
         elif _len < 0:
             # _len < 0 -> Exception
-            _ex = pickle.loads(self.mfile)
+            _ex = self._load(-_len, _sizes[1:])
 
             # reconstitute the exception, pass server exception through locally
             _ex_class, _ex_msg = _ex['class'], _ex['message']
@@ -203,12 +274,12 @@ class InterProcessRPC:
 
         if obj is not None:
             # put the dict into shared memory
-            self.mfile.seek(0)
-            pickle.dump(obj, self.mfile)
+            _sizes = self._dump(obj)
 
-            # write a leading "len", positive (object) or negative (exception)
-            # and signal to the server there's something to do
-            _lenstr = str(_lenmult * 1)+'\n'
+            # write a leading "len", positive (object) or negative (exception), and the sizes
+            # of the out-of-band buffers, and signal to the server there's something to do
+            _sizes[0] *= _lenmult
+            _lenstr = ' '.join(str(_size) for _size in _sizes) + '\n'
             self.outfd.write(_lenstr.encode('utf-8', 'ignore'))
         else:
             # no payload for None return
@@ -273,6 +344,9 @@ class InterProcessRPCClient(InterProcessRPC):
     """
 
     def __init__(self, server_args, env=None):
+        # one call at a time on the pipe; set first, IPCModuleClient proxies unknown attributes
+        self._call_lock = threading.Lock()
+        self._call_executor = None
 
         # trap and send stderr to syslog if we are in a server process
         _is_server = is_server_process()
@@ -325,8 +399,15 @@ class InterProcessRPCClient(InterProcessRPC):
         Raises:
             Exception with appropriate message raised in remote execution (xxx -- reinstantiate exception class)
         """
-        self.rpc_write(rpcobj)
-        return self.rpc_read()
+        with self._call_lock:
+            self.rpc_write(rpcobj)
+            return self.rpc_read()
+
+    async def call_async(self, rpcobj):
+        """ call_async - call, without blocking the event loop while the server works """
+        if self._call_executor is None:
+            self._call_executor = ThreadPoolExecutor(max_workers=1)
+        return await asyncio.get_event_loop().run_in_executor(self._call_executor, self.call, rpcobj)
 
 
 class IPCModuleClient(InterProcessRPCClient):
@@ -349,3 +430,54 @@ class IPCModuleClient(InterProcessRPCClient):
 
         _super = super() # bind super outside of the lambda
         return lambda *x: _super.call({'method': method_name, 'args': [*x]})
+
+
+class AsyncIPCModuleClient(IPCModuleClient):
+    """ AsyncIPCModuleClient - IPCModuleClient whose proxied calls are coroutines, for use from async plugins """
+
+    def __getattr__(self, method_name):
+        _super = super(IPCModuleClient, self)  # bind super outside of the lambda, skipping the sync proxy
+        return lambda *x: _super.call_async({'method': method_name, 'args': [*x]})
+
+
+class IPCModuleClientPool:
+    """ IPCModuleClientPool - servers of the same python module, each call goes to a server which is not busy
+
+    Calls are proxied by name as with IPCModuleClient. The servers do not share state: a call which sets up
+    a server, such as plugin_init, must be sent to all of them with broadcast.
+    """
+
+    def __init__(self, module_name, module_dir, size=None):
+        self.size = size or os.cpu_count() or 1
+        self._clients = [IPCModuleClient(module_name, module_dir) for _ in range(self.size)]
+        self._idle = queue.Queue()
+        for _client in self._clients:
+            self._idle.put(_client)
+        self._executor = ThreadPoolExecutor(max_workers=self.size)
+
+    def call(self, rpcobj):
+        """ call - run the call on the first server which is not busy """
+        _client = self._idle.get()
+        try:
+            return _client.call(rpcobj)
+        finally:
+            self._idle.put(_client)
+
+    async def call_async(self, rpcobj):
+        return await asyncio.get_event_loop().run_in_executor(self._executor, self.call, rpcobj)
+
+    def map(self, method_name, args_list):
+        """ map - call the method once per list of arguments, fanned out across the servers
+
+        Returns:
+            the results in the order of args_list
+        """
+        return list(self._executor.map(lambda args: self.call({'method': method_name, 'args': list(args)}),
+                                       args_list))
+
+    def broadcast(self, method_name, *args):
+        """ broadcast - call the method on every server, returns the results """
+        return [_client.call({'method': method_name, 'args': [*args]}) for _client in self._clients]
+
+    def __getattr__(self, method_name):
+        return lambda *x: self.call({'method': method_name, 'args': [*x]})
@@ -5,10 +5,14 @@
 # FLEDGE_END
 
 """ Fledge Logger """
+import atexit
+import copy
 import os
-import subprocess
+import queue
+import sys
 import logging
-import traceback
+import threading
+import time
 from logging.handlers import SysLogHandler
 from functools import wraps
 
@@ -30,6 +34,16 @@ FLEDGE_LOGS_DESTINATION = 'FLEDGE_LOGS_DESTINATION'
 """Log destination environment variable"""
 default_destination = SYSLOG
 """Default destination of logger"""
+LOG_QUEUE_SIZE = 10000
+"""Records waiting to be written, the records logged while the queue is full are dropped"""
+RATE_LIMIT_INTERVAL = 10
+"""Seconds of the windows in which the records of a same message are counted"""
+RATE_LIMIT_RECORDS = 50
+"""Records of a same logger, level and message written per window, the others are dropped"""
+RATE_LIMIT_KEYS = 10000
+"""Messages counted at a time, the counts are reset beyond that"""
+FLUSH_TIMEOUT_AT_EXIT = 2
+"""Seconds given to the log writer to write the queued records when the process exits"""
 
 
 def set_default_destination(destination: int):
@@ -47,14 +61,182 @@ if (FLEDGE_LOGS_DESTINATION in os.environ) and \
     set_default_destination(int(os.environ[FLEDGE_LOGS_DESTINATION]))
 
 
+_process_name = None
+""" pid and name of the process, resolved once """
+
+
+def _command_line() -> list:
+    try:
+        with open('/proc/self/cmdline', 'rb') as f:
+            args = f.read().split(b'\0')
+        return [arg.decode(errors='replace') for arg in args if arg]
+    except OSError:
+        return list(sys.argv)
+
+
 def get_process_name() -> str:
-    # Example: ps -eaf | grep 5175 | grep -v grep | awk -F '--name=' '{print $2}'
+    """ Returns 'Fledge <name>' for a process started with --name=<name>, 'Fledge' otherwise
+
+    The name is read from the command line of the process once and cached, a forked child resolves it again.
+    """
+    global _process_name
     pid = os.getpid()
-    cmd = "ps -eaf | grep {} | grep -v grep | awk -F '--name=' '{{print $2}}'| tr -d '\n'".format(pid)
-    read_process_name = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE).stdout.readlines()
-    binary_to_string = [b.decode() for b in read_process_name]
-    pname = 'Fledge ' + binary_to_string[0] if binary_to_string else 'Fledge'
-    return pname
+    if _process_name is None or _process_name[0] != pid:
+        name = None
+        for arg in _command_line():
+            if arg.startswith('--name='):
+                name = arg[len('--name='):]
+        _process_name = (pid, 'Fledge ' + name if name else 'Fledge')
+    return _process_name[1]
+
+
+def _line_records(record: logging.LogRecord):
+    """ Returns the records of every line of a record, with its traceback if any, so that every line is written
+    with the prefix of the format, rather than as #012 separated lines in syslog
+    """
+    text = record.getMessage()
+    if not record.exc_info and not record.stack_info and '\n' not in text:
+        return [record]
+    if record.exc_info:
+        text = text + '\n' + _traceback_formatter.formatException(record.exc_info)
+    if record.stack_info:
+        text = text + '\n' + record.stack_info
+    records = []
+    for line in text.splitlines():
+        if line.strip():
+            line_record = copy.copy(record)
+            line_record.msg, line_record.args = line, None
+            line_record.exc_info = line_record.exc_text = line_record.stack_info = None
+            records.append(line_record)
+    return records
+
+
+_traceback_formatter = logging.Formatter()
+
+
+class _LogWriter(object):
+    """ Writes the records queued by the QueuedHandlers of the process from a background thread """
+
+    def __init__(self, size=LOG_QUEUE_SIZE):
+        self._size = size
+        self._queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+        """Records dropped as the queue was full"""
+        self.suppressed = 0
+        """Records dropped by the rate limit"""
+        self._reported_dropped = 0
+
+    def put(self, handler, record):
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait((handler, record))
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A forked process has no writer thread, nor does it write the records queued by its parent
+            self._queue = queue.Queue(self._size)
+            thread = threading.Thread(target=self._run, args=(self._queue,), name="FledgeLogWriter", daemon=True)
+            thread.start()
+            self._pid = os.getpid()
+
+    def _run(self, records):
+        while True:
+            handler, record = records.get()
+            try:
+                for line_record in _line_records(record):
+                    handler.handle(line_record)
+                if self.dropped != self._reported_dropped:
+                    dropped, self._reported_dropped = self.dropped - self._reported_dropped, self.dropped
+                    handler.handle(logging.makeLogRecord({
+                        'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                        'msg': '{} log records dropped, the log queue was full'.format(dropped)}))
+            except Exception:
+                handler.handleError(record)
+            finally:
+                records.task_done()
+
+    def flush(self, timeout=None):
+        """ Waits until the queued records are written, at most timeout seconds if given """
+        if self._pid != os.getpid():
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+            time.sleep(0.01)
+
+
+_writer = _LogWriter()
+atexit.register(_writer.flush, FLUSH_TIMEOUT_AT_EXIT)
+
+
+def log_drop_counts() -> dict:
+    """ Returns the number of records dropped by the log queue of the process, as it was full or by the rate limit """
+    return {'queueFull': _writer.dropped, 'rateLimited': _writer.suppressed}
+
+
+def flush():
+    """ Waits until the records logged so far are written """
+    _writer.flush()
+
+
+class QueuedHandler(logging.Handler):
+    """ Queues the records for a handler, written from a background thread, so that logging never blocks
+
+    The message of a record is formatted when it is logged; its traceback, if any, is formatted by the writer.
+    The records of a same logger, level and message are limited to RATE_LIMIT_RECORDS per RATE_LIMIT_INTERVAL, the
+    number of records dropped is logged with the next record of that message in a later interval.
+    """
+
+    def __init__(self, target: logging.Handler):
+        super().__init__()
+        self.target = target
+        self.name = target.name
+        self._windows = {}
+        """(logger name, level, message, exception class) -> [start of the window, records written, records dropped]"""
+
+    def emit(self, record):
+        try:
+            key = (record.name, record.levelno, str(record.msg), record.exc_info[0] if record.exc_info else None)
+            now = time.monotonic()
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= RATE_LIMIT_INTERVAL:
+                if window is None and len(self._windows) >= RATE_LIMIT_KEYS:
+                    self._windows.clear()
+                if window is not None and window[2]:
+                    self._put(record, '{} similar log records dropped in {} seconds: {}'.format(
+                        window[2], RATE_LIMIT_INTERVAL, str(record.msg).split('\n', 1)[0]), summary=True)
+                self._windows[key] = [now, 1, 0]
+            elif window[1] < RATE_LIMIT_RECORDS:
+                window[1] += 1
+            else:
+                window[2] += 1
+                _writer.suppressed += 1
+                return
+            self._put(record, record.getMessage())
+        except Exception:
+            self.handleError(record)
+
+    def _put(self, record, message, summary=False):
+        queued = copy.copy(record)
+        queued.msg, queued.args = message, None
+        if summary:
+            queued.exc_info = queued.exc_text = queued.stack_info = None
+        _writer.put(self.target, queued)
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def close(self):
+        self.target.close()
+        super().close()
 
 
 def setup(logger_name: str = None,
@@ -114,7 +296,7 @@ def setup(logger_name: str = None,
     handler.setFormatter(formatter)
     if level is not None:
         logger.setLevel(level)
-    logger.addHandler(handler)
+    logger.addHandler(QueuedHandler(handler))
     logger.propagate = propagate
 
     # Call error override
@@ -135,31 +317,24 @@ def error_override(_logger: logging.Logger) -> None:
 
     @wraps(_logger.error)
     def error(msg, *args, **kwargs):
+        # The message and the traceback are written a line at a time by the QueuedHandler, formatting the
+        # traceback is left to its writer thread
         if isinstance(msg, Exception):
             """For example:
                 a) _logger.error(ex)
                 b) _logger.error(ex, "Failed to add data.")
             """
-            trace_msg = traceback.format_exception(msg.__class__, msg, msg.__traceback__)
-            if args:
-                trace_msg[:0] = ["{}\n".format(args[0])]
-            [__logging_error(line.strip('\n')) for line in trace_msg]
+            __logging_error("{}".format(args[0]) if args else "", exc_info=(msg.__class__, msg, msg.__traceback__))
         else:
-            if isinstance(msg, str):
-                """For example:
-                    a) _logger.error(str(ex))
-                    b) _logger.error("Failed to log audit trail entry")
-                    c) _logger.error('Failed to log audit trail entry for code: %s', "CONCH")
-                    d) _logger.error('Failed to log audit trail entry for code: {log_code}'.format(log_code="CONAD"))
-                    e) _logger.error('Failed to log audit trail entry for code: {0}'.format("CONAD"))
-                    f) _logger.error("Failed to log audit trail entry for code '{}' \n{}".format("CONCH", "Next line"))
-                """
-                if args:
-                    msg = msg % args
-                [__logging_error(m) for m in msg.splitlines()]
-            else:
-                # Default logging error
-                __logging_error(msg)
+            """For example:
+                a) _logger.error(str(ex))
+                b) _logger.error("Failed to log audit trail entry")
+                c) _logger.error('Failed to log audit trail entry for code: %s', "CONCH")
+                d) _logger.error('Failed to log audit trail entry for code: {log_code}'.format(log_code="CONAD"))
+                e) _logger.error('Failed to log audit trail entry for code: {0}'.format("CONAD"))
+                f) _logger.error("Failed to log audit trail entry for code '{}' \n{}".format("CONCH", "Next line"))
+            """
+            __logging_error(msg, *args, **kwargs)
     # overwrite the default logging.error
     _logger.error = error
 
@@ -229,9 +404,11 @@ class FLCoreLogger:
             logger: returns logger for module
         """
         _logger = logging.getLogger(logger_name)
-        console_handler = self.get_console_handler()
-        syslog_handler = self.get_syslog_handler()
-        self.add_handlers(_logger, [syslog_handler, console_handler])
+        existing_handler_names = [existing_handler.name for existing_handler in _logger.handlers]
+        if "syslogHandler" not in existing_handler_names or "consoleHandler" not in existing_handler_names:
+            # Logging never waits for syslog or the console, the records are written from a background thread
+            self.add_handlers(_logger, [QueuedHandler(self.get_syslog_handler()),
+                                        QueuedHandler(self.get_console_handler())])
         _logger.propagate = False
         # Call error override
         error_override(_logger)
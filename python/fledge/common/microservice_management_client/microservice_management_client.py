@@ -4,13 +4,17 @@
 # See: http://fledge-iot.readthedocs.io/
 # FLEDGE_END
 
+import asyncio
+import copy
 import http.client
 import json
+import time
 import urllib.parse
 import logging
 
 from fledge.common import logger
 from fledge.common.microservice_management_client import exceptions as client_exceptions
+from fledge.common.storage_client.session_pool import ClientSessionPool, DEFAULT_POOL_SIZE, DEFAULT_IDLE_TIMEOUT
 
 __author__ = "Ashwin Gopalakrishnan"
 __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
@@ -19,6 +23,9 @@ __version__ = "${VERSION}"
 
 _logger = logger.setup(__name__, level=logging.INFO)
 
+SERVICES_CACHE_TTL = 2
+""" Number of seconds the services returned by MicroserviceManagementClientAsync.get_services are cached """
+
 
 class MicroserviceManagementClient(object):
     _management_client_conn = None
@@ -420,4 +427,226 @@ class MicroserviceManagementClient(object):
         res = r.read().decode()
         self._management_client_conn.close()
         response = json.loads(res)
-        return response
\ No newline at end of file
+        return response
+
+
+class MicroserviceManagementClientAsync(object):
+    """ asyncio client of the core microservice management API
+
+    All calls share one keep-alive aiohttp session: requests reuse the open connections instead of opening one per
+    call, and independent requests, such as those of the bulk variants, run concurrently on up to pool_size
+    connections. The services returned by :meth:`get_services` are cached for services_cache_ttl seconds.
+    """
+
+    def __init__(self, microservice_management_host, microservice_management_port, pool_size=DEFAULT_POOL_SIZE,
+                 pool_idle_timeout=DEFAULT_IDLE_TIMEOUT, services_cache_ttl=SERVICES_CACHE_TTL):
+        self.hostname = microservice_management_host
+        self.port = microservice_management_port
+        self._base_url = 'http://{}:{}'.format(microservice_management_host, microservice_management_port)
+        self._pool = ClientSessionPool(pool_size, pool_idle_timeout)
+        self._services_cache_ttl = services_cache_ttl
+        self._services_cache = {}
+        """ (service name, service type) -> (expiry time, response) """
+        self._bulk_track_supported = True
+        """ False once the core has answered that it has no bulk asset tracker endpoint """
+        self.services_cache_hits = 0
+
+    async def _request(self, method, url, body=None, not_found_ok=False):
+        async with self._pool.session() as session:
+            async with session.request(method, self._base_url + url, data=body) as resp:
+                if resp.status in range(400, 500) and not (not_found_ok and resp.status == 404):
+                    _logger.error("Client error code: %d, Reason: %s", resp.status, resp.reason)
+                    raise client_exceptions.MicroserviceManagementClientError(status=resp.status, reason=resp.reason)
+                if resp.status in range(500, 600):
+                    _logger.error("Server error code: %d, Reason: %s", resp.status, resp.reason)
+                    raise client_exceptions.MicroserviceManagementClientError(status=resp.status, reason=resp.reason)
+                res = await resp.text()
+        return json.loads(res)
+
+    async def register_service(self, service_registration_payload):
+        """ Registers a newly created microservice with the core service, see MicroserviceManagementClient """
+        response = await self._request('POST', '/fledge/service', json.dumps(service_registration_payload))
+        self._services_cache.clear()
+        try:
+            response["id"]
+        except (KeyError, Exception) as ex:
+            _logger.exception(ex, "Could not register the microservice, From request {}".format(
+                json.dumps(service_registration_payload)))
+            raise
+        return response
+
+    async def unregister_service(self, microservice_id):
+        """ Removes the registration record for a microservice, see MicroserviceManagementClient """
+        response = await self._request('DELETE', '/fledge/service/{}'.format(microservice_id))
+        self._services_cache.clear()
+        try:
+            response["id"]
+        except (KeyError, Exception) as ex:
+            _logger.exception(ex, "Could not unregister the microservice having UUID {}".format(microservice_id))
+            raise
+        return response
+
+    async def register_interest(self, category, microservice_id):
+        """ Register an interest of microservice in a configuration category
+
+        :param category: configuration category
+        :param microservice_id: microservice's UUID string
+        :return: A JSON object containing a registration ID for this registration
+        """
+        payload = json.dumps({"category": category, "service": microservice_id}, sort_keys=True)
+        response = await self._request('POST', '/fledge/interest', payload)
+        try:
+            response["id"]
+        except (KeyError, Exception) as ex:
+            _logger.exception(ex, "Could not register interest, for request payload {}".format(payload))
+            raise
+        return response
+
+    async def unregister_interest(self, registered_interest_id):
+        """ Remove a previously registered interest in a configuration category
+
+        :param registered_interest_id: registered interest id for a configuration category
+        :return: A JSON object containing the unregistered interest id
+        """
+        response = await self._request('DELETE', '/fledge/interest/{}'.format(registered_interest_id))
+        try:
+            response["id"]
+        except (KeyError, Exception) as ex:
+            _logger.exception(ex, "Could not unregister interest for {}".format(registered_interest_id))
+            raise
+        return response
+
+    async def get_services(self, service_name=None, service_type=None):
+        """ Retrieve the details of one or more services that are registered
+
+        The response is cached for services_cache_ttl seconds; registering or unregistering a service through this
+        client drops the cache.
+
+        :param service_name: filter the returned services by name
+        :param service_type: filter the returned services by type
+        :return: list of registered microservices, all or based on filter(s) applied
+        """
+        key = (service_name, service_type)
+        cached = self._services_cache.get(key)
+        now = time.monotonic()
+        if cached is not None and cached[0] > now:
+            self.services_cache_hits += 1
+            return copy.deepcopy(cached[1])
+
+        url = '/fledge/service'
+        delimeter = '?'
+        if service_name:
+            url = '{}{}name={}'.format(url, delimeter, urllib.parse.quote(service_name))
+            delimeter = '&'
+        if service_type:
+            url = '{}{}type={}'.format(url, delimeter, service_type)
+        response = await self._request('GET', url)
+        try:
+            response["services"]
+        except (KeyError, Exception) as ex:
+            _logger.exception(ex, "Could not find the microservice for requested url {}".format(url))
+            raise
+        if self._services_cache_ttl > 0:
+            self._services_cache[key] = (now + self._services_cache_ttl, copy.deepcopy(response))
+        return response
+
+    async def get_configuration_category(self, category_name=None):
+        url = '/fledge/service/category'
+        if category_name:
+            url = "{}/{}".format(url, urllib.parse.quote(category_name))
+        return await self._request('GET', url)
+
+    async def get_configuration_categories(self, category_names):
+        """ Bulk variant of :meth:`get_configuration_category`
+
+        :param category_names: list of category names, fetched concurrently
+        :return: dict of category name -> category
+        """
+        categories = await asyncio.gather(*[self.get_configuration_category(name) for name in category_names])
+        return dict(zip(category_names, categories))
+
+    async def get_configuration_item(self, category_name, config_item):
+        url = "/fledge/service/category/{}/{}".format(urllib.parse.quote(category_name), urllib.parse.quote(config_item))
+        return await self._request('GET', url)
+
+    async def create_configuration_category(self, category_data):
+        """
+
+        :param category_data: JSON string, see MicroserviceManagementClient.create_configuration_category
+        :return:
+        """
+        data = json.loads(category_data)
+        if 'keep_original_items' in data:
+            keep_original_item = 'true' if data['keep_original_items'] is True else 'false'
+            url = '/fledge/service/category?keep_original_items={}'.format(keep_original_item)
+            del data['keep_original_items']
+        else:
+            url = '/fledge/service/category'
+        return await self._request('POST', url, json.dumps(data))
+
+    async def create_configuration_categories(self, categories_data):
+        """ Bulk variant of :meth:`create_configuration_category`, the categories are created concurrently
+
+        :param categories_data: list of category JSON strings; a parent category must not be in the same call
+                                as the categories it is created with as children
+        :return: list of responses, in the order of categories_data
+        """
+        return list(await asyncio.gather(*[self.create_configuration_category(data) for data in categories_data]))
+
+    async def create_child_category(self, parent, children):
+        url = '/fledge/service/category/{}/children'.format(urllib.parse.quote(parent))
+        return await self._request('POST', url, json.dumps({"children": children}))
+
+    async def update_configuration_item(self, category_name, config_item, category_data):
+        """
+
+        :param category_data: e.g. '{"value": "true"}'
+        """
+        url = "/fledge/service/category/{}/{}".format(urllib.parse.quote(category_name),
+                                                      urllib.parse.quote(config_item))
+        return await self._request('PUT', url, category_data)
+
+    async def delete_configuration_item(self, category_name, config_item):
+        url = "/fledge/service/category/{}/{}/value".format(urllib.parse.quote(category_name),
+                                                            urllib.parse.quote(config_item))
+        return await self._request('DELETE', url)
+
+    async def get_asset_tracker_events(self):
+        return await self._request('GET', '/fledge/track')
+
+    async def create_asset_tracker_event(self, asset_event):
+        """
+
+        :param asset_event
+               e.g. {"asset": "AirIntake", "event": "Ingest", "service": "PT100_In1", "plugin": "PT100"}
+        """
+        return await self._request('POST', '/fledge/track', json.dumps(asset_event))
+
+    async def create_asset_tracker_events(self, asset_events):
+        """ Bulk variant of :meth:`create_asset_tracker_event`
+
+        The events are sent in a single request; a core without the bulk endpoint is sent one request per event,
+        concurrently.
+
+        :param asset_events: list of asset tracker events
+        :return: list of the events added
+        """
+        if self._bulk_track_supported:
+            try:
+                response = await self._request('POST', '/fledge/track/bulk', json.dumps({"track": asset_events}))
+                return response["track"]
+            except client_exceptions.MicroserviceManagementClientError as ex:
+                if ex.status not in (404, 405):
+                    raise
+                self._bulk_track_supported = False
+        return list(await asyncio.gather(*[self.create_asset_tracker_event(event) for event in asset_events]))
+
+    async def get_alert_by_key(self, key):
+        return await self._request('GET', "/fledge/alert/{}".format(key), not_found_ok=True)
+
+    async def add_alert(self, params):
+        return await self._request('POST', '/fledge/alert', json.dumps(params))
+
+    async def close(self):
+        """ Close the keep-alive session """
+        await self._pool.close()
@@ -7,7 +7,9 @@
 """Common Plugin Discovery Class"""
 
 import os
+import sys
 from fledge.common.logger import FLCoreLogger
+from fledge.common.plugin_index import plugin_index
 from fledge.plugins.common import utils as common_utils
 from fledge.services.core.api import utils
 from fledge.services.core.api.plugins import common
@@ -70,6 +72,7 @@ class PluginDiscovery(object):
                                                        installed_dir_name=installed_dir_name, is_config=is_config)
             plugins_list.extend(cls.fetch_c_plugins_installed(plugin_type=plugin_type, is_config=is_config,
                                                               installed_dir_name=installed_dir_name))
+        plugin_index.save()
         return plugins_list
 
     @classmethod
@@ -127,11 +130,13 @@ class PluginDiscovery(object):
     @classmethod
     def fetch_c_plugins_installed(cls, plugin_type, is_config, installed_dir_name):
         libs = utils.find_c_plugin_libs(installed_dir_name)
+        # Probe the libraries which are not in the plugin index at the same time
+        infos = utils.get_plugins_info([name for name, _type in libs if _type == 'binary'], dir=installed_dir_name)
         configs = []
         for name, _type in libs:
             try:
                 if _type == 'binary':
-                    jdoc = utils.get_plugin_info(name, dir=installed_dir_name)
+                    jdoc = infos[name]
                     if jdoc:
                         if 'flag' in jdoc:
                             if common_utils.bit_at_given_position_set_or_unset(jdoc['flag'],
@@ -174,8 +179,17 @@ class PluginDiscovery(object):
         plugin_config = None
         # Now load the plugin to fetch its configuration
         try:
-            plugin_info = common.load_and_fetch_python_plugin_info(
-                plugin_module_path, plugin_module_path.split('/')[-1], installed_dir_name)
+            plugin_name = plugin_module_path.split('/')[-1]
+            plugin_file = '{}/{}.py'.format(plugin_module_path, plugin_name)
+            plugin_info = plugin_index.get(plugin_file)
+            if plugin_info is None:
+                if plugin_index.is_stale(plugin_file):
+                    # The plugin was updated, import the new module rather than the one loaded before
+                    sys.modules.pop("fledge.plugins.{}.{}.{}".format(installed_dir_name, plugin_name, plugin_name),
+                                    None)
+                plugin_info = common.load_and_fetch_python_plugin_info(plugin_module_path, plugin_name,
+                                                                       installed_dir_name)
+                plugin_index.put(plugin_file, plugin_info)
             # Fetch configuration from the configuration defined in the plugin
             if plugin_info['type'] == installed_dir_name:
                 if 'flag' in plugin_info:
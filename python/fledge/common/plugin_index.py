@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+# FLEDGE_BEGIN
+# See: http://fledge-iot.readthedocs.io/
+# FLEDGE_END
+
+"""Index of the plugin information of the installed plugins
+
+Fetching the information of a plugin means importing a Python plugin or running the get_plugin_info utility on a C
+plugin library. The index keeps the information of each plugin file with a signature of the files of the plugin
+directory when it was read, so that it is only read again once one of them has changed: a plugin may import other
+modules or load other libraries from its directory. The index is saved to a file in the data directory and loaded
+again at the next start.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import threading
+
+from fledge.common.common import _FLEDGE_ROOT, _FLEDGE_DATA
+from fledge.common.logger import FLCoreLogger
+
+__copyright__ = "Copyright (c) 2023 Dianomic Systems Inc."
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+_logger = FLCoreLogger().get_logger(__name__)
+
+_INDEX_VERSION = 2
+
+
+def index_path():
+    """Returns the file the plugin index is saved to"""
+    cache_dir = _FLEDGE_DATA + '/cache' if _FLEDGE_DATA else _FLEDGE_ROOT + '/data/cache'
+    return cache_dir + '/plugin_index.json'
+
+
+def _file_signature(file_path):
+    """Returns a hash of the name, modification time and size of the files in the directory of a plugin file,
+    None if the plugin file does not exist"""
+    if not os.path.isfile(file_path):
+        return None
+    plugin_dir = os.path.dirname(file_path)
+    digest = hashlib.sha1()
+    for root, dirs, files in os.walk(plugin_dir):
+        dirs[:] = sorted(name for name in dirs if name != '__pycache__')
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            digest.update('{}:{}:{}\n'.format(os.path.relpath(path, plugin_dir), stat.st_mtime_ns,
+                                              stat.st_size).encode())
+    return digest.hexdigest()
+
+
+class PluginInfoIndex(object):
+    """Plugin information keyed by the path of the plugin file and the signature of its directory"""
+
+    def __init__(self, path=None):
+        self._path = path
+        self._entries = {}
+        """File path -> [signature, plugin information]"""
+        self._loaded = path is None
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, file_path):
+        """Returns a copy of the plugin information of a file, None if the file is unknown or has changed"""
+        self._load()
+        entry = self._entries.get(file_path)
+        if entry is not None and entry[0] == _file_signature(file_path):
+            self.hits += 1
+            return copy.deepcopy(entry[1])
+        self.misses += 1
+        return None
+
+    def is_stale(self, file_path):
+        """True if the file is in the index but the files of its directory have changed since"""
+        self._load()
+        entry = self._entries.get(file_path)
+        return entry is not None and entry[0] != _file_signature(file_path)
+
+    def put(self, file_path, info):
+        """Adds the plugin information of a file, read from the file as it is now"""
+        signature = _file_signature(file_path)
+        if signature is None or not info:
+            return
+        try:
+            # Only what can be saved is indexed
+            info = json.loads(json.dumps(info))
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            self._entries[file_path] = [signature, info]
+            self._dirty = True
+
+    def save(self):
+        """Writes the index file if entries were added, dropping the entries of the files which no longer exist"""
+        if self._path is None or not self._dirty:
+            return
+        with self._lock:
+            self._entries = {path: entry for path, entry in self._entries.items() if os.path.exists(path)}
+            data = json.dumps({"version": _INDEX_VERSION, "plugins": self._entries})
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            tmp_path = self._path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path)
+        except OSError as ex:
+            _logger.warning('Unable to save the plugin index to {}. {}'.format(self._path, str(ex)))
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._dirty = True
+
+    @property
+    def size(self):
+        return len(self._entries)
+
+    def _load(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            try:
+                with open(self._path) as f:
+                    data = json.load(f)
+                if data.get("version") == _INDEX_VERSION and isinstance(data.get("plugins"), dict):
+                    self._entries.update(data["plugins"])
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, AttributeError) as ex:
+                _logger.warning('Unable to load the plugin index from {}, it is built again. {}'.format(
+                    self._path, str(ex)))
+
+
+plugin_index = PluginInfoIndex(index_path())
+"""Index of the core"""
@@ -11,7 +11,8 @@ import argparse
 import time
 from fledge.common.storage_client.storage_client import StorageClientAsync, ReadingsStorageClientAsync
 from fledge.common import logger
-from fledge.common.microservice_management_client.microservice_management_client import MicroserviceManagementClient
+from fledge.common.microservice_management_client.microservice_management_client import MicroserviceManagementClient, \
+    MicroserviceManagementClientAsync
 
 __author__ = "Ashwin Gopalakrishnan, Amarendra K Sinha"
 __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
@@ -56,6 +57,9 @@ class FledgeProcess(ABC):
     _core_microservice_management_client = None
     """ MicroserviceManagementClient instance """
 
+    _core_microservice_management_client_async = None
+    """ MicroserviceManagementClientAsync instance, for calls to core made from the event loop """
+
     _readings_storage_async = None
     """ fledge.common.storage_client.storage_client.ReadingsStorageClientAsync """
 
@@ -105,16 +109,32 @@ class FledgeProcess(ABC):
 
         self._core_microservice_management_client = MicroserviceManagementClient(self._core_management_host,
                                                                                  self._core_management_port)
+        self._core_microservice_management_client_async = MicroserviceManagementClientAsync(
+            self._core_management_host, self._core_management_port)
 
         self._readings_storage_async = ReadingsStorageClientAsync(self._core_management_host,
-                                                                  self._core_management_port)
-        self._storage_async = StorageClientAsync(self._core_management_host, self._core_management_port)
+                                                                  self._core_management_port, pooled=True)
+        self._storage_async = StorageClientAsync(self._core_management_host, self._core_management_port, pooled=True)
 
     # pure virtual method run() to be implemented by child class
     @abstractmethod
     def run(self):
         pass
 
+    def storage_pool_stats(self):
+        """ Connection pool hit/miss counters of the pooled storage clients of the process """
+        clients = {"storage": self._storage_async, "readings": self._readings_storage_async}
+        return {name: client.pool_stats() for name, client in clients.items()
+                if client is not None and client.pooled}
+
+    async def close_storage_clients(self):
+        """ Close the pooled storage sessions, and the core management session, once the process has finished """
+        _logger.info("Storage connection pools of %s: %s", self._name, self.storage_pool_stats())
+        for client in (self._readings_storage_async, self._storage_async,
+                       self._core_microservice_management_client_async):
+            if client is not None:
+                await client.close()
+
     def get_services_from_core(self, name=None, _type=None):
         return self._core_microservice_management_client.get_services(name, _type)
 
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+# FLEDGE_BEGIN
+# See: http://fledge-iot.readthedocs.io/
+# FLEDGE_END
+
+"""Startup profiling of the Fledge python processes
+
+With FLEDGE_STARTUP_PROFILE=true in the environment, which the processes started by the core inherit, a process
+records the time taken by every module it imports and by the phases of its initialization, and logs the slowest ones
+when report() is called once it is started. The entry points import this module before any other Fledge module, so
+that their imports are timed. Only imports made with the import statement in the main thread are recorded, not those
+of importlib.import_module.
+"""
+
+import builtins
+import contextlib
+import importlib.util
+import os
+import sys
+import threading
+import time
+
+__copyright__ = "Copyright (c) 2023 Dianomic Systems Inc."
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+ENV_VARIABLE = 'FLEDGE_STARTUP_PROFILE'
+"""Environment variable enabling the startup profile"""
+
+TOP_IMPORTS = 25
+"""Number of the slowest imports reported"""
+
+
+class StartupProfile(object):
+    """Import times per module and initialization phase times of a process"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imports = {}
+        """Module name -> [cumulative seconds, seconds excluding the nested imports]"""
+        self.phases = []
+        """(name, seconds) of the initialization phases, in the order they ended"""
+        self._children = []
+        """Seconds taken by the nested imports of every import in progress"""
+        self._thread = None
+        self._original_import = None
+        self._active = False
+
+    def install(self):
+        if self._original_import is None:
+            self._thread = threading.get_ident()
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._import
+        self._active = True
+
+    def uninstall(self):
+        self._active = False
+        # Left in place, passing the imports through, when another hook has been installed since
+        if self._original_import is not None and builtins.__import__ == self._import:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import
+        if not self._active:
+            return original(name, globals, locals, fromlist, level)
+        module_name = name
+        if level:
+            package = globals.get('__package__') if globals else None
+            try:
+                module_name = importlib.util.resolve_name('.' * level + name, package)
+            except (ImportError, ValueError):
+                module_name = name
+        if threading.get_ident() != self._thread:
+            return original(name, globals, locals, fromlist, level)
+        if module_name not in sys.modules:
+            names = [module_name]
+        else:
+            # from package import module imports the modules of the from list, not loaded yet, in the same call
+            names = ['{}.{}'.format(module_name, item) for item in fromlist or () if item != '*']
+            names = [name_ for name_ in names if name_ not in sys.modules]
+            if not names:
+                return original(name, globals, locals, fromlist, level)
+        self._children.append(0.0)
+        start = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self._children.pop()
+            # The names of the from list which are not modules are left out
+            imported = [name_ for name_ in names if name_ in sys.modules]
+            if imported:
+                if self._children:
+                    self._children[-1] += elapsed
+                entry = self.imports.setdefault(', '.join(imported), [0.0, 0.0])
+                entry[0] += elapsed
+                entry[1] += elapsed - children
+
+    def lines(self, process_name, top=TOP_IMPORTS):
+        """Returns the lines of the report"""
+        total = time.perf_counter() - self.started
+        import_total = sum(entry[1] for entry in self.imports.values())
+        lines = ['Startup of {}: {:.1f} ms, {} modules imported in {:.1f} ms'.format(
+            process_name, total * 1000, len(self.imports), import_total * 1000)]
+        for name, seconds in self.phases:
+            lines.append('Phase {}: {:.1f} ms'.format(name, seconds * 1000))
+        slowest = sorted(self.imports.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        for name, (cumulative, own) in slowest:
+            lines.append('Import {}: {:.1f} ms, {:.1f} ms with its imports'.format(name, own * 1000, cumulative * 1000))
+        return lines
+
+
+_profile = None
+
+
+def enable():
+    """Starts profiling the process, enabled on import when FLEDGE_STARTUP_PROFILE is true"""
+    global _profile
+    if _profile is None:
+        _profile = StartupProfile()
+        _profile.install()
+    return _profile
+
+
+def is_enabled():
+    return _profile is not None
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Records the time taken by an initialization phase of the process, does nothing when not profiling"""
+    if _profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _profile is not None:
+            _profile.phases.append((name, time.perf_counter() - start))
+
+
+def report(process_name, top=TOP_IMPORTS):
+    """Logs the startup profile of the process and stops profiling
+
+    Returns:
+        The lines logged, an empty list when not profiling
+    """
+    global _profile
+    profile, _profile = _profile, None
+    if profile is None:
+        return []
+    profile.uninstall()
+    lines = profile.lines(process_name, top)
+    # Imported here as this module is imported before any other Fledge module
+    import logging
+    from fledge.common.logger import FLCoreLogger
+    _logger = FLCoreLogger().get_logger('StartupProfile')
+    _logger.setLevel(logging.INFO)
+    for line in lines:
+        _logger.info(line)
+    return lines
+
+
+if os.environ.get(ENV_VARIABLE, '').strip().lower() in ('1', 'true'):
+    enable()
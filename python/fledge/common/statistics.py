@@ -4,9 +4,11 @@
 # See: http://fledge-iot.readthedocs.io/
 # FLEDGE_END
 
+import asyncio
 import json
+from fledge.common import utils as common_utils
 from fledge.common.logger import FLCoreLogger
-from fledge.common.storage_client.payload_builder import PayloadBuilder
+from fledge.common.storage_client.payload_builder import PayloadBuilder, Param
 from fledge.common.storage_client.storage_client import StorageClientAsync
 
 
@@ -17,6 +19,15 @@ __version__ = "${VERSION}"
 
 _logger = FLCoreLogger().get_logger(__name__)
 
+DEFAULT_FLUSH_INTERVAL = 5
+""" Number of seconds between two writes of the write-behind statistics counters """
+
+DEFAULT_FLUSH_THRESHOLD = 100000
+""" Sum of the pending increments above which the write-behind statistics counters are written immediately """
+
+_INCREMENT_QUERY = PayloadBuilder().WHERE(["key", "=", Param("key")]).EXPR(["value", "+", Param("increment")]).prepare()
+""" Update of the value of a statistics key by an increment """
+
 
 async def create_statistics(storage=None):
     stat = Statistics(storage)
@@ -61,18 +72,36 @@ class Statistics(object):
             raise TypeError('stat_list must be a dict')
 
         try:
-            payload = {"updates": []}
-            for k, v in stat_list.items():
-                payload_item = PayloadBuilder() \
-                    .WHERE(["key", "=", k]) \
-                    .EXPR(["value", "+", v]) \
-                    .payload()
-                payload['updates'].append(json.loads(payload_item))
+            payload = {"updates": [{"where": {"column": "key", "condition": "=", "value": k},
+                                    "expressions": [{"column": "value", "operator": "+", "value": v}]}
+                                   for k, v in stat_list.items() if v]}
+            if not payload['updates']:
+                return
             await self._storage.update_tbl("statistics", json.dumps(payload, sort_keys=False))
         except Exception as ex:
             _logger.exception(ex, 'Unable to bulk update statistics')
             raise
 
+    async def set_bulk(self, stat_list):
+        """ Bulk set statistics table keys to the given values, for statistics reporting a level rather than a count
+
+        Args:
+            stat_list: dict containing statistics keys and their new values
+
+        Returns:
+            None
+        """
+        if not isinstance(stat_list, dict):
+            raise TypeError('stat_list must be a dict')
+
+        try:
+            payload = {"updates": [{"values": {"value": v}, "where": {"column": "key", "condition": "=", "value": k}}
+                                   for k, v in stat_list.items()]}
+            await self._storage.update_tbl("statistics", json.dumps(payload, sort_keys=False))
+        except Exception as ex:
+            _logger.exception(ex, 'Unable to bulk set statistics')
+            raise
+
     async def update(self, key, value_increment):
         """ UPDATE the value column only of a statistics row based on key
 
@@ -90,10 +119,7 @@ class Statistics(object):
             raise ValueError('value must be an integer')
 
         try:
-            payload = PayloadBuilder()\
-                .WHERE(["key", "=", key])\
-                .EXPR(["value", "+", value_increment])\
-                .payload()
+            payload = _INCREMENT_QUERY.payload(key=key, increment=value_increment)
             await self._storage.update_tbl("statistics", payload)
         except Exception as ex:
             msg = 'Unable to update statistics value based on statistics_key {} and value_increment {}'.format(
@@ -113,10 +139,7 @@ class Statistics(object):
         for key, value_increment in sensor_stat_dict.items():
             # Try updating the statistics value for given key
             try:
-                payload = PayloadBuilder() \
-                    .WHERE(["key", "=", key]) \
-                    .EXPR(["value", "+", value_increment]) \
-                    .payload()
+                payload = _INCREMENT_QUERY.payload(key=key, increment=value_increment)
                 result = await self._storage.update_tbl("statistics", payload)
                 if result["response"] != "updated":
                     raise KeyError
@@ -155,3 +178,174 @@ class Statistics(object):
                 self._registered_keys.append(row['key'])
         except Exception as ex:
             _logger.exception(ex, 'Failed to retrieve statistics keys')
+
+
+class StatisticsCounters(object):
+    """ Write-behind statistics counters
+
+    Increments and levels are accumulated in memory and written to the statistics table with a single bulk
+    update every flush_interval seconds, or as soon as the pending increments reach flush_threshold.
+    Counters are only updated from the event loop, hence no lock is needed. :meth:`stop` writes what is pending.
+    """
+
+    def __init__(self, stats, flush_interval=DEFAULT_FLUSH_INTERVAL, flush_threshold=DEFAULT_FLUSH_THRESHOLD):
+        if not isinstance(flush_interval, (int, float)) or flush_interval <= 0:
+            raise ValueError('flush_interval must be a positive number')
+        if not isinstance(flush_threshold, int) or flush_threshold < 1:
+            raise ValueError('flush_threshold must be a positive integer')
+        self._stats = stats
+        self._flush_interval = flush_interval
+        self._flush_threshold = flush_threshold
+        self._increments = {}
+        self._levels = {}
+        self._descriptions = {}
+        """ Description of the keys to register before they are written for the first time """
+        self._registered = set()
+        self._pending = 0
+        self._flush_requested = None
+        self._flush_task = None
+        self._stopping = False
+        self.flushes = 0
+        self.failures = 0
+
+    @property
+    def pending(self):
+        """ Sum of the increments not yet written """
+        return self._pending
+
+    def increment(self, key, value=1, description=None):
+        """ Adds value to the statistics key, registering the key with description if given """
+        if not value:
+            return
+        self._increments[key] = self._increments.get(key, 0) + value
+        self._pending += value
+        self._add_description(key, description)
+        if self._pending >= self._flush_threshold and self._flush_requested is not None:
+            self._flush_requested.set()
+
+    def set(self, key, value, description=None):
+        """ Sets the statistics key to value, for statistics reporting a level rather than a count """
+        self._levels[key] = value
+        self._add_description(key, description)
+
+    def _add_description(self, key, description):
+        if description is not None and key not in self._registered:
+            self._descriptions[key] = description
+
+    def start(self):
+        """ Starts the periodic write of the counters """
+        if self._flush_task is None:
+            self._stopping = False
+            self._flush_requested = asyncio.Event()
+            self._flush_task = asyncio.ensure_future(self._flush_loop())
+
+    async def stop(self):
+        """ Stops the periodic write and writes the pending counters """
+        if self._flush_task is not None:
+            self._stopping = True
+            self._flush_requested.set()
+            await self._flush_task
+            self._flush_task = None
+            self._flush_requested = None
+        return await self.flush()
+
+    async def _flush_loop(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
+
+    async def flush(self):
+        """ Writes the pending counters to the statistics table
+
+        Returns:
+            True if they have been written, False if they are kept to be written at the next flush
+        """
+        increments, self._increments = self._increments, {}
+        levels, self._levels = self._levels, {}
+        descriptions, self._descriptions = self._descriptions, {}
+        pending, self._pending = self._pending, 0
+        if not (increments or levels or descriptions):
+            return True
+        try:
+            for key, description in descriptions.items():
+                await self._stats.register(key, description)
+                self._registered.add(key)
+            await self._stats.update_bulk(increments)
+        except Exception as ex:
+            # Keeps the counters, increments made meanwhile are added and newer levels win
+            for key, value in increments.items():
+                self._increments[key] = self._increments.get(key, 0) + value
+            self._pending += pending
+            self._restore_levels(levels)
+            for key, description in descriptions.items():
+                if key not in self._registered:
+                    self._descriptions.setdefault(key, description)
+            self.failures += 1
+            _logger.exception(ex, 'Unable to write statistics counters')
+            return False
+        if levels:
+            try:
+                await self._stats.set_bulk(levels)
+            except Exception as ex:
+                self._restore_levels(levels)
+                self.failures += 1
+                _logger.exception(ex, 'Unable to write statistics levels')
+                return False
+        self.flushes += 1
+        return True
+
+    def _restore_levels(self, levels):
+        for key, value in levels.items():
+            self._levels.setdefault(key, value)
+
+
+class StatisticsCollector(object):
+    """ Writes the statistics deltas since the previous collection to the statistics_history table
+
+    Runs in the core for the stats collector schedule, and in the stats collector task when started on its own.
+    The delta of every key is recorded, previous_value is only updated for the keys whose value changed.
+    """
+
+    def __init__(self, storage=None):
+        self._storage_async = storage
+
+    async def _bulk_update_previous_value(self, payload):
+        """ UPDATE previous_value of column to have the same value as snapshot
+
+        Query:
+            UPDATE statistics_history SET previous_value = value WHERE key = key
+        Args:
+           payload: dict containing statistics keys and previous values
+        """
+        await self._storage_async.update_tbl("statistics", json.dumps(payload, sort_keys=False))
+
+    async def collect(self):
+        """ SELECT against the statistics table, to get a snapshot of the data at that moment.
+
+        Based on the snapshot:
+            1. INSERT the delta between `value` and `previous_value` into  statistics_history
+            2. UPDATE the previous_value in statistics table to be equal to statistics.value at snapshot,
+               for the keys with a delta
+        """
+        current_time = common_utils.local_timestamp()
+        results = await self._storage_async.query_tbl("statistics")
+        # Bulk updates payload
+        payload = {"updates": []}
+        # Bulk inserts payload
+        insert_payload = {"inserts": []}
+        for r in results['rows']:
+            key = r['key']
+            value = int(r["value"])
+            delta = value - int(r["previous_value"])
+            if delta:
+                payload['updates'].append({"values": {"previous_value": value},
+                                           "where": {"column": "key", "condition": "=", "value": key}})
+            insert_payload['inserts'].append({'key': key, 'value': delta, 'history_ts': current_time})
+        if insert_payload['inserts']:
+            await self._storage_async.insert_into_tbl("statistics_history", json.dumps(insert_payload))
+        if payload['updates']:
+            await self._bulk_update_previous_value(payload)
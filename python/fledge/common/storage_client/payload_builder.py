@@ -14,15 +14,82 @@ __version__ = "${VERSION}"
 
 from collections import OrderedDict
 import json
+import re
 import urllib.parse
+import uuid
 import numbers
 
 from fledge.common import logger
+from fledge.common.storage_client.utils import Utils
 
 
 _LOGGER = logger.setup(__name__)
 
 
+class Param(object):
+    """ Placeholder of a value in a prepared query, given by name when the query is run
+
+    :example:
+    PayloadBuilder().SELECT("token_expiration").WHERE(['token', '=', Param('token')]).prepare()
+    """
+
+    __slots__ = ['name']
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return 'Param({!r})'.format(self.name)
+
+
+class PreparedQuery(object):
+    """ A payload encoded once, with the values of its parameters substituted in the encoded text when it is run
+
+    The payload is encoded with a marker in place of every Param; the text is then split on the markers, so that
+    payload() only encodes the values of the parameters and joins them with the pre-encoded parts.
+    """
+
+    def __init__(self, query_payload):
+        token = uuid.uuid4().hex
+        names = []
+
+        def mark(node):
+            if isinstance(node, Param):
+                names.append(node.name)
+                return '@{}:{}@'.format(token, len(names) - 1)
+            if isinstance(node, dict):
+                return OrderedDict((key, mark(value)) for key, value in node.items())
+            if isinstance(node, (list, tuple)):
+                return [mark(value) for value in node]
+            return node
+
+        text = json.dumps(mark(query_payload), sort_keys=False)
+        pieces = re.split('"@{}:([0-9]+)@"'.format(token), text)
+        self._parts = [piece.encode() for piece in pieces[0::2]]
+        self._names = [names[int(index)] for index in pieces[1::2]]
+
+    @property
+    def params(self):
+        """ Names of the parameters, in the order they appear in the payload """
+        return tuple(self._names)
+
+    def payload(self, **values):
+        """ Returns the JSON payload, as bytes, with the given values of the parameters
+
+        :raises ValueError: a parameter has no value
+        """
+        try:
+            encoded = [Utils.dumps(values[name]) for name in self._names]
+        except KeyError as ex:
+            raise ValueError("Missing value of query parameter {}".format(ex.args[0]))
+        parts = self._parts
+        chunks = [parts[0]]
+        for index, value in enumerate(encoded):
+            chunks.append(value)
+            chunks.append(parts[index + 1])
+        return b''.join(chunks)
+
+
 class PayloadBuilder(object):
     """ Payload Builder to be used in Python client  for Storage Service
 
@@ -35,11 +102,9 @@ class PayloadBuilder(object):
     '''
     # TODO: Add tests
 
-    query_payload = None
-
-    def __init__(self, initial_payload=OrderedDict()):
-        # TODO: Investigate why simple "self.__class__.query_payload = initial_payload" is not working
-        self.__class__.query_payload = initial_payload if len(initial_payload) else OrderedDict()
+    def __init__(self, initial_payload=None):
+        # The payload is built in place: a chain payload given is extended, not copied
+        self.query_payload = initial_payload if initial_payload else OrderedDict()
 
     @staticmethod
     def verify_select(arg):
@@ -176,8 +241,7 @@ class PayloadBuilder(object):
                 my_item[clause] = clause_value
             qp['group'] = my_item
 
-    @classmethod
-    def _add_clause(cls, clause, main_key, args):
+    def _add_clause(self, clause, main_key, args):
         """
         Adds "alias" and "format" clauses to columns in payload info. Currently, adding clauses is supported at two
         actions only - SELECT and AGGREGATE.
@@ -190,29 +254,28 @@ class PayloadBuilder(object):
         :return:
         """
         if clause not in ['alias', 'format', 'group']:
-            return cls
+            return self
 
         if main_key in ['return', 'aggregate', 'group']:
             for arg in args:
-                if cls.verify_alias(arg):
+                if self.verify_alias(arg):
                     if main_key == 'return':
                         col = arg[0]
                         alias = arg[1]
-                        cls.add_clause_to_select(clause, cls.query_payload[main_key], col, alias)
+                        self.add_clause_to_select(clause, self.query_payload[main_key], col, alias)
                     if main_key == 'aggregate':
                         col = arg[0]
                         opr = arg[1]
                         alias = arg[2]
-                        cls.add_clause_to_aggregate(clause, cls.query_payload[main_key], col, opr, alias)
+                        self.add_clause_to_aggregate(clause, self.query_payload[main_key], col, opr, alias)
                     if main_key == 'group':
                         col = arg[0]
                         alias = arg[1]
-                        cls.add_clause_to_group(clause, cls.query_payload, col, alias)
+                        self.add_clause_to_group(clause, self.query_payload, col, alias)
 
-        return cls
+        return self
 
-    @classmethod
-    def ALIAS(cls, main_key, *args):
+    def ALIAS(self, main_key, *args):
         """
         Adds "alias" to columns in payload info. Currently, adding clauses is supported at two
         actions only - SELECT and AGGREGATE.
@@ -278,10 +341,9 @@ class PayloadBuilder(object):
               ]
             }
         """
-        return cls._add_clause('alias', main_key, args)
+        return self._add_clause('alias', main_key, args)
 
-    @classmethod
-    def FORMAT(cls, main_key, *args):
+    def FORMAT(self, main_key, *args):
         """
         Adds "format" to columns in payload info. Currently, adding clauses is supported at two
         actions only - SELECT and AGGREGATE.
@@ -296,10 +358,9 @@ class PayloadBuilder(object):
             FORMAT('return', ('user_ts', "YYYY-MM-DD HH24:MI:SS.MS")).payload() returns
             {"return": ["reading", {"format": "YYYY-MM-DD HH24:MI:SS.MS", "column": "user_ts", "alias": "timestamp"}]}
         """
-        return cls._add_clause('format', main_key, args)
+        return self._add_clause('format', main_key, args)
 
-    @classmethod
-    def SELECT(cls, *args):
+    def SELECT(self, *args):
         """
         Forms a json to return a list of columns.
 
@@ -307,59 +368,55 @@ class PayloadBuilder(object):
         :return:
         """
         for arg in args:
-            if cls.verify_select(arg):
-                if 'return' not in cls.query_payload:
-                    cls.query_payload["return"] = list()
+            if self.verify_select(arg):
+                if 'return' not in self.query_payload:
+                    self.query_payload["return"] = list()
                 if isinstance(arg, tuple):
                     for a in arg:
                         if isinstance(a, list):
                             select = {"json": {'column': a[0], 'properties': a[1]}}
                         elif isinstance(a, str):
-                            select = json.loads(a) if cls.is_json(a) else a
+                            select = json.loads(a) if self.is_json(a) else a
                         else:
                             continue
-                        cls.query_payload["return"].append(select)
+                        self.query_payload["return"].append(select)
                 else:
                     if isinstance(arg, list):
                         select = {"json": {'column': arg[0], 'properties': arg[1]}}
                     elif isinstance(arg, str):
-                        select = json.loads(arg) if cls.is_json(arg) else arg
+                        select = json.loads(arg) if self.is_json(arg) else arg
                     else:
                         continue
-                    cls.query_payload["return"].append(select)
-        return cls
+                    self.query_payload["return"].append(select)
+        return self
 
-    @classmethod
-    def FROM(cls, tbl_name):
-        cls.query_payload["table"] = tbl_name
-        return cls
+    def FROM(self, tbl_name):
+        self.query_payload["table"] = tbl_name
+        return self
 
-    @classmethod
-    def DISTINCT(cls, cols):
+    def DISTINCT(self, cols):
         if cols is None:
-            return cls
+            return self
         if not isinstance(cols, list):
-            return cls
+            return self
         if len(cols) == 0:
-            return cls
-        cls.query_payload["modifier"] = "distinct"
-        cls.query_payload["return"] = cols
-        return cls
+            return self
+        self.query_payload["modifier"] = "distinct"
+        self.query_payload["return"] = cols
+        return self
 
-    @classmethod
-    def MODIFIER(cls, arg):
+    def MODIFIER(self, arg):
         if arg is None:
-            return cls
+            return self
         if not isinstance(arg, list):
-            return cls
+            return self
         if len(arg) == 0:
-            return cls
-        cls.query_payload["modifier"] = arg
-        return cls
+            return self
+        self.query_payload["modifier"] = arg
+        return self
 
-    @classmethod
-    def UPDATE_TABLE(cls, tbl_name):
-        return cls.FROM(tbl_name)
+    def UPDATE_TABLE(self, tbl_name):
+        return self.FROM(tbl_name)
 
     @classmethod
     def COLS(cls, kwargs):
@@ -368,36 +425,32 @@ class PayloadBuilder(object):
             values[key] = value
         return values
 
-    @classmethod
-    def SET(cls, **kwargs):
-        if 'values' in cls.query_payload:
-            cls.query_payload["values"].update(cls.COLS(kwargs))
+    def SET(self, **kwargs):
+        if 'values' in self.query_payload:
+            self.query_payload["values"].update(self.COLS(kwargs))
         else:
-            cls.query_payload["values"] = cls.COLS(kwargs)
-        return cls
+            self.query_payload["values"] = self.COLS(kwargs)
+        return self
 
-    @classmethod
-    def INSERT(cls, **kwargs):
-        cls.query_payload.update(cls.COLS(kwargs))
-        return cls
+    def INSERT(self, **kwargs):
+        self.query_payload.update(self.COLS(kwargs))
+        return self
 
-    @classmethod
-    def INSERT_INTO(cls, tbl_name):
-        return cls.FROM(tbl_name)
+    def INSERT_INTO(self, tbl_name):
+        return self.FROM(tbl_name)
 
-    @classmethod
-    def DELETE(cls, tbl_name):
-        return cls.FROM(tbl_name)
+    def DELETE(self, tbl_name):
+        return self.FROM(tbl_name)
 
     @classmethod
     def add_new_clause(cls, and_or, main, new):
         """
-        Recursively searches for the innermost and/or block, or cls.query_payload["where"] if none, in "main" to add
+        Recursively searches for the innermost and/or block, or self.query_payload["where"] if none, in "main" to add
         the 'new' condition block under "and_or" key.
 
         Args:
             and_or: one of 'and', 'or'
-            main: Dict (cls.query_payload["where"] or the innermost and/or subset of it) where
+            main: Dict (self.query_payload["where"] or the innermost and/or subset of it) where
                   the new condition block is to be added
             new: condition block to be added
 
@@ -411,70 +464,65 @@ class PayloadBuilder(object):
         else:
             cls.add_new_clause(and_or, main['and'], new)
 
-    @classmethod
-    def WHERE(cls, arg, *args):
+    def WHERE(self, arg, *args):
         # Pass multiple arguments in a single tuple also. Useful when called from external process i.e. api, test.
         args = (arg,) + args if not isinstance(arg, tuple) else arg
         for arg in args:
             condition = OrderedDict()
-            if cls.verify_condition(arg):
+            if self.verify_condition(arg):
                 condition["column"] = arg[0]
                 condition["condition"] = arg[1]
                 # Note: append value KV pair only if 3 argument supplied
                 if len(arg) == 3:
                     condition["value"] = arg[2]
-                if 'where' not in cls.query_payload:
-                    cls.query_payload["where"] = condition
+                if 'where' not in self.query_payload:
+                    self.query_payload["where"] = condition
                 else:
-                    cls.add_new_clause('and', cls.query_payload['where'], condition)
-        return cls
+                    self.add_new_clause('and', self.query_payload['where'], condition)
+        return self
 
-    @classmethod
-    def AND_WHERE(cls, arg, *args):
+    def AND_WHERE(self, arg, *args):
         # Pass multiple arguments in a single tuple also. Useful when called from external process i.e. api, test.
         args = (arg,) + args if not isinstance(arg, tuple) else arg
         for arg in args:
             condition = OrderedDict()
-            if cls.verify_condition(arg):
+            if self.verify_condition(arg):
                 condition["column"] = arg[0]
                 condition["condition"] = arg[1]
                 # Note: append value KV pair only if 3 argument supplied
                 if len(arg) == 3:
                     condition["value"] = arg[2]
-                if 'where' not in cls.query_payload:
-                    cls.query_payload["where"] = condition
+                if 'where' not in self.query_payload:
+                    self.query_payload["where"] = condition
                 else:
-                    cls.add_new_clause('and', cls.query_payload['where'], condition)
-        return cls
+                    self.add_new_clause('and', self.query_payload['where'], condition)
+        return self
 
-    @classmethod
-    def OR_WHERE(cls, arg, *args):
+    def OR_WHERE(self, arg, *args):
         # Pass multiple arguments in a single tuple also. Useful when called from external process i.e. api, test.
         args = (arg,) + args if not isinstance(arg, tuple) else arg
         for arg in args:
             condition = OrderedDict()
-            if cls.verify_condition(arg):
+            if self.verify_condition(arg):
                 condition["column"] = arg[0]
                 condition["condition"] = arg[1]
                 # Note: append value KV pair only if 3 argument supplied
                 if len(arg) == 3:
                     condition["value"] = arg[2]
-                if 'where' not in cls.query_payload:
-                    cls.query_payload["where"] = condition
+                if 'where' not in self.query_payload:
+                    self.query_payload["where"] = condition
                 else:
-                    cls.add_new_clause('or', cls.query_payload['where'], condition)
-        return cls
+                    self.add_new_clause('or', self.query_payload['where'], condition)
+        return self
 
-    @classmethod
-    def GROUP_BY(cls, *args):
+    def GROUP_BY(self, *args):
         # TODO: Add dict format for args
-        cls.query_payload["group"] = ', '.join(args)
-        return cls
+        self.query_payload["group"] = ', '.join(args)
+        return self
 
-    @classmethod
-    def JOIN(cls, *args):
+    def JOIN(self, *args):
         """
-        Class method for JOIN. Use like this 1. PayloadBuilder().JOIN("table_name", "column_name")
+        Method for JOIN. Use like this 1. PayloadBuilder().JOIN("table_name", "column_name")
                                         or   2. PayloadBuilder().JOIN("table_name").
         The first example assumes that were a table_name and a column_name for the JOIN clause.
         The second example assumes that we only have a table_name and its column matches
@@ -507,13 +555,12 @@ class PayloadBuilder(object):
         else:
             raise Exception("Expected at least table name with JOIN clause.")
 
-        cls.query_payload["join"] = table_dict
-        return cls
+        self.query_payload["join"] = table_dict
+        return self
 
-    @classmethod
-    def ON(cls, *args):
+    def ON(self, *args):
         """
-            Class method for ON. Use like this PayloadBuilder().JOIN("table_name", "column_name").\
+            Method for ON. Use like this PayloadBuilder().JOIN("table_name", "column_name").\
                                                                 ON("column_name")
             Used only with JOIN.
             Args:
@@ -522,21 +569,20 @@ class PayloadBuilder(object):
             Returns:
                 The object of payload builder class.
         """
-        if "join" not in cls.query_payload:
+        if "join" not in self.query_payload:
             raise Exception("ON Clause used without using JOIN first.")
 
         if len(args) != 1:
             raise Exception("Expected column name with ON clause.")
 
         col_name = args[0]
-        cls.query_payload["join"]["on"] = col_name
-        return cls
+        self.query_payload["join"]["on"] = col_name
+        return self
 
-    @classmethod
-    def QUERY(cls, *args):
+    def QUERY(self, *args):
         """
-             Class method for QUERY. Used only with JOIN and ON.
-             Inserts a query payload inside cls.query_payload['join']['query.']
+             Method for QUERY. Used only with JOIN and ON.
+             Inserts a query payload inside self.query_payload['join']['query.']
              Usage
               1. First make a query payload like this
               qp = PayloadBuilder().SELECT(("name", "id")) \
@@ -573,10 +619,10 @@ class PayloadBuilder(object):
                 The object of payload builder class.
         """
 
-        if "join" not in cls.query_payload:
+        if "join" not in self.query_payload:
             raise Exception("Query used without JOIN clause.")
 
-        if 'on' not in cls.query_payload['join']:
+        if 'on' not in self.query_payload['join']:
             raise Exception("Query used without ON clause.")
 
         if len(args) != 1:
@@ -586,17 +632,16 @@ class PayloadBuilder(object):
         if not isinstance(payload, OrderedDict):
             raise Exception("The query payload parameter must be an OrderedDict.")
 
-        if 'query' in cls.query_payload['join']:
+        if 'query' in self.query_payload['join']:
             # Used when we have to perform only one join.
-            cls.query_payload['join']['query'].update(payload)
+            self.query_payload['join']['query'].update(payload)
         else:
             # Used when we have to perform nested join.
             # This will update the already existent query field.
-            cls.query_payload['join']['query'] = payload
-        return cls
+            self.query_payload['join']['query'] = payload
+        return self
 
-    @classmethod
-    def AGGREGATE(cls, arg, *args):
+    def AGGREGATE(self, arg, *args):
         """
         Forms a json to return a dict (for a single col) or a list of dicts required in an aggregate clause.
 
@@ -619,7 +664,7 @@ class PayloadBuilder(object):
         args = (arg,) + args if not isinstance(arg, tuple) else arg
         for arg in args:
             aggregate = OrderedDict()
-            if cls.verify_aggregation(arg):
+            if self.verify_aggregation(arg):
                 aggregate["operation"] = arg[0]
                 if len(arg) >= 2:
                     if isinstance(arg[1], list):
@@ -628,51 +673,46 @@ class PayloadBuilder(object):
                         aggregate["column"] = arg[1]
                     else:
                         continue
-                if 'aggregate' in cls.query_payload:
-                    if not isinstance(cls.query_payload['aggregate'], list):
-                        cls.query_payload['aggregate'] = [cls.query_payload.get('aggregate')]
-                    cls.query_payload['aggregate'].append(aggregate)
+                if 'aggregate' in self.query_payload:
+                    if not isinstance(self.query_payload['aggregate'], list):
+                        self.query_payload['aggregate'] = [self.query_payload.get('aggregate')]
+                    self.query_payload['aggregate'].append(aggregate)
                 else:
-                    cls.query_payload["aggregate"] = aggregate
-        return cls
+                    self.query_payload["aggregate"] = aggregate
+        return self
 
-    @classmethod
-    def HAVING(cls):
+    def HAVING(self):
         raise NotImplementedError("To be implemented")
 
-    @classmethod
-    def LIMIT(cls, arg):
-        if isinstance(arg, numbers.Real):
-            cls.query_payload["limit"] = arg
-        return cls
+    def LIMIT(self, arg):
+        if isinstance(arg, (numbers.Real, Param)):
+            self.query_payload["limit"] = arg
+        return self
 
-    @classmethod
-    def OFFSET(cls, arg):
-        if isinstance(arg, numbers.Real):
-            cls.query_payload["skip"] = arg
-        return cls
+    def OFFSET(self, arg):
+        if isinstance(arg, (numbers.Real, Param)):
+            self.query_payload["skip"] = arg
+        return self
 
     SKIP = OFFSET
 
-    @classmethod
-    def ORDER_BY(cls, arg, *args):
+    def ORDER_BY(self, arg, *args):
         # Pass multiple arguments in a single tuple also. Useful when called from external process i.e. api, test.
         args = (arg,) + args if not isinstance(arg, tuple) else arg
         for arg in args:
             sort = OrderedDict()
-            if cls.verify_orderby(arg):
+            if self.verify_orderby(arg):
                 sort["column"] = arg[0]
                 sort["direction"] = arg[1]
-                if 'sort' in cls.query_payload:
-                    if not isinstance(cls.query_payload['sort'], list):
-                        cls.query_payload['sort'] = [cls.query_payload.get('sort')]
-                    cls.query_payload['sort'].append(sort)
+                if 'sort' in self.query_payload:
+                    if not isinstance(self.query_payload['sort'], list):
+                        self.query_payload['sort'] = [self.query_payload.get('sort')]
+                    self.query_payload['sort'].append(sort)
                 else:
-                    cls.query_payload["sort"] = sort
-        return cls
+                    self.query_payload["sort"] = sort
+        return self
 
-    @classmethod
-    def EXPR(cls, arg, *args):
+    def EXPR(self, arg, *args):
         args = (arg,) + args if not isinstance(arg, tuple) else arg
 
         for arg in args:
@@ -681,14 +721,13 @@ class PayloadBuilder(object):
             expr["operator"] = arg[1]
             expr["value"] = arg[2]
 
-            if 'expressions' in cls.query_payload:
-                cls.query_payload['expressions'].append(expr)
+            if 'expressions' in self.query_payload:
+                self.query_payload['expressions'].append(expr)
             else:
-                cls.query_payload['expressions'] = [expr]
-        return cls
+                self.query_payload['expressions'] = [expr]
+        return self
 
-    @classmethod
-    def JSON_PROPERTY(cls, *args):
+    def JSON_PROPERTY(self, *args):
         """
         Forms a json to return a list of dicts required in a json_properties clause.
 
@@ -711,20 +750,19 @@ class PayloadBuilder(object):
         # Pass multiple arguments in a single tuple also. Useful when called from external process i.e. api, test.
         for arg in args:
             json_property = OrderedDict()
-            if cls.verify_json_property(arg):
+            if self.verify_json_property(arg):
                 json_property["column"] = arg[0]
                 json_property["path"] = arg[1]
                 json_property["value"] = arg[2]
-                if 'json_properties' in cls.query_payload:
-                    if not isinstance(cls.query_payload['json_properties'], list):
-                        cls.query_payload['json_properties'] = [cls.query_payload.get('json_properties')]
-                    cls.query_payload['json_properties'].append(json_property)
+                if 'json_properties' in self.query_payload:
+                    if not isinstance(self.query_payload['json_properties'], list):
+                        self.query_payload['json_properties'] = [self.query_payload.get('json_properties')]
+                    self.query_payload['json_properties'].append(json_property)
                 else:
-                    cls.query_payload["json_properties"] = [json_property]
-        return cls
+                    self.query_payload["json_properties"] = [json_property]
+        return self
 
-    @classmethod
-    def TIMEBUCKET(cls, timestamp, size="1", fmt=None, alias=None):
+    def TIMEBUCKET(self, timestamp, size="1", fmt=None, alias=None):
         """
         Forms a json to return a dict of timebucket col
 
@@ -763,25 +801,35 @@ class PayloadBuilder(object):
             timebucket["format"] = fmt
         if alias is not None:
             timebucket["alias"] = alias
-        cls.query_payload["timebucket"] = timebucket
+        self.query_payload["timebucket"] = timebucket
 
-        return cls
+        return self
 
-    @classmethod
-    def payload(cls):
-        return json.dumps(cls.query_payload, sort_keys=False)
+    def payload(self):
+        return json.dumps(self.query_payload, sort_keys=False)
 
-    @classmethod
-    def chain_payload(cls):
+    def prepare(self):
+        """
+        Compiles the payload, whose values may be Param placeholders, into a PreparedQuery. A query run often is
+        built once then, and every run only encodes the values of its parameters.
+
+        :example:
+        query = PayloadBuilder().WHERE(["key", "=", Param("key")]).EXPR(["value", "+", Param("increment")]).prepare()
+        query.payload(key="READINGS", increment=5) returns
+            b'{"where": {"column": "key", "condition": "=", "value": "READINGS"}, '
+            b'"expressions": [{"column": "value", "operator": "+", "value": 5}]}'
+        """
+        return PreparedQuery(self.query_payload)
+
+    def chain_payload(self):
         """
         Sometimes, we may want to create payload incremently, based upon some conditions, this method will come
         handy in such Use cases.
         """
-        return cls.query_payload
+        return self.query_payload
 
-    @classmethod
-    def query_params(cls):
-        where = cls.query_payload['where']
+    def query_params(self):
+        where = self.query_payload['where']
         query_params = OrderedDict({where['column']: where['value']})
         for key, value in where.items():
             if key == 'and':
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+# FLEDGE_BEGIN
+# See: http://fledge-iot.readthedocs.io/
+# FLEDGE_END
+
+""" Long lived, connection pooled aiohttp session for the storage layer python client
+"""
+
+__copyright__ = "Copyright (c) 2023 Dianomic Systems Inc."
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+import asyncio
+import aiohttp
+
+DEFAULT_POOL_SIZE = 10
+""" Maximum number of simultaneous connections kept open to the storage service """
+
+DEFAULT_IDLE_TIMEOUT = 60
+""" Number of seconds after which an idle keep-alive connection is closed """
+
+
+class ClientSessionPool(object):
+    """ Holds a single keep-alive aiohttp.ClientSession and hands it out to the storage client calls
+
+    Connections are bounded by pool_size, idle connections are evicted after idle_timeout seconds
+    and the pool keeps count of connections reused (hits) and opened (misses).
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        if not isinstance(pool_size, int) or pool_size < 1:
+            raise ValueError("pool_size must be a positive integer")
+        if not isinstance(idle_timeout, (int, float)) or idle_timeout <= 0:
+            raise ValueError("idle_timeout must be a positive number")
+        self._pool_size = pool_size
+        self._idle_timeout = idle_timeout
+        self._session = None
+        self._loop = None
+        self._hits = 0
+        self._misses = 0
+        self._sessions_created = 0
+
+    @property
+    def pool_size(self):
+        return self._pool_size
+
+    @property
+    def idle_timeout(self):
+        return self._idle_timeout
+
+    def stats(self):
+        """ Pool counters for monitoring
+
+        :return: dict with connection hits, misses, number of sessions created and the configured bounds
+        """
+        return {"hits": self._hits,
+                "misses": self._misses,
+                "sessions": self._sessions_created,
+                "pool_size": self._pool_size,
+                "idle_timeout": self._idle_timeout}
+
+    def session(self):
+        """ Async context manager which yields the shared session; the session is left open on exit """
+        return _PooledSession(self)
+
+    def _get_session(self):
+        loop = asyncio.get_event_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            # A session is bound to the loop that created it; a new one is needed if the loop has changed
+            self._session = self._create_session()
+            self._loop = loop
+            self._sessions_created += 1
+        return self._session
+
+    def _create_session(self):
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_reuseconn.append(self._on_connection_reused)
+        trace_config.on_connection_create_end.append(self._on_connection_created)
+        connector = aiohttp.TCPConnector(limit=self._pool_size, keepalive_timeout=self._idle_timeout)
+        return aiohttp.ClientSession(connector=connector, trace_configs=[trace_config])
+
+    async def _on_connection_reused(self, session, trace_config_ctx, params):
+        self._hits += 1
+
+    async def _on_connection_created(self, session, trace_config_ctx, params):
+        self._misses += 1
+
+    async def close(self):
+        """ Close the shared session and all its pooled connections """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+
+class _PooledSession(object):
+
+    def __init__(self, pool):
+        self._pool = pool
+
+    async def __aenter__(self):
+        return self._pool._get_session()
+
+    async def __aexit__(self, *args):
+        pass
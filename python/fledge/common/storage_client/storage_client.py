@@ -21,11 +21,41 @@ from abc import ABC, abstractmethod
 from fledge.common import logger
 from fledge.common.service_record import ServiceRecord
 from fledge.common.storage_client.exceptions import *
-from fledge.common.storage_client.utils import Utils
+from fledge.common.storage_client.session_pool import ClientSessionPool, DEFAULT_POOL_SIZE, DEFAULT_IDLE_TIMEOUT
+from fledge.common.storage_client.utils import Utils, StorageResult
 
 _LOGGER = logger.setup(__name__)
 
 
+def _encode_payload(data, message):
+    """ Returns the body sent for a payload
+
+    bytes are taken as valid JSON already and sent as they are, a str is still validated, other objects are encoded
+    once to JSON bytes.
+
+    :raises TypeError: with message, the payload is not valid JSON or can not be encoded
+    """
+    if isinstance(data, (bytes, bytearray)):
+        return data
+    if isinstance(data, str):
+        if not Utils.is_json(data):
+            raise TypeError(message)
+        return data
+    try:
+        return Utils.dumps(data)
+    except (TypeError, ValueError):
+        raise TypeError(message)
+
+
+async def _read_result(resp, raw):
+    """ Returns the response body as a StorageResult when raw is requested and the request succeeded, decoded
+    otherwise
+    """
+    if raw and resp.status in range(200, 209):
+        return StorageResult(await resp.read())
+    return await resp.json(loads=Utils.loads)
+
+
 class AbstractStorage(ABC):
     """ abstract class for storage client """
 
@@ -49,7 +79,18 @@ class AbstractStorage(ABC):
 
 
 class StorageClientAsync(AbstractStorage):
-    def __init__(self, core_management_host, core_management_port, svc=None):
+    def __init__(self, core_management_host, core_management_port, svc=None, pooled=False,
+                 pool_size=DEFAULT_POOL_SIZE, pool_idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        """
+        :param core_management_host: core microservice management host, used to discover the storage service
+        :param core_management_port: core microservice management port
+        :param svc: storage service record; when given, discovery through core is skipped
+        :param pooled: when True, all calls share one long lived keep-alive session instead of opening
+            a new session (and a new connection) per call
+        :param pool_size: maximum number of simultaneous connections of the pooled session
+        :param pool_idle_timeout: seconds after which an idle pooled connection is closed
+        """
+        self._pool = ClientSessionPool(pool_size, pool_idle_timeout) if pooled else None
         try:
             if svc:
                 self.service = svc
@@ -120,13 +161,39 @@ class StorageClientAsync(AbstractStorage):
     def disconnect(self):
         pass
 
+    def _session(self):
+        """ aiohttp session context for a single storage call
+
+        A new session is opened and closed for the call unless the client is pooled,
+        in which case the shared keep-alive session is used and left open.
+        """
+        if self._pool is not None:
+            return self._pool.session()
+        return aiohttp.ClientSession()
+
+    @property
+    def pooled(self):
+        return self._pool is not None
+
+    def pool_stats(self):
+        """ Connection pool hit/miss counters, None when the client is not pooled """
+        if self._pool is None:
+            return None
+        return self._pool.stats()
+
+    async def close(self):
+        """ Close the pooled session, if any. Safe to call on a non pooled client """
+        if self._pool is not None:
+            await self._pool.close()
+
     # FIXME: As per JIRA-615 strict=false at python side (interim solution)
     # fix is required at storage layer (error message with escape sequence using a single quote)
-    async def insert_into_tbl(self, tbl_name, data):
+    async def insert_into_tbl(self, tbl_name, data, raw=False):
         """ insert json payload into given table
 
         :param tbl_name:
-        :param data: JSON payload
+        :param data: JSON payload, str, bytes taken as valid JSON, or an object encoded to JSON
+        :param raw: True to return the response body as a StorageResult, decoded on demand
         :return:
 
         :Example:
@@ -145,15 +212,14 @@ class StorageClientAsync(AbstractStorage):
         if not data:
             raise ValueError("Data to insert is missing")
 
-        if not Utils.is_json(data):
-            raise TypeError("Provided data to insert must be a valid JSON")
+        data = _encode_payload(data, "Provided data to insert must be a valid JSON")
 
         post_url = '/storage/table/{tbl_name}'.format(tbl_name=tbl_name)
         url = 'http://' + self.base_url + post_url
-        async with aiohttp.ClientSession() as session:
+        async with self._session() as session:
             async with session.post(url, data=data) as resp:
                 status_code = resp.status
-                jdoc = await resp.json()
+                jdoc = await _read_result(resp, raw)
                 if status_code not in range(200, 209):
                     _LOGGER.info("POST %s, with payload: %s", post_url, data)
                     _LOGGER.error("Error code: %d, reason: %s, details: %s", resp.status, resp.reason, jdoc)
@@ -161,11 +227,12 @@ class StorageClientAsync(AbstractStorage):
 
         return jdoc
 
-    async def update_tbl(self, tbl_name, data):
+    async def update_tbl(self, tbl_name, data, raw=False):
         """ update json payload for specified condition into given table
 
         :param tbl_name:
-        :param data: JSON payload
+        :param data: JSON payload, str, bytes taken as valid JSON, or an object encoded to JSON
+        :param raw: True to return the response body as a StorageResult, decoded on demand
         :return:
 
         :Example:
@@ -188,16 +255,15 @@ class StorageClientAsync(AbstractStorage):
         if not data:
             raise ValueError("Data to update is missing")
 
-        if not Utils.is_json(data):
-            raise TypeError("Provided data to update must be a valid JSON")
+        data = _encode_payload(data, "Provided data to update must be a valid JSON")
 
         put_url = '/storage/table/{tbl_name}'.format(tbl_name=tbl_name)
 
         url = 'http://' + self.base_url + put_url
-        async with aiohttp.ClientSession() as session:
+        async with self._session() as session:
             async with session.put(url, data=data) as resp:
                 status_code = resp.status
-                jdoc = await resp.json()
+                jdoc = await _read_result(resp, raw)
                 if status_code not in range(200, 209):
                     _LOGGER.info("PUT %s, with payload: %s", put_url, data)
                     _LOGGER.error("Error code: %d, reason: %s, details: %s", resp.status, resp.reason, jdoc)
@@ -231,7 +297,7 @@ class StorageClientAsync(AbstractStorage):
             raise TypeError("condition payload must be a valid JSON")
 
         url = 'http://' + self.base_url + del_url
-        async with aiohttp.ClientSession() as session:
+        async with self._session() as session:
             async with session.delete(url, data=condition) as resp:
                 status_code = resp.status
                 jdoc = await resp.json()
@@ -262,7 +328,7 @@ class StorageClientAsync(AbstractStorage):
             get_url += '?{}'.format(query)
 
         url = 'http://' + self.base_url + get_url
-        async with aiohttp.ClientSession() as session:
+        async with self._session() as session:
             async with session.get(url) as resp:
                 status_code = resp.status
                 jdoc = await resp.json()
@@ -273,11 +339,12 @@ class StorageClientAsync(AbstractStorage):
 
         return jdoc
 
-    async def query_tbl_with_payload(self, tbl_name, query_payload):
+    async def query_tbl_with_payload(self, tbl_name, query_payload, raw=False):
         """ Complex SELECT query for the specified table with a payload
 
         :param tbl_name:
-        :param query_payload: payload in valid JSON format
+        :param query_payload: payload in valid JSON format, bytes taken as valid JSON, or an object encoded to JSON
+        :param raw: True to return the response body as a StorageResult, decoded on demand
         :return:
 
         :Example:
@@ -295,17 +362,16 @@ class StorageClientAsync(AbstractStorage):
         if not query_payload:
             raise ValueError("Query payload is missing")
 
-        if not Utils.is_json(query_payload):
-            raise TypeError("Query payload must be a valid JSON")
+        query_payload = _encode_payload(query_payload, "Query payload must be a valid JSON")
 
         put_url = '/storage/table/{tbl_name}/query'.format(tbl_name=tbl_name)
 
         url = 'http://' + self.base_url + put_url
 
-        async with aiohttp.ClientSession() as session:
+        async with self._session() as session:
             async with session.put(url, data=query_payload) as resp:
                 status_code = resp.status
-                jdoc = await resp.json()
+                jdoc = await _read_result(resp, raw)
                 if status_code not in range(200, 209):
                     _LOGGER.info("PUT %s, with query payload: %s", put_url, query_payload)
                     _LOGGER.error("Error code: %d, reason: %s, details: %s", resp.status, resp.reason, jdoc)
@@ -326,7 +392,7 @@ class StorageClientAsync(AbstractStorage):
         data = {"id": str(int(time.time()))}
 
         url = 'http://' + self.base_url + post_url
-        async with aiohttp.ClientSession() as session:
+        async with self._session() as session:
             async with session.post(url, data=json.dumps(data)) as resp:
                 status_code = resp.status
                 jdoc = await resp.text()
@@ -349,7 +415,7 @@ class StorageClientAsync(AbstractStorage):
         put_url = '/storage/table/{tbl_name}/snapshot/{id}'.format(tbl_name=tbl_name, id=snapshot_id)
 
         url = 'http://' + self.base_url + put_url
-        async with aiohttp.ClientSession() as session:
+        async with self._session() as session:
             async with session.put(url) as resp:
                 status_code = resp.status
                 jdoc = await resp.text()
@@ -372,7 +438,7 @@ class StorageClientAsync(AbstractStorage):
         delete_url = '/storage/table/{tbl_name}/snapshot/{id}'.format(tbl_name=tbl_name, id=snapshot_id)
 
         url = 'http://' + self.base_url + delete_url
-        async with aiohttp.ClientSession() as session:
+        async with self._session() as session:
             async with session.delete(url) as resp:
                 status_code = resp.status
                 jdoc = await resp.text()
@@ -394,7 +460,7 @@ class StorageClientAsync(AbstractStorage):
         get_url = '/storage/table/{tbl_name}/snapshot'.format(tbl_name=tbl_name)
 
         url = 'http://' + self.base_url + get_url
-        async with aiohttp.ClientSession() as session:
+        async with self._session() as session:
             async with session.get(url) as resp:
                 status_code = resp.status
                 jdoc = await resp.text()
@@ -409,13 +475,16 @@ class ReadingsStorageClientAsync(StorageClientAsync):
     """ Readings table operations """
     _base_url = ""
 
-    def __init__(self, core_mgt_host, core_mgt_port, svc=None):
-        super().__init__(core_management_host=core_mgt_host, core_management_port=core_mgt_port, svc=svc)
+    def __init__(self, core_mgt_host, core_mgt_port, svc=None, pooled=False,
+                 pool_size=DEFAULT_POOL_SIZE, pool_idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        super().__init__(core_management_host=core_mgt_host, core_management_port=core_mgt_port, svc=svc,
+                         pooled=pooled, pool_size=pool_size, pool_idle_timeout=pool_idle_timeout)
         self.__class__._base_url = self.base_url
 
-    async def append(self, readings):
+    async def append(self, readings, raw=False):
         """
-        :param readings:
+        :param readings: JSON payload, str, bytes taken as valid JSON, or an object encoded to JSON
+        :param raw: True to return the response body as a StorageResult, decoded on demand
         :return:
 
         :Example:
@@ -441,14 +510,13 @@ class ReadingsStorageClientAsync(StorageClientAsync):
         if not readings:
             raise ValueError("Readings payload is missing")
 
-        if not Utils.is_json(readings):
-            raise TypeError("Readings payload must be a valid JSON")
+        readings = _encode_payload(readings, "Readings payload must be a valid JSON")
 
         url = 'http://' + self._base_url + '/storage/reading'
-        async with aiohttp.ClientSession() as session:
+        async with self._session() as session:
             async with session.post(url, data=readings) as resp:
                 status_code = resp.status
-                jdoc = await resp.json()
+                jdoc = await _read_result(resp, raw)
                 if status_code not in range(200, 209):
                     _LOGGER.error("POST url %s with payload: %s, Error code: %d, reason: %s, details: %s",
                                   '/storage/reading', readings, resp.status, resp.reason, jdoc)
@@ -480,7 +548,7 @@ class ReadingsStorageClientAsync(StorageClientAsync):
 
         get_url = '/storage/reading?id={}&count={}'.format(reading_id, count)
         url = 'http://' + self._base_url + get_url
-        async with aiohttp.ClientSession() as session:
+        async with self._session() as session:
             async with session.get(url) as resp:
                 status_code = resp.status
                 jdoc = await resp.json()
@@ -491,10 +559,11 @@ class ReadingsStorageClientAsync(StorageClientAsync):
 
         return jdoc
 
-    async def query(self, query_payload):
+    async def query(self, query_payload, raw=False):
         """
 
-        :param query_payload:
+        :param query_payload: JSON payload, str, bytes taken as valid JSON, or an object encoded to JSON
+        :param raw: True to return the response body as a StorageResult, decoded on demand
         :return:
         :Example:
             curl -X PUT http://0.0.0.0:8080/storage/reading/query -d @payload.json
@@ -512,14 +581,13 @@ class ReadingsStorageClientAsync(StorageClientAsync):
         if not query_payload:
             raise ValueError("Query payload is missing")
 
-        if not Utils.is_json(query_payload):
-            raise TypeError("Query payload must be a valid JSON")
+        query_payload = _encode_payload(query_payload, "Query payload must be a valid JSON")
 
         url = 'http://' + self._base_url + '/storage/reading/query'
-        async with aiohttp.ClientSession() as session:
+        async with self._session() as session:
             async with session.put(url, data=query_payload) as resp:
                 status_code = resp.status
-                jdoc = await resp.json()
+                jdoc = await _read_result(resp, raw)
                 if status_code not in range(200, 209):
                     _LOGGER.error("PUT url %s with query payload: %s, Error code: %d, reason: %s, details: %s",
                                   '/storage/reading/query', query_payload, resp.status, resp.reason, jdoc)
@@ -584,7 +652,7 @@ class ReadingsStorageClientAsync(StorageClientAsync):
             put_url = '/storage/reading/purge?asset={}'.format(asset)
 
         url = 'http://' + self._base_url + put_url
-        async with aiohttp.ClientSession() as session:
+        async with self._session() as session:
             async with session.put(url, data=None) as resp:
                 status_code = resp.status
                 try:
@@ -17,6 +17,12 @@ __version__ = "${VERSION}"
 
 import json
 
+try:
+    # Optional faster JSON backend
+    import orjson
+except ImportError:
+    orjson = None
+
 
 class Utils(object):
 
@@ -27,3 +33,39 @@ class Utils(object):
         except (TypeError, ValueError):  # JSONDecodeError is a subclass of ValueError
             return False
         return True
+
+    @staticmethod
+    def dumps(obj):
+        """ Encodes a payload to JSON bytes, with orjson when it is installed
+
+        :raises TypeError: obj can not be encoded
+        """
+        if orjson is not None:
+            try:
+                return orjson.dumps(obj)
+            except TypeError:
+                # Such as non string keys, which json converts
+                pass
+        return json.dumps(obj).encode()
+
+    @staticmethod
+    def loads(data):
+        """ Decodes a JSON document, str or bytes, with orjson when it is installed """
+        if orjson is not None:
+            try:
+                return orjson.loads(data)
+            except ValueError:
+                # Such as NaN, which json accepts
+                pass
+        return json.loads(data)
+
+
+class StorageResult(bytes):
+    """ Body of a storage service response, decoded on the first call of json() """
+
+    def json(self):
+        try:
+            return self._json
+        except AttributeError:
+            self._json = Utils.loads(self)
+            return self._json
@@ -77,7 +77,7 @@ async def auth_middleware(app, handler):
                 # and no bad token exception raised
                 await User.Objects.refresh_token_expiry(token)
                 # set the user to request object
-                request.user = await User.Objects.get(uid=uid)
+                request.user = await User.Objects.get_token_user(token, uid)
                 # set the token to request
                 request.token = token
                 # set if user is admin
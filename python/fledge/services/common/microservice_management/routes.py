@@ -55,6 +55,7 @@ def setup(app, obj, is_core=False):
         # Asset Tracker
         app.router.add_route('GET', '/fledge/track', obj.get_track)
         app.router.add_route('POST', '/fledge/track', obj.add_track)
+        app.router.add_route('POST', '/fledge/track/bulk', obj.add_track_bulk)
 
         # Audit Log
         app.router.add_route('POST', '/fledge/audit', obj.add_audit)
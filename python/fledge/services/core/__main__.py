@@ -8,6 +8,7 @@
 """Core server starter"""
 
 import sys
+from fledge.common import startup_profile  # First, to profile the imports which follow
 from fledge.services.core.server import Server
 
 __author__ = "Terris Linenbach"
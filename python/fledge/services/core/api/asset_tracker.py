@@ -3,6 +3,7 @@
 # FLEDGE_BEGIN
 # See: http://fledge-iot.readthedocs.io/
 # FLEDGE_END
+import functools
 import json
 
 from aiohttp import web
@@ -14,6 +15,7 @@ from fledge.common.logger import FLCoreLogger
 from fledge.common.storage_client.exceptions import StorageServerError
 from fledge.common.storage_client.payload_builder import PayloadBuilder
 from fledge.services.core import connect
+from fledge.services.core.api import json_stream
 
 __author__ = "Ashish Jabble"
 __copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
@@ -45,8 +47,14 @@ async def get_asset_tracker_events(request: web.Request) -> web.Response:
             curl -sX GET http://localhost:8081/fledge/track?service=XXX
             curl -sX GET http://localhost:8081/fledge/track?deprecated=true
             curl -sX GET http://localhost:8081/fledge/track?event=XXX&asset=XXX&service=XXX
+            curl -sX GET http://localhost:8081/fledge/track?stream=true
     """
-    payload = PayloadBuilder().SELECT("asset", "event", "service", "fledge", "plugin", "ts", "deprecated_ts", "data") \
+    stream = json_stream.is_stream_requested(request)
+    columns = ("asset", "event", "service", "fledge", "plugin", "ts", "deprecated_ts", "data")
+    if stream:
+        # The stream pages are read by id
+        columns = ("id",) + columns
+    payload = PayloadBuilder().SELECT(*columns) \
         .ALIAS("return", ("ts", 'timestamp')).FORMAT("return", ("ts", "YYYY-MM-DD HH24:MI:SS.MS")) \
         .ALIAS("return", ("deprecated_ts", 'deprecatedTimestamp')) \
         .WHERE(['1', '=', 1])
@@ -65,6 +73,15 @@ async def get_asset_tracker_events(request: web.Request) -> web.Response:
             payload.AND_WHERE(['deprecated_ts', "notnull"])
 
     storage_client = connect.get_storage_async()
+    if stream:
+        pager = json_stream.KeysetPager(functools.partial(storage_client.query_tbl_with_payload, 'asset_tracker'),
+                                        payload.chain_payload(), direction='asc')
+        try:
+            return await json_stream.stream_json(request, pager, prefix='{"track": [', suffix=']}')
+        except Exception as ex:
+            msg = str(ex)
+            _logger.error(ex, "Failed to get asset tracker events.")
+            raise web.HTTPInternalServerError(reason=msg, body=json.dumps({"message": msg}))
     payload = PayloadBuilder(payload.chain_payload())
     try:
         result = await storage_client.query_tbl_with_payload('asset_tracker', payload.payload())
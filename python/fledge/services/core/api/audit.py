@@ -5,6 +5,7 @@
 # FLEDGE_END
 
 import copy
+import functools
 from datetime import datetime
 from enum import IntEnum
 from aiohttp import web
@@ -15,6 +16,7 @@ from fledge.common.logger import FLCoreLogger
 from fledge.common.storage_client.payload_builder import PayloadBuilder
 from fledge.common.storage_client.exceptions import StorageServerError
 from fledge.services.core import connect
+from fledge.services.core.api import json_stream
 
 __author__ = "Amarendra K. Sinha, Ashish Jabble, Massimiliano Pinto"
 __copyright__ = "Copyright (c) 2017-2018 OSIsoft, LLC"
@@ -106,7 +108,8 @@ async def create_audit_entry(request):
 
     try:
         audit = AuditLogger()
-        await getattr(audit, str(severity).lower())(source, details)
+        # Written now rather than queued, so that an entry refused by storage is reported to the client
+        await getattr(audit, str(severity).lower())(source, details, wait=True)
 
         # Set timestamp for return message
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
@@ -158,9 +161,14 @@ async def get_audit_entries(request):
         curl -X GET "http://localhost:8081/fledge/audit?source=LOGGN&severity=INFORMATION&limit=10"
 
         curl -X GET "http://localhost:8081/fledge/audit?source=CONAD&since=2022-10-10%2009:31:32"
-    """
 
-    limit = __DEFAULT_LIMIT
+        curl -X GET "http://localhost:8081/fledge/audit?source=PURGE&stream=true"
+
+    With stream=true the entries are written to the response as they are read from storage, all of them unless a
+    limit is given, most recently added first.
+    """
+    stream = json_stream.is_stream_requested(request)
+    limit = None if stream else __DEFAULT_LIMIT
     if 'limit' in request.query and request.query['limit'] != '':
         try:
             limit = int(request.query['limit'])
@@ -210,10 +218,12 @@ async def get_audit_entries(request):
         except KeyError as ex:
             raise web.HTTPBadRequest(reason="{} is not a valid severity".format(ex))
 
+    # The stream pages are read by id
+    columns = ("id", "code", "level", "log", "ts") if stream else ("code", "level", "log", "ts")
     try:
         # HACK: This way when we can more future we do not get an exponential
         # explosion of if statements
-        payload = PayloadBuilder().SELECT("code", "level", "log", "ts")\
+        payload = PayloadBuilder().SELECT(*columns)\
             .ALIAS("return", ("ts", 'timestamp')).FORMAT("return", ("ts", "YYYY-MM-DD HH24:MI:SS.MS"))\
             .WHERE(['1', '=', 1])
 
@@ -221,7 +231,7 @@ async def get_audit_entries(request):
             if len(source_list) == 1:
                 payload.AND_WHERE(['code', '=', source])
             else:
-                payload = PayloadBuilder().SELECT("code", "level", "log", "ts") \
+                payload = PayloadBuilder().SELECT(*columns) \
                     .ALIAS("return", ("ts", 'timestamp')).FORMAT("return", ("ts", "YYYY-MM-DD HH24:MI:SS.MS"))
                 payload.WHERE(['code', 'in', source_list])
         if severity is not None:
@@ -239,6 +249,41 @@ async def get_audit_entries(request):
         result = await storage_client.query_tbl_with_payload('log', total_count_payload)
         total_count = result['rows'][0]['count']
 
+        def audit_entries(rows):
+            # If 'since' datetime string param is passed then filter the records internally from the storage result
+            if 'since' in request.query:
+                since_dt = datetime.strptime(request.query['since'].split('.', 1)[0], __DATE_FORMAT)
+                rows = [row for row in rows
+                        if since_dt <= datetime.strptime(row['timestamp'].split('.', 1)[0], __DATE_FORMAT)]
+            entries = []
+            for row in rows:
+                r = dict()
+                r["details"] = row["log"]
+                severity_level = int(row["level"])
+                r["severity"] = Severity(severity_level).name if severity_level in (0, 1, 2, 4) else "UNKNOWN"
+                r["source"] = row["code"]
+                r["timestamp"] = row["timestamp"]
+                entries.append(r)
+            return entries
+
+        if stream:
+            streamed = 0
+
+            def stream_entries(rows):
+                nonlocal streamed
+                entries = audit_entries(rows)
+                streamed += len(entries)
+                return entries
+
+            def stream_end():
+                # With since the total is the number of entries returned
+                return '], "totalCount": {}}}'.format(streamed if 'since' in request.query else total_count)
+
+            pager = json_stream.KeysetPager(functools.partial(storage_client.query_tbl_with_payload, 'log'),
+                                            _and_where_payload, limit=limit, skip=offset)
+            return await json_stream.stream_json(request, pager, prefix='{"audit": [', suffix=stream_end,
+                                                 transform=stream_entries)
+
         payload = PayloadBuilder(_and_where_payload)
         payload.ORDER_BY(['ts', 'desc'])
         payload.LIMIT(limit)
@@ -248,26 +293,9 @@ async def get_audit_entries(request):
 
         # SELECT * FROM log <payload.payload()>
         results = await storage_client.query_tbl_with_payload('log', payload.payload())
-        rows = results['rows']
-        # If 'since' datetime string param is passed then filter the records internally from the actual storage result
+        res = audit_entries(results['rows'])
         if 'since' in request.query:
-            since_dt = datetime.strptime(request.query['since'].split('.', 1)[0], __DATE_FORMAT)
-            temp_rows = []
-            for row in results["rows"]:
-                convert_dt = datetime.strptime(row['timestamp'].split('.', 1)[0], __DATE_FORMAT)
-                if since_dt <= convert_dt:
-                    temp_rows.append(row)
-            rows = temp_rows
-            total_count = len(rows)
-        res = []
-        for row in rows:
-            r = dict()
-            r["details"] = row["log"]
-            severity_level = int(row["level"])
-            r["severity"] = Severity(severity_level).name if severity_level in (0, 1, 2, 4) else "UNKNOWN"
-            r["source"] = row["code"]
-            r["timestamp"] = row["timestamp"]
-            res.append(r)
+            total_count = len(res)
     except Exception as ex:
         msg = str(ex)
         _logger.error(ex, "Failed to get Audit log entry.")
@@ -6,7 +6,6 @@
 
 """Backup and Restore Rest API support"""
 import os
-import sys
 import tarfile
 import json
 from pathlib import Path
@@ -22,11 +21,8 @@ from fledge.common.storage_client import payload_builder
 from fledge.plugins.storage.common import exceptions
 from fledge.services.core import connect
 
-if 'fledge.plugins.storage.common.backup' not in sys.modules:
-    from fledge.plugins.storage.common.backup import Backup
-
-if 'fledge.plugins.storage.common.restore' not in sys.modules:
-    from fledge.plugins.storage.common.restore import Restore
+from fledge.plugins.storage.common.backup import Backup
+from fledge.plugins.storage.common.restore import Restore
 
 __author__ = "Vaibhav Singhal, Ashish Jabble"
 __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
@@ -36,6 +36,12 @@ Supports a number of REST API:
   Note: seconds, minutes and hours can not be combined in a URL. If they are then only seconds
   will have an effect.
   Note: if datetime units are supplied then limit will not respect i.e mutually exclusive
+
+  The /fledge/asset/{asset_code} and /fledge/asset/{asset_code}/{reading} API calls also take
+    downsample=x    Return about x readings per datapoint, for charts over long time windows
+    method=x        The downsampling method, lttb (default) or minmax
+    stream=true     Write the readings to the response as they are read from storage, all of them unless a
+                    limit is given; not with downsample or additional
 """
 import time
 import datetime
@@ -46,6 +52,7 @@ from aiohttp import web
 from fledge.common.logger import FLCoreLogger
 from fledge.common.storage_client.payload_builder import PayloadBuilder
 from fledge.services.core import connect
+from fledge.services.core.api import browser_cache, json_stream
 
 _logger = FLCoreLogger().get_logger(__name__)
 
@@ -60,6 +67,9 @@ __DEFAULT_OFFSET = 0
 
 DATAPOINT_TYPES = ['__DPIMAGE', '__DATABUFFER']
 IMAGE_PLACEHOLDER = "Data removed for brevity"
+_DATAPOINT_PREFIXES = tuple(DATAPOINT_TYPES)
+
+_bucket_cache = browser_cache.BucketCache()
 
 
 def setup(app):
@@ -91,7 +101,24 @@ def prepare_limit_skip_payload(request, _dict):
     Returns:
         chain payload dict
     """
-    limit = __DEFAULT_LIMIT
+    limit, offset = limit_skip(request, __DEFAULT_LIMIT)
+    payload = PayloadBuilder(_dict).LIMIT(limit)
+    if offset:
+        payload = PayloadBuilder(_dict).SKIP(offset)
+
+    return payload.chain_payload()
+
+
+def limit_skip(request, default_limit):
+    """ limit and skip query params validation
+
+    Args:
+        request: request query params
+        default_limit: limit when the request has none
+    Returns:
+        tuple of limit and offset
+    """
+    limit = default_limit
     if 'limit' in request.query and request.query['limit'] != '':
         try:
             limit = int(request.query['limit'])
@@ -108,12 +135,7 @@ def prepare_limit_skip_payload(request, _dict):
                 raise ValueError
         except ValueError:
             raise web.HTTPBadRequest(reason="Skip/Offset must be a positive integer")
-
-    payload = PayloadBuilder(_dict).LIMIT(limit)
-    if offset:
-        payload = PayloadBuilder(_dict).SKIP(offset)
-
-    return payload.chain_payload()
+    return limit, offset
 
 
 def is_image_excluded(request: web.Request) -> bool:
@@ -132,6 +154,29 @@ def is_image_excluded(request: web.Request) -> bool:
     return True
 
 
+def downsample_params(request: web.Request):
+    """ downsampling request query params validation
+    Args:
+        request: downsample and method request query params
+    Returns:
+        Tuple of the number of points and the downsampling method, None if no downsampling is requested
+    """
+    if 'downsample' not in request.query or request.query['downsample'] == '':
+        return None
+    try:
+        points = int(request.query['downsample'])
+        if points < 3:
+            raise ValueError
+    except ValueError:
+        msg = "downsample must be an integer greater than 2."
+        raise web.HTTPBadRequest(reason=msg, body=json.dumps({"message": msg}))
+    method = request.query.get('method', 'lttb')
+    if method not in browser_cache.DOWNSAMPLING_METHODS:
+        msg = "method must be one of {}.".format(', '.join(browser_cache.DOWNSAMPLING_METHODS))
+        raise web.HTTPBadRequest(reason=msg, body=json.dumps({"message": msg}))
+    return points, method
+
+
 async def asset_counts(request):
     """ Browse all the assets for which we have recorded readings and
     return a readings count.
@@ -181,8 +226,14 @@ async def asset(request):
             curl -sX GET "http://localhost:8081/fledge/asset/fogbench_humidity?additional=sinusoid,random&seconds=600"
             curl -sX GET "http://localhost:8081/fledge/asset/sinusoid?mostrecent=true&seconds=600"
             curl -sX GET "http://localhost:8081/fledge/asset/sinusoid?mostrecent=true&seconds=60&additional=randomwalk"
+            curl -sX GET "http://localhost:8081/fledge/asset/sinusoid?seconds=86400&downsample=500&method=minmax"
+            curl -sX GET "http://localhost:8081/fledge/asset/sinusoid?hours=24&stream=true"
     """
     asset_code = request.match_info.get('asset_code', '')
+    exclude_images = is_image_excluded(request)
+    downsample = downsample_params(request)
+    stream = json_stream.is_stream_requested(request) and 'additional' not in request.query and downsample is None
+    stream_limit, stream_skip = None, 0
     # A comma separated list of additional assets to generate the readings to display multiple graphs in GUI
     if 'additional' in request.query:
         additional_assets = "{},{}".format(asset_code, request.query['additional'])
@@ -191,7 +242,7 @@ async def asset(request):
             "return", ("user_ts", "timestamp")).chain_payload()
         _where = PayloadBuilder(_select).WHERE(["asset_code", "in", additional_asset_codes]).chain_payload()
     else:
-        _select = PayloadBuilder().SELECT(("reading", "user_ts")).ALIAS(
+        _select = PayloadBuilder().SELECT(("id", "reading", "user_ts") if stream else ("reading", "user_ts")).ALIAS(
             "return", ("user_ts", "timestamp")).chain_payload()
         _where = PayloadBuilder(_select).WHERE(["asset_code", "=", asset_code]).chain_payload()
     if 'previous' in request.query and (
@@ -226,6 +277,10 @@ async def asset(request):
     elif 'previous' in request.query:
         msg = "the parameter previous can only be given if one of seconds, minutes or hours is also given"
         raise web.HTTPBadRequest(reason=msg, body=json.dumps({"message": msg}))
+    elif stream:
+        # The pages are limited by the stream
+        stream_limit, stream_skip = limit_skip(request, None)
+        _and_where = _where
     else:
         # Add the order by and limit, offset clause
         _and_where = prepare_limit_skip_payload(request, _where)
@@ -237,17 +292,21 @@ async def asset(request):
         if _order not in ('asc', 'desc'):
             msg = "order must be asc or desc"
             raise web.HTTPBadRequest(reason=msg, body=json.dumps({"message": msg}))
+    if stream:
+        pager = json_stream.KeysetPager(connect.get_readings_async().query, _and_where, 'user_ts', 'timestamp',
+                                        _order, limit=stream_limit, skip=stream_skip)
+        try:
+            return await json_stream.stream_json(request, pager,
+                                                 transform=_exclude_image_datapoints if exclude_images else None)
+        except Exception as exc:
+            msg = str(exc)
+            _logger.error(exc, "Failed to get {} asset.".format(asset_code))
+            raise web.HTTPInternalServerError(reason=msg, body=json.dumps({"message": msg}))
     payload = PayloadBuilder(_and_where).ORDER_BY(["user_ts", _order]).payload()
     try:
         _readings = connect.get_readings_async()
         results = await _readings.query(payload)
         rows = results['rows']
-        for index, data in enumerate(rows):
-            for item_name, item_val in data.items():
-                if isinstance(item_val, dict):
-                    for item_name2, item_val2 in item_val.items():
-                        if isinstance(item_val2, str) and item_val2.startswith(tuple(DATAPOINT_TYPES)):
-                            data[item_name][item_name2] = IMAGE_PLACEHOLDER if is_image_excluded(request) else item_val2
         # Group the readings value by asset_code in case of additional multiple assets
         if 'additional' in request.query:
             response_by_asset_code = {}
@@ -257,9 +316,19 @@ async def asset(request):
                 if r['asset_code'] in additional_asset_codes:
                     response_by_asset_code[r['asset_code']].extend([r])
                     r.pop('asset_code')
+            if downsample is not None:
+                for aacl in additional_asset_codes:
+                    response_by_asset_code[aacl] = browser_cache.downsample_rows(
+                        response_by_asset_code[aacl], *downsample)
             response = response_by_asset_code
+            rows = [r for asset_rows in response_by_asset_code.values() for r in asset_rows]
         else:
+            if downsample is not None:
+                rows = browser_cache.downsample_rows(rows, *downsample)
             response = rows
+        # Only the returned rows are walked, and not at all when images are included
+        if exclude_images:
+            _exclude_image_datapoints(rows)
     except KeyError:
         msg = results['message']
         raise web.HTTPBadRequest(reason=msg, body=json.dumps({"message": msg}))
@@ -271,6 +340,17 @@ async def asset(request):
         return web.json_response(response)
 
 
+def _exclude_image_datapoints(rows):
+    """ Replaces the image and data buffer datapoints of reading rows by a placeholder """
+    for data in rows:
+        for item_val in data.values():
+            if isinstance(item_val, dict):
+                for item_name2, item_val2 in item_val.items():
+                    if isinstance(item_val2, str) and item_val2.startswith(_DATAPOINT_PREFIXES):
+                        item_val[item_name2] = IMAGE_PLACEHOLDER
+    return rows
+
+
 async def asset_latest(request: web.Request) -> web.Response:
     """ Browse a particular asset for which we have recorded readings and
     return a single latest reading with timestamps for an asset.
@@ -327,11 +407,18 @@ async def asset_reading(request):
             curl -sX GET http://localhost:8081/fledge/asset/fogbench_humidity/temperature?skip=10
             curl -sX GET "http://localhost:8081/fledge/asset/fogbench_humidity/temperature?limit=1&skip=10"
             curl -sX GET http://localhost:8081/fledge/asset/fogbench_humidity/temperature?minutes=60
+            curl -sX GET "http://localhost:8081/fledge/asset/fogbench_humidity/temperature?hours=24&downsample=500"
+            curl -sX GET "http://localhost:8081/fledge/asset/fogbench_humidity/temperature?hours=24&stream=true"
     """
     asset_code = request.match_info.get('asset_code', '')
     reading = request.match_info.get('reading', '')
+    exclude_images = is_image_excluded(request)
+    downsample = downsample_params(request)
+    stream = json_stream.is_stream_requested(request) and downsample is None
+    stream_limit, stream_skip = None, 0
 
-    _select = PayloadBuilder().SELECT(("user_ts", ["reading", reading])) \
+    _select = PayloadBuilder().SELECT(("id", "user_ts", ["reading", reading]) if stream else
+                                      ("user_ts", ["reading", reading])) \
         .ALIAS("return", ("user_ts", "timestamp"), ("reading", reading)).chain_payload()
     _where = PayloadBuilder(_select).WHERE(["asset_code", "=", asset_code]).chain_payload()
     if 'previous' in request.query and (
@@ -342,19 +429,40 @@ async def asset_reading(request):
     elif 'previous' in request.query:
         msg = "the parameter previous can only be given if one of seconds, minutes or hours is also given"
         raise web.HTTPBadRequest(reason=msg, body=json.dumps({"message": msg}))
+    elif stream:
+        # The pages are limited by the stream
+        stream_limit, stream_skip = limit_skip(request, None)
+        _and_where = _where
     else:
         # Add the order by and limit, offset clause
         _and_where = prepare_limit_skip_payload(request, _where)
+
+    def exclude_image_values(rows):
+        for data in rows:
+            item_val = data.get(reading)
+            if isinstance(item_val, str) and item_val.startswith(_DATAPOINT_PREFIXES):
+                data[reading] = IMAGE_PLACEHOLDER
+        return rows
+
+    if stream:
+        pager = json_stream.KeysetPager(connect.get_readings_async().query, _and_where, 'user_ts', 'timestamp',
+                                        'desc', limit=stream_limit, skip=stream_skip)
+        try:
+            return await json_stream.stream_json(request, pager,
+                                                 transform=exclude_image_values if exclude_images else None)
+        except Exception as exc:
+            msg = str(exc)
+            _logger.error(exc, "Failed to get {} asset for {} reading.".format(asset_code, reading))
+            raise web.HTTPInternalServerError(reason=msg, body=json.dumps({"message": msg}))
     payload = PayloadBuilder(_and_where).ORDER_BY(["user_ts", "desc"]).payload()
     try:
         _readings = connect.get_readings_async()
         results = await _readings.query(payload)
         rows = results['rows']
-        for index, data in enumerate(rows):
-            for item_name, item_val in data.items():
-                if item_name != 'timestamp':
-                    if isinstance(item_val, str) and item_val.startswith(tuple(DATAPOINT_TYPES)):
-                        data[item_name] = IMAGE_PLACEHOLDER if is_image_excluded(request) else item_val
+        if downsample is not None:
+            rows = browser_cache.downsample_rows(rows, *downsample)
+        if exclude_images:
+            exclude_image_values(rows)
         response = rows
     except KeyError:
         msg = results['message']
@@ -422,12 +530,13 @@ async def asset_all_readings_summary(request):
             payload = PayloadBuilder(_aggregate).payload()
             results = await _readings.query(payload)
             rows.append({reading: results['rows'][0]})
-        for index, data in enumerate(rows):
-            for item_name, item_val in data.items():
-                if isinstance(item_val, dict):
-                    for item_name2, item_val2 in item_val.items():
-                        if isinstance(item_val2, str) and item_val2.startswith(tuple(DATAPOINT_TYPES)):
-                            data[item_name][item_name2] = IMAGE_PLACEHOLDER if is_image_excluded(request) else item_val2
+        if is_image_excluded(request):
+            for data in rows:
+                for item_val in data.values():
+                    if isinstance(item_val, dict):
+                        for item_name2, item_val2 in item_val.items():
+                            if isinstance(item_val2, str) and item_val2.startswith(_DATAPOINT_PREFIXES):
+                                item_val[item_name2] = IMAGE_PLACEHOLDER
         response = rows
     except (KeyError, IndexError) as err:
         msg = str(err)
@@ -492,9 +601,10 @@ async def asset_summary(request):
         results = await _readings.query(payload)
         # for aggregates, so there can only ever be one row
         response = results['rows'][0]
-        for item_name, item_val in response.items():
-            if isinstance(item_val, str) and item_val.startswith(tuple(DATAPOINT_TYPES)):
-                response[item_name] = IMAGE_PLACEHOLDER if is_image_excluded(request) else item_val
+        if is_image_excluded(request):
+            for item_name, item_val in response.items():
+                if isinstance(item_val, str) and item_val.startswith(_DATAPOINT_PREFIXES):
+                    response[item_name] = IMAGE_PLACEHOLDER
     except KeyError:
         msg = results['message']
         raise web.HTTPBadRequest(reason=msg, body=json.dumps({"message": msg}))
@@ -554,6 +664,7 @@ async def asset_averages(request):
     """
     asset_code = request.match_info.get('asset_code', '')
     reading = request.match_info.get('reading', '')
+    exclude_images = is_image_excluded(request)
 
     ts_restraint = 'YYYY-MM-DD HH24:MI:SS'
     if 'group' in request.query and request.query['group'] != '':
@@ -594,11 +705,12 @@ async def asset_averages(request):
         _readings = connect.get_readings_async()
         results = await _readings.query(payload)
         rows = results['rows']
-        for index, data in enumerate(rows):
-            for item_name, item_val in data.items():
-                if item_name != 'timestamp':
-                    if isinstance(item_val, str) and item_val.startswith(tuple(DATAPOINT_TYPES)):
-                        data[item_name] = IMAGE_PLACEHOLDER if is_image_excluded(request) else item_val
+        if exclude_images:
+            for data in rows:
+                for item_name, item_val in data.items():
+                    if item_name != 'timestamp' and isinstance(item_val, str) and \
+                            item_val.startswith(_DATAPOINT_PREFIXES):
+                        data[item_name] = IMAGE_PLACEHOLDER
         response = rows
     except KeyError:
         msg = results['message']
@@ -781,6 +893,8 @@ async def asset_readings_with_bucket_size(request: web.Request) -> web.Response:
         If start is not given then the start point is now - 60 seconds.
         If length is not given then length is 60 seconds. And length is calculated with length / bucket_size
 
+        Closed buckets are cached, so that a refresh of the same chart only reads the newer buckets from storage.
+
        :Example:
                curl -sX GET http://localhost:8081/fledge/asset/{asset_code}/{reading}/bucket/{bucket_size}
                curl -sX GET http://localhost:8081/fledge/asset/{asset_code}/{reading}/bucket/{bucket_size}?start=<start point>
@@ -817,25 +931,36 @@ async def asset_readings_with_bucket_size(request: web.Request) -> web.Response:
             if start_found is False:
                 start = ts - length
 
-        # Build datetime from timestamp
-        start_time = time.gmtime(start)
-        start_date = time.strftime("%Y-%m-%d %H:%M:%S", start_time)
-        stop_time = time.gmtime(start + length)
-        stop_date = time.strftime("%Y-%m-%d %H:%M:%S", stop_time)
-
-        # Prepare payload
-        _where = PayloadBuilder(_aggregate).WHERE(["asset_code", "=", asset_code]).AND_WHERE([
-            "user_ts", ">=", str(start_date)], ["user_ts", "<=", str(stop_date)], [
-            "user_ts", "<=", str(stop_date)]).chain_payload()
-        _bucket = PayloadBuilder(_where).TIMEBUCKET('user_ts', bucket_size, 'YYYY-MM-DD HH24:MI:SS',
-                                                    'timestamp').chain_payload()
-
-        payload = PayloadBuilder(_bucket).LIMIT(int(length / int(bucket_size))).payload()
-
-        # Sort & timebucket modifiers can not be used in same payload
-        # payload = PayloadBuilder(limit).ORDER_BY(["user_ts", "desc"]).payload()
+        bucket = int(bucket_size)
+        if bucket < 1:
+            raise ValueError('bucket_size must be a positive integer')
+        limit = int(length / bucket)
+        start_second = int(start)
+        stop_second = int(start + length)
+        # Storage aligns the buckets on the epoch and returns the newest first, the bucket holding start
+        # is incomplete so cached buckets are only used from the next one
+        first_bucket = -(-start_second // bucket) * bucket
+        cache_key = (asset_code, reading, bucket)
+        cached_end, cached_rows = _bucket_cache.get(cache_key, first_bucket, stop_second) if limit > 0 \
+            else (None, [])
+
+        query_start = start_second if cached_end is None else cached_end
+        payload = _bucket_payload(_aggregate, asset_code, bucket_size, query_start, stop_second, limit)
         results = await _readings.query(payload)
-        response = results['rows']
+        rows = results['rows']
+        response = rows
+        if cached_end is not None and len(rows) < limit:
+            response = rows + cached_rows[:limit - len(rows)]
+            if len(response) < limit and start_second < first_bucket:
+                payload = _bucket_payload(_aggregate, asset_code, bucket_size, start_second, first_bucket, 1,
+                                          stop_condition="<")
+                results = await _readings.query(payload)
+                response += results['rows']
+
+        if limit > 0:
+            closed = min(int(ts) - _bucket_cache.settle_seconds, stop_second) // bucket * bucket
+            read_from = first_bucket if cached_end is None else cached_end
+            _bucket_cache.update(cache_key, first_bucket, read_from, closed, rows, truncated=len(rows) >= limit)
     except (KeyError, IndexError) as e:
         raise web.HTTPNotFound(reason=e)
     except (TypeError, ValueError) as e:
@@ -849,6 +974,18 @@ async def asset_readings_with_bucket_size(request: web.Request) -> web.Response:
         return web.json_response(response)
 
 
+def _bucket_payload(aggregate, asset_code, bucket_size, start, stop, limit, stop_condition="<="):
+    """ Time bucket payload of the readings of an asset between two epochs in seconds """
+    start_date = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(start))
+    stop_date = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(stop))
+    _where = PayloadBuilder(aggregate).WHERE(["asset_code", "=", asset_code]).AND_WHERE([
+        "user_ts", ">=", str(start_date)], ["user_ts", stop_condition, str(stop_date)]).chain_payload()
+    _bucket = PayloadBuilder(_where).TIMEBUCKET('user_ts', bucket_size, 'YYYY-MM-DD HH24:MI:SS',
+                                                'timestamp').chain_payload()
+    # Sort & timebucket modifiers can not be used in same payload
+    return PayloadBuilder(_bucket).LIMIT(limit).payload()
+
+
 async def asset_structure(request):
     """ Browse all the assets for which we have recorded readings and
     return the asset structure
@@ -940,6 +1077,7 @@ async def asset_purge_all(request):
         start_time = time.strftime('%Y-%m-%d %H:%M:%S.%s', time.localtime(time.time()))
 
         results = await _readings.purge(asset="")
+        _bucket_cache.invalidate()
 
         if 'purged' in results:
             end_time = time.strftime('%Y-%m-%d %H:%M:%S.%s', time.localtime(time.time()))
@@ -980,6 +1118,7 @@ async def asset_purge(request):
         start_time = time.strftime('%Y-%m-%d %H:%M:%S.%s', time.localtime(time.time()))
 
         results = await _readings.purge(asset=asset_code)
+        _bucket_cache.invalidate(asset_code)
 
         if 'purged' in results:
             end_time = time.strftime('%Y-%m-%d %H:%M:%S.%s', time.localtime(time.time()))
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+
+# FLEDGE_BEGIN
+# See: http://fledge-iot.readthedocs.io/
+# FLEDGE_END
+
+"""Time bucket cache and downsampling for the asset browser
+
+The bucket cache holds the min, max and average rows of the closed time buckets of an asset datapoint, so that
+a chart refreshed by the GUI only reads from storage the buckets which are newer than the previous request.
+A bucket is closed once its end is older than SETTLE_SECONDS. Readings may still be inserted or removed later with a
+timestamp in a cached bucket, by a south service replaying buffered readings or by the purge task, so that an entry is
+only used for MAX_AGE_SECONDS after it is created; the buckets are then read from storage again. An asset purge
+through the API drops its entries at once.
+"""
+
+import calendar
+import time
+from collections import OrderedDict
+
+__copyright__ = "Copyright (c) 2023 Dianomic Systems Inc."
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+MAX_CACHE_SIZE = 100
+"""Maximum number of asset, datapoint and bucket size combinations kept in the cache"""
+
+SETTLE_SECONDS = 10
+"""Age in seconds after which a time bucket no longer receives readings"""
+
+MAX_AGE_SECONDS = 60
+"""Seconds for which the buckets of an entry are used, the readings changed since are reflected once it expires"""
+
+DOWNSAMPLING_METHODS = ('lttb', 'minmax')
+
+_BUCKET_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def bucket_epoch(timestamp):
+    """Returns the seconds since the epoch of the UTC timestamp of a time bucket row"""
+    return calendar.timegm(time.strptime(timestamp, _BUCKET_TIMESTAMP_FORMAT))
+
+
+class _BucketCacheEntry(object):
+    __slots__ = ['start', 'end', 'rows', 'cached_at']
+
+    def __init__(self, start, end, rows):
+        self.start = start
+        """Epoch of the first cached bucket"""
+        self.end = end
+        """Epoch of the end of the last cached bucket"""
+        self.rows = rows
+        """Bucket epoch -> row, buckets with no readings have no row"""
+        self.cached_at = time.monotonic()
+        """Monotonic time the first buckets were read, extending the entry does not refresh it"""
+
+
+class BucketCache(object):
+    """Least recently used cache of closed time bucket rows keyed by asset code, datapoint and bucket size"""
+
+    def __init__(self, max_cache_size=MAX_CACHE_SIZE, settle_seconds=SETTLE_SECONDS, max_age_seconds=MAX_AGE_SECONDS):
+        self.max_cache_size = max_cache_size
+        self.settle_seconds = settle_seconds
+        self.max_age_seconds = max_age_seconds
+        self._entries = OrderedDict()
+        self.hit = 0
+        self.miss = 0
+
+    def get(self, key, first_bucket, stop):
+        """Returns the cached rows from first_bucket onwards
+
+        Returns:
+            A tuple of the epoch up to which buckets are cached and the rows, newest first;
+            (None, []) when the cache does not hold first_bucket or holds buckets after stop
+        """
+        entry = self._get_entry(key)
+        if entry is None or not entry.start <= first_bucket < entry.end <= stop:
+            self.miss += 1
+            return None, []
+        self._entries.move_to_end(key)
+        self.hit += 1
+        return entry.end, [entry.rows[epoch] for epoch in sorted(entry.rows, reverse=True) if epoch >= first_bucket]
+
+    def update(self, key, first_bucket, start, end, rows, truncated=False):
+        """Caches the rows of the buckets from start to end, which were all read from storage
+
+        Args:
+            key: tuple of asset code, datapoint and bucket size
+            first_bucket: epoch of the first bucket of the request, older buckets are dropped
+            start: epoch of the first bucket read
+            end: epoch up to which buckets are closed
+            rows: rows read from storage with their bucket timestamp, newest first
+            truncated: True if the rows were cut by the query limit, the oldest buckets read are then unknown
+        """
+        try:
+            epochs = [bucket_epoch(row['timestamp']) for row in rows]
+        except (KeyError, TypeError, ValueError):
+            # Not a time bucket row, nothing can be cached for this key
+            self._entries.pop(key, None)
+            return
+        if truncated and epochs:
+            start = max(start, min(epochs))
+        if end <= start:
+            return
+        new_rows = {epoch: row for epoch, row in zip(epochs, rows) if start <= epoch < end}
+        entry = self._get_entry(key)
+        if entry is not None and entry.start <= start <= entry.end:
+            # Contiguous with the cached buckets, extend the entry
+            entry.rows.update(new_rows)
+            entry.end = max(entry.end, end)
+            if entry.start < first_bucket:
+                entry.rows = {epoch: row for epoch, row in entry.rows.items() if epoch >= first_bucket}
+                entry.start = first_bucket
+        else:
+            self._entries[key] = _BucketCacheEntry(start, end, new_rows)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_cache_size:
+            self._entries.popitem(last=False)
+
+    def _get_entry(self, key):
+        """Returns the entry of a key, None if it has expired"""
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry.cached_at >= self.max_age_seconds:
+            del self._entries[key]
+            return None
+        return entry
+
+    def invalidate(self, asset_code=None):
+        """Drops the cached buckets of an asset, or of all assets"""
+        if asset_code is None:
+            self._entries.clear()
+            return
+        for key in [key for key in self._entries if key[0] == asset_code]:
+            del self._entries[key]
+
+    @property
+    def size(self):
+        return len(self._entries)
+
+
+def lttb(points, threshold):
+    """Largest triangle three buckets downsampling
+
+    The first and last points are kept, the others are split in threshold - 2 buckets and the point of each bucket
+    forming the largest triangle with the previously kept point and the average of the next bucket is kept.
+
+    Args:
+        points: list of (x, y) tuples ordered by x
+        threshold: number of points to keep
+    Returns:
+        The kept points, in order
+    """
+    count = len(points)
+    if threshold >= count or threshold < 3:
+        return points
+    sampled = [points[0]]
+    every = (count - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, count)
+        avg_count = avg_end - avg_start
+        avg_x = sum(point[0] for point in points[avg_start:avg_end]) / avg_count
+        avg_y = sum(point[1] for point in points[avg_start:avg_end]) / avg_count
+
+        a_x, a_y = points[a]
+        max_area = -1
+        next_a = avg_start - 1
+        for j in range(int(i * every) + 1, avg_start):
+            x, y = points[j]
+            area = abs((a_x - avg_x) * (y - a_y) - (a_x - x) * (avg_y - a_y))
+            if area > max_area:
+                max_area = area
+                next_a = j
+        sampled.append(points[next_a])
+        a = next_a
+    sampled.append(points[-1])
+    return sampled
+
+
+def min_max(points, threshold):
+    """Min max downsampling, the lowest and highest points of threshold / 2 buckets are kept
+
+    Args:
+        points: list of (x, y) tuples ordered by x
+        threshold: number of points to keep
+    Returns:
+        The kept points, in order
+    """
+    count = len(points)
+    if threshold >= count or threshold < 2:
+        return points
+    buckets = threshold // 2
+    every = count / buckets
+    sampled = []
+    for i in range(buckets):
+        bucket = points[int(i * every):int((i + 1) * every)]
+        if not bucket:
+            continue
+        low = min(bucket, key=lambda point: point[1])
+        high = max(bucket, key=lambda point: point[1])
+        if low is high:
+            sampled.append(low)
+        else:
+            sampled.extend((low, high) if low[0] < high[0] else (high, low))
+    return sampled
+
+
+def downsample_rows(rows, threshold, method='lttb'):
+    """Reduces time ordered reading rows to about threshold rows
+
+    Every numeric datapoint is downsampled on its own, with the position of the row as x axis, and the rows kept
+    for any of the datapoints are returned in their original order. Rows without numeric datapoints are sampled
+    at a regular interval.
+
+    Args:
+        rows: rows with either a reading dict or the datapoints as keys
+        threshold: number of rows to keep per datapoint
+        method: one of DOWNSAMPLING_METHODS
+    Returns:
+        The kept rows
+    """
+    if len(rows) <= threshold:
+        return rows
+    sample = lttb if method == 'lttb' else min_max
+    series = {}
+    for index, row in enumerate(rows):
+        values = row['reading'] if isinstance(row.get('reading'), dict) else row
+        for name, value in values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                series.setdefault(name, []).append((index, value))
+    if not series:
+        return rows[::-(-len(rows) // threshold)]
+    kept = set()
+    for points in series.values():
+        kept.update(x for x, _ in sample(points, threshold))
+    return [rows[index] for index in sorted(kept)]
@@ -35,6 +35,7 @@ _help = """
     | GET POST       | /fledge/category/{category_name}/children                  |
     | DELETE         | /fledge/category/{category_name}/children/{child_category} |
     | DELETE         | /fledge/category/{category_name}/parent                    |
+    | GET            | /fledge/configuration/cache                                |
     --------------------------------------------------------------------------------
 """
 
@@ -690,6 +691,21 @@ async def upload_script(request):
         return web.json_response(result)
 
 
+async def get_configuration_cache(request):
+    """
+    Args:
+         request:
+
+    Returns:
+            the size, limits and hit/miss/eviction counters of the configuration cache
+
+    :Example:
+            curl -sX GET http://localhost:8081/fledge/configuration/cache
+    """
+    cf_mgr = ConfigurationManager(connect.get_storage_async())
+    return web.json_response(cf_mgr._cacheManager.stats())
+
+
 def hide_password(config: dict) -> Dict:
     new_config = copy.deepcopy(config)
     try:
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+# FLEDGE_BEGIN
+# See: http://fledge-iot.readthedocs.io/
+# FLEDGE_END
+
+"""Streaming JSON responses for the REST query endpoints returning many rows
+
+In stream mode, requested with ?stream=true, an endpoint reads its rows from storage a page at a time and writes
+each page to a chunked response before reading the next one, so that the memory used by a request no longer grows
+with the number of rows returned. Every page starts after the last row of the previous one, found by the sort column
+and the id of that row, rather than by an offset which storage would have to walk again for every page.
+
+An error reading the first page is returned as usual; once the response is started an error ends the response
+without closing the JSON document, which the client then fails to parse.
+"""
+
+import copy
+import json
+
+from aiohttp import web
+
+from fledge.common.logger import FLCoreLogger
+from fledge.common.storage_client.payload_builder import PayloadBuilder
+
+__copyright__ = "Copyright (c) 2023 Dianomic Systems Inc."
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+_logger = FLCoreLogger().get_logger(__name__)
+
+PAGE_ROWS = 1000
+"""Rows read from storage and written to the response at a time"""
+
+
+def is_stream_requested(request: web.Request) -> bool:
+    return request.query.get('stream', '').strip().lower() == 'true'
+
+
+class KeysetPager(object):
+    """Reads the rows of a query a page at a time, ordered by a column and then by id
+
+    The query must return the id column. The cursor is the sort column value and the id of the last row returned:
+    the next page asks for the rows up to that value, and drops the rows of the same value already returned.
+    """
+
+    def __init__(self, query, chain_payload, sort_column='id', sort_key=None, direction='desc',
+                 page_rows=None, limit=None, skip=0, keep_id=False):
+        """
+        Args:
+            query: coroutine function running a query payload and returning the result with its rows
+            chain_payload: select and where clauses of the query
+            sort_column: column the rows are ordered by, the id is used for the rows of the same value
+            sort_key: key of the sort column in the rows returned, when it is aliased
+            direction: asc or desc
+            page_rows: rows read at a time, PAGE_ROWS by default
+            limit: maximum number of rows returned by all the pages, None for all the rows
+            skip: rows skipped before the first page
+            keep_id: False to remove the id from the rows returned
+        """
+        self._query = query
+        self._chain_payload = chain_payload
+        self._sort_column = sort_column
+        self._sort_key = sort_key or sort_column
+        self._descending = direction == 'desc'
+        self._direction = direction
+        self.page_rows = page_rows or PAGE_ROWS
+        self._limit = limit
+        self._skip = skip
+        self._keep_id = keep_id
+        self._cursor = None
+        """Sort column value and id of the last row returned"""
+        self._returned_at_cursor = 0
+        """Rows returned with the sort column value of the cursor"""
+        self.rows_returned = 0
+        self.done = False
+
+    async def next_page(self):
+        """Returns the next page of rows, an empty list once all the rows are returned"""
+        size = self.page_rows if self._limit is None else min(self.page_rows, self._limit - self.rows_returned)
+        if self.done or size <= 0:
+            self.done = True
+            return []
+        by_id = self._sort_column == 'id'
+        payload = PayloadBuilder(copy.deepcopy(self._chain_payload))
+        extra = 0
+        if self._cursor is None:
+            if self._skip:
+                payload.SKIP(self._skip)
+        elif by_id:
+            payload.AND_WHERE(['id', '<' if self._descending else '>', self._cursor[1]])
+        else:
+            payload.AND_WHERE([self._sort_column, '<=' if self._descending else '>=', self._cursor[0]])
+            # The rows of the cursor value already returned come first
+            extra = self._returned_at_cursor
+        payload.ORDER_BY([self._sort_column, self._direction])
+        if not by_id:
+            payload.ORDER_BY(['id', self._direction])
+        payload.LIMIT(size + extra)
+        result = await self._query(payload.payload())
+        rows = result['rows']
+        if len(rows) < size + extra:
+            self.done = True
+        if extra:
+            value, last_id = self._cursor
+            rows = [row for row in rows if row[self._sort_key] != value or
+                    (int(row['id']) < last_id if self._descending else int(row['id']) > last_id)]
+        rows = rows[:size]
+        if not rows:
+            self.done = True
+            return rows
+        self._advance(rows)
+        if not self._keep_id:
+            for row in rows:
+                row.pop('id', None)
+        self.rows_returned += len(rows)
+        return rows
+
+    def _advance(self, rows):
+        last = rows[-1]
+        value = last[self._sort_key]
+        same_value = 0
+        for row in reversed(rows):
+            if row[self._sort_key] != value:
+                break
+            same_value += 1
+        if self._cursor is not None and self._cursor[0] == value and same_value == len(rows):
+            same_value += self._returned_at_cursor
+        self._cursor = (value, int(last['id']))
+        self._returned_at_cursor = same_value
+
+
+async def stream_json(request, pager, prefix='[', suffix=']', transform=None):
+    """Writes the rows of a pager to a chunked JSON response as they are read
+
+    Args:
+        request: the request answered
+        pager: KeysetPager of the rows
+        prefix: JSON text written before the rows
+        suffix: JSON text written after the rows, or a function returning it once all the rows are written
+        transform: function called with every page of rows, returning the rows to write
+    Returns:
+        The response, already written
+    """
+    rows = await pager.next_page()
+    response = web.StreamResponse(headers={'Content-Type': 'application/json'})
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    await response.write(prefix.encode())
+    separator = ''
+    try:
+        while rows:
+            if transform is not None:
+                rows = transform(rows)
+            if rows:
+                await response.write((separator + ', '.join(json.dumps(row) for row in rows)).encode())
+                separator = ', '
+            rows = await pager.next_page()
+    except Exception as ex:
+        # The status is already sent, the JSON document is left incomplete
+        _logger.error(ex, "Failed to stream the response of {}.".format(request.path))
+        return response
+    await response.write((suffix() if callable(suffix) else suffix).encode())
+    await response.write_eof()
+    return response
@@ -44,6 +44,8 @@ _help = """
     | GET POST            | /fledge/service                                      |
     | GET                 | /fledge/service/available                            |
     | GET                 | /fledge/service/installed                            |
+    | GET                 | /fledge/service/monitor                              |
+    | GET                 | /fledge/service/storage/pool                         |
     | PUT                 | /fledge/service/{type}/{name}/update                 |
     | DELETE              | /fledge/service/{service_name}                       |
     | POST                | /fledge/service/{service_name}/otp                   |
@@ -124,6 +126,38 @@ async def get_health(request):
         return web.json_response(response)
 
 
+async def get_monitor_stats(request):
+    """
+    Args:
+        request:
+
+    Returns:
+            service monitor round durations and ping latencies of the registered services
+
+    :Example:
+            curl -sX GET http://localhost:8081/fledge/service/monitor
+    """
+    if server.Server.service_monitor is None:
+        msg = "Service monitor is not running."
+        raise web.HTTPNotFound(reason=msg, body=json.dumps({"message": msg}))
+    return web.json_response(server.Server.service_monitor.stats())
+
+
+async def get_storage_pool_stats(request):
+    """
+    Args:
+        request:
+
+    Returns:
+            connection reuses (hits) and new connections (misses) of the pooled storage clients of the core
+
+    :Example:
+            curl -sX GET http://localhost:8081/fledge/service/storage/pool
+    """
+    clients = {"storage": server.Server._storage_client_async, "readings": server.Server._readings_client_async}
+    return web.json_response({name: client.pool_stats() for name, client in clients.items() if client is not None})
+
+
 async def delete_service(request):
     """ Delete an existing service
 
@@ -8,6 +8,7 @@ from aiohttp import web
 
 from fledge.common.storage_client.payload_builder import PayloadBuilder
 from fledge.services.core import connect
+from fledge.services.core.api import statistics_rollup
 from fledge.services.core.scheduler.scheduler import Scheduler
 from fledge.common.logger import FLCoreLogger
 
@@ -26,6 +27,8 @@ _help = """
 
 _logger = FLCoreLogger().get_logger(__name__)
 
+_rollup = statistics_rollup.StatisticsRollup()
+
 
 #################################
 #  Statistics
@@ -49,6 +52,21 @@ async def get_statistics(request):
     return web.json_response(result['rows'])
 
 
+async def _get_stats_collector_interval(storage_client):
+    """Returns the interval in seconds of the stats collector schedule"""
+    scheduler_payload = PayloadBuilder().SELECT("schedule_interval").WHERE(
+        ['process_name', '=', 'stats collector']).payload()
+    result = await storage_client.query_tbl_with_payload('schedules', scheduler_payload)
+    if len(result['rows']) > 0:
+        scheduler = Scheduler()
+        interval_days, interval_dt = scheduler.extract_day_time_from_interval(result['rows'][0]['schedule_interval'])
+        interval = datetime.timedelta(days=interval_days, hours=interval_dt.hour, minutes=interval_dt.minute,
+                                      seconds=interval_dt.second)
+        return interval.total_seconds()
+    else:
+        raise web.HTTPNotFound(reason="No stats collector schedule found")
+
+
 async def get_statistics_history(request):
     """
     Args:
@@ -61,19 +79,14 @@ async def get_statistics_history(request):
             curl -X GET http://localhost:8081/fledge/statistics/history?limit=1
             curl -X GET http://localhost:8081/fledge/statistics/history?key=READINGS
             curl -X GET http://localhost:8081/fledge/statistics/history?key=READINGS,PURGED,UNSENT&minutes=60
+            curl -X GET http://localhost:8081/fledge/statistics/history?days=7
+
+    A time window holding more than statistics_rollup.MAX_RAW_ROWS history rows per key, without a limit, is
+    answered from the minute, hour or day rollup tier and the interval returned is the bucket size of the tier.
     """
     storage_client = connect.get_storage_async()
     # To find the interval in secs from stats collector schedule
-    scheduler_payload = PayloadBuilder().SELECT("schedule_interval").WHERE(
-        ['process_name', '=', 'stats collector']).payload()
-    result = await storage_client.query_tbl_with_payload('schedules', scheduler_payload)
-    if len(result['rows']) > 0:
-        scheduler = Scheduler()
-        interval_days, interval_dt = scheduler.extract_day_time_from_interval(result['rows'][0]['schedule_interval'])
-        interval = datetime.timedelta(days=interval_days, hours=interval_dt.hour, minutes=interval_dt.minute, seconds=interval_dt.second)
-        interval_in_secs = interval.total_seconds()
-    else:
-        raise web.HTTPNotFound(reason="No stats collector schedule found")
+    interval_in_secs = await _get_stats_collector_interval(storage_client)
     stats_history_chain_payload = PayloadBuilder().SELECT(("history_ts", "key", "value"))\
         .ALIAS("return", ("history_ts", 'history_ts')).FORMAT("return", ("history_ts", "YYYY-MM-DD HH24:MI:SS.MS"))\
         .ORDER_BY(['history_ts', 'desc']).WHERE(['1', '=', 1]).chain_payload()
@@ -104,6 +117,14 @@ async def get_statistics_history(request):
     except ValueError:
         raise web.HTTPBadRequest(reason="Time unit must be a positive integer")
 
+    if 'limit' not in request.query or request.query['limit'] == '':
+        tier_seconds = statistics_rollup.select_tier(val, interval_in_secs)
+        if tier_seconds is not None:
+            await _rollup.refresh(storage_client, val)
+            keys = request.query['key'].split(',') if 'key' in request.query else None
+            return web.json_response({"interval": tier_seconds,
+                                      'statistics': _rollup.buckets(tier_seconds, val, keys)})
+
     if 'limit' in request.query and request.query['limit'] != '':
         try:
             limit = int(request.query['limit'])
@@ -157,6 +178,8 @@ async def get_statistics_history(request):
 async def get_statistics_rate(request: web.Request) -> web.Response:
     """To retrieve the statistics rates and will be calculated by formula:
         (sum(value) / ((60 * period) / stats_collector_interval))
+        A period holding more than statistics_rollup.MAX_RAW_ROWS history rows is summed from the rollup tier
+        buckets instead.
         For example:
             If stats_collector_interval set to 15 seconds then
             a) For a 1 minute period should take 4 statistics history values, sum those and then divide by period
@@ -194,18 +217,16 @@ async def get_statistics_rate(request: web.Request) -> web.Response:
     stat_split_list = list(filter(None, [x for x in stats.split(',')]))
     storage_client = connect.get_storage_async()
     # To find the interval in secs from stats collector schedule
-    scheduler_payload = PayloadBuilder().SELECT("schedule_interval").WHERE(
-        ['process_name', '=', 'stats collector']).payload()
-    result = await storage_client.query_tbl_with_payload('schedules', scheduler_payload)
-    if len(result['rows']) > 0:
-        scheduler = Scheduler()
-        interval_days, interval_dt = scheduler.extract_day_time_from_interval(result['rows'][0]['schedule_interval'])
-        interval_in_secs = datetime.timedelta(days=interval_days, hours=interval_dt.hour, minutes=interval_dt.minute,
-                                              seconds=interval_dt.second).total_seconds()
-    else:
-        raise web.HTTPNotFound(reason="No stats collector schedule found")
+    interval_in_secs = await _get_stats_collector_interval(storage_client)
+    rollup_periods = [p for p in period_split_list if statistics_rollup.select_tier(60 * int(p), interval_in_secs)]
+    if rollup_periods:
+        await _rollup.refresh(storage_client, max(60 * int(p) for p in rollup_periods))
     resp = []
     for x, y in [(x, y) for x in period_split_list for y in stat_split_list]:
+        if x in rollup_periods:
+            tier_seconds = statistics_rollup.select_tier(60 * int(x), interval_in_secs)
+            resp.append({y: {x: _rollup.total(tier_seconds, 60 * int(x), y) / int(x)}})
+            continue
         # Get value column as per given key along with history_ts column order by
         _payload = PayloadBuilder().SELECT("value").WHERE(['key', '=', y]).ORDER_BY(["history_ts", "desc"]
                                                                                     ).chain_payload()
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+# FLEDGE_BEGIN
+# See: http://fledge-iot.readthedocs.io/
+# FLEDGE_END
+
+"""Rollup tiers of the statistics history
+
+The statistics history holds one row per statistics key for every run of the stats collector, so that a chart of the
+last days reads and regroups tens of thousands of rows per key. The rollup keeps the sum of the values of every key
+per minute, hour and day bucket in memory. Every refresh reads from storage only the history rows written since the
+previous one, found by their id, and the rows older than the tiers hold the first time a window reaches further back.
+Every refresh also reads the oldest history row: once the purge task or a statistics reset has removed the rows the
+tiers start with, the buckets older than that row are dropped, along with the bucket holding it which has lost part
+of its rows. The bucket times are those of the history_ts returned by storage, the rollup does not convert them.
+"""
+
+import asyncio
+import calendar
+import time
+
+from fledge.common.storage_client.payload_builder import PayloadBuilder
+
+__copyright__ = "Copyright (c) 2023 Dianomic Systems Inc."
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+TIERS = (60, 3600, 86400)
+"""Bucket sizes in seconds of the rollup tiers, from the finest to the coarsest"""
+
+MAX_RAW_ROWS = 1440
+"""Rows per key up to which a window is answered from the statistics history rows themselves"""
+
+MIN_BUCKETS = 100
+"""A tier is used for a window which holds at least that many of its buckets"""
+
+MAX_DAYS = 3660
+"""Buckets of the coarsest tier which are kept"""
+
+PAGE_ROWS = 10000
+"""Rows read from storage by a single query"""
+
+_HISTORY_TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def history_epoch(history_ts):
+    """Returns the seconds since the epoch of a history_ts formatted as YYYY-MM-DD HH24:MI:SS.MS, read as UTC"""
+    return calendar.timegm(time.strptime(history_ts[:19], _HISTORY_TS_FORMAT))
+
+
+def select_tier(window_seconds, interval_seconds):
+    """Returns the bucket size of the tier a window of the statistics history is read from
+
+    Args:
+        window_seconds: the requested window, 0 for the whole history
+        interval_seconds: interval of the stats collector schedule
+    Returns:
+        The coarsest tier holding at least MIN_BUCKETS buckets of the window, or None when the window holds no
+        more than MAX_RAW_ROWS history rows per key
+    """
+    if window_seconds <= 0 or interval_seconds <= 0 or window_seconds / interval_seconds <= MAX_RAW_ROWS:
+        return None
+    for seconds in reversed(TIERS):
+        if window_seconds / seconds >= MIN_BUCKETS:
+            return seconds
+    return TIERS[0]
+
+
+def _max_age(seconds):
+    """Age of the oldest bucket kept by a tier, the finer tiers are only used for windows shorter than that"""
+    index = TIERS.index(seconds)
+    if index == len(TIERS) - 1:
+        return MAX_DAYS * seconds
+    return (MIN_BUCKETS + 1) * TIERS[index + 1]
+
+
+class StatisticsRollup(object):
+    """Sums of the statistics history values per key in minute, hour and day buckets"""
+
+    def __init__(self, page_rows=PAGE_ROWS):
+        self.page_rows = page_rows
+        self._tiers = {seconds: {} for seconds in TIERS}
+        """Bucket size -> bucket epoch -> key -> sum of the values, zero sums are not kept"""
+        self._keys = set()
+        self._first_id = None
+        self._last_id = None
+        self.newest = None
+        """Epoch of the newest history row"""
+        self.covered_from = None
+        """Epoch from which all the history rows are in the tiers, 0 once the oldest row has been read"""
+        self._lock = None
+
+    async def refresh(self, storage, window_seconds):
+        """Adds the history rows written since the previous refresh, and the older rows the window needs"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._last_id is not None:
+                await self._drop_removed(storage)
+            if self._last_id is None:
+                await self._read_older(storage)
+            else:
+                while await self._read_newer(storage) >= self.page_rows:
+                    pass
+            if self.newest is None:
+                return
+            start = self.newest - window_seconds
+            while self.covered_from > start:
+                await self._read_older(storage)
+
+    def buckets(self, seconds, window_seconds, keys=None):
+        """Returns the buckets of a tier in the window ending with the newest history row
+
+        The bucket holding the start of the window is left out, as only part of its rows are in the window.
+
+        Returns:
+            A list of dicts with the history_ts of the bucket and the sum of every key, newest first
+        """
+        if self.newest is None:
+            return []
+        first = -(-(self.newest - window_seconds) // seconds) * seconds
+        keys = sorted(self._keys if keys is None else self._keys.intersection(keys))
+        tier = self._tiers[seconds]
+        results = []
+        for epoch in sorted((epoch for epoch in tier if epoch >= first), reverse=True):
+            row = {'history_ts': time.strftime(_HISTORY_TS_FORMAT, time.gmtime(epoch)) + '.000'}
+            for key in keys:
+                row[key] = tier[epoch].get(key, 0)
+            results.append(row)
+        return results
+
+    def total(self, seconds, window_seconds, key):
+        """Returns the sum of the values of a key over the buckets of a tier in the window"""
+        return sum(bucket.get(key, 0) for bucket in self.buckets(seconds, window_seconds, [key]))
+
+    def clear(self):
+        for tier in self._tiers.values():
+            tier.clear()
+        self._keys.clear()
+        self._first_id = self._last_id = self.newest = self.covered_from = None
+
+    @property
+    def size(self):
+        """Number of buckets in the tiers"""
+        return sum(len(tier) for tier in self._tiers.values())
+
+    async def _read_newer(self, storage):
+        rows = await self._query(storage, ['id', '>', self._last_id], 'asc')
+        self._add(rows)
+        return len(rows)
+
+    async def _read_older(self, storage):
+        where = ['1', '=', 1] if self._first_id is None else ['id', '<', self._first_id]
+        rows = await self._query(storage, where, 'desc')
+        self._add(rows)
+        if len(rows) < self.page_rows:
+            # The oldest row has been read
+            self.covered_from = 0
+        else:
+            # Rows of the same second as the oldest row read may be in the next page
+            self.covered_from = history_epoch(rows[-1]['history_ts']) + 1
+
+    async def _drop_removed(self, storage):
+        rows = await self._query(storage, ['1', '=', 1], 'asc', limit=1)
+        if not rows or int(rows[0]['id']) > self._last_id:
+            # All the rows read have been removed
+            self.clear()
+            return
+        oldest_id = int(rows[0]['id'])
+        if oldest_id <= self._first_id:
+            return
+        oldest = history_epoch(rows[0]['history_ts'])
+        for tier in self._tiers.values():
+            for epoch in [epoch for epoch in tier if epoch < oldest]:
+                del tier[epoch]
+        self._first_id = oldest_id
+        # The rows older than those read have been removed as well
+        self.covered_from = 0
+
+    async def _query(self, storage, where, direction, limit=None):
+        payload = PayloadBuilder().SELECT(("id", "history_ts", "key", "value")) \
+            .ALIAS("return", ("history_ts", 'history_ts')).FORMAT("return", ("history_ts", "YYYY-MM-DD HH24:MI:SS.MS")) \
+            .WHERE(where).ORDER_BY(['id', direction]).LIMIT(limit or self.page_rows).payload()
+        result = await storage.query_tbl_with_payload('statistics_history', payload)
+        return result['rows']
+
+    def _add(self, rows):
+        for row in rows:
+            epoch = history_epoch(row['history_ts'])
+            key = row['key']
+            value = row['value']
+            self._keys.add(key)
+            for seconds, tier in self._tiers.items():
+                bucket = tier.setdefault(epoch // seconds * seconds, {})
+                if value:
+                    bucket[key] = bucket.get(key, 0) + value
+            row_id = int(row['id'])
+            if self._first_id is None or row_id < self._first_id:
+                self._first_id = row_id
+            if self._last_id is None or row_id > self._last_id:
+                self._last_id = row_id
+            if self.newest is None or epoch > self.newest:
+                self.newest = epoch
+        if rows:
+            self._trim()
+
+    def _trim(self):
+        for seconds, tier in self._tiers.items():
+            cutoff = self.newest - _max_age(seconds)
+            for epoch in [epoch for epoch in tier if epoch < cutoff]:
+                del tier[epoch]
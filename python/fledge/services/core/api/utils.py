@@ -7,8 +7,10 @@
 import subprocess
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 from fledge.common.common import _FLEDGE_ROOT, _FLEDGE_PLUGIN_PATH
 from fledge.common.logger import FLCoreLogger
+from fledge.common.plugin_index import plugin_index
 
 _logger = FLCoreLogger().get_logger(__name__)
 _lib_path = _FLEDGE_ROOT + "/" + "plugins"
@@ -16,12 +18,18 @@ _lib_path = _FLEDGE_ROOT + "/" + "plugins"
 C_PLUGIN_UTIL_PATH = _FLEDGE_ROOT + "/extras/C/get_plugin_info" if os.path.isdir(_FLEDGE_ROOT + "/extras/C") \
         else _FLEDGE_ROOT + "/cmake_build/C/plugins/utils/get_plugin_info"
 
+_MAX_PLUGIN_INFO_WORKERS = 8
+"""Maximum number of get_plugin_info utilities run at the same time"""
+
 
 def get_plugin_info(name, dir):
     try:
         arg2 = _find_c_lib(name, dir)
         if arg2 is None:
             raise ValueError('The plugin {} does not exist'.format(name))
+        jdoc = plugin_index.get(arg2)
+        if jdoc is not None:
+            return jdoc
         cmd_with_args = [C_PLUGIN_UTIL_PATH, arg2, "plugin_info"]
         p = subprocess.Popen(cmd_with_args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         out, err = p.communicate()
@@ -43,9 +51,24 @@ def get_plugin_info(name, dir):
         _logger.error(ex, "{} C plugin get info failed.".format(name))
         return {}
     else:
+        plugin_index.put(arg2, jdoc)
         return jdoc
 
 
+def get_plugins_info(names, dir):
+    """Fetches the information of several C plugins, running the get_plugin_info utilities in parallel
+
+    Returns:
+        A dict of plugin name -> plugin information, empty for a plugin which failed
+    """
+    names = list(dict.fromkeys(names))
+    if len(names) < 2:
+        return {name: get_plugin_info(name, dir=dir) for name in names}
+    with ThreadPoolExecutor(max_workers=min(len(names), _MAX_PLUGIN_INFO_WORKERS)) as executor:
+        infos = executor.map(lambda name: get_plugin_info(name, dir=dir), names)
+        return dict(zip(names, infos))
+
+
 def _find_c_lib(name, installed_dir):
     _path = [_lib_path + "/" + installed_dir]
     _path = _find_plugins_from_env(_path)
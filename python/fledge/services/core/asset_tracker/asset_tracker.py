@@ -4,6 +4,9 @@
 # See: http://fledge-iot.readthedocs.io/
 # FLEDGE_END
 
+import copy
+import json
+
 from fledge.common.configuration_manager import ConfigurationManager
 from fledge.common.logger import FLCoreLogger
 from fledge.common.storage_client.payload_builder import PayloadBuilder
@@ -29,6 +32,9 @@ class AssetTracker(object):
     _registered_asset_records = None
     """Set of rows for asset_tracker already in the storage tables"""
 
+    _registered_asset_keys = None
+    """Hashable keys of _registered_asset_records, for constant time lookups"""
+
     def __init__(self, storage=None):
         if self._storage is None:
             if not isinstance(storage, StorageClientAsync):
@@ -40,11 +46,13 @@ class AssetTracker(object):
         """ Fetch all asset_tracker records from database """
 
         self._registered_asset_records = []
+        self._registered_asset_keys = set()
         try:
             payload = PayloadBuilder().SELECT("asset", "event", "service", "plugin", "data").payload()
             results = await self._storage.query_tbl_with_payload('asset_tracker', payload)
             for row in results['rows']:
                 self._registered_asset_records.append(row)
+                self._registered_asset_keys.add(self._record_key(row))
         except Exception as ex:
             _logger.exception(ex, 'Failed to retrieve asset records')
 
@@ -58,9 +66,72 @@ class AssetTracker(object):
         """
         # If (asset + event + service + plugin) row combination exists in _find_registered_asset_record then return
         d = {"asset": asset, "event": event, "service": service, "plugin": plugin, "data":jsondata}
-        if d in self._registered_asset_records:
+        if self._is_registered(d):
             return {}
 
+        await self._get_fledge_svc_name()
+
+        try:
+            payload = PayloadBuilder().INSERT(asset=asset, event=event, service=service, plugin=plugin, fledge=self.fledge_svc_name, data=jsondata).payload()
+
+            result = await self._storage.insert_into_tbl('asset_tracker', payload)
+        except StorageServerError as ex:
+            err_response = ex.error
+            raise ValueError(err_response)
+        if 'response' not in result:
+            raise ValueError(result['message'])
+        self._register(d)
+        result = copy.deepcopy(d)
+        result.update({"fledge": self.fledge_svc_name})
+        return result
+
+    async def add_asset_records(self, records):
+        """ Adds several asset tracker records with a single insert
+
+        Args:
+            records: list of dicts with asset, event, service, plugin and an optional data
+        Returns:
+            The list of the records added, records already registered are left out
+        """
+        new_records = []
+        keys = set()
+        for record in records:
+            if not isinstance(record, dict):
+                raise TypeError('Asset tracker record must be a dictionary')
+            d = {"asset": record.get("asset"), "event": record.get("event"), "service": record.get("service"),
+                 "plugin": record.get("plugin"), "data": record.get("data", {})}
+            key = self._record_key(d)
+            if key in keys or self._is_registered(d):
+                continue
+            keys.add(key)
+            new_records.append(d)
+        if not new_records:
+            return []
+
+        await self._get_fledge_svc_name()
+
+        inserts = [dict(d, fledge=self.fledge_svc_name) for d in new_records]
+        try:
+            result = await self._storage.insert_into_tbl('asset_tracker', json.dumps({"inserts": inserts}))
+            if 'response' not in result:
+                raise ValueError(result.get('message'))
+        except (ValueError, StorageServerError) as ex:
+            # One bad record fails the whole insert, add them one at a time to keep the others
+            _logger.warning('Bulk insert of {} asset tracker records failed, inserting them one by one. {}'.format(
+                len(inserts), str(ex)))
+            added = []
+            for d in new_records:
+                try:
+                    added.append(await self.add_asset_record(asset=d["asset"], event=d["event"], service=d["service"],
+                                                             plugin=d["plugin"], jsondata=d["data"]))
+                except ValueError as err:
+                    _logger.error('Failed to add asset tracker record {}. {}'.format(d, str(err)))
+            return added
+        for d in new_records:
+            self._register(d)
+        return inserts
+
+    async def _get_fledge_svc_name(self):
         # The name of the Fledge this entry has come from.
         # This is defined as the service name and configured as part of the general configuration of Fledge.
         # it will only change on restart! Later we may want to fix it via callback mechanism
@@ -69,19 +140,16 @@ class AssetTracker(object):
             svc_config = await cfg_manager.get_category_item(category_name='service', item_name='name')
             self.fledge_svc_name = svc_config['value']
 
-        try:
-            payload = PayloadBuilder().INSERT(asset=asset, event=event, service=service, plugin=plugin, fledge=self.fledge_svc_name, data=jsondata).payload()
+    @staticmethod
+    def _record_key(record):
+        return (record.get("asset"), record.get("event"), record.get("service"), record.get("plugin"),
+                json.dumps(record.get("data", {}), sort_keys=True))
 
-            result = await self._storage.insert_into_tbl('asset_tracker', payload)
-            response = result['response']
-            self._registered_asset_records.append(d)
-        except KeyError:
-            raise ValueError(result['message'])
-        except StorageServerError as ex:
-            err_response = ex.error
-            raise ValueError(err_response)
-        else:
-            import copy
-            result = copy.deepcopy(d)
-            result.update({"fledge": self.fledge_svc_name})
-            return result
+    def _is_registered(self, record):
+        if self._registered_asset_keys is None:
+            self._registered_asset_keys = {self._record_key(row) for row in self._registered_asset_records}
+        return self._record_key(record) in self._registered_asset_keys
+
+    def _register(self, record):
+        self._registered_asset_records.append(record)
+        self._registered_asset_keys.add(self._record_key(record))
@@ -4,8 +4,10 @@
 # See: http://fledge-iot.readthedocs.io/
 # FLEDGE_END
 
+import importlib
+
 from fledge.services.core import proxy
-from fledge.services.core.api import alerts, asset_tracker, auth, backup_restore, browser, certificate_store, filters, health, notification, north, package_log, performance_monitor, python_packages, south, support, service, task, update
+from fledge.services.core.api import alerts, asset_tracker, auth, browser, filters, health, notification, north, performance_monitor, south, service, task
 from fledge.services.core.api import audit as api_audit
 from fledge.services.core.api import common as api_common
 from fledge.services.core.api import configuration as api_configuration
@@ -14,11 +16,6 @@ from fledge.services.core.api import statistics as api_statistics
 from fledge.services.core.api.control_service import script_management, acl_management, pipeline, entrypoint
 from fledge.services.core.api.plugins import data as plugin_data
 from fledge.services.core.api.plugins import install as plugins_install, discovery as plugins_discovery
-from fledge.services.core.api.plugins import update as plugins_update
-from fledge.services.core.api.plugins import remove as plugins_remove
-from fledge.services.core.api.repos import configure as configure_repo
-from fledge.services.core.api.snapshot import plugins as snapshot_plugins
-from fledge.services.core.api.snapshot import table as snapshot_table
 
 
 __author__ = "Ashish Jabble, Praveen Garg, Massimiliano Pinto, Amarendra K Sinha"
@@ -27,6 +24,37 @@ __license__ = "Apache 2.0"
 __version__ = "${VERSION}"
 
 
+class _LazyModule(object):
+    """ An API module imported on the first request to one of its handlers rather than when the core starts
+
+    Used for the API modules which are rarely requested, and slow to import or importing modules slow to import.
+    """
+
+    def __init__(self, module_name):
+        self._module_name = module_name
+
+    def __getattr__(self, handler_name):
+        module_name = self._module_name
+
+        async def handler(request):
+            return await getattr(importlib.import_module(module_name), handler_name)(request)
+        handler.__name__ = handler.__qualname__ = handler_name
+        return handler
+
+
+backup_restore = _LazyModule('fledge.services.core.api.backup_restore')
+certificate_store = _LazyModule('fledge.services.core.api.certificate_store')
+package_log = _LazyModule('fledge.services.core.api.package_log')
+python_packages = _LazyModule('fledge.services.core.api.python_packages')
+support = _LazyModule('fledge.services.core.api.support')
+update = _LazyModule('fledge.services.core.api.update')
+plugins_update = _LazyModule('fledge.services.core.api.plugins.update')
+plugins_remove = _LazyModule('fledge.services.core.api.plugins.remove')
+configure_repo = _LazyModule('fledge.services.core.api.repos.configure')
+snapshot_plugins = _LazyModule('fledge.services.core.api.snapshot.plugins')
+snapshot_table = _LazyModule('fledge.services.core.api.snapshot.table')
+
+
 def setup(app):
     app.router.add_route('GET', '/fledge/ping', api_common.ping)
     app.router.add_route('PUT', '/fledge/shutdown', api_common.shutdown)
@@ -72,6 +100,7 @@ def setup(app):
     app.router.add_route('POST', '/fledge/category/{category_name}/{config_item}', api_configuration.add_configuration_item)
     app.router.add_route('DELETE', '/fledge/category/{category_name}/{config_item}/value', api_configuration.delete_configuration_item_value)
     app.router.add_route('POST', '/fledge/category/{category_name}/{config_item}/upload', api_configuration.upload_script)
+    app.router.add_route('GET', '/fledge/configuration/cache', api_configuration.get_configuration_cache)
     # Scheduler
     # Scheduled_processes - As per doc
     app.router.add_route('GET', '/fledge/schedule/process', api_scheduler.get_scheduled_processes)
@@ -106,6 +135,8 @@ def setup(app):
     app.router.add_route('DELETE', '/fledge/service/{service_name}', service.delete_service)
     app.router.add_route('GET', '/fledge/service/available', service.get_available)
     app.router.add_route('GET', '/fledge/service/installed', service.get_installed)
+    app.router.add_route('GET', '/fledge/service/monitor', service.get_monitor_stats)
+    app.router.add_route('GET', '/fledge/service/storage/pool', service.get_storage_pool_stats)
     app.router.add_route('PUT', '/fledge/service/{type}/{name}/update', service.update_service)
     app.router.add_route('POST', '/fledge/service/{service_name}/otp', service.issueOTPToken)
 
@@ -9,6 +9,7 @@
 import asyncio
 import collections
 import datetime
+import heapq
 import logging
 import math
 import time
@@ -80,6 +81,29 @@ class Scheduler(object):
             """Epoch time when the task was started"""
             self.future = None
 
+    class _ResidentProcess(object):
+        """Runs a coroutine in the core in place of a task process, see :meth:`add_resident_process`"""
+        __slots__ = ['pid', 'returncode', '_task']
+
+        def __init__(self, coro):
+            self.pid = os.getpid()
+            self.returncode = None
+            self._task = asyncio.ensure_future(coro)
+
+        async def wait(self):
+            try:
+                await self._task
+                self.returncode = 0
+            except asyncio.CancelledError:
+                self.returncode = -signal.SIGTERM
+            except Exception as ex:
+                Scheduler._logger.exception(ex, 'Resident process failed')
+                self.returncode = 1
+            return self.returncode
+
+        def terminate(self):
+            self._task.cancel()
+
     # TODO: Methods that accept a schedule and look in _schedule_executions
     # should accept schedule_execution instead. Add reference to schedule
     # in _ScheduleExecution.
@@ -87,7 +111,7 @@ class Scheduler(object):
     class _ScheduleExecution(object):
         """Tracks information about schedules"""
 
-        __slots__ = ['next_start_time', 'task_processes', 'start_now']
+        __slots__ = ['next_start_time', 'task_processes', 'start_now', 'start_lag', 'max_start_lag']
 
         def __init__(self):
             self.next_start_time = None
@@ -96,6 +120,10 @@ class Scheduler(object):
             """dict of task id to _TaskProcess"""
             self.start_now = False
             """True when a task is queued to start via :meth:`start_task`"""
+            self.start_lag = None
+            """Seconds between next_start_time and the actual start of the last scheduled task"""
+            self.max_start_lag = 0
+            """Largest start_lag since the scheduler started"""
 
     # Constant class attributes
     _DEFAULT_MAX_RUNNING_TASKS = 50
@@ -166,12 +194,14 @@ class Scheduler(object):
         """Dictionary of schedules.id to _ScheduleExecution"""
         self._task_processes = dict()
         """Dictionary of tasks.id to _TaskProcess"""
-        self._check_processes_pending = False
-        """bool: True when request to run check_processes"""
+        self._schedule_heap = []
+        """Heap of (next_start_time, schedules.id); an entry is stale once next_start_time of the schedule changed"""
+        self._pending_schedule_ids = collections.OrderedDict()
+        """schedules.id to check in :meth:`_check_schedules` although they are not in the heap"""
         self._scheduler_loop_task = None  # type: asyncio.Task
         """Task for :meth:`_scheduler_loop`, to ensure it has finished"""
-        self._scheduler_loop_sleep_task = None  # type: asyncio.Task
-        """Task for asyncio.sleep used by :meth:`_scheduler_loop`"""
+        self._scheduler_loop_wake = None  # type: asyncio.Event
+        """Set to wake up :meth:`_scheduler_loop`"""
         self.current_time = None  # type: int
         """Time to use when determining when to start tasks, for testing"""
         self._last_task_purge_time = None  # type: int
@@ -182,6 +212,8 @@ class Scheduler(object):
         """asynico task for :meth:`purge_tasks`, if scheduled to run"""
         self._restore_backup_id = None # type: int
         """Restore backup id and it will be used when SCHEDULE_RESTORE_ON_DEMAND runs"""
+        self._resident_processes = dict()
+        """Dictionary of scheduled_processes.name to the coroutine function run in place of the process"""
 
     @property
     def max_completed_task_age(self) -> datetime.timedelta:
@@ -208,20 +240,36 @@ class Scheduler(object):
         self._max_running_tasks = value
         self._resume_check_schedules()
 
+    def add_resident_process(self, process_name, coroutine_function):
+        """Runs the tasks of a scheduled process as coroutine_function() in the core instead of starting the process
+
+        The tasks are recorded in the tasks table as for a process, with the pid of the core.
+        """
+        self._resident_processes[process_name] = coroutine_function
+
     def _resume_check_schedules(self):
         """Wakes up :meth:`_scheduler_loop` so that
         :meth:`_check_schedules` will be called the next time 'await'
         is invoked.
 
         """
-        if self._scheduler_loop_sleep_task:
-            try:
-                self._scheduler_loop_sleep_task.cancel()
-                self._scheduler_loop_sleep_task = None
-            except RuntimeError:
-                self._check_processes_pending = True
-        else:
-            self._check_processes_pending = True
+        if self._scheduler_loop_wake is not None:
+            self._scheduler_loop_wake.set()
+
+    def _push_schedule(self, schedule_id, schedule_execution):
+        """Adds the next start time of a schedule to the heap"""
+        if schedule_execution.next_start_time:
+            heapq.heappush(self._schedule_heap, (schedule_execution.next_start_time, schedule_id))
+
+    def _is_heap_entry_current(self, entry):
+        schedule_execution = self._schedule_executions.get(entry[1])
+        return schedule_execution is not None and schedule_execution.next_start_time == entry[0]
+
+    def _earliest_start_time(self):
+        """Returns the earliest next start time in the heap, dropping the stale entries in front of it"""
+        while self._schedule_heap and not self._is_heap_entry_current(self._schedule_heap[0]):
+            heapq.heappop(self._schedule_heap)
+        return self._schedule_heap[0][0] if self._schedule_heap else None
 
     async def _wait_for_task_completion(self, task_process: _TaskProcess) -> None:
         exit_code = await task_process.process.wait()
@@ -283,6 +331,7 @@ class Scheduler(object):
         # are only manual tasks waiting
         # TODO Do this only if len(_task_processes) >= max_processes or
         # an exclusive task finished and ( start_now or schedule.repeats )
+        self._pending_schedule_ids[schedule.id] = None
         self._resume_check_schedules()
 
         # This must occur after all awaiting. The size of _task_processes
@@ -349,13 +398,20 @@ class Scheduler(object):
         task_process = self._TaskProcess()
         task_process.start_time = time.time()
 
-        try:
-            process = await asyncio.create_subprocess_exec(*args_to_exec, cwd=_SCRIPTS_DIR)
-        except EnvironmentError:
-            self._logger.exception(
-                "Unable to start schedule '%s' process '%s'\n%s",
-                schedule.name, schedule.process_name, args_to_exec_printable)
-            raise
+        resident_process = self._resident_processes.get(schedule.process_name)
+        if resident_process is not None and schedule.type != Schedule.Type.STARTUP:
+            if dryrun:
+                return
+            process = self._ResidentProcess(resident_process())
+            args_to_exec_printable = ["resident {}".format(schedule.process_name)]
+        else:
+            try:
+                process = await asyncio.create_subprocess_exec(*args_to_exec, cwd=_SCRIPTS_DIR)
+            except EnvironmentError:
+                self._logger.exception(
+                    "Unable to start schedule '%s' process '%s'\n%s",
+                    schedule.name, schedule.process_name, args_to_exec_printable)
+                raise
 
         if dryrun:
             return
@@ -433,15 +489,30 @@ class Scheduler(object):
             self._purge_tasks_task = asyncio.ensure_future(self.purge_tasks())
 
     async def _check_schedules(self):
-        """Starts tasks according to schedules based on the current time"""
-        earliest_start_time = None
+        """Starts tasks according to schedules based on the current time
+
+        Only the schedules which are due, popped from the heap, and those marked pending by a queued
+        start or a task completion are checked.
 
-        # Can not iterate over _schedule_executions - it can change mid-iteration
-        for schedule_id in list(self._schedule_executions.keys()):
+        Returns:
+            The earliest next start time, None when there is none or no task can start
+        """
+        now = self.current_time if self.current_time else time.time()
+        while self._schedule_heap and self._schedule_heap[0][0] <= now:
+            entry = heapq.heappop(self._schedule_heap)
+            if self._is_heap_entry_current(entry):
+                self._pending_schedule_ids[entry[1]] = None
+
+        # Can not iterate over _pending_schedule_ids - it can change mid-iteration
+        for schedule_id in list(self._pending_schedule_ids.keys()):
             if self._paused or len(self._task_processes) >= self._max_running_tasks:
+                # The schedules left pending are checked once a task completes
                 return None
 
-            schedule_execution = self._schedule_executions[schedule_id]
+            self._pending_schedule_ids.pop(schedule_id, None)
+            schedule_execution = self._schedule_executions.get(schedule_id)
+            if schedule_execution is None:
+                continue
 
             try:
                 schedule = self._schedules[schedule_id]
@@ -455,6 +526,7 @@ class Scheduler(object):
                 continue
 
             if schedule.exclusive and schedule_execution.task_processes:
+                # Checked again when the task completes
                 continue
 
             # next_start_time is None when repeat is None until the
@@ -466,7 +538,6 @@ class Scheduler(object):
                 continue
 
             if next_start_time and not schedule_execution.start_now:
-                now = self.current_time if self.current_time else time.time()
                 right_time = now >= next_start_time
             else:
                 right_time = False
@@ -474,6 +545,13 @@ class Scheduler(object):
             if right_time or schedule_execution.start_now:
                 # Start a task
 
+                if right_time:
+                    schedule_execution.start_lag = now - next_start_time
+                    schedule_execution.max_start_lag = max(schedule_execution.max_start_lag,
+                                                           schedule_execution.start_lag)
+                    self._logger.debug("Schedule '%s' started %.3f seconds late", schedule.name,
+                                       schedule_execution.start_lag)
+
                 if not right_time:
                     # Manual start - don't change next_start_time
                     pass
@@ -497,18 +575,16 @@ class Scheduler(object):
                 # will undo that because, after all, the task started.
                 schedule_execution.start_now = False
 
-            # Keep track of the earliest next_start_time
-            if next_start_time and (earliest_start_time is None or
-                                            earliest_start_time > next_start_time):
-                earliest_start_time = next_start_time
-
-        return earliest_start_time
+        return self._earliest_start_time()
 
     async def _scheduler_loop(self):
         """Main loop for the scheduler"""
         # TODO: log exception here or add an exception handler in asyncio
 
+        self._scheduler_loop_wake = asyncio.Event()
         while True:
+            # A wake up requested while checking the schedules ends the sleep below straight away
+            self._scheduler_loop_wake.clear()
             next_start_time = await self._check_schedules()
 
             if self._paused:
@@ -517,28 +593,18 @@ class Scheduler(object):
             self._check_purge_tasks()
 
             # Determine how long to sleep
-            if self._check_processes_pending:
-                self._check_processes_pending = False
-                sleep_seconds = 0
-            elif next_start_time:
+            if next_start_time:
                 sleep_seconds = next_start_time - time.time()
             else:
                 sleep_seconds = self._MAX_SLEEP
 
             if sleep_seconds > 0:
                 self._logger.debug("Sleeping for %s seconds", sleep_seconds)
-                self._scheduler_loop_sleep_task = (
-                    asyncio.ensure_future(asyncio.sleep(sleep_seconds)))
-
                 try:
-                    await self._scheduler_loop_sleep_task
-                    self._scheduler_loop_sleep_task = None
-                except asyncio.CancelledError:
+                    await asyncio.wait_for(self._scheduler_loop_wake.wait(), sleep_seconds)
                     self._logger.debug("Main loop awakened")
-            else:
-                # Relinquish control for each loop iteration to avoid starving
-                # other coroutines
-                await asyncio.sleep(0)
+                except asyncio.TimeoutError:
+                    pass
 
     def _schedule_next_timed_task(self, schedule, schedule_execution, current_dt):
         """Handle daylight savings time transitions.
@@ -635,6 +701,8 @@ class Scheduler(object):
                 "Scheduled task for schedule '%s' to start at %s", schedule.name,
                 datetime.datetime.fromtimestamp(schedule_execution.next_start_time))
 
+        self._push_schedule(schedule.id, schedule_execution)
+
     def _schedule_first_task(self, schedule, current_time):
         """Determines the time when a task for a schedule will start.
 
@@ -683,6 +751,8 @@ class Scheduler(object):
         elif schedule.type == Schedule.Type.STARTUP:
             schedule_execution.next_start_time = current_time
 
+        self._push_schedule(schedule.id, schedule_execution)
+
         if self._logger.isEnabledFor(logging.INFO):
             self._logger.info(
                 "Scheduled task for schedule '%s' to start at %s", schedule.name,
@@ -1438,6 +1508,7 @@ class Scheduler(object):
             schedule_execution.start_now = True
 
         self._logger.debug("Queued schedule '%s' for execution", schedule_row.name)
+        self._pending_schedule_ids[schedule_id] = None
         self._resume_check_schedules()
         return True
 
@@ -1634,6 +1705,9 @@ class Scheduler(object):
             await self._wait_for_task_completion(task_process)
 
     def _terminate_child_processes(self, parent_id):
+        if parent_id == os.getpid():
+            # A resident process, the children of the core are the services
+            return
         ps_command = subprocess.Popen("ps -o pid --ppid {} --noheaders".format(parent_id), shell=True,
                                       stdout=subprocess.PIPE)
         ps_output, err = ps_command.communicate()
@@ -23,9 +23,12 @@ from datetime import datetime, timedelta
 import jwt
 
 from fledge.common import logger
+from fledge.common import startup_profile
 from fledge.common.alert_manager import AlertManager
 from fledge.common.audit_logger import AuditLogger
-from fledge.common.configuration_manager import ConfigurationManager
+from fledge.common.configuration_manager import ConfigurationManager, ConfigurationCache
+from fledge.common.plugin_discovery import PluginDiscovery
+from fledge.common.statistics import StatisticsCollector
 from fledge.common.storage_client.exceptions import *
 from fledge.common.storage_client.storage_client import StorageClientAsync
 from fledge.common.storage_client.storage_client import ReadingsStorageClientAsync
@@ -159,6 +162,23 @@ class Server:
             'default': 'Fledge administrative API',
             'displayName': 'Description',
             'order': '2'
+        },
+        'configurationCacheSize': {
+            'description': 'Maximum number of configuration categories held in memory',
+            'type': 'integer',
+            'default': str(ConfigurationCache.MAX_CACHE_SIZE),
+            'displayName': 'Configuration Cache Size',
+            'order': '3',
+            'minimum': '1'
+        },
+        'configurationCacheTTL': {
+            'description': 'Number of seconds after which a cached configuration category is read again '
+                           'from storage, 0 to keep it until it is evicted',
+            'type': 'integer',
+            'default': str(ConfigurationCache.TTL),
+            'displayName': 'Configuration Cache TTL',
+            'order': '4',
+            'minimum': '0'
         }
     }
 
@@ -509,6 +529,11 @@ class Server:
                 cls._service_description = config['description']['value']
             except KeyError:
                 cls._service_description = 'Fledge REST Services'
+            try:
+                cls._configuration_manager._cacheManager.configure(int(config['configurationCacheSize']['value']),
+                                                                   int(config['configurationCacheTTL']['value']))
+            except (KeyError, ValueError) as ex:
+                _logger.warning("Invalid configuration cache settings, %s", str(ex))
         except Exception as ex:
             _logger.exception(ex)
             raise
@@ -609,6 +634,8 @@ class Server:
         """Starts the scheduler"""
         _logger.info("Starting scheduler ...")
         cls.scheduler = Scheduler(cls._host, cls.core_management_port, cls.running_in_safe_mode)
+        # Collect the statistics history in the core rather than by starting the stats collector task every time
+        cls.scheduler.add_resident_process('stats collector', StatisticsCollector(cls._storage_client_async).collect)
         await cls.scheduler.start()
 
     @staticmethod
@@ -635,12 +662,14 @@ class Server:
             try:
                 found_services = ServiceRegistry.get(name="Fledge Storage")
                 storage_service = found_services[0]
-                cls._storage_client_async = StorageClientAsync(cls._host, cls.core_management_port, svc=storage_service)
+                cls._storage_client_async = StorageClientAsync(cls._host, cls.core_management_port, svc=storage_service,
+                                                               pooled=True)
             except (service_registry_exceptions.DoesNotExist, InvalidServiceInstance, StorageServiceUnavailable, Exception) as ex:
                 await asyncio.sleep(5)
         while cls._readings_client_async is None:
             try:
-                cls._readings_client_async = ReadingsStorageClientAsync(cls._host, cls.core_management_port, svc=storage_service)
+                cls._readings_client_async = ReadingsStorageClientAsync(cls._host, cls.core_management_port,
+                                                                        svc=storage_service, pooled=True)
             except (service_registry_exceptions.DoesNotExist, InvalidServiceInstance, StorageServiceUnavailable, Exception) as ex:
                 await asyncio.sleep(5)
 
@@ -835,16 +864,21 @@ class Server:
         try:
             host = cls._host
 
-            cls.core_app = cls._make_core_app()
-            cls.core_server, cls.core_server_handler = cls._start_app(loop, cls.core_app, host, 0)
+            with startup_profile.phase('management API'):
+                cls.core_app = cls._make_core_app()
+                cls.core_server, cls.core_server_handler = cls._start_app(loop, cls.core_app, host, 0)
             address, cls.core_management_port = cls.core_server.sockets[0].getsockname()
             _logger.info('Management API started on http://%s:%s', address, cls.core_management_port)
             # see http://<core_mgt_host>:<core_mgt_port>/fledge/service for registered services
             # start storage
-            loop.run_until_complete(cls._start_storage(loop))
+            with startup_profile.phase('storage'):
+                loop.run_until_complete(cls._start_storage(loop))
+
+                # get storage client
+                loop.run_until_complete(cls._get_storage_client())
 
-            # get storage client
-            loop.run_until_complete(cls._get_storage_client())
+            # Audit trail entries are queued and written in batches from now on
+            AuditLogger(cls._storage_client_async).start_writer()
 
             if not cls.running_in_safe_mode:
                 # If readings table is empty, set last_object of all streams to 0
@@ -864,13 +898,15 @@ class Server:
             # NOTE: In safe mode, the scheduler will be in restricted mode,
             # and only API operations and current state will be accessible (No jobs / processes will be triggered)
             #
-            loop.run_until_complete(cls._start_scheduler())
+            with startup_profile.phase('scheduler'):
+                loop.run_until_complete(cls._start_scheduler())
 
             # start monitor
             loop.run_until_complete(cls._start_service_monitor())
 
-            loop.run_until_complete(cls.rest_api_config())
-            cls.service_app = cls._make_app(auth_required=cls.is_auth_required, auth_method=cls.auth_method)
+            with startup_profile.phase('REST API'):
+                loop.run_until_complete(cls.rest_api_config())
+                cls.service_app = cls._make_app(auth_required=cls.is_auth_required, auth_method=cls.auth_method)
 
             # ssl context
             ssl_ctx = None
@@ -933,6 +969,10 @@ class Server:
             # Create the configuration category parents
             loop.run_until_complete(cls._config_parents())
 
+            # Bring the plugin index up to date in the background, so that the first plugin listing
+            # does not have to load every installed plugin
+            loop.run_in_executor(None, PluginDiscovery.get_plugins_installed)
+
             if not cls.running_in_safe_mode:
                 # Start asset tracker
                 loop.run_until_complete(cls._start_asset_tracker())
@@ -970,6 +1010,7 @@ class Server:
             cls._audit = AuditLogger(cls._storage_client_async)
             audit_msg = {"message": "Running in safe mode"} if cls.running_in_safe_mode else None
             loop.run_until_complete(cls._audit.information('START', audit_msg))
+            startup_profile.report("Core")
             if sys.version_info >= (3, 7, 1):
                 ignore_aiohttp_ssl_eror(loop)
             loop.run_forever()
@@ -1025,6 +1066,8 @@ class Server:
             cls._audit = AuditLogger(cls._storage_client_async)
             audit_msg = {"message": "Exited from safe mode"} if cls.running_in_safe_mode else None
             await cls._audit.information('FSTOP', audit_msg)
+            # Write the queued audit trail entries
+            await cls._audit.stop_writer()
 
             # stop storage
             await cls.stop_storage()
@@ -1052,6 +1095,11 @@ class Server:
     async def stop_storage(cls):
         """Stops Storage service """
 
+        # Release the pooled keep-alive connections before the storage service goes away
+        for client in (cls._storage_client_async, cls._readings_client_async):
+            if client is not None:
+                await client.close()
+
         try:
             found_services = ServiceRegistry.get(name="Fledge Storage")
         except service_registry_exceptions.DoesNotExist:
@@ -1721,6 +1769,30 @@ class Server:
 
         return web.json_response(result)
 
+    @classmethod
+    async def add_track_bulk(cls, request):
+        """ Adds several asset tracker events in a single request
+
+        :Example:
+            curl -sX POST http://localhost:<core mgt port>/fledge/track/bulk -d
+            '{"track": [{"asset": "sinusoid", "event": "Ingest", "service": "sine", "plugin": "sinusoid"}]}'
+        """
+        data = await request.json()
+
+        if not isinstance(data, dict) or not isinstance(data.get("track"), list):
+            raise web.HTTPBadRequest(reason='Data payload must be a dictionary with a track list')
+
+        try:
+            result = await cls._asset_tracker.add_asset_records(data["track"])
+        except (TypeError, StorageServerError) as ex:
+            raise web.HTTPBadRequest(reason=str(ex))
+        except ValueError as ex:
+            raise web.HTTPNotFound(reason=str(ex))
+        except Exception as ex:
+            raise web.HTTPInternalServerError(reason=ex)
+
+        return web.json_response({"track": result})
+
     @classmethod
     async def enable_disable_schedule(cls, request: web.Request) -> web.Response:
         data = await request.json()
@@ -8,7 +8,9 @@
 
 import asyncio
 import aiohttp
+import bisect
 import json
+import time
 from fledge.common import logger
 from fledge.common.audit_logger import AuditLogger
 from fledge.common.configuration_manager import ConfigurationManager
@@ -23,6 +25,36 @@ __license__ = "Apache 2.0"
 __version__ = "${VERSION}"
 
 
+class LatencyHistogram(object):
+    """Distribution of the ping latencies of a service"""
+
+    BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+    """Upper bounds of the histogram buckets in milliseconds; the last bucket counts the slower pings"""
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+
+    def add(self, latency_ms):
+        self.counts[bisect.bisect_left(self.BUCKETS_MS, latency_ms)] += 1
+        self.total += 1
+        self.sum_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+        self.last_ms = latency_ms
+
+    def to_dict(self):
+        buckets = {"le_{}".format(bound): count for bound, count in zip(self.BUCKETS_MS, self.counts)}
+        buckets["gt_{}".format(self.BUCKETS_MS[-1])] = self.counts[-1]
+        return {"count": self.total,
+                "mean_ms": round(self.sum_ms / self.total, 3) if self.total else 0,
+                "max_ms": round(self.max_ms, 3),
+                "last_ms": round(self.last_ms, 3),
+                "buckets": buckets}
+
+
 class Monitor(object):
 
     _DEFAULT_SLEEP_INTERVAL = 5
@@ -36,6 +68,9 @@ class Monitor(object):
     _DEFAULT_RESTART_FAILED = "auto"
     """Restart failed microservice - manual/auto"""
 
+    _DEFAULT_MAX_CONCURRENT_PINGS = 10
+    """Maximum number of micro-services pinged at the same time"""
+
     _logger = None
 
     def __init__(self):
@@ -51,6 +86,16 @@ class Monitor(object):
         """Number of max attempts for finding a heartbeat of service"""
         self._restart_failed = None  # type: str
         """Restart failed microservice - manual/auto"""
+        self._max_concurrent_pings = self._DEFAULT_MAX_CONCURRENT_PINGS  # type: int
+        """Maximum number of micro-services pinged at the same time"""
+        self._session = None  # type: aiohttp.ClientSession
+        """Session shared by the pings of a monitoring round"""
+
+        self.ping_latency = {}
+        """Service name -> :class:`LatencyHistogram` of its pings"""
+        self.rounds = 0
+        self.last_round_seconds = 0.0
+        self.max_round_seconds = 0.0
 
         self.restarted_services = []
         self._acl_handler = None
@@ -58,6 +103,36 @@ class Monitor(object):
     async def _sleep(self, sleep_time):
         await asyncio.sleep(sleep_time)
 
+    async def _ping(self, semaphore, service_record):
+        """Pings a micro-service
+
+        A ping that failed or timed out is added to the latency histogram as lasting the whole timeout.
+
+        Returns:
+            The exception raised by the ping, None if the service answered
+        """
+        url = "{}://{}:{}/fledge/service/ping".format(
+            service_record._protocol, service_record._address, service_record._management_port)
+        async with semaphore:
+            start = time.monotonic()
+            try:
+                async with self._session.get(url, timeout=self._ping_timeout) as resp:
+                    text = await resp.text()
+                    res = json.loads(text)
+                    if res["uptime"] is None:
+                        raise ValueError('res.uptime is None')
+            except Exception as ex:
+                self._latency_histogram(service_record._name).add(self._ping_timeout * 1000)
+                return ex
+            else:
+                self._latency_histogram(service_record._name).add((time.monotonic() - start) * 1000)
+                return None
+
+    def _latency_histogram(self, service_name):
+        if service_name not in self.ping_latency:
+            self.ping_latency[service_name] = LatencyHistogram()
+        return self.ping_latency[service_name]
+
     async def _monitor_loop(self):
         """async Monitor loop to monitor registered services"""
         # check health of all micro-services every N seconds
@@ -65,11 +140,18 @@ class Monitor(object):
         check_count = {}  # dict to hold current count of current status.
                           # In case of ok and running status, count will always be 1.
                           # In case of of non running statuses, count shows since when this status is set.
+        semaphore = asyncio.Semaphore(self._max_concurrent_pings)
         while True:
             round_cnt += 1
             self._logger.debug("Starting next round#{} of service monitoring, sleep/i:{} ping/t:{} max/a:{}".format(
                 round_cnt, self._sleep_interval, self._ping_timeout, self._max_attempts))
+            round_start = time.monotonic()
+            to_ping = []
+            registered = set()
             for service_record in ServiceRegistry.all():
+                if service_record._status != ServiceRecord.Status.Shutdown:
+                    registered.add(service_record._name)
+
                 if service_record._id not in check_count:
                     check_count.update({service_record._id: 1})
 
@@ -95,32 +177,19 @@ class Monitor(object):
                          asyncio.ensure_future(self.restart_service(service_record))
                      continue
 
-                try:
-                    url = "{}://{}:{}/fledge/service/ping".format(
-                        service_record._protocol, service_record._address, service_record._management_port)
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(url, timeout=self._ping_timeout) as resp:
-                            text = await resp.text()
-                            res = json.loads(text)
-                            if res["uptime"] is None:
-                                raise ValueError('res.uptime is None')
-                except (asyncio.TimeoutError, aiohttp.client_exceptions.ServerTimeoutError) as ex:
-                    service_record._status = ServiceRecord.Status.Unresponsive
-                    check_count[service_record._id] += 1
-                    self._logger.info("ServerTimeoutError: %s, %s", str(ex), service_record.__repr__())
-                except aiohttp.client_exceptions.ClientConnectorError as ex:
-                    service_record._status = ServiceRecord.Status.Unresponsive
-                    check_count[service_record._id] += 1
-                    self._logger.info("ClientConnectorError: %s, %s", str(ex), service_record.__repr__())
-                except ValueError as ex:
-                    service_record._status = ServiceRecord.Status.Unresponsive
-                    check_count[service_record._id] += 1
-                    self._logger.info("Invalid response: %s, %s", str(ex), service_record.__repr__())
-                except Exception as ex:
-                    service_record._status = ServiceRecord.Status.Unresponsive
-                    check_count[service_record._id] += 1
-                    self._logger.info("Exception occurred: %s, %s", str(ex), service_record.__repr__())
-                else:
+                to_ping.append(service_record)
+
+            # The ping latencies of the services unregistered since the previous round are removed
+            for name in set(self.ping_latency) - registered:
+                del self.ping_latency[name]
+
+            # All services are pinged concurrently, a round lasts as long as the slowest ping
+            if to_ping and (self._session is None or self._session.closed):
+                self._session = aiohttp.ClientSession()
+            results = await asyncio.gather(*[self._ping(semaphore, service_record) for service_record in to_ping])
+
+            for service_record, ex in zip(to_ping, results):
+                if ex is None:
                     service_record._status = ServiceRecord.Status.Running
 
                     self._logger.debug("Resolving pending notification for ACL change "
@@ -131,6 +200,17 @@ class Monitor(object):
                         resolve_pending_notification_for_acl_change(service_record._name)
 
                     check_count[service_record._id] = 1
+                else:
+                    service_record._status = ServiceRecord.Status.Unresponsive
+                    check_count[service_record._id] += 1
+                    if isinstance(ex, (asyncio.TimeoutError, aiohttp.client_exceptions.ServerTimeoutError)):
+                        self._logger.info("ServerTimeoutError: %s, %s", str(ex), service_record.__repr__())
+                    elif isinstance(ex, aiohttp.client_exceptions.ClientConnectorError):
+                        self._logger.info("ClientConnectorError: %s, %s", str(ex), service_record.__repr__())
+                    elif isinstance(ex, ValueError):
+                        self._logger.info("Invalid response: %s, %s", str(ex), service_record.__repr__())
+                    else:
+                        self._logger.info("Exception occurred: %s, %s", str(ex), service_record.__repr__())
 
                 if check_count[service_record._id] > self._max_attempts:
                     ServiceRegistry.mark_as_failed(service_record._id)
@@ -140,8 +220,20 @@ class Monitor(object):
                         await audit.failure('SRVFL', {'name':service_record._name})
                     except Exception as ex:
                         self._logger.info("Failed to audit service failure %s", str(ex))
+
+            self.rounds = round_cnt
+            self.last_round_seconds = time.monotonic() - round_start
+            self.max_round_seconds = max(self.max_round_seconds, self.last_round_seconds)
             await self._sleep(self._sleep_interval)
 
+    def stats(self):
+        """Round duration and per service ping latency metrics"""
+        return {"rounds": self.rounds,
+                "last_round_ms": round(self.last_round_seconds * 1000, 3),
+                "max_round_ms": round(self.max_round_seconds * 1000, 3),
+                "max_concurrent_pings": self._max_concurrent_pings,
+                "services": {name: histogram.to_dict() for name, histogram in self.ping_latency.items()}}
+
     async def _read_config(self):
         """Reads configuration"""
         default_config = {
@@ -173,6 +265,13 @@ class Monitor(object):
                 'options': ['auto', 'manual'],
                 "default": self._DEFAULT_RESTART_FAILED,
                 "displayName": "Restart Failed"
+            },
+            "max_concurrent_pings": {
+                "description": "Maximum number of micro-services pinged at the same time",
+                "type": "integer",
+                "default": str(self._DEFAULT_MAX_CONCURRENT_PINGS),
+                "displayName": "Max Concurrent Pings",
+                "minimum": "1"
             }
         }
 
@@ -186,6 +285,7 @@ class Monitor(object):
         self._ping_timeout = int(config['ping_timeout']['value'])
         self._max_attempts = int(config['max_attempts']['value'])
         self._restart_failed = config['restart_failed']['value']
+        self._max_concurrent_pings = int(config['max_concurrent_pings']['value'])
 
     async def restart_service(self, service_record):
         from fledge.services.core import server  # To avoid cyclic import as server also imports monitor
@@ -202,3 +302,6 @@ class Monitor(object):
             self._monitor_loop_task.cancel()
         except asyncio.CancelledError:
             pass
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -8,6 +8,7 @@
 import json
 import uuid
 import hashlib
+from collections import OrderedDict
 from datetime import datetime, timedelta
 import jwt
 
@@ -15,7 +16,7 @@ from fledge.common.audit_logger import AuditLogger
 from fledge.common.common import _FLEDGE_ROOT, _FLEDGE_DATA
 from fledge.common.configuration_manager import ConfigurationManager
 from fledge.common.logger import FLCoreLogger
-from fledge.common.storage_client.payload_builder import PayloadBuilder
+from fledge.common.storage_client.payload_builder import PayloadBuilder, Param
 from fledge.common.storage_client.exceptions import StorageServerError
 from fledge.common.web.ssl_wrapper import SSLVerifier
 from fledge.services.core import connect
@@ -31,9 +32,80 @@ JWT_ALGORITHM = 'HS256'
 JWT_EXP_DELTA_SECONDS = 30*60  # 30 minutes
 ERROR_MSG = 'Something went wrong'
 USED_PASSWORD_HISTORY_COUNT = 3
+TOKEN_CACHE_SIZE = 1000
+TOKEN_REFRESH_INTERVAL_SECONDS = 60
 
 _logger = FLCoreLogger().get_logger(__name__)
 
+_TOKEN_EXPIRATION_QUERY = PayloadBuilder().SELECT("token_expiration") \
+    .ALIAS("return", ("token_expiration", 'token_expiration')) \
+    .FORMAT("return", ("token_expiration", "YYYY-MM-DD HH24:MI:SS.MS")) \
+    .WHERE(['token', '=', Param('token')]).prepare()
+
+
+class TokenCache:
+    """ Bounded cache of the validated tokens, with their expiry and the user they belong to
+
+    A token is served from the cache until its expiry; its expiry is extended in storage at most once
+    every refresh_interval seconds. Tokens are removed on logout and on any change of their user.
+    """
+
+    def __init__(self, max_size=TOKEN_CACHE_SIZE, refresh_interval=TOKEN_REFRESH_INTERVAL_SECONDS):
+        self._max_size = max_size
+        self._refresh_interval = timedelta(seconds=refresh_interval)
+        self._tokens = OrderedDict()
+        """ token -> dict with uid, expiry, refreshed and user, from the least to the most recently used """
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def get_uid(self, token):
+        entry = self._tokens.get(token)
+        if entry is None:
+            return None
+        if entry['expiry'] <= datetime.now():
+            del self._tokens[token]
+            return None
+        self._tokens.move_to_end(token)
+        return entry['uid']
+
+    def add(self, token, uid, expiry):
+        if token not in self._tokens and len(self._tokens) >= self._max_size:
+            self._tokens.popitem(last=False)
+        self._tokens[token] = {'uid': uid, 'expiry': expiry, 'refreshed': None, 'user': None}
+
+    def refresh_due(self, token, now):
+        entry = self._tokens.get(token)
+        return entry is None or entry['refreshed'] is None or now - entry['refreshed'] >= self._refresh_interval
+
+    def refreshed(self, token, now, expiry):
+        entry = self._tokens.get(token)
+        if entry is not None:
+            entry['refreshed'] = now
+            entry['expiry'] = expiry
+
+    def get_user(self, token):
+        entry = self._tokens.get(token)
+        return None if entry is None else entry['user']
+
+    def set_user(self, token, user):
+        entry = self._tokens.get(token)
+        if entry is not None:
+            entry['user'] = user
+
+    def remove_token(self, token):
+        self._tokens.pop(token, None)
+
+    def remove_user(self, uid):
+        for token in [t for t, entry in self._tokens.items() if str(entry['uid']) == str(uid)]:
+            del self._tokens[token]
+
+    def clear(self):
+        self._tokens.clear()
+
+
+_token_cache = TokenCache()
+
 
 class User:
 
@@ -198,6 +270,7 @@ class User:
                     ['enabled', '=', 't']).payload()
                 result = await storage_client.update_tbl("users", payload)
                 if result['rows_affected']:
+                    cls.invalidate_cached_user(user_id)
                     # FIXME: FOGL-1226 active session delete only in case of role_id and password updation
                     if 'password' in user_data or 'role_id' in user_data:
                         # delete all active sessions
@@ -280,12 +353,31 @@ class User:
 
         @classmethod
         async def refresh_token_expiry(cls, token):
+            """ Extends the token expiry; for a cached token at most once every TOKEN_REFRESH_INTERVAL_SECONDS """
+            now = datetime.now()
+            if not _token_cache.refresh_due(token, now):
+                return
             storage_client = connect.get_storage_async()
-            exp = datetime.now() + timedelta(seconds=JWT_EXP_DELTA_SECONDS)
+            exp = now + timedelta(seconds=JWT_EXP_DELTA_SECONDS)
             """ MODIFIER with allowzero is passed in payload so that storage returns rows_affected 0 in any case """
             payload = PayloadBuilder().SET(token_expiration=str(exp)).WHERE(['token', '=', token]
                                                                             ).MODIFIER(["allowzero"]).payload()
             await storage_client.update_tbl("user_logins", payload)
+            _token_cache.refreshed(token, now, exp)
+
+        @classmethod
+        async def get_token_user(cls, token, uid):
+            """ Returns the user a validated token belongs to, cached along with the token """
+            user = _token_cache.get_user(token)
+            if user is None:
+                user = await cls.get(uid=uid)
+                _token_cache.set_user(token, user)
+            return user
+
+        @classmethod
+        def invalidate_cached_user(cls, user_id):
+            """ Removes the cached tokens of a user, to be called when the user is changed """
+            _token_cache.remove_user(user_id)
 
         @classmethod
         async def validate_token(cls, token):
@@ -295,11 +387,11 @@ class User:
             :param token:
             :return:
             """
+            uid = _token_cache.get_uid(token)
+            if uid is not None:
+                return uid
             storage_client = connect.get_storage_async()
-            payload = PayloadBuilder().SELECT("token_expiration") \
-                .ALIAS("return", ("token_expiration", 'token_expiration')) \
-                .FORMAT("return", ("token_expiration", "YYYY-MM-DD HH24:MI:SS.MS")) \
-                .WHERE(['token', '=', token]).payload()
+            payload = _TOKEN_EXPIRATION_QUERY.payload(token=token)
             result = await storage_client.query_tbl_with_payload('user_logins', payload)
 
             if len(result['rows']) == 0:
@@ -320,6 +412,7 @@ class User:
             # as we want to refresh token on each successful request
             # and extend it to keep session alive
             user_payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM], options={'verify_exp': False})
+            _token_cache.add(token, user_payload["uid"], datetime.strptime(token_expiry, fmt))
             return user_payload["uid"]
 
         @classmethod
@@ -426,6 +519,7 @@ class User:
 
         @classmethod
         async def delete_user_tokens(cls, user_id):
+            _token_cache.remove_user(user_id)
             storage_client = connect.get_storage_async()
             payload = PayloadBuilder().WHERE(['user_id', '=', user_id]).payload()
             try:
@@ -439,6 +533,7 @@ class User:
 
         @classmethod
         async def delete_token(cls, token):
+            _token_cache.remove_token(token)
             storage_client = connect.get_storage_async()
             payload = PayloadBuilder().WHERE(['token', '=', token]).payload()
             try:
@@ -452,6 +547,7 @@ class User:
 
         @classmethod
         async def delete_all_user_tokens(cls):
+            _token_cache.clear()
             storage_client = connect.get_storage_async()
             await storage_client.delete_from_tbl("user_logins")
 
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+# FLEDGE_BEGIN
+# See: http://fledge-iot.readthedocs.io/
+# FLEDGE_END
+
+"""Adaptive batch sizing for the South Ingest readings inserts"""
+
+__copyright__ = "Copyright (c) 2023 Dianomic Systems Inc."
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+_LATENCY_SMOOTHING = 0.2
+"""Weight of the latest sample in the exponentially weighted moving average of the insert latency"""
+
+_CONGESTION_THRESHOLD = 0.8
+"""Fraction of the readings buffer in use above which the ingest is reported as congested"""
+
+
+class BatchController(object):
+    """Tunes the readings insert batch size from the measured append latency and the buffered readings
+
+    The batch size grows additively while inserts stay under the target latency and readings are
+    queuing up, so that more readings are sent per storage round trip. It is halved as soon as the
+    latency goes over the target, so that a slow storage layer is given smaller requests.
+    """
+
+    def __init__(self, batch_size, min_batch_size, max_batch_size, target_latency_seconds):
+        if min_batch_size < 1 or min_batch_size > max_batch_size:
+            raise ValueError('min_batch_size must be between 1 and max_batch_size')
+        if target_latency_seconds <= 0:
+            raise ValueError('target_latency_seconds must be greater than 0')
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.batch_size = min(max(batch_size, min_batch_size), max_batch_size)
+        self.target_latency_seconds = target_latency_seconds
+        self.latency_seconds = 0.0
+        """Smoothed insert latency"""
+        self.inserts = 0
+        self.increases = 0
+        self.decreases = 0
+        self._step = max(1, self.batch_size // 4)
+
+    def observe(self, latency_seconds, batch_size, queued):
+        """Records an insert and returns the batch size to use for the next ones
+
+        Args:
+            latency_seconds: time taken by the append call
+            batch_size: number of readings sent by the append call
+            queued: number of readings still buffered
+
+        Returns:
+            The new batch size
+        """
+        if self.inserts == 0:
+            self.latency_seconds = latency_seconds
+        else:
+            self.latency_seconds += _LATENCY_SMOOTHING * (latency_seconds - self.latency_seconds)
+        self.inserts += 1
+
+        if self.latency_seconds > self.target_latency_seconds:
+            new_size = max(self.min_batch_size, self.batch_size // 2)
+        elif queued >= self.batch_size and batch_size >= self.batch_size:
+            new_size = min(self.max_batch_size, self.batch_size + self._step)
+        else:
+            new_size = self.batch_size
+
+        if new_size > self.batch_size:
+            self.increases += 1
+        elif new_size < self.batch_size:
+            self.decreases += 1
+        self.batch_size = new_size
+        return new_size
+
+    @staticmethod
+    def is_congested(buffered, capacity):
+        """True when the buffered readings are close to the buffer capacity"""
+        return capacity > 0 and buffered >= capacity * _CONGESTION_THRESHOLD
+
+    def state(self):
+        return {"batch_size": self.batch_size,
+                "latency_ms": int(self.latency_seconds * 1000),
+                "target_latency_ms": int(self.target_latency_seconds * 1000),
+                "inserts": self.inserts,
+                "increases": self.increases,
+                "decreases": self.decreases}
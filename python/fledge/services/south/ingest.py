@@ -7,14 +7,20 @@
 """Fledge Sensor Readings Ingest API"""
 
 import asyncio
+import collections
 import datetime
+import sys
 import time
 from typing import List, Union
 import json
 
 from fledge.common import logger
 from fledge.common import statistics
+from fledge.common.microservice_management_client.exceptions import MicroserviceManagementClientError
 from fledge.common.storage_client.exceptions import StorageServerError
+from fledge.services.south.batch_controller import BatchController
+from fledge.services.south.poll_executor import PollExecutor, POLL_EXECUTOR_MODES
+from fledge.services.south.spill_buffer import SpillBuffer, spill_path
 
 __author__ = "Terris Linenbach, Amarendra K Sinha"
 __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
@@ -23,6 +29,9 @@ __version__ = "${VERSION}"
 
 _LOGGER = logger.setup(__name__)  # type: logging.Logger
 _MAX_ATTEMPTS = 2
+_MAX_ASSET_CODES = 10000
+_ASSET_TRACKER_FLUSH_SECONDS = 1
+"""Interval at which the queued asset tracker events are sent to the core"""
 
 # _LOGGER = logger.setup(__name__, level=logging.DEBUG)  # type: logging.Logger
 # _LOGGER = logger.setup(__name__, destination=logger.CONSOLE, level=logging.DEBUG)
@@ -58,7 +67,11 @@ class Ingest(object):
     """True when the server has been started"""
 
     _readings_lists = None  # type: List
-    """A list of readings lists. Each list contains the inputs to :meth:`add_readings`."""
+    """A list of readings lists. Each list contains the inputs to :meth:`add_readings`, already encoded as
+    JSON reading objects so that a batch payload is a join of its items."""
+
+    _asset_codes = {}  # type: dict
+    """Interned asset code -> (JSON encoded asset code, statistics key) for the assets seen so far"""
 
     _current_readings_list_index = 0
     """Which readings list to insert into next"""
@@ -102,14 +115,65 @@ class Ingest(object):
     _max_readings_insert_batch_reconnect_wait_seconds = 10
     """The maximum number of seconds to wait before reconnecting to storage when inserting readings"""
 
+    _adaptive_batching = False
+    """Adapt the batch size to the measured storage insert latency"""
+
+    _readings_insert_target_latency_ms = 500
+    """Insert latency the adaptive batch size is tuned for"""
+
+    _spill_to_disk = False
+    """Write readings to a file on disk when they can not be inserted in storage, and replay them later"""
+
+    _spill_buffer_size_mb = 100
+    """Maximum size of the disk spill file in megabytes"""
+
+    _write_statistics_frequency_seconds = statistics.DEFAULT_FLUSH_INTERVAL
+    """Number of seconds between two writes of the ingest statistics to storage"""
+
+    _write_statistics_threshold = statistics.DEFAULT_FLUSH_THRESHOLD
+    """Number of readings counted in the statistics above which they are written to storage immediately"""
+
+    _poll_executor_mode = 'none'
+    """Where the plugin_poll calls of a poll plugin run, one of POLL_EXECUTOR_MODES"""
+
+    _max_concurrent_polls = 1
+    """Maximum number of plugin_poll calls running at the same time"""
+
     # Configuration (end)
 
-    _payload_events = []
-    """The list of unique reading payload for asset tracker"""
+    _poll_executor = None  # type: PollExecutor
+    """Executor of the plugin polls, set by the south server; its metrics are written with the ingest statistics"""
+
+    _batch_controller = None  # type: BatchController
+    """Adaptive batch size controller, None when adaptive batching is disabled"""
+
+    _backpressure_stats = 0  # type: int
+    """Number of readings refused because the buffers were full, before statistics were written to storage"""
+
+    _spill_buffer = None  # type: SpillBuffer
+    """Disk spill buffer, None when spilling to disk is disabled"""
+
+    _spill_replayed_stats = 0  # type: int
+    """Number of spilled readings inserted in storage, before statistics were written to storage"""
+
+    _spill_replay_rate = 0  # type: int
+    """Readings per second inserted by the last replay of the spill buffer"""
+
+    _payload_events = set()
+    """(asset, event, service, plugin) of the asset tracker events already sent to the core"""
+
+    _asset_tracker_queue = []  # type: List[dict]
+    """Asset tracker events waiting to be sent to the core"""
+
+    _asset_tracker_task = None  # type: asyncio.Task
+    """asyncio task for :meth:`_send_asset_tracker_events`"""
 
     stats = None
     """Statistics class instance"""
 
+    _statistics_counters = None  # type: statistics.StatisticsCounters
+    """Write-behind counters the statistics are accumulated in"""
+
     @classmethod
     async def _read_config(cls):
         """Creates default values for the South configuration category and then reads all
@@ -158,6 +222,62 @@ class Ingest(object):
                 "type": "integer",
                 "default": str(cls._max_readings_insert_batch_reconnect_wait_seconds)
             },
+            "adaptive_batching": {
+                "description": "Adapt the batch size to the measured storage insert latency",
+                "displayName": "Adaptive Batching",
+                "type": "boolean",
+                "default": str(cls._adaptive_batching).lower()
+            },
+            "readings_insert_target_latency_ms": {
+                "description": "Target time in milliseconds to insert a batch of readings in storage, "
+                               "used by adaptive batching",
+                "displayName": "Target Insert Latency",
+                "type": "integer",
+                "default": str(cls._readings_insert_target_latency_ms)
+            },
+            "spill_to_disk": {
+                "description": "Write readings to a file on disk when they can not be inserted in storage or "
+                               "the buffers are full, and insert them once storage is available",
+                "displayName": "Spill To Disk",
+                "type": "boolean",
+                "default": str(cls._spill_to_disk).lower()
+            },
+            "spill_buffer_size_mb": {
+                "description": "Maximum size in megabytes of the file used to spill readings to disk",
+                "displayName": "Spill Buffer Size (MB)",
+                "type": "integer",
+                "default": str(cls._spill_buffer_size_mb)
+            },
+            "write_statistics_frequency_seconds": {
+                "description": "Number of seconds between two writes of the ingest statistics to storage",
+                "displayName": "Statistics Write Interval",
+                "type": "integer",
+                "default": str(cls._write_statistics_frequency_seconds)
+            },
+            "write_statistics_threshold": {
+                "description": "Number of readings counted in the ingest statistics above which they are written "
+                               "to storage before the write interval",
+                "displayName": "Statistics Write Threshold",
+                "type": "integer",
+                "default": str(cls._write_statistics_threshold)
+            },
+            "poll_executor": {
+                "description": "Where the plugin polls run: none on the service event loop, thread in a thread "
+                               "pool for plugins waiting on devices, process in a process pool for plugins "
+                               "computing their readings. Thread and process only for plugins whose plugin_poll "
+                               "can run away from the event loop",
+                "displayName": "Poll Executor",
+                "type": "enumeration",
+                "options": list(POLL_EXECUTOR_MODES),
+                "default": cls._poll_executor_mode
+            },
+            "max_concurrent_polls": {
+                "description": "Maximum number of plugin polls running at the same time, more than 1 only for "
+                               "plugins which support concurrent polls",
+                "displayName": "Max Concurrent Polls",
+                "type": "integer",
+                "default": str(cls._max_concurrent_polls)
+            },
         }
 
         # Create configuration category and any new keys within it
@@ -191,8 +311,16 @@ class Ingest(object):
             ['value'])
         cls._max_readings_insert_batch_reconnect_wait_seconds = int(
             config['max_readings_insert_batch_reconnect_wait_seconds']['value'])
+        cls._adaptive_batching = config['adaptive_batching']['value'].lower() == 'true'
+        cls._readings_insert_target_latency_ms = int(config['readings_insert_target_latency_ms']['value'])
+        cls._spill_to_disk = config['spill_to_disk']['value'].lower() == 'true'
+        cls._spill_buffer_size_mb = int(config['spill_buffer_size_mb']['value'])
+        cls._write_statistics_frequency_seconds = int(config['write_statistics_frequency_seconds']['value'])
+        cls._write_statistics_threshold = int(config['write_statistics_threshold']['value'])
+        cls._poll_executor_mode = config['poll_executor']['value']
+        cls._max_concurrent_polls = int(config['max_concurrent_polls']['value'])
 
-        cls._payload_events = []
+        cls._payload_events = set()
 
     @classmethod
     async def start(cls, parent):
@@ -225,6 +353,25 @@ class Ingest(object):
                             'to %s', cls._readings_buffer_size,
                             cls._readings_list_size * cls._max_concurrent_readings_inserts)
 
+        cls._batch_controller = None
+        if cls._adaptive_batching:
+            cls._batch_controller = BatchController(batch_size=cls._readings_insert_batch_size,
+                                                    min_batch_size=max(1, cls._readings_insert_batch_size // 8),
+                                                    max_batch_size=cls._readings_list_size,
+                                                    target_latency_seconds=max(
+                                                        1, cls._readings_insert_target_latency_ms) / 1000)
+
+        cls._spill_buffer = None
+        if cls._spill_to_disk:
+            path = spill_path(cls._parent_service._name)
+            try:
+                cls._spill_buffer = SpillBuffer(path, cls._spill_buffer_size_mb * 1024 * 1024)
+                if cls._spill_buffer.records:
+                    _LOGGER.info('%s readings spilled to disk will be inserted in storage', cls._spill_buffer.records)
+            except (OSError, ValueError) as ex:
+                _LOGGER.error('Unable to open the spill buffer %s, readings will not be spilled to disk. %s',
+                              path, str(ex))
+
         cls._last_insert_time = 0
         cls._insert_readings_wait_tasks = []
         cls._readings_list_batch_size_reached = []
@@ -240,7 +387,11 @@ class Ingest(object):
         cls._insert_readings_task = asyncio.ensure_future(cls._insert_readings())
         cls._readings_lists_not_full = asyncio.Event()
 
-        cls._payload_events = cls._parent_service._core_microservice_management_client.get_asset_tracker_events()['track']
+        tracked = cls._parent_service._core_microservice_management_client.get_asset_tracker_events()['track']
+        cls._payload_events = {(event.get('asset'), event.get('event'), event.get('service'), event.get('plugin'))
+                               for event in tracked}
+        cls._asset_tracker_queue = []
+        cls._asset_tracker_task = asyncio.ensure_future(cls._send_asset_tracker_events())
 
         cls.stats = await statistics.create_statistics(cls.storage_async)
 
@@ -249,6 +400,25 @@ class Ingest(object):
         await cls.stats.register('DISCARDED', 'Readings discarded at the input side by Fledge, i.e. '
                                               'discarded before being placed in the buffer. This may be due to some '
                                               'error in the readings themselves.')
+        await cls.stats.register(cls._backpressure_key(), 'Readings refused by service {} because its buffers '
+                                                          'were full'.format(cls._parent_service._name))
+        if cls._spill_buffer is not None:
+            await cls.stats.register(cls._spill_key('Buffered'), 'Readings of service {} spilled to disk and waiting '
+                                                                 'to be stored'.format(cls._parent_service._name))
+            await cls.stats.register(cls._spill_key('Replayed'), 'Readings of service {} spilled to disk and '
+                                                                 'then stored'.format(cls._parent_service._name))
+            await cls.stats.register(cls._spill_key('DiskUsage'), 'Size in kilobytes of the spill file of '
+                                                                  'service {}'.format(cls._parent_service._name))
+        if cls._batch_controller is not None:
+            await cls.stats.register(cls._batch_size_key(), 'Current readings insert batch size of service '
+                                                            '{}'.format(cls._parent_service._name))
+            await cls.stats.register(cls._latency_key(), 'Average readings insert time in milliseconds of service '
+                                                         '{}'.format(cls._parent_service._name))
+
+        cls._statistics_counters = statistics.StatisticsCounters(
+            cls.stats, flush_interval=max(1, cls._write_statistics_frequency_seconds),
+            flush_threshold=max(1, cls._write_statistics_threshold))
+        cls._statistics_counters.start()
 
         cls._stop = False
         cls._started = True
@@ -275,6 +445,25 @@ class Ingest(object):
         except Exception:
             _LOGGER.exception('An exception was raised by Ingest._insert_readings')
 
+        if cls._asset_tracker_task is not None:
+            # Not cancelled, so that a request on its way to the core is not interrupted
+            try:
+                await cls._asset_tracker_task
+            except Exception:
+                _LOGGER.exception('An exception was raised by Ingest._send_asset_tracker_events')
+            cls._asset_tracker_task = None
+        if not await cls._flush_asset_tracker_events():
+            _LOGGER.error('Unable to send %s asset tracker events to the core', len(cls._asset_tracker_queue))
+
+        if cls._statistics_counters is not None:
+            if not await cls._statistics_counters.stop():
+                _LOGGER.error('Unable to write the ingest statistics to storage')
+            cls._statistics_counters = None
+
+        if cls._spill_buffer is not None:
+            cls._spill_buffer.close()
+            cls._spill_buffer = None
+
         cls._insert_readings_wait_tasks = None
         cls._insert_readings_tasks = None
         cls._readings_lists = None
@@ -343,6 +532,10 @@ class Ingest(object):
 
             # If list is still empty, then proceed to next list
             if not len(readings_list):
+                # The wait timed out with nothing to insert, send back any reading spilled to disk
+                if not cls._stop and cls._spill_buffer is not None and cls._spill_buffer.records:
+                    await cls._replay_spilled_readings()
+                    cls._write_statistics()
                 continue
 
             # If batch size still not reached and if there is time then let this list wait and move to next list
@@ -351,20 +544,28 @@ class Ingest(object):
                 continue
 
             attempt = 0
+            inserted = False
             cls._last_insert_time = time.time()
 
             # Perform insert. Retry when fails.
             while True:
                 try:
+                    # Items are pre-encoded; the whole list is sent as readings added while awaiting
+                    # are only removed from the list after the insert, using batch_size.
                     batch_size = len(readings_list)
-                    payload = json.dumps({"readings": readings_list[:batch_size]})
+                    # Sent as bytes, which the storage client does not parse again to validate them
+                    payload = ('{"readings":[' + ','.join(readings_list) + ']}').encode()
                     # insert_start_time = time.time()
                     # _LOGGER.debug('Begin insert: Queue index: %s Batch size: %s', list_index, batch_size)
                     try:
-                        await cls.readings_storage_async.append(payload)
+                        insert_start_time = time.time()
+                        await cls.readings_storage_async.append(payload, raw=True)
                         # insert_end_time = time.time()
                         # _LOGGER.debug('Inserted %s records in time %s', batch_size, insert_end_time - insert_start_time)
                         cls._readings_stats += batch_size
+                        inserted = True
+                        if cls._batch_controller is not None:
+                            cls._adapt_batch_size(time.time() - insert_start_time, batch_size)
                     except StorageServerError as ex:
                         err_response = ex.error
                         # if key error in next, it will be automatically in parent except block
@@ -385,13 +586,22 @@ class Ingest(object):
                     _LOGGER.exception(ex, 'Insert failed on attempt #{}, list index: {}'.format(attempt, list_index))
 
                     if cls._stop or attempt >= _MAX_ATTEMPTS:
-                        # Stopping. Discard the entire list upon failure.
+                        # Stopping. Spill the entire list to disk upon failure, or discard it.
                         batch_size = len(readings_list)
-                        cls._discarded_readings_stats += batch_size
-                        _LOGGER.warning('Insert failed: Queue index: %s Batch size: %s', list_index, batch_size)
+                        spilled = cls._spill(readings_list)
+                        cls._discarded_readings_stats += batch_size - spilled
+                        if spilled:
+                            _LOGGER.warning('Insert failed: Queue index: %s Batch size: %s, %s readings spilled to '
+                                            'disk', list_index, batch_size, spilled)
+                        else:
+                            _LOGGER.warning('Insert failed: Queue index: %s Batch size: %s', list_index, batch_size)
                         break
 
-            await cls._write_statistics()
+            # Storage is accepting readings, send back any reading spilled to disk
+            if inserted and cls._spill_buffer is not None and cls._spill_buffer.records:
+                await cls._replay_spilled_readings()
+
+            cls._write_statistics()
 
             del readings_list[:batch_size]
 
@@ -404,35 +614,182 @@ class Ingest(object):
         _LOGGER.info('Insert readings loop stopped')
 
     @classmethod
-    async def _write_statistics(cls):
-        """Periodically commits collected readings statistics"""
-
-        updates = {}
+    async def _replay_spilled_readings(cls):
+        """Inserts readings spilled to disk, in full batches, as long as storage accepts them
 
-        readings = cls._readings_stats
-        cls._readings_stats -= readings
-        updates.update({'READINGS': readings})
+        At most one batch per readings list is replayed at a time so that buffered readings are not held back.
+        An error of the spill file is logged, it is never raised to the insert of the buffered readings.
+        """
+        replayed = 0
+        replay_start_time = time.time()
+        try:
+            for _ in range(cls._max_concurrent_readings_inserts):
+                records, position = cls._spill_buffer.read(cls._readings_insert_batch_size)
+                if not records:
+                    break
+                payload = b'{"readings":[' + b','.join(records) + b']}'
+                try:
+                    await cls.readings_storage_async.append(payload, raw=True)
+                except StorageServerError as ex:
+                    err_response = ex.error
+                    if err_response.get("retryable", True):
+                        _LOGGER.warning('Insert of readings spilled to disk failed, %s', err_response.get("source"))
+                        break
+                    # not retryable, these readings will never be accepted
+                    _LOGGER.error('Discarding %s readings spilled to disk, %s, %s', len(records),
+                                  err_response.get("source"), err_response.get("message"))
+                    cls._spill_buffer.commit(position, len(records))
+                    cls._discarded_readings_stats += len(records)
+                    continue
+                except Exception as ex:
+                    _LOGGER.warning('Insert of readings spilled to disk failed, %s', str(ex))
+                    break
+                cls._spill_buffer.commit(position, len(records))
+                replayed += len(records)
+        except OSError as ex:
+            _LOGGER.error('Unable to replay the readings spilled to disk, %s', str(ex))
 
-        discarded_readings = cls._discarded_readings_stats
-        cls._discarded_readings_stats -= discarded_readings
-        updates.update({'DISCARDED': discarded_readings})
+        if replayed:
+            cls._readings_stats += replayed
+            cls._spill_replayed_stats += replayed
+            cls._spill_replay_rate = int(replayed / max(time.time() - replay_start_time, 0.001))
 
-        """ Register the statistics keys as this may be the first time the key has come into existence """
-        sensor_readings = cls._sensor_stats.copy()
-        for key in sensor_readings:
-            description = 'Readings received by Fledge since startup for sensor {}'.format(key)
-            await cls.stats.register(key, description)
-            cls._sensor_stats[key] -= sensor_readings[key]
-            updates.update({key: sensor_readings[key]})
+    @classmethod
+    def _spill(cls, reads) -> int:
+        """Appends encoded readings to the spill buffer
 
+        Returns:
+            The number of readings spilled to disk, 0 when spilling is disabled or the file can not be written
+        """
+        if cls._spill_buffer is None:
+            return 0
         try:
-            await cls.stats.update_bulk(updates)
-        except Exception as ex:
-            cls._readings_stats += readings
-            cls._discarded_readings_stats += discarded_readings
-            for key in sensor_readings:
-                cls._sensor_stats[key] += sensor_readings[key]
-            _LOGGER.exception(ex, 'An error occurred while writing sensor statistics')
+            return cls._spill_buffer.append(reads)
+        except OSError as ex:
+            _LOGGER.error('Unable to spill %s readings to disk, %s', len(reads), str(ex))
+            return 0
+
+    @classmethod
+    def _spill_key(cls, name):
+        return '{}-Spill{}'.format(cls._parent_service._name, name)
+
+    @classmethod
+    def _adapt_batch_size(cls, latency_seconds, batch_size):
+        """Feeds an insert latency to the batch controller and applies the batch size it returns"""
+        queued = cls._buffered_readings() - batch_size
+        new_size = cls._batch_controller.observe(latency_seconds, batch_size, queued)
+        if new_size != cls._readings_insert_batch_size:
+            _LOGGER.debug('Readings insert batch size changed from %s to %s, insert latency %s ms',
+                          cls._readings_insert_batch_size, new_size, int(latency_seconds * 1000))
+            cls._readings_insert_batch_size = new_size
+
+    @classmethod
+    def _backpressure_key(cls):
+        return '{}-IngestBackpressure'.format(cls._parent_service._name)
+
+    @classmethod
+    def _batch_size_key(cls):
+        return '{}-IngestBatchSize'.format(cls._parent_service._name)
+
+    @classmethod
+    def _latency_key(cls):
+        return '{}-IngestLatency'.format(cls._parent_service._name)
+
+    @classmethod
+    def _poll_key(cls, name):
+        return '{}-Poll{}'.format(cls._parent_service._name, name)
+
+    @classmethod
+    def _write_statistics(cls):
+        """Moves the collected readings statistics to the write-behind counters, which write them to storage"""
+        counters = cls._statistics_counters
+
+        counters.increment('READINGS', cls._readings_stats)
+        cls._readings_stats = 0
+
+        counters.increment('DISCARDED', cls._discarded_readings_stats)
+        cls._discarded_readings_stats = 0
+
+        counters.increment(cls._backpressure_key(), cls._backpressure_stats)
+        cls._backpressure_stats = 0
+
+        if cls._spill_replayed_stats:
+            counters.increment(cls._spill_key('Replayed'), cls._spill_replayed_stats)
+            cls._spill_replayed_stats = 0
+
+        """ The sensor statistics keys are registered the first time they are written """
+        sensor_readings, cls._sensor_stats = cls._sensor_stats, {}
+        for key, value in sensor_readings.items():
+            counters.increment(key, value, 'Readings received by Fledge since startup for sensor {}'.format(key))
+
+        if cls._batch_controller is not None:
+            state = cls._batch_controller.state()
+            counters.set(cls._batch_size_key(), state['batch_size'])
+            counters.set(cls._latency_key(), state['latency_ms'])
+        if cls._spill_buffer is not None:
+            counters.set(cls._spill_key('Buffered'), cls._spill_buffer.records)
+            counters.set(cls._spill_key('DiskUsage'), cls._spill_buffer.disk_usage // 1024)
+        if cls._poll_executor is not None:
+            state = cls._poll_executor.state()
+            counters.set(cls._poll_key('Latency'), state['latency_ms'],
+                         'Average plugin poll time in milliseconds of service {}'.format(cls._parent_service._name))
+            counters.set(cls._poll_key('Overruns'), state['overruns'],
+                         'Plugin polls of service {} skipped because the service could not keep up with its '
+                         'poll interval'.format(cls._parent_service._name))
+
+    @classmethod
+    def _buffered_readings(cls) -> int:
+        return sum(len(readings_list) for readings_list in cls._readings_lists)
+
+    @classmethod
+    def is_congested(cls) -> bool:
+        """Backpressure signal for producers, readings should be held back until capacity is available
+
+        Returns:
+            True - The readings buffers are nearly full
+            False - Otherwise, or when the service is not running
+        """
+        if not cls._started or cls._stop or cls._readings_lists is None:
+            return False
+        capacity = cls._readings_list_size * cls._max_concurrent_readings_inserts
+        return BatchController.is_congested(cls._buffered_readings(), capacity)
+
+    @classmethod
+    def batch_state(cls) -> dict:
+        """Current state of the readings inserts, for monitoring"""
+        state = {"batch_size": cls._readings_insert_batch_size,
+                 "buffered": cls._buffered_readings() if cls._readings_lists is not None else 0,
+                 "congested": cls.is_congested(),
+                 "adaptive": cls._batch_controller is not None}
+        if cls._batch_controller is not None:
+            state.update(cls._batch_controller.state())
+        if cls._spill_buffer is not None:
+            state["spill"] = cls._spill_buffer.state()
+            state["spill"]["replay_rate"] = cls._spill_replay_rate
+        return state
+
+    @classmethod
+    async def wait_for_capacity(cls, timeout: float) -> bool:
+        """Waits until the readings buffers are no longer congested
+
+        Args:
+            timeout: maximum number of seconds to wait
+
+        Returns:
+            True - Readings can be added
+            False - The buffers are still congested after timeout seconds, or the service is stopping
+        """
+        deadline = time.time() + timeout
+        while cls.is_congested():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            cls._readings_lists_not_full.clear()
+            try:
+                await asyncio.wait_for(cls._readings_lists_not_full.wait(), remaining)
+            except asyncio.TimeoutError:
+                return not cls.is_congested()
+        return not cls._stop
 
     @classmethod
     def is_available(cls) -> bool:
@@ -458,9 +815,102 @@ class Ingest(object):
         _LOGGER.warning('The ingest service is unavailable %s', list_index)
         return False
 
+    @classmethod
+    def _encode_asset_code(cls, asset: str):
+        """Returns the JSON encoded asset code and the statistics key of an asset, computed once per asset"""
+        try:
+            return cls._asset_codes[asset]
+        except KeyError:
+            pass
+        if len(cls._asset_codes) >= _MAX_ASSET_CODES:
+            cls._asset_codes.clear()
+        asset = sys.intern(asset)
+        encoded = (json.dumps(asset), sys.intern(asset.upper()))
+        cls._asset_codes[asset] = encoded
+        return encoded
+
+    @classmethod
+    def _encode_reading(cls, asset: str, timestamp: Union[str, datetime.datetime], readings: dict = None):
+        """Validates a reading and encodes it as a JSON reading object
+
+        Returns:
+            A tuple of the encoded reading and the statistics key of its asset
+
+        Raises:
+            ValueError, TypeError:
+                An invalid value was provided
+        """
+        if asset is None:
+            raise ValueError('asset can not be None')
+
+        if not isinstance(asset, str):
+            raise TypeError('asset must be a string')
+
+        if timestamp is None:
+            raise ValueError('timestamp can not be None')
+
+        # if not isinstance(timestamp, datetime.datetime):
+        #     # validate
+        #     timestamp = dateutil.parser.parse(timestamp)
+
+        if readings is None:
+            readings = dict()
+        elif not isinstance(readings, dict):
+            # Postgres allows values like 5 be converted to JSON
+            # Downstream processors can not handle this
+            raise TypeError('readings must be a dictionary')
+
+        # Encode on arrival, an unserializable reading is discarded on its own instead of failing a batch
+        asset_code, stats_key = cls._encode_asset_code(asset)
+        read = '{"asset_code":' + asset_code + ',"reading":' + json.dumps(readings) + \
+               ',"user_ts":' + json.dumps(timestamp) + '}'
+        return read, stats_key
+
+    @classmethod
+    def _track_asset(cls, asset: str):
+        """Queues the Ingest asset tracker event of an asset the first time it is seen"""
+        service = cls._parent_service._name
+        plugin = cls._parent_service._plugin_info['config']['plugin']['default']
+        key = (asset, 'Ingest', service, plugin)
+        if key not in cls._payload_events:
+            cls._payload_events.add(key)
+            cls._asset_tracker_queue.append({"asset": asset, "event": "Ingest", "service": service, "plugin": plugin})
+
+    @classmethod
+    async def _send_asset_tracker_events(cls):
+        """Sends the queued asset tracker events to the core until the service stops"""
+        while not cls._stop:
+            await asyncio.sleep(_ASSET_TRACKER_FLUSH_SECONDS)
+            await cls._flush_asset_tracker_events()
+
+    @classmethod
+    async def _flush_asset_tracker_events(cls) -> bool:
+        """Sends the queued asset tracker events to the core in one request
+
+        Returns:
+            False if the events could not be sent, they are then queued again
+        """
+        if not cls._asset_tracker_queue:
+            return True
+        events, cls._asset_tracker_queue = cls._asset_tracker_queue, []
+        try:
+            await cls._parent_service._core_microservice_management_client_async.create_asset_tracker_events(events)
+        except MicroserviceManagementClientError as ex:
+            if ex.status is not None and ex.status < 500:
+                # Refused by the core, sending them again would not help
+                _LOGGER.error('Asset tracker events %s refused by the core. %s', events, ex.reason)
+                return True
+            cls._asset_tracker_queue[:0] = events
+            return False
+        except Exception as ex:
+            _LOGGER.warning('Unable to send %s asset tracker events to the core. %s', len(events), str(ex))
+            cls._asset_tracker_queue[:0] = events
+            return False
+        return True
+
     @classmethod
     async def add_readings(cls, asset: str, timestamp: Union[str, datetime.datetime],
-                           readings: dict = None) -> None:
+                           readings: dict = None) -> bool:
         """Adds an asset readings record to Fledge
 
         Args:
@@ -468,6 +918,11 @@ class Ingest(object):
             timestamp: When the readings were taken
             readings: A dictionary of sensor readings
 
+        Returns:
+            True - The reading has been buffered
+            False - The reading was refused because the service is stopping or the buffers are full.
+                Callers should back off, see :meth:`is_congested` and :meth:`wait_for_capacity`
+
         Raises:
             If this method raises an Exception, the discarded readings counter is
             also incremented.
@@ -480,71 +935,51 @@ class Ingest(object):
         """
         if cls._stop:
             _LOGGER.warning('The South Service is stopping')
-            return
+            return False
 
         if not cls._started:
             raise RuntimeError('The South Service was not started')
             # cls._logger = logger.setup(__name__, destination=logger.CONSOLE, level=logging.DEBUG)
 
         try:
-            if asset is None:
-                raise ValueError('asset can not be None')
-
-            if not isinstance(asset, str):
-                raise TypeError('asset must be a string')
-
-            if timestamp is None:
-                raise ValueError('timestamp can not be None')
-
-            # if not isinstance(timestamp, datetime.datetime):
-            #     # validate
-            #     timestamp = dateutil.parser.parse(timestamp)
-
-            if readings is None:
-                readings = dict()
-            elif not isinstance(readings, dict):
-                # Postgres allows values like 5 be converted to JSON
-                # Downstream processors can not handle this
-                raise TypeError('readings must be a dictionary')
+            read, stats_key = cls._encode_reading(asset, timestamp, readings)
         except Exception:
             cls.increment_discarded_readings()
             raise
 
-        # If an empty slot is not available, discard the reading
+        # If an empty slot is not available, spill the reading to disk or discard it
         if not cls.is_available():
+            if cls._spill([read]):
+                cls._sensor_stats[stats_key] = cls._sensor_stats.get(stats_key, 0) + 1
+                cls._track_asset(asset)
+                return True
             cls.increment_discarded_readings()
-            return
+            cls._backpressure_stats += 1
+            return False
 
         list_index = cls._current_readings_list_index
         readings_list = cls._readings_lists[list_index]
 
-        read = dict()
-        read['asset_code'] = asset
-        read['reading'] = readings
-        read['user_ts'] = timestamp
         readings_list.append(read)
 
         list_size = len(readings_list)
 
         # Increment the count of received readings to be used for statistics update
-        if asset.upper() in cls._sensor_stats:
-            cls._sensor_stats[asset.upper()] += 1
+        if stats_key in cls._sensor_stats:
+            cls._sensor_stats[stats_key] += 1
         else:
-            cls._sensor_stats[asset.upper()] = 1
+            cls._sensor_stats[stats_key] = 1
 
         # asset tracker checking
-        payload = {"asset": asset, "event": "Ingest", "service": cls._parent_service._name,
-                   "plugin": cls._parent_service._plugin_info['config']['plugin']['default']}
-        if payload not in cls._payload_events:
-            cls._parent_service._core_microservice_management_client.create_asset_tracker_event(payload)
-            cls._payload_events.append(payload)
+        cls._track_asset(asset)
 
         # _LOGGER.debug('Add readings list index: %s size: %s', cls._current_readings_list_index, list_size)
 
         if list_size == 1:
             cls._readings_list_not_empty[list_index].set()
 
-        if list_size == cls._readings_insert_batch_size:
+        # The batch size may have been lowered below the list size by the adaptive batching
+        if list_size >= cls._readings_insert_batch_size:
             cls._readings_list_batch_size_reached[list_index].set()
             # _LOGGER.debug('Set event list index: %s size: %s', cls._current_readings_list_index, len(readings_list))
 
@@ -558,3 +993,110 @@ class Ingest(object):
                     # _LOGGER.debug('Change Ingest Queue: from #%s (len %s) to #%s', cls._current_readings_list_index,
                     #               len(cls._readings_lists[list_index]), list_index)
                     break
+
+        return True
+
+    @classmethod
+    async def add_readings_batch(cls, readings: Union[list, dict]) -> int:
+        """Adds the readings returned by a plugin poll to Fledge in one call
+
+        The readings are validated and encoded one by one, an invalid reading is discarded on its own,
+        then appended to the readings lists in bulk and the statistics of each asset are updated once.
+
+        Args:
+            readings: Either a list of readings, each a dict with asset, timestamp and readings keys,
+                a single reading dict, or a columnar block of readings of one asset, a dict with an asset,
+                a list of timestamps and a readings dict holding a list of values per datapoint, e.g.
+                {"asset": "pump1", "timestamps": [t1, t2], "readings": {"velocity": [500, 510]}}
+
+        Returns:
+            The number of readings buffered or spilled to disk, the others were discarded
+
+        Raises:
+            RuntimeError:
+                The server has not been started
+
+            ValueError, TypeError:
+                readings is neither a list of readings nor a columnar block
+        """
+        if cls._stop:
+            _LOGGER.warning('The South Service is stopping')
+            return 0
+
+        if not cls._started:
+            raise RuntimeError('The South Service was not started')
+
+        if isinstance(readings, dict):
+            readings = cls._columnar_readings(readings) if 'timestamps' in readings else [readings]
+        elif not isinstance(readings, list):
+            raise TypeError('readings must be a list or a dictionary')
+
+        reads = []
+        stats_keys = []
+        assets = []
+        for reading in readings:
+            try:
+                read, stats_key = cls._encode_reading(reading['asset'], reading['timestamp'], reading.get('readings'))
+            except Exception as ex:
+                cls.increment_discarded_readings()
+                _LOGGER.debug('Discarded invalid reading %s: %s', reading, str(ex))
+                continue
+            reads.append(read)
+            stats_keys.append(stats_key)
+            assets.append(reading['asset'])
+
+        total = len(reads)
+        added = 0
+        while added < total and cls.is_available():
+            list_index = cls._current_readings_list_index
+            readings_list = cls._readings_lists[list_index]
+            list_size = len(readings_list)
+            # Fill the list up to the batch size, then beyond only if all the lists have reached it
+            fill_to = cls._readings_insert_batch_size if list_size < cls._readings_insert_batch_size \
+                else cls._readings_list_size
+            count = min(min(fill_to, cls._readings_list_size) - list_size, total - added)
+            readings_list.extend(reads[added:added + count])
+            added += count
+            if list_size == 0:
+                cls._readings_list_not_empty[list_index].set()
+            if len(readings_list) >= cls._readings_insert_batch_size:
+                cls._readings_list_batch_size_reached[list_index].set()
+                # When the current list is full, move on to the next list
+                if cls._max_concurrent_readings_inserts > 1:
+                    for list_index in range(cls._max_concurrent_readings_inserts):
+                        if len(cls._readings_lists[list_index]) < cls._readings_insert_batch_size:
+                            cls._current_readings_list_index = list_index
+                            break
+
+        # Readings for which no slot is available are spilled to disk or discarded
+        accepted = added
+        if added < total:
+            accepted += cls._spill(reads[added:])
+            refused = total - accepted
+            cls._discarded_readings_stats += refused
+            cls._backpressure_stats += refused
+
+        # Increment the count of received readings to be used for statistics update, once per asset
+        for stats_key, count in collections.Counter(stats_keys[:accepted]).items():
+            cls._sensor_stats[stats_key] = cls._sensor_stats.get(stats_key, 0) + count
+
+        for asset in set(assets[:accepted]):
+            cls._track_asset(asset)
+
+        return accepted
+
+    @staticmethod
+    def _columnar_readings(block: dict) -> list:
+        """Converts a columnar block of readings of one asset into a list of readings"""
+        timestamps = block['timestamps']
+        columns = block.get('readings') or {}
+        if not isinstance(timestamps, list) or not isinstance(columns, dict):
+            raise TypeError('timestamps must be a list and readings a dictionary of lists')
+        for name, values in columns.items():
+            if not isinstance(values, list) or len(values) != len(timestamps):
+                raise ValueError('datapoint {} must have one value per timestamp'.format(name))
+        asset = block['asset']
+        names = list(columns)
+        rows = zip(*columns.values()) if names else [()] * len(timestamps)
+        return [{"asset": asset, "timestamp": timestamp, "readings": dict(zip(names, values))}
+                for timestamp, values in zip(timestamps, rows)]
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+# FLEDGE_BEGIN
+# See: http://fledge-iot.readthedocs.io/
+# FLEDGE_END
+
+"""Runs the plugin_poll calls of a Python south plugin away from the event loop
+
+In thread mode the polls run in a thread pool, which suits plugins waiting on device I/O. In process mode they run
+in a process pool, for plugins holding the GIL while they compute their readings; the plugin handle is then pickled
+for every poll, so that a plugin keeping state in its handle between polls must not be run in process mode. Both are
+opt-in per service, as plugin_poll then runs while the service may call the other plugin entry points: the service
+stops the executor, waiting for the polls still running, before it reconfigures or shuts down the plugin.
+"""
+
+import asyncio
+import concurrent.futures
+import importlib
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+__copyright__ = "Copyright (c) 2023 Dianomic Systems Inc."
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+POLL_EXECUTOR_MODES = ('none', 'thread', 'process')
+"""none runs plugin_poll on the event loop"""
+
+STOP_TIMEOUT = 10
+"""Seconds the polls still running in the workers are waited for when the executor is stopped"""
+
+_LATENCY_SMOOTHING = 0.2
+"""Weight of the latest sample in the exponentially weighted moving average of the poll latency"""
+
+
+def _poll_in_process(module_name, handle):
+    """Runs in a worker process, the plugin module is imported by the first poll of the process"""
+    return importlib.import_module(module_name).plugin_poll(handle)
+
+
+def next_due(due, now, interval):
+    """Returns the time of the next poll and the number of polls missed
+
+    Polls are due at a fixed cadence from the first one; the polls which fell due while the loop was held up are
+    skipped rather than run back to back.
+    """
+    due += interval
+    if due > now:
+        return due, 0
+    missed = int((now - due) // interval) + 1
+    return due + missed * interval, missed
+
+
+class PollExecutor(object):
+    """Runs plugin_poll in the configured executor and measures every poll"""
+
+    def __init__(self, plugin, mode='none', max_concurrent_polls=1):
+        if mode not in POLL_EXECUTOR_MODES:
+            raise ValueError('mode must be one of {}'.format(', '.join(POLL_EXECUTOR_MODES)))
+        if max_concurrent_polls < 1:
+            raise ValueError('max_concurrent_polls must be greater than 0')
+        self._plugin = plugin
+        self.mode = mode
+        self.max_concurrent_polls = max_concurrent_polls
+        """Polls which may run at the same time, a poll due while they are all running is an overrun"""
+        self._executor = None
+        self._running = set()
+        """Futures of the polls submitted to the workers and not completed"""
+        if mode == 'thread':
+            self._executor = ThreadPoolExecutor(max_workers=max_concurrent_polls, thread_name_prefix='south-poll')
+        elif mode == 'process':
+            self._executor = ProcessPoolExecutor(max_workers=max_concurrent_polls)
+        self.polls = 0
+        self.failures = 0
+        self.overruns = 0
+        self.latency_seconds = 0.0
+        """Smoothed poll latency"""
+        self.max_latency_seconds = 0.0
+
+    async def poll(self, handle):
+        """Calls plugin_poll with the plugin handle and returns the readings"""
+        start = time.monotonic()
+        try:
+            if self.mode == 'none':
+                return self._plugin.plugin_poll(handle)
+            if self._executor is None:
+                raise RuntimeError('The poll executor is shut down')
+            if self.mode == 'process':
+                future = self._executor.submit(_poll_in_process, self._plugin.__name__, handle)
+            else:
+                future = self._executor.submit(self._plugin.plugin_poll, handle)
+            # Kept apart from the asyncio future, which is done as soon as the awaiting task is cancelled
+            self._running.add(future)
+            future.add_done_callback(self._running.discard)
+            return await asyncio.wrap_future(future)
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self._observe(time.monotonic() - start)
+
+    def overrun(self, count=1):
+        """Records polls which were due while max_concurrent_polls polls were still running"""
+        self.overruns += count
+
+    def _observe(self, latency_seconds):
+        if self.polls == 0:
+            self.latency_seconds = latency_seconds
+        else:
+            self.latency_seconds += _LATENCY_SMOOTHING * (latency_seconds - self.latency_seconds)
+        self.max_latency_seconds = max(self.max_latency_seconds, latency_seconds)
+        self.polls += 1
+
+    async def stop(self, timeout=STOP_TIMEOUT):
+        """Releases the workers once the polls still running in them complete
+
+        The polls are waited for in the default executor rather than on the event loop, up to timeout seconds.
+
+        Returns:
+            True if no poll is still running
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        running = [future for future in self._running if not future.done()]
+        if not running:
+            return True
+        loop = asyncio.get_event_loop()
+        _, not_done = await loop.run_in_executor(None, concurrent.futures.wait, running, timeout)
+        return not not_done
+
+    def state(self):
+        return {"mode": self.mode,
+                "max_concurrent_polls": self.max_concurrent_polls,
+                "polls": self.polls,
+                "failures": self.failures,
+                "overruns": self.overruns,
+                "latency_ms": int(self.latency_seconds * 1000),
+                "max_latency_ms": int(self.max_latency_seconds * 1000)}
@@ -12,6 +12,7 @@ import sys
 from fledge.services.south import exceptions
 from fledge.common import logger
 from fledge.services.south.ingest import Ingest
+from fledge.services.south.poll_executor import PollExecutor, STOP_TIMEOUT, next_due
 from fledge.services.common.microservice import FledgeMicroservice
 from aiohttp import web
 
@@ -21,7 +22,6 @@ __license__ = "Apache 2.0"
 __version__ = "${VERSION}"
 
 _LOGGER = logger.setup(__name__)
-_MAX_RETRY_POLL = 3
 _TIME_TO_WAIT_BEFORE_RETRY = 1
 _CLEAR_PENDING_TASKS_TIMEOUT = 3
 
@@ -170,9 +170,12 @@ class Server(FledgeMicroservice):
 
     async def _exec_plugin_poll(self) -> None:
         """Executes poll type plugin
+
+        Polls are started at a fixed cadence of pollInterval and run in the configured poll executor, so that a
+        slow poll holds up neither the event loop nor the next poll. A poll due while max_concurrent_polls polls
+        are still running is skipped and counted as an overrun.
         """
         _LOGGER.info('Started South Plugin: {}'.format(self._name))
-        try_count = 1
 
         # pollInterval is expressed in milliseconds
         if int(self._plugin_handle['pollInterval']['value']) <= 0:
@@ -180,42 +183,63 @@ class Server(FledgeMicroservice):
             _LOGGER.warning('Plugin {} pollInterval must be greater than 0, defaulting to {} ms'.format(
                 self._name, self._plugin_handle['pollInterval']['value']))
         sleep_seconds = int(self._plugin_handle['pollInterval']['value']) / 1000.0
-        _TIME_TO_WAIT_BEFORE_RETRY = sleep_seconds
 
-        while self._plugin and try_count <= _MAX_RETRY_POLL:
-            try:
-                t1 = self._event_loop.time()
-                data = self._plugin.plugin_poll(self._plugin_handle)
-                if len(data) > 0:
-                    if isinstance(data, list):
-                        for reading in data:
-                            asyncio.ensure_future(Ingest.add_readings(asset=reading['asset'],
-                                                                        timestamp=reading['timestamp'],
-                                                                        readings=reading['readings']))
-                    elif isinstance(data, dict):
-                        asyncio.ensure_future(Ingest.add_readings(asset=data['asset'],
-                                                                  timestamp=data['timestamp'],
-                                                                  readings=data['readings']))
-                delta = self._event_loop.time() - t1
-                # If delta somehow becomes > sleep_seconds, then ignore delta
-                sleep_for = sleep_seconds - delta if delta < sleep_seconds else sleep_seconds
-                await asyncio.sleep(sleep_for)
-            except asyncio.CancelledError:
-                pass
-            except KeyError as ex:
-                try_count = 2
-                _LOGGER.exception('Key error plugin {} : {}'.format(self._name, str(ex)))
-            except exceptions.QuietError:
-                try_count = 2
-                await asyncio.sleep(_TIME_TO_WAIT_BEFORE_RETRY)
-            except (Exception, RuntimeError, exceptions.DataRetrievalError) as ex:
-                try_count = 2
-                _LOGGER.error('Failed to poll for plugin {}'.format(self._name))
-                _LOGGER.debug('Exception poll plugin {}'.format(str(ex)))
-                await asyncio.sleep(_TIME_TO_WAIT_BEFORE_RETRY)
+        try:
+            executor = PollExecutor(self._plugin, mode=Ingest._poll_executor_mode,
+                                    max_concurrent_polls=max(1, Ingest._max_concurrent_polls))
+        except ValueError as ex:
+            _LOGGER.warning('Plugin {} polls run on the event loop, invalid poll executor configuration: {}'.format(
+                self._name, str(ex)))
+            executor = PollExecutor(self._plugin)
+        Ingest._poll_executor = executor
+        polls = set()
+
+        try:
+            due = self._event_loop.time()
+            while self._plugin:
+                # Hold the poll back while the ingest buffers are nearly full rather than having its readings
+                # discarded, but do not wait longer than a poll interval
+                if Ingest.is_congested():
+                    await Ingest.wait_for_capacity(sleep_seconds)
+                if len(polls) >= executor.max_concurrent_polls:
+                    executor.overrun()
+                else:
+                    task = asyncio.ensure_future(self._poll(executor))
+                    polls.add(task)
+                    task.add_done_callback(polls.discard)
+                due, missed = next_due(due, self._event_loop.time(), sleep_seconds)
+                if missed:
+                    executor.overrun(missed)
+                await asyncio.sleep(due - self._event_loop.time())
+        except asyncio.CancelledError:
+            pass
+        finally:
+            for task in polls:
+                task.cancel()
+            if not await executor.stop(STOP_TIMEOUT):
+                _LOGGER.warning('Plugin {} polls still running after {} seconds'.format(self._name, STOP_TIMEOUT))
+            if Ingest._poll_executor is executor:
+                Ingest._poll_executor = None
 
         _LOGGER.warning('Stopped all polling tasks for plugin: {}'.format(self._name))
 
+    async def _poll(self, executor: PollExecutor) -> None:
+        """Polls the plugin once and ingests its readings"""
+        try:
+            data = await executor.poll(self._plugin_handle)
+            if len(data) > 0 and isinstance(data, (list, dict)):
+                # A list of readings, a single reading or a columnar block of readings is ingested in one call
+                await Ingest.add_readings_batch(data)
+        except asyncio.CancelledError:
+            pass
+        except KeyError as ex:
+            _LOGGER.exception('Key error plugin {} : {}'.format(self._name, str(ex)))
+        except exceptions.QuietError:
+            pass
+        except (Exception, RuntimeError, exceptions.DataRetrievalError) as ex:
+            _LOGGER.error('Failed to poll for plugin {}'.format(self._name))
+            _LOGGER.debug('Exception poll plugin {}'.format(str(ex)))
+
     def run(self):
         """Starts the South Microservice
         """
@@ -224,8 +248,21 @@ class Server(FledgeMicroservice):
         # This activates event loop and starts fetching events to the microservice server instance
         loop.run_forever()
 
+    async def _stop_polling(self):
+        """Stops the polls of a poll plugin and waits for those running in the poll executor to complete"""
+        if self._plugin_info is None or self._plugin_info['mode'] != 'poll' or self._task_main is None:
+            return
+        task, self._task_main = self._task_main, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
     async def _stop(self, loop):
         if self._plugin is not None:
+            # plugin_shutdown must not run while a poll is running in a worker
+            await self._stop_polling()
             try:
                 self._plugin.plugin_shutdown(self._plugin_handle)
             except Exception as ex:
@@ -245,6 +282,11 @@ class Server(FledgeMicroservice):
             _LOGGER.exception('Unable to stop the Ingest server. %s', str(ex))
             raise ex
 
+        try:
+            await self.close_storage_clients()
+        except Exception as ex:
+            _LOGGER.warning('Unable to close storage connections. %s', str(ex))
+
         try:
             if self._task_main is not None:
                 self._task_main.cancel()
@@ -297,19 +339,32 @@ class Server(FledgeMicroservice):
 
         try:
             # retrieve new configuration
-            new_config = self._core_microservice_management_client.get_configuration_category(category_name=self._name)
+            new_config = await self._core_microservice_management_client_async.get_configuration_category(
+                category_name=self._name)
 
             # Check and warn if pipeline exists in South service
             if 'filter' in new_config:
                 _LOGGER.warning('South Service [%s] does not support the use of a filter pipeline.', self._name)
 
-            # plugin_reconfigure and assign new handle
-            new_handle = self._plugin.plugin_reconfigure(self._plugin_handle, new_config)
-            self._plugin_handle = new_handle
+            # plugin_reconfigure must not run while a poll is running in a worker, polls are resumed after it
+            executor = Ingest._poll_executor
+            resume_polls = executor is not None and executor.mode != 'none' and self._task_main is not None
+            if resume_polls:
+                await self._stop_polling()
+
+            try:
+                # plugin_reconfigure and assign new handle
+                new_handle = self._plugin.plugin_reconfigure(self._plugin_handle, new_config)
+                self._plugin_handle = new_handle
+            finally:
+                if resume_polls:
+                    # Polls are resumed even when the plugin could not be reconfigured
+                    self._task_main = asyncio.ensure_future(self._exec_plugin_poll())
 
             _LOGGER.info('Reconfiguration done for South plugin {}'.format(self._name))
             if new_handle['restart'] == 'yes':
-                self._task_main.cancel()
+                if self._task_main is not None:
+                    self._task_main.cancel()
                 # Executes the requested plugin type with new config
                 if self._plugin_info['mode'] == 'async':
                     self._task_main = asyncio.ensure_future(self._exec_plugin_async())
@@ -320,6 +375,6 @@ class Server(FledgeMicroservice):
             pass
         except exceptions.DataRetrievalError:
             _LOGGER.exception('Data retrieval error in plugin {} during reconfigure'.format(self._name))
-            raise web.HTTPInternalServerError('Data retrieval error in plugin {} during reconfigure'.format(self._name))
+            raise web.HTTPInternalServerError(reason='Data retrieval error in plugin {} during reconfigure'.format(self._name))
 
         return web.json_response({"south": "change"})
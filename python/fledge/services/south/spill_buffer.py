@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+# FLEDGE_BEGIN
+# See: http://fledge-iot.readthedocs.io/
+# FLEDGE_END
+
+"""Disk spill buffer for the South Ingest readings
+
+Readings which can not be inserted in storage are appended to a file and replayed later. The file starts
+with the offset of the first reading not yet replayed, followed by one JSON encoded reading per line.
+Replay reads the file through a memory map and only moves the offset once storage has accepted the
+readings, so that spilled readings survive a restart of the service. Once the replayed readings take half of the
+maximum size, or a new reading would not fit after them, the readings not yet replayed are moved to a new file.
+"""
+
+import mmap
+import os
+import struct
+
+from fledge.common.common import _FLEDGE_ROOT, _FLEDGE_DATA
+
+__copyright__ = "Copyright (c) 2023 Dianomic Systems Inc."
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+_HEADER = struct.Struct('<Q')
+_SEPARATOR = b'\n'
+_COPY_SIZE = 1024 * 1024
+
+
+def spill_path(service_name):
+    """Returns the spill file of a south service"""
+    spill_dir = _FLEDGE_DATA + '/buffer' if _FLEDGE_DATA else _FLEDGE_ROOT + '/data/buffer'
+    return '{}/{}.spill'.format(spill_dir, service_name.replace('/', '_'))
+
+
+class SpillBuffer(object):
+    """Append only file of readings waiting to be inserted in storage"""
+
+    def __init__(self, path, max_bytes):
+        if max_bytes <= _HEADER.size:
+            raise ValueError('max_bytes must be greater than {}'.format(_HEADER.size))
+        self._path = path
+        self._max_bytes = max_bytes
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._size = os.fstat(self._fd).st_size
+        self._offset = _HEADER.size
+        if self._size >= _HEADER.size:
+            self._offset = _HEADER.unpack(os.pread(self._fd, _HEADER.size, 0))[0]
+        if not _HEADER.size <= self._offset <= self._size:
+            # New or corrupted file, start again empty
+            self._reset()
+        self._drop_partial_record()
+        self.records = self._count_records()
+        """Number of readings waiting to be replayed"""
+        self.spilled = 0
+        self.replayed = 0
+        self.dropped = 0
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def disk_usage(self):
+        """Size of the spill file in bytes"""
+        return self._size
+
+    def append(self, records):
+        """Appends encoded readings to the file
+
+        Args:
+            records: list of JSON encoded readings, as str or bytes, without line breaks
+
+        Returns:
+            The number of readings written; readings which do not fit in max_bytes with the readings not yet
+            replayed are dropped
+        """
+        data = bytearray()
+        count = 0
+        pending = _HEADER.size + self._size - self._offset
+        for record in records:
+            if isinstance(record, str):
+                record = record.encode()
+            if pending + len(data) + len(record) + 1 > self._max_bytes:
+                break
+            data += record
+            data += _SEPARATOR
+            count += 1
+        if count:
+            if self._size + len(data) > self._max_bytes:
+                self._compact()
+            os.pwrite(self._fd, data, self._size)
+            self._size += len(data)
+            self.records += count
+            self.spilled += count
+        self.dropped += len(records) - count
+        return count
+
+    def read(self, max_records):
+        """Reads the oldest readings, without removing them from the file
+
+        Args:
+            max_records: maximum number of readings to return
+
+        Returns:
+            A tuple of the list of encoded readings, as bytes, and the position to :meth:`commit` once they are stored
+        """
+        if not self.records:
+            return [], self._offset
+        records = []
+        position = self._offset
+        with mmap.mmap(self._fd, self._size, access=mmap.ACCESS_READ) as spill_map:
+            while len(records) < max_records and position < self._size:
+                end = spill_map.find(_SEPARATOR, position, self._size)
+                if end < 0:
+                    break
+                records.append(spill_map[position:end])
+                position = end + 1
+        return records, position
+
+    def commit(self, position, count):
+        """Removes the readings returned by :meth:`read` once they have been stored"""
+        self.records -= count
+        self.replayed += count
+        if position >= self._size or self.records <= 0:
+            self._reset()
+        else:
+            self._offset = position
+            os.pwrite(self._fd, _HEADER.pack(position), 0)
+            if self._offset - _HEADER.size >= self._max_bytes // 2:
+                self._compact()
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _reset(self):
+        os.ftruncate(self._fd, 0)
+        os.pwrite(self._fd, _HEADER.pack(_HEADER.size), 0)
+        self._size = _HEADER.size
+        self._offset = _HEADER.size
+        self.records = 0
+
+    def _compact(self):
+        """Moves the readings not yet replayed to a new file, which replaces the spill file"""
+        tmp_path = self._path + '.tmp'
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.pwrite(fd, _HEADER.pack(_HEADER.size), 0)
+            size = _HEADER.size
+            position = self._offset
+            while position < self._size:
+                chunk = os.pread(self._fd, min(_COPY_SIZE, self._size - position), position)
+                if not chunk:
+                    break
+                os.pwrite(fd, chunk, size)
+                position += len(chunk)
+                size += len(chunk)
+            os.replace(tmp_path, self._path)
+        except OSError:
+            os.close(fd)
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        os.close(self._fd)
+        self._fd = fd
+        self._size = size
+        self._offset = _HEADER.size
+
+    def _drop_partial_record(self):
+        """Truncates a reading left incomplete by an interrupted write"""
+        if self._size <= self._offset:
+            return
+        with mmap.mmap(self._fd, self._size, access=mmap.ACCESS_READ) as spill_map:
+            end = spill_map.rfind(_SEPARATOR, self._offset) + 1
+        if end < self._size:
+            self._size = max(end, self._offset)
+            os.ftruncate(self._fd, self._size)
+
+    def _count_records(self):
+        if self._size <= self._offset:
+            return 0
+        with mmap.mmap(self._fd, self._size, access=mmap.ACCESS_READ) as spill_map:
+            count = 0
+            position = spill_map.find(_SEPARATOR, self._offset)
+            while position >= 0:
+                count += 1
+                position = spill_map.find(_SEPARATOR, position + 1)
+        return count
+
+    def state(self):
+        return {"records": self.records,
+                "disk_usage": self._size,
+                "max_bytes": self._max_bytes,
+                "spilled": self.spilled,
+                "replayed": self.replayed,
+                "dropped": self.dropped}
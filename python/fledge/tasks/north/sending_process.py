@@ -15,6 +15,8 @@
     in the translation process.
 """
 
+from fledge.common import startup_profile  # First, to profile the imports which follow
+
 import importlib
 import aiohttp
 import resource
@@ -253,9 +255,21 @@ class SendingProcess(FledgeProcess):
             "default": "10",
             "order": "12",
             "displayName": "Memory Buffer Size"
+        },
+        "memory_buffer_readings": {
+            "description": "Maximum number of readings held in memory waiting to be sent, 0 for no limit",
+            "type": "integer",
+            "default": "50000",
+            "order": "13",
+            "displayName": "Memory Buffer Readings"
         }
     }
 
+    _MAX_ASSET_CODES = 10000
+    """ Maximum number of asset codes kept in the cache used by the readings conversion """
+    _asset_codes = {}
+    """ Cache of the asset codes, as stored, to the asset codes sent to the plugin """
+
     def __init__(self, loop=None):
         super().__init__()
 
@@ -267,6 +281,7 @@ class SendingProcess(FledgeProcess):
             'blockSize': int(self._CONFIG_DEFAULT['blockSize']['default']),
             'sleepInterval': float(self._CONFIG_DEFAULT['sleepInterval']['default']),
             'memory_buffer_size': int(self._CONFIG_DEFAULT['memory_buffer_size']['default']),
+            'memory_buffer_readings': int(self._CONFIG_DEFAULT['memory_buffer_readings']['default']),
         }
         self._config_from_manager = ""
         self._module_template = "fledge.plugins.north." + "empty." + "empty"
@@ -302,6 +317,10 @@ class SendingProcess(FledgeProcess):
         self._memory_buffer_fetch_idx = 0
         self._memory_buffer_send_idx = 0
         """" Used to to managed the in memory buffer for the fetch/send operations """
+        self._memory_buffer_readings = 0
+        """" Number of readings loaded in the in memory buffer and not yet sent """
+        self._readings_prefetch = None
+        """" Last object id and task of the fetch of the next block of readings, started while the current one is converted """
         self._event_loop = asyncio.get_event_loop() if loop is None else loop
 
     @staticmethod
@@ -348,6 +367,25 @@ class SendingProcess(FledgeProcess):
         await self._update_statistics(tot_num_sent)
         await self._audit.information(self._AUDIT_CODE, {"sentRows": tot_num_sent})
 
+    async def _track_assets(self, readings):
+        """ Sends, in a single request, the Egress asset tracker events of the assets sent for the first time"""
+        events = []
+        for _reads in readings:
+            key = (_reads['asset_code'], "Egress", self._name, self._config['plugin'])
+            if key not in self._tracked_assets:
+                self._tracked_assets.add(key)
+                events.append({"asset": key[0], "event": key[1], "service": key[2], "plugin": key[3]})
+        if not events:
+            return
+        try:
+            await self._core_microservice_management_client_async.create_asset_tracker_events(events)
+        except Exception as _ex:
+            # The events are sent again with the next readings of these assets
+            self._tracked_assets.difference_update(
+                (event["asset"], event["event"], event["service"], event["plugin"]) for event in events)
+            SendingProcess._logger.error("Unable to send {} asset tracker events to the core: {}".format(
+                len(events), _ex))
+
     async def _task_send_data(self):
         """ Sends the data from the in memory structure to the destination using the loaded plugin"""
         data_sent = False
@@ -380,18 +418,12 @@ class SendingProcess(FledgeProcess):
                             await asyncio.sleep(sleep_time)
 
                         if data_sent:
-                            # asset tracker checking
-                            for _reads in self._memory_buffer[self._memory_buffer_send_idx]:
-                                payload = {"asset": _reads['asset_code'], "event": "Egress", "service": self._name,
-                                           "plugin": self._config['plugin']}
-                                if payload not in self._tracked_assets:
-                                    self._core_microservice_management_client.create_asset_tracker_event(
-                                        payload)
-                                    self._tracked_assets.append(payload)
+                            await self._track_assets(self._memory_buffer[self._memory_buffer_send_idx])
 
                             db_update = True
                             update_last_object_id = new_last_object_id
                             tot_num_sent = tot_num_sent + num_sent
+                            self._memory_buffer_readings -= len(self._memory_buffer[self._memory_buffer_send_idx])
                             self._memory_buffer[self._memory_buffer_send_idx] = None
                             self._memory_buffer_send_idx += 1
                             self._task_send_data_sem.release()
@@ -486,6 +518,8 @@ class SendingProcess(FledgeProcess):
             to a dictionary (using the eval also), like for example :
                 '{"value":02}'
             so these rows will generate an exception and will be skipped.
+            Readings having only integer and float values, the common case, are already in their
+            proper type and are passed through without being converted value by value.
         """
 
         def recurse(reading_payload):
@@ -499,18 +533,32 @@ class SendingProcess(FledgeProcess):
                     reading_payload[k] = plugin_common.convert_to_type(v)
             return reading_payload
 
+        asset_codes = SendingProcess._asset_codes
         converted_data = []
         for row in raw_data:
 
             try:
-
-                asset_code = row['asset_code'].replace(" ", "")
+                asset_code = asset_codes.get(row['asset_code'])
+                if asset_code is None:
+                    if len(asset_codes) >= SendingProcess._MAX_ASSET_CODES:
+                        asset_codes.clear()
+                    asset_code = row['asset_code'].replace(" ", "")
+                    asset_codes[row['asset_code']] = asset_code
 
                 # Skips row having undefined asset_code
                 if asset_code != "":
                     # Converts values to the proper types, for example "180.2" to float 180.2
-                    payload = recurse(row['reading'])
-                    timestamp = apply_date_format(row['user_ts'])  # Adds timezone UTC
+                    payload = row['reading']
+                    for v in payload.values():
+                        if type(v) is not int and type(v) is not float:
+                            payload = recurse(payload)
+                            break
+                    user_ts = row['user_ts']
+                    if len(user_ts) == 32 and user_ts.endswith("+00:00"):
+                        # Timestamp in the format returned by the storage layer
+                        timestamp = user_ts[:26].replace(" ", "T") + "Z"
+                    else:
+                        timestamp = apply_date_format(user_ts)  # Adds timezone UTC
                     new_row = {
                         'id': row['id'],
                         'asset_code': asset_code,
@@ -526,19 +574,54 @@ class SendingProcess(FledgeProcess):
 
         return converted_data
 
+    async def _fetch_readings(self, last_object_id):
+        """ Fetches the block of readings following last_object_id, using the prefetched one if available"""
+        prefetch, self._readings_prefetch = self._readings_prefetch, None
+        if prefetch is not None:
+            prefetch_id, prefetch_task = prefetch
+            if prefetch_id == last_object_id:
+                readings = await prefetch_task
+                return readings['rows']
+            # The position has been changed, for example by the filter, the prefetched block is not usable
+            prefetch_task.cancel()
+        # Loads data, +1 as > is needed
+        readings = await self._readings.fetch(last_object_id + 1, self._config['blockSize'])
+        return readings['rows']
+
+    def _cancel_readings_prefetch(self):
+        prefetch, self._readings_prefetch = self._readings_prefetch, None
+        if prefetch is not None:
+            prefetch_task = prefetch[1]
+            if prefetch_task.done():
+                # Retrieves the exception, if any, to avoid it being reported as never retrieved
+                if not prefetch_task.cancelled():
+                    prefetch_task.exception()
+            else:
+                prefetch_task.cancel()
+
     async def _load_data_into_memory_readings(self, last_object_id):
-        """ Extracts from the DB Layer data related to the readings loading into a memory structure"""
+        """ Extracts from the DB Layer data related to the readings loading into a memory structure
+
+        The fetch of the next block is started before the conversion of the current one, the conversion
+        runs in the default executor so that the fetch and the sending of the previous blocks progress meanwhile.
+        """
         raw_data = None
         converted_data = []
         try:
-            # Loads data, +1 as > is needed
-            readings = await self._readings.fetch(last_object_id + 1, self._config['blockSize'])
-            raw_data = readings['rows']
-            converted_data = self._transform_in_memory_data_readings(raw_data)
+            raw_data = await self._fetch_readings(last_object_id)
+            if raw_data:
+                self._readings_prefetch = (raw_data[-1]['id'],
+                                           asyncio.ensure_future(self._readings.fetch(raw_data[-1]['id'] + 1,
+                                                                                      self._config['blockSize'])))
+                converted_data = await self._event_loop.run_in_executor(None, self._transform_in_memory_data_readings,
+                                                                        raw_data)
         except aiohttp.client_exceptions.ClientPayloadError as _ex:
             SendingProcess._logger.warning(_MESSAGES_LIST["e000009"].format(str(_ex)))
+            self._cancel_readings_prefetch()
         except Exception as _ex:
             SendingProcess._logger.error(_MESSAGES_LIST["e000009"].format(str(_ex)))
+            # The block following the one which failed is fetched again, from the position reached
+            self._cancel_readings_prefetch()
             raise
         return converted_data
 
@@ -585,7 +668,7 @@ class SendingProcess(FledgeProcess):
                 slept = False
                 if self._memory_buffer_fetch_idx < self._config['memory_buffer_size']:
                     # Checks if there is enough space to load a new block of data
-                    if self._memory_buffer[self._memory_buffer_fetch_idx] is None:
+                    if self._memory_buffer[self._memory_buffer_fetch_idx] is None and not self._memory_buffer_full():
                         try:
                             data_to_send = await self._load_data_into_memory(last_object_id)
                         except Exception as ex:
@@ -616,6 +699,7 @@ class SendingProcess(FledgeProcess):
 
                             # Loads the block of data into the in memory buffer
                             self._memory_buffer[self._memory_buffer_fetch_idx] = data_to_send
+                            self._memory_buffer_readings += len(data_to_send)
                             last_position = len(data_to_send) - 1
                             last_object_id = data_to_send[last_position]['id']
                             self._memory_buffer_fetch_idx += 1
@@ -643,11 +727,18 @@ class SendingProcess(FledgeProcess):
             await self._audit.failure(self._AUDIT_CODE, {"error - on _task_fetch_data": _message})
             raise
 
+    def _memory_buffer_full(self):
+        """ True if loading a new block of data would exceed the maximum number of readings held in memory"""
+        max_readings = self._config['memory_buffer_readings']
+        return 0 < max_readings < self._memory_buffer_readings + self._config['blockSize'] \
+            and self._memory_buffer_readings > 0
+
     async def send_data(self):
         """ Handles the sending of the data to the destination using the configured plugin for a defined amount of time"""
 
         # Prepares the in memory buffer for the fetch/send operations
         self._memory_buffer = [None for _ in range(self._config['memory_buffer_size'])]
+        self._memory_buffer_readings = 0
         self._task_fetch_data_sem = asyncio.Semaphore(0)
         self._task_send_data_sem = asyncio.Semaphore(0)
         self._task_fetch_data_task_id = asyncio.ensure_future(self._task_fetch_data())
@@ -682,6 +773,7 @@ class SendingProcess(FledgeProcess):
             self._task_send_data_sem.release()
             await self._task_fetch_data_task_id
             await self._task_send_data_task_id
+            self._cancel_readings_prefetch()
         except Exception as ex:
             SendingProcess._logger.error(_MESSAGES_LIST["e000029"].format(ex))
 
@@ -875,6 +967,8 @@ class SendingProcess(FledgeProcess):
                 self._config['plugin'] = _config_from_manager['plugin']['value']
 
             self._config['memory_buffer_size'] = int(_config_from_manager['memory_buffer_size']['value'])
+            if 'memory_buffer_readings' in _config_from_manager:
+                self._config['memory_buffer_readings'] = int(_config_from_manager['memory_buffer_readings']['value'])
             _config_from_manager['_CONFIG_CATEGORY_NAME'] = cat_name
 
             if 'stream_id' in _config_from_manager:
@@ -966,12 +1060,22 @@ class SendingProcess(FledgeProcess):
             await self._audit.failure(self._AUDIT_CODE, {"error - on start": _message})
             raise
 
-        # The list of unique reading payload for asset tracker
-        self._tracked_assets = []
+        # (asset, event, service, plugin) of the asset tracker events already sent
+        self._tracked_assets = set()
 
         return exec_sending_process
 
     async def run(self):
+        """ Sends the data, then closes the pooled storage clients, also when the process exits with sys.exit """
+        try:
+            await self._run()
+        finally:
+            try:
+                await self.close_storage_clients()
+            except Exception as ex:
+                SendingProcess._logger.warning('Unable to close storage connections. %s', str(ex))
+
+    async def _run(self):
         global _log_performance
         global _LOGGER
 
@@ -989,8 +1093,10 @@ class SendingProcess(FledgeProcess):
         _log_performance = self._log_performance
 
         try:
-            self._storage_async = StorageClientAsync(self._core_management_host, self._core_management_port)
-            self._readings = ReadingsStorageClientAsync(self._core_management_host, self._core_management_port)
+            self._storage_async = StorageClientAsync(self._core_management_host, self._core_management_port,
+                                                     pooled=True)
+            self._readings = ReadingsStorageClientAsync(self._core_management_host, self._core_management_port,
+                                                        pooled=True)
             self._audit = AuditLogger(self._storage_async)
         except Exception as ex:
             SendingProcess._logger.exception(_MESSAGES_LIST["e000023"].format(str(ex)))
@@ -1024,9 +1130,23 @@ class SendingProcess(FledgeProcess):
             raise
         SendingProcess._logger.info("Stopped")
 
+    def storage_pool_stats(self):
+        """ Connection pool counters, including the readings client used to fetch the data to send """
+        stats = super().storage_pool_stats()
+        if self._readings is not None and self._readings.pooled:
+            stats["readings_fetch"] = self._readings.pool_stats()
+        return stats
+
+    async def close_storage_clients(self):
+        """ Close the pooled storage sessions, including the readings client used to fetch the data to send """
+        await super().close_storage_clients()
+        if self._readings is not None:
+            await self._readings.close()
+
 
 if __name__ == "__main__":
 
     loop = asyncio.get_event_loop()
     sp = SendingProcess(loop)
+    startup_profile.report("SendingProcess")
     loop.run_until_complete(sp.run())
@@ -8,6 +8,7 @@
 """Purge process starter"""
 
 import asyncio
+from fledge.common import startup_profile  # First, to profile the imports which follow
 from fledge.common.logger import FLCoreLogger
 from fledge.tasks.purge.purge import Purge
 
@@ -21,4 +22,6 @@ if __name__ == '__main__':
     _logger = FLCoreLogger().get_logger("Purge")
     loop = asyncio.get_event_loop()
     purge_process = Purge()
+    startup_profile.report("Purge")
     loop.run_until_complete(purge_process.run())
+    loop.run_until_complete(purge_process.close_storage_clients())
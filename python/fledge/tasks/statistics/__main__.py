@@ -8,6 +8,7 @@
 """Statistics history process starter"""
 
 import asyncio
+from fledge.common import startup_profile  # First, to profile the imports which follow
 from fledge.common.logger import FLCoreLogger
 from fledge.tasks.statistics.statistics_history import StatisticsHistory
 
@@ -20,5 +21,7 @@ __version__ = "${VERSION}"
 if __name__ == '__main__':
     _logger = FLCoreLogger().get_logger("StatisticsHistory")
     statistics_history_process = StatisticsHistory()
+    startup_profile.report("StatisticsHistory")
     loop = asyncio.get_event_loop()
     loop.run_until_complete(statistics_history_process.run())
+    loop.run_until_complete(statistics_history_process.close_storage_clients())
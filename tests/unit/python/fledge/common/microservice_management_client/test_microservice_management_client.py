@@ -5,15 +5,21 @@ from unittest.mock import patch
 from http.client import HTTPConnection, HTTPResponse
 import json
 import pytest
+from aiohttp import web
+from aiohttp.test_utils import unused_port
 
 from fledge.common.microservice_management_client import exceptions as client_exceptions
-from fledge.common.microservice_management_client.microservice_management_client import MicroserviceManagementClient, _logger
+from fledge.common.microservice_management_client.microservice_management_client import MicroserviceManagementClient, \
+    MicroserviceManagementClientAsync, _logger
 
 __author__ = "Ashwin Gopalakrishnan"
 __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
 __license__ = "Apache 2.0"
 __version__ = "${VERSION}"
 
+HOST = '127.0.0.1'
+PORT = unused_port()
+
 
 @pytest.allure.feature("unit")
 @pytest.allure.story("common", "microservice-management-client")
@@ -783,3 +789,144 @@ class TestMicroserviceManagementClient:
         assert 'POST' == kwargs['method']
         assert '/fledge/track' == kwargs['url']
         assert test_dict == json.loads(kwargs['body'])
+
+
+class FakeCoreMgtServer:
+    """Core management API answering the async client tests, counting the requests of each route"""
+
+    def __init__(self, bulk_track=True):
+        self.calls = {}
+        self.tracked = []
+        self.app = web.Application()
+        self.app.router.add_get('/fledge/service', self.get_services)
+        self.app.router.add_post('/fledge/service', self.register_service)
+        self.app.router.add_get('/fledge/service/category/{name}', self.get_category)
+        self.app.router.add_post('/fledge/track', self.add_track)
+        if bulk_track:
+            self.app.router.add_post('/fledge/track/bulk', self.add_track_bulk)
+        self.app.router.add_get('/fledge/alert/{key}', self.get_alert)
+        self.runner = None
+
+    async def start(self):
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, HOST, PORT).start()
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    def _count(self, request):
+        self.calls[request.path] = self.calls.get(request.path, 0) + 1
+
+    async def get_services(self, request):
+        self._count(request)
+        return web.json_response({"services": [{"name": request.query.get("name", "all")}]})
+
+    async def register_service(self, request):
+        self._count(request)
+        return web.json_response({"id": "a7d3d4d1-8f3b-4d5e-9c5e-6e9d8f1c2b3a"})
+
+    async def get_category(self, request):
+        self._count(request)
+        name = request.match_info['name']
+        if name == 'broken':
+            raise web.HTTPInternalServerError(reason='broken category')
+        return web.json_response({"name": {"value": name}})
+
+    async def add_track(self, request):
+        self._count(request)
+        self.tracked.append(await request.json())
+        return web.json_response(self.tracked[-1])
+
+    async def add_track_bulk(self, request):
+        self._count(request)
+        events = (await request.json())["track"]
+        self.tracked.extend(events)
+        return web.json_response({"track": events})
+
+    async def get_alert(self, request):
+        self._count(request)
+        raise web.HTTPNotFound(reason='not found', text=json.dumps({"message": "not found"}))
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("common", "microservice-management-client")
+class TestMicroserviceManagementClientAsync:
+
+    @pytest.mark.asyncio
+    async def test_get_services_cached(self):
+        srvr = FakeCoreMgtServer()
+        await srvr.start()
+        client = MicroserviceManagementClientAsync(HOST, PORT, services_cache_ttl=30)
+        try:
+            for _ in range(3):
+                assert {"services": [{"name": "sine"}]} == await client.get_services('sine')
+            assert {"services": [{"name": "all"}]} == await client.get_services()
+            assert 2 == srvr.calls['/fledge/service']
+            assert 2 == client.services_cache_hits
+            # the response handed out is a copy of the cached one
+            (await client.get_services('sine'))["services"].clear()
+            assert {"services": [{"name": "sine"}]} == await client.get_services('sine')
+
+            await client.register_service({"name": "new"})
+            await client.get_services('sine')
+            assert 4 == srvr.calls['/fledge/service']
+            # one keep-alive connection for all the requests
+            assert 1 == client._pool.stats()["misses"]
+        finally:
+            await client.close()
+            await srvr.stop()
+
+    @pytest.mark.asyncio
+    async def test_get_configuration_categories(self):
+        srvr = FakeCoreMgtServer()
+        await srvr.start()
+        client = MicroserviceManagementClientAsync(HOST, PORT)
+        try:
+            categories = await client.get_configuration_categories(['sine', 'sine Advanced'])
+            assert {'sine': {"name": {"value": "sine"}},
+                    'sine Advanced': {"name": {"value": "sine Advanced"}}} == categories
+            with patch.object(_logger, "error") as log_error:
+                with pytest.raises(client_exceptions.MicroserviceManagementClientError) as excinfo:
+                    await client.get_configuration_categories(['sine', 'broken'])
+                assert 500 == excinfo.value.status
+            log_error.assert_called_once_with("Server error code: %d, Reason: %s", 500, 'broken category')
+        finally:
+            await client.close()
+            await srvr.stop()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("bulk_track", [True, False])
+    async def test_create_asset_tracker_events(self, bulk_track):
+        srvr = FakeCoreMgtServer(bulk_track=bulk_track)
+        await srvr.start()
+        client = MicroserviceManagementClientAsync(HOST, PORT)
+        events = [{"asset": "a{}".format(i), "event": "Ingest", "service": "sine", "plugin": "sinusoid"}
+                  for i in range(3)]
+        try:
+            with patch.object(_logger, "error"):
+                assert events[:2] == await client.create_asset_tracker_events(events[:2])
+                assert events[2:] == await client.create_asset_tracker_events(events[2:])
+            assert events == srvr.tracked
+            if bulk_track:
+                assert {'/fledge/track/bulk': 2} == srvr.calls
+            else:
+                # the bulk endpoint is only tried once against a core without it
+                assert 3 == srvr.calls['/fledge/track']
+                assert client._bulk_track_supported is False
+        finally:
+            await client.close()
+            await srvr.stop()
+
+    @pytest.mark.asyncio
+    async def test_get_alert_by_key_not_found(self):
+        srvr = FakeCoreMgtServer()
+        await srvr.start()
+        client = MicroserviceManagementClientAsync(HOST, PORT)
+        try:
+            with patch.object(_logger, "error") as log_error:
+                assert {"message": "not found"} == await client.get_alert_by_key('update')
+            assert 0 == log_error.call_count
+        finally:
+            await client.close()
+            await srvr.stop()
@@ -8,7 +8,7 @@ import json
 import os
 import pytest
 import py
-from fledge.common.storage_client.payload_builder import PayloadBuilder
+from fledge.common.storage_client.payload_builder import PayloadBuilder, Param
 
 __author__ = "Vaibhav Singhal"
 __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
@@ -553,3 +553,49 @@ class TestPayloadBuilderDelete:
     def test_delete_where_payload(self, input_where, input_table, expected):
         res = PayloadBuilder().DELETE(input_table).WHERE(input_where).payload()
         assert expected == json.loads(res)
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("payload_builder")
+class TestPayloadBuilderInstance:
+    """
+    This class tests builders are independent and prepared queries
+    """
+    def test_builders_are_independent(self):
+        first = PayloadBuilder().SELECT("name").WHERE(["id", "=", 1])
+        second = PayloadBuilder().SELECT("id").LIMIT(5)
+        assert {"return": ["name"], "where": {"column": "id", "condition": "=", "value": 1}} == \
+            json.loads(first.payload())
+        assert {"return": ["id"], "limit": 5} == json.loads(second.payload())
+
+    def test_chain_payload_extended(self):
+        chain = PayloadBuilder().WHERE(["id", ">", 1]).chain_payload()
+        PayloadBuilder(chain).LIMIT(2)
+        assert 2 == chain["limit"]
+
+    def test_prepare(self):
+        query = PayloadBuilder().SELECT("key", "value").WHERE(["key", "=", Param("key")]) \
+            .AND_WHERE(["ts", ">", Param("since")]).LIMIT(Param("limit")).prepare()
+        assert ("key", "since", "limit") == query.params
+        for key, since, limit in (("READINGS", "2023-01-01", 10), ('a "quoted" key', None, 1)):
+            expected = PayloadBuilder().SELECT("key", "value").WHERE(["key", "=", key]) \
+                .AND_WHERE(["ts", ">", since]).LIMIT(limit).payload()
+            assert expected.encode() == query.payload(key=key, since=since, limit=limit)
+
+    def test_prepare_repeated_and_structured_params(self):
+        query = PayloadBuilder().SET(value=Param("value")).WHERE(["key", "=", Param("key")]) \
+            .OR_WHERE(["key", "=", Param("key")]).prepare()
+        payload = json.loads(query.payload(key="K", value={"nested": [1, 2]}).decode())
+        assert {"nested": [1, 2]} == payload["values"]["value"]
+        assert "K" == payload["where"]["value"] == payload["where"]["or"]["value"]
+
+    def test_prepare_missing_param(self):
+        query = PayloadBuilder().WHERE(["key", "=", Param("key")]).prepare()
+        with pytest.raises(ValueError) as excinfo:
+            query.payload(value=1)
+        assert "Missing value of query parameter key" == str(excinfo.value)
+
+    def test_prepare_without_params(self):
+        query = PayloadBuilder().SELECT("id").LIMIT(1).prepare()
+        assert () == query.params
+        assert b'{"return": ["id"], "limit": 1}' == query.payload()
@@ -16,6 +16,7 @@ from functools import partial
 
 from fledge.common.service_record import ServiceRecord
 from fledge.common.storage_client.storage_client import _LOGGER, StorageClientAsync, ReadingsStorageClientAsync
+from fledge.common.storage_client.utils import StorageResult
 
 from fledge.common.storage_client.exceptions import *
 
@@ -239,7 +240,7 @@ class TestStorageClientAsync:
         assert "Data to insert is missing" in str(excinfo.value)
 
         with pytest.raises(Exception) as excinfo:
-            args = "aTable", {"k": "v"}
+            args = "aTable", {"k": {"v"}}
             await sc.insert_into_tbl(*args)
         assert excinfo.type is TypeError
         assert "Provided data to insert must be a valid JSON" in str(excinfo.value)
@@ -248,6 +249,13 @@ class TestStorageClientAsync:
         response = await sc.insert_into_tbl(*args)
         assert {"k": "v"} == response["called"]
 
+        # Objects are encoded by the client, bytes are sent as they are
+        response = await sc.insert_into_tbl("aTable", {"k": "v"})
+        assert {"k": "v"} == response["called"]
+        response = await sc.insert_into_tbl("aTable", b'{"k": "v"}', raw=True)
+        assert isinstance(response, StorageResult)
+        assert {"k": "v"} == response.json()["called"]
+
         with pytest.raises(Exception) as excinfo:
             with patch.object(_LOGGER, "error") as log_e:
                 with patch.object(_LOGGER, "info") as log_i:
@@ -297,7 +305,7 @@ class TestStorageClientAsync:
         assert "Data to update is missing" in str(excinfo.value)
 
         with pytest.raises(Exception) as excinfo:
-            args = "aTable", {"k": "v"}
+            args = "aTable", {"k": {"v"}}
             await sc.update_tbl(*args)
         assert excinfo.type is TypeError
         assert "Provided data to update must be a valid JSON" in str(excinfo.value)
@@ -461,7 +469,7 @@ class TestStorageClientAsync:
         assert "Query payload is missing" in str(excinfo.value)
 
         with pytest.raises(Exception) as excinfo:
-            args = "aTable", {"k": "v"}
+            args = "aTable", {"k": {"v"}}
             await sc.query_tbl_with_payload(*args)
         assert excinfo.type is TypeError
         assert "Query payload must be a valid JSON" in str(excinfo.value)
@@ -492,6 +500,51 @@ class TestStorageClientAsync:
 
         await fake_storage_srvr.stop()
 
+    def test_not_pooled_by_default(self):
+        mockServiceRecord = MagicMock(ServiceRecord)
+        mockServiceRecord._address = "local"
+        mockServiceRecord._type = "Storage"
+        mockServiceRecord._port = 1000
+        mockServiceRecord._management_port = 2000
+
+        sc = StorageClientAsync(1, 2, mockServiceRecord)
+        assert sc.pooled is False
+        assert sc.pool_stats() is None
+
+    @pytest.mark.asyncio
+    async def test_pooled_session_reuse(self, event_loop):
+        fake_storage_srvr = FakeFledgeStorageSrvr(loop=event_loop)
+        await fake_storage_srvr.start()
+
+        mockServiceRecord = MagicMock(ServiceRecord)
+        mockServiceRecord._address = HOST
+        mockServiceRecord._type = "Storage"
+        mockServiceRecord._port = PORT
+        mockServiceRecord._management_port = 2000
+
+        sc = StorageClientAsync(1, 2, mockServiceRecord, pooled=True, pool_size=2, pool_idle_timeout=30)
+        assert sc.pooled is True
+        assert {"hits": 0, "misses": 0, "sessions": 0, "pool_size": 2, "idle_timeout": 30} == sc.pool_stats()
+
+        for _ in range(3):
+            response = await sc.insert_into_tbl("aTable", json.dumps({"k": "v"}))
+            assert {"k": "v"} == response["called"]
+        response = await sc.query_tbl("aTable")
+        assert 1 == response["called"]
+
+        stats = sc.pool_stats()
+        assert 1 == stats["sessions"]
+        assert 1 == stats["misses"]
+        assert 3 == stats["hits"]
+
+        await sc.close()
+        response = await sc.query_tbl("aTable")
+        assert 1 == response["called"]
+        assert 2 == sc.pool_stats()["sessions"]
+
+        await sc.close()
+        await fake_storage_srvr.stop()
+
 
 @pytest.allure.feature("unit")
 @pytest.allure.story("common", "storage_client")
@@ -554,6 +607,11 @@ class TestReadingsStorageAsyncClient:
         response = await rsc.append(readings)
         assert {'readings': []} == response['appended']
 
+        response = await rsc.append(b'{"readings": []}', raw=True)
+        assert {'readings': []} == response.json()['appended']
+        response = await rsc.append({"readings": []})
+        assert {'readings': []} == response['appended']
+
         await fake_storage_srvr.stop()
 
     @pytest.mark.asyncio
@@ -6,8 +6,10 @@
 
 """ Test common/storage_client/utils.py """
 
+import json
+
 import pytest
-from fledge.common.storage_client.utils import Utils
+from fledge.common.storage_client.utils import Utils, StorageResult
 
 __copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
 __license__ = "Apache 2.0"
@@ -45,3 +47,23 @@ class TestUtils:
     def test_is_json_return_false_with_invalid_json(self, test_input):
         ret_val = Utils.is_json(test_input)
         assert ret_val is False
+
+    @pytest.mark.parametrize("test_input", [{"k": "v"}, [1, 2.5, None, True], {"k": {"k1": ["v1"]}}, {1: "v"}])
+    def test_dumps(self, test_input):
+        ret_val = Utils.dumps(test_input)
+        assert isinstance(ret_val, bytes)
+        assert json.loads(json.dumps(test_input)) == json.loads(ret_val.decode())
+
+    def test_dumps_invalid(self):
+        with pytest.raises(TypeError):
+            Utils.dumps({"k": {"v"}})
+
+    @pytest.mark.parametrize("test_input", ['{"k": "v"}', b'{"k": "v"}', bytearray(b'{"k": "v"}')])
+    def test_loads(self, test_input):
+        assert {"k": "v"} == Utils.loads(test_input)
+
+    def test_storage_result(self):
+        result = StorageResult(b'{"rows": [], "count": 0}')
+        assert b'{"rows": [], "count": 0}' == result
+        assert {"rows": [], "count": 0} == result.json()
+        assert result.json() is result.json()
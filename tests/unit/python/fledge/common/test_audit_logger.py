@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 
 import asyncio
+import json
 import pytest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
-from fledge.common.audit_logger import AuditLogger
+from fledge.common.audit_logger import AuditLogger, AuditLoggerSingleton, AuditWriter
+from fledge.common.storage_client.exceptions import StorageServerError
 from fledge.common.storage_client.storage_client import StorageClientAsync
 
 __copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
@@ -130,3 +132,175 @@ class TestAuditLogger():
         await audit.success('AUDTCODE', None)
         assert audit._storage.insert_into_tbl.called is True
         audit._storage.insert_into_tbl.reset_mock()
+
+
+class FakeLogTable(object):
+    """ Rows inserted in the log table, refusing the inserts holding a code it does not know """
+
+    def __init__(self):
+        self.rows = []
+        self.inserts = 0
+        self.available = True
+
+    async def insert(self, table, payload):
+        assert 'log' == table
+        if not self.available:
+            raise RuntimeError("Storage unavailable")
+        if isinstance(payload, str):
+            # A single entry written as it is logged
+            payload = {'inserts': [json.loads(payload)]}
+        if any(row['code'] == 'BADCD' for row in payload['inserts']):
+            raise StorageServerError(code=400, reason="Bad Request", error={"message": "foreign key"})
+        self.inserts += 1
+        self.rows.extend(payload['inserts'])
+        return {"response": "inserted", "rows_affected": len(payload['inserts'])}
+
+    def storage(self):
+        storage = MagicMock(spec=StorageClientAsync)
+        storage.insert_into_tbl.side_effect = self.insert
+        return storage
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("common", "audit-logger")
+class TestAuditWriter:
+
+    @pytest.mark.parametrize("kwargs", [
+        {"flush_interval": 0},
+        {"flush_size": 0},
+        {"flush_size": 10, "queue_size": 5},
+        {"queue_size": "100"}
+    ])
+    def test_bad_arguments(self, kwargs):
+        with pytest.raises(ValueError):
+            AuditWriter(MagicMock(spec=StorageClientAsync), **kwargs)
+
+    async def test_flush_in_batches(self):
+        table = FakeLogTable()
+        writer = AuditWriter(table.storage(), flush_size=2)
+        for i in range(5):
+            assert writer.append(4, 'AUDT{}'.format(i), {'i': i} if i % 2 else None) is True
+        assert 5 == writer.depth
+        assert await writer.flush() is True
+        assert 3 == table.inserts
+        assert ['AUDT{}'.format(i) for i in range(5)] == [row['code'] for row in table.rows]
+        assert 'log' not in table.rows[0]
+        assert {'i': 1} == table.rows[1]['log']
+        assert all('ts' in row for row in table.rows)
+        assert 0 == writer.depth
+
+    async def test_flush_on_size_and_interval(self):
+        table = FakeLogTable()
+        writer = AuditWriter(table.storage(), flush_interval=60, flush_size=3)
+        writer.start()
+        writer.append(4, 'AUDT1', None)
+        writer.append(4, 'AUDT2', None)
+        await asyncio.sleep(0.05)
+        assert [] == table.rows
+        writer.append(4, 'AUDT3', None)
+        await asyncio.sleep(0.05)
+        assert 3 == len(table.rows)
+        await writer.stop()
+
+        writer = AuditWriter(table.storage(), flush_interval=0.05)
+        writer.start()
+        writer.append(4, 'AUDT4', None)
+        await asyncio.sleep(0.2)
+        assert 'AUDT4' == table.rows[-1]['code']
+        await writer.stop()
+
+    async def test_stop_writes_queued_entries(self):
+        table = FakeLogTable()
+        writer = AuditWriter(table.storage(), flush_interval=60)
+        writer.start()
+        writer.append(4, 'FSTOP', None)
+        assert await writer.stop() is True
+        assert ['FSTOP'] == [row['code'] for row in table.rows]
+
+    async def test_queue_full(self):
+        table = FakeLogTable()
+        writer = AuditWriter(table.storage(), flush_size=2, queue_size=3)
+        with patch('fledge.common.audit_logger._logger') as patch_logger:
+            results = [writer.append(4, 'AUDT{}'.format(i), None) for i in range(5)]
+        assert [True, True, True, False, False] == results
+        assert 2 == writer.dropped
+        assert 2 == patch_logger.warning.call_count
+        await writer.flush()
+        assert ['AUDT0', 'AUDT1', 'AUDT2'] == [row['code'] for row in table.rows]
+
+    async def test_storage_unavailable(self):
+        table = FakeLogTable()
+        table.available = False
+        writer = AuditWriter(table.storage(), flush_size=2)
+        writer.append(4, 'AUDT1', None)
+        writer.append(4, 'AUDT2', None)
+        with patch('fledge.common.audit_logger._logger') as patch_logger:
+            assert await writer.flush() is False
+        assert 1 == patch_logger.error.call_count
+        assert 1 == writer.failures
+        writer.append(4, 'AUDT3', None)
+        assert 3 == writer.depth
+        table.available = True
+        assert await writer.flush() is True
+        # The entries kept are written first, in the order they were logged
+        assert ['AUDT1', 'AUDT2', 'AUDT3'] == [row['code'] for row in table.rows]
+
+    async def test_refused_entry(self):
+        table = FakeLogTable()
+        writer = AuditWriter(table.storage(), flush_size=3)
+        for code in ('AUDT1', 'BADCD', 'AUDT2'):
+            writer.append(4, code, None)
+        with patch('fledge.common.audit_logger._logger') as patch_logger:
+            assert await writer.flush() is False
+        patch_logger.error.assert_called_once()
+        assert ['AUDT1', 'AUDT2'] == [row['code'] for row in table.rows]
+        assert 1 == writer.refused
+        assert 0 == writer.dropped
+        assert 0 == writer.depth
+        writer.append(4, 'AUDT3', None)
+        assert await writer.flush() is True
+
+    async def test_stop_reports_refused_entry(self):
+        table = FakeLogTable()
+        with patch.dict(AuditLoggerSingleton._shared_state, clear=True):
+            audit = AuditLogger(table.storage())
+            audit.start_writer(flush_interval=60)
+            await audit.information('BADCD', None)
+            writer = audit._writer
+            with patch('fledge.common.audit_logger._logger'):
+                assert await audit.stop_writer() is False
+            assert 1 == writer.refused
+            assert [] == table.rows
+
+    async def test_wait_writes_now(self):
+        table = FakeLogTable()
+        with patch.dict(AuditLoggerSingleton._shared_state, clear=True):
+            audit = AuditLogger(table.storage())
+            audit.start_writer(flush_interval=60)
+            await audit.information('AUDT1', None)
+            await audit.warning('AUDT2', None, wait=True)
+            assert ['AUDT2'] == [row['code'] for row in table.rows]
+            with patch('fledge.common.audit_logger._logger'):
+                with pytest.raises(StorageServerError):
+                    await audit.warning('BADCD', None, wait=True)
+            assert 1 == audit.queue_depth
+            assert await audit.stop_writer() is True
+            assert ['AUDT2', 'AUDT1'] == [row['code'] for row in table.rows]
+
+    async def test_audit_logger_writer(self):
+        table = FakeLogTable()
+        with patch.dict(AuditLoggerSingleton._shared_state, clear=True):
+            audit = AuditLogger(table.storage())
+            audit.start_writer(flush_interval=60)
+            await audit.information('AUDT1', {'message': 'queued'})
+            await audit.failure('AUDT2', None)
+            assert 2 == audit.queue_depth
+            assert 0 == audit.dropped
+            assert [] == table.rows
+            assert await audit.stop_writer() is True
+            assert [('AUDT1', 4), ('AUDT2', 1)] == [(row['code'], row['level']) for row in table.rows]
+            assert 0 == audit.queue_depth
+            # Written as it is logged once the writer is stopped
+            await audit.success('AUDT3', None)
+            assert 2 == table.inserts
+            assert 'AUDT3' == table.rows[-1]['code']
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import datetime
 import pytest
 from fledge.common.configuration_manager import ConfigurationCache
 
@@ -16,9 +17,12 @@ class TestConfigurationCache:
     def test_init(self):
         cached_manager = ConfigurationCache()
         assert {} == cached_manager.cache
-        assert 10 == cached_manager.max_cache_size
+        assert 100 == cached_manager.max_cache_size
+        assert 0 == cached_manager.ttl
         assert 0 == cached_manager.hit
         assert 0 == cached_manager.miss
+        assert 0 == cached_manager.evictions
+        assert 0 == cached_manager.expirations
 
     def test_size(self):
         cached_manager = ConfigurationCache()
@@ -54,7 +58,7 @@ class TestConfigurationCache:
         assert cat_display_name == cached_manager.cache[cat_name]['displayName']
 
     def test_remove_oldest(self):
-        cached_manager = ConfigurationCache()
+        cached_manager = ConfigurationCache(max_cache_size=10)
         cached_manager.update("cat1", "desc1", {'value': {}})
         cached_manager.update("cat2", "desc2", {'value': {}})
         cached_manager.update("cat3", "desc3", {'value': {}})
@@ -93,3 +97,58 @@ class TestConfigurationCache:
         assert 'cat1' in cached_manager.cache
         assert 'cat3' in cached_manager.cache
         assert 'cat4' in cached_manager.cache
+
+    def test_remove_least_recently_used(self):
+        cached_manager = ConfigurationCache(max_cache_size=3)
+        cached_manager.update("cat1", "desc1", {'value': {}})
+        cached_manager.update("cat2", "desc2", {'value': {}})
+        cached_manager.update("cat3", "desc3", {'value': {}})
+        assert "cat1" in cached_manager
+        cached_manager.update("cat4", "desc4", {'value': {}})
+        assert ['cat3', 'cat1', 'cat4'] == list(cached_manager.cache)
+        assert 1 == cached_manager.evictions
+        cached_manager.remove("cat5")
+        assert 3 == cached_manager.size
+
+    def test_ttl(self):
+        cached_manager = ConfigurationCache(ttl=60)
+        cached_manager.update("cat1", "desc1", {'value': {}})
+        assert "cat1" in cached_manager
+        cached_manager._cached_at["cat1"] -= datetime.timedelta(seconds=61)
+        assert "cat1" not in cached_manager
+        assert 'cat1' not in cached_manager.cache
+        assert 1 == cached_manager.expirations
+        assert 1 == cached_manager.hit
+        assert 1 == cached_manager.miss
+
+    def test_ttl_reset_on_update(self):
+        cached_manager = ConfigurationCache(ttl=60)
+        cached_manager.update("cat1", "desc1", {'value': {}})
+        cached_manager._cached_at["cat1"] -= datetime.timedelta(seconds=61)
+        # The category written again is as fresh as the storage layer
+        cached_manager.update("cat1", "desc1", {'value': {'item': 1}})
+        assert "cat1" in cached_manager
+        assert {'value': {'item': 1}} == cached_manager.cache["cat1"]['value']
+        assert 0 == cached_manager.expirations
+
+    def test_configure(self):
+        cached_manager = ConfigurationCache()
+        for i in range(5):
+            cached_manager.update("cat{}".format(i), "desc", {'value': {}})
+        cached_manager.configure(2, 30)
+        assert 2 == cached_manager.max_cache_size
+        assert 30 == cached_manager.ttl
+        assert ['cat3', 'cat4'] == list(cached_manager.cache)
+        assert {'size': 2, 'maxSize': 2, 'ttl': 30, 'hit': 0, 'miss': 0, 'evictions': 3,
+                'expirations': 0} == cached_manager.stats()
+
+    @pytest.mark.parametrize("max_cache_size, ttl, message", [
+        (0, 0, 'max_cache_size must be a positive integer'),
+        ('10', 0, 'max_cache_size must be a positive integer'),
+        (10, -1, 'ttl must be a non negative integer')
+    ])
+    def test_configure_bad(self, max_cache_size, ttl, message):
+        cached_manager = ConfigurationCache()
+        with pytest.raises(ValueError) as excinfo:
+            cached_manager.configure(max_cache_size, ttl)
+        assert message == str(excinfo.value)
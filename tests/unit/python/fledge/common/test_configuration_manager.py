@@ -1819,19 +1819,19 @@ class TestConfigurationManager:
         c_mgr = ConfigurationManager(storage_client_mock)
 
         # Changed in version 3.8: patch() now returns an AsyncMock if the target is an async function.
+        category = {'key': category_name, 'description': 'desc', 'display_name': category_name,
+                    'value': {item_name: {'type': 'string', 'value': 'bla'}}}
         if sys.version_info.major == 3 and sys.version_info.minor >= 8:
-            _rv1 = await async_mock('bla')
-            _rv2 = await async_mock(None)
+            _rv = await async_mock(category)
         else:
-            _rv1 = asyncio.ensure_future(async_mock('bla'))
-            _rv2 = asyncio.ensure_future(async_mock(None))        
+            _rv = asyncio.ensure_future(async_mock(category))
 
-        with patch.object(ConfigurationManager, '_read_item_val', return_value=_rv1) as read_item_patch:
-            with patch.object(ConfigurationManager, '_read_category', return_value=_rv2) as read_cat_patch:
-                ret_val = await c_mgr.get_category_item(category_name, item_name)
-                assert 'bla' == ret_val
-            read_cat_patch.assert_called_once_with(category_name)
-        read_item_patch.assert_called_once_with(category_name, item_name)
+        with patch.object(ConfigurationManager, '_read_category', return_value=_rv) as read_cat_patch:
+            ret_val = await c_mgr.get_category_item(category_name, item_name)
+            assert {'type': 'string', 'value': 'bla'} == ret_val
+            # Served from the cache, including the other items
+            assert await c_mgr.get_category_item(category_name, 'other') is None
+        read_cat_patch.assert_called_once_with(category_name)
 
     async def test_get_category_item_bad(self, reset_singleton):
         category_name = 'catname'
@@ -1839,10 +1839,10 @@ class TestConfigurationManager:
         storage_client_mock = MagicMock(spec=StorageClientAsync)
         c_mgr = ConfigurationManager(storage_client_mock)
         with patch.object(_logger, 'exception') as log_exc:
-            with patch.object(ConfigurationManager, '_read_item_val', side_effect=Exception()) as readpatch:
+            with patch.object(ConfigurationManager, '_read_category', side_effect=Exception()) as readpatch:
                 with pytest.raises(Exception):
                     await c_mgr.get_category_item(category_name, item_name)
-            readpatch.assert_called_once_with(category_name, item_name)
+            readpatch.assert_called_once_with(category_name)
         assert 1 == log_exc.call_count
         log_exc.assert_called_once_with('Unable to get category item based on category_name %s and item_name %s', 'catname', 'item_name')
 
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+
+# FLEDGE_BEGIN
+# See: http://fledge-iot.readthedocs.io/
+# FLEDGE_END
+
+import io
+import os
+import pickle
+import threading
+from unittest.mock import patch
+
+import pytest
+
+import fledge
+from fledge.common import iprpc
+from fledge.common.iprpc import AsyncIPCModuleClient, InterProcessRPC, IPCModuleClient, IPCModuleClientPool
+
+__copyright__ = "Copyright (c) 2023 Dianomic Systems Inc."
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+SERVER_MODULE = '''
+import os
+import time
+
+from fledge.common.iprpc import InterProcessRPC
+
+
+class EchoError(Exception):
+    pass
+
+
+class EchoServer(InterProcessRPC):
+    def echo(self, value):
+        return value
+
+    def slow_echo(self, value, seconds):
+        time.sleep(seconds)
+        return value
+
+    def fail(self, message):
+        raise ValueError(message)
+
+    def fail_custom(self, message):
+        raise EchoError(message)
+
+    def pid(self):
+        return os.getpid()
+
+
+if __name__ == '__main__':
+    EchoServer().serve()
+'''
+
+
+class EchoError(Exception):
+    pass
+
+
+@pytest.fixture
+def channel(tmpdir):
+    """ A writer and a reader sharing an arg file of 1 KB and a pipe, as a client and its server do """
+    path = str(tmpdir.join('argfile'))
+    with open(path, 'wb') as argfile:
+        argfile.truncate(1024)
+    read_fd, write_fd = os.pipe()
+    writer = InterProcessRPC(infd=io.BytesIO(), outfd=io.BufferedWriter(io.FileIO(write_fd, mode='w')),
+                             argfile_fd=os.open(path, os.O_RDWR))
+    reader = InterProcessRPC(infd=io.BufferedReader(io.FileIO(read_fd)), outfd=io.BytesIO(),
+                             argfile_fd=os.open(path, os.O_RDWR))
+    yield writer, reader
+    for end in (writer, reader):
+        end.mfile.close()
+        os.close(end.argfile_fd)
+    writer.outfd.close()
+    reader.infd.close()
+
+
+@pytest.fixture(scope='module')
+def server_module(tmpdir_factory):
+    module_dir = tmpdir_factory.mktemp('iprpc')
+    module_dir.join('echo_server.py').write(SERVER_MODULE)
+    # The server process imports fledge from the same tree as the tests
+    fledge_root = os.path.dirname(os.path.dirname(os.path.abspath(fledge.__file__)))
+    python_path = os.environ.get('PYTHONPATH')
+    os.environ['PYTHONPATH'] = fledge_root if not python_path else python_path + ':' + fledge_root
+    yield 'echo_server', str(module_dir)
+    if python_path is None:
+        del os.environ['PYTHONPATH']
+    else:
+        os.environ['PYTHONPATH'] = python_path
+
+
+def _close(client):
+    # The server exits once its stdin is closed
+    client.outfd.close()
+
+
+@pytest.fixture(scope='module')
+def client(server_module):
+    client = IPCModuleClient(*server_module)
+    yield client
+    _close(client)
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("common", "iprpc")
+class TestInterProcessRPC:
+
+    def test_import_does_not_duplicate_stdio(self):
+        # The stdin/stdout of the server are duplicated when it starts, not when the module is imported
+        assert iprpc.InterProcessRPC.__init__.__defaults__[:2] == (None, None)
+
+    def test_call_round_trip(self, channel):
+        writer, reader = channel
+        rpcobj = {'method': 'echo', 'args': [1, 'two', {'three': 3.0}]}
+        writer.rpc_write(rpcobj)
+        assert rpcobj == reader.rpc_read()
+        writer.rpc_write(None)
+        assert reader.rpc_read() is None
+
+    def test_arg_file_grows(self, channel):
+        writer, reader = channel
+        data = os.urandom(100000)
+        writer.rpc_write({'method': 'echo', 'args': [data]})
+        assert len(writer.mfile) > 100000
+        # The reader maps the arg file again at the size the writer grew it to
+        assert {'method': 'echo', 'args': [data]} == reader.rpc_read()
+        assert len(writer.mfile) == len(reader.mfile)
+
+    def test_message_beyond_arg_file(self, channel):
+        writer, reader = channel
+        writer.outfd.write(b'4096\n')
+        writer.outfd.flush()
+        with pytest.raises(ValueError) as excinfo:
+            reader.rpc_read()
+        assert 'rpc message of 4096 bytes exceeds the arg file size 1024' == str(excinfo.value)
+
+    def test_eof(self, channel):
+        writer, reader = channel
+        writer.outfd.close()
+        with pytest.raises(EOFError):
+            reader.rpc_read()
+
+    @pytest.mark.parametrize("exception, expected_class, expected_message", [
+        (ValueError('bad value'), ValueError, 'bad value'),
+        (KeyError('key'), KeyError, "\"'key'\""),
+        (EchoError('unknown to the reader'), Exception, 'EchoError: unknown to the reader')
+    ])
+    def test_exception(self, channel, exception, expected_class, expected_message):
+        writer, reader = channel
+        writer.rpc_exception(exception)
+        with patch.object(iprpc, '_LOGGER'):
+            with pytest.raises(expected_class) as excinfo:
+                reader.rpc_read()
+        assert expected_class is excinfo.type
+        assert expected_message == str(excinfo.value)
+
+    @pytest.mark.skipif(not iprpc.OUT_OF_BAND, reason="requires pickle protocol 5")
+    def test_out_of_band_buffers(self, channel):
+        writer, reader = channel
+        first = bytearray(os.urandom(3000))
+        second = bytearray(os.urandom(500))
+        sizes = writer._dump({'first': pickle.PickleBuffer(first), 'second': pickle.PickleBuffer(second)})
+        # The buffers follow the pickle stream rather than being copied into it
+        assert [3000, 500] == sizes[1:]
+        assert sizes[0] < 500
+        loaded = reader._load(sizes[0], sizes[1:])
+        assert first == loaded['first']
+        assert second == loaded['second']
+        # The loaded buffers are copies, the next call may overwrite the arg file
+        writer.mfile[:] = b'\0' * len(writer.mfile)
+        assert first == loaded['first']
+
+    @pytest.mark.skipif(not iprpc.OUT_OF_BAND, reason="requires pickle protocol 5")
+    def test_out_of_band_signal_line(self, channel):
+        writer, reader = channel
+        data = bytearray(os.urandom(2000))
+        pipe, writer.outfd = writer.outfd, io.BytesIO()
+        writer.rpc_write({'method': 'echo', 'args': [pickle.PickleBuffer(data)]})
+        line = writer.outfd.getvalue()
+        # <len> <buffer size>
+        assert line.endswith(b'\n')
+        assert b'2000' == line.split()[1]
+        writer.outfd = pipe
+        pipe.write(line)
+        pipe.flush()
+        assert data == reader.rpc_read()['args'][0]
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("common", "iprpc")
+class TestIPCModuleClient:
+
+    def test_echo(self, client):
+        assert [1, {'two': 2}] == client.echo([1, {'two': 2}])
+        assert client.echo(None) is None
+
+    def test_large_echo(self, client):
+        data = os.urandom(iprpc.ARGFILE_SIZE + 1024 * 1024)
+        assert data == client.echo(data)
+        assert len(client.mfile) > iprpc.ARGFILE_SIZE
+        assert 'small' == client.echo('small')
+
+    def test_exceptions(self, client):
+        with pytest.raises(ValueError) as excinfo:
+            client.fail('server failure')
+        assert 'server failure' == str(excinfo.value)
+        with patch.object(iprpc, '_LOGGER') as patch_logger:
+            with pytest.raises(Exception) as excinfo:
+                client.fail_custom('custom failure')
+        assert 'EchoError: custom failure' == str(excinfo.value)
+        patch_logger.warning.assert_called_once_with('unknown local exception EchoError')
+        # The server keeps serving
+        assert 1 == client.echo(1)
+
+    def test_calls_from_threads(self, client):
+        results = {}
+
+        def call(value):
+            results[value] = client.slow_echo(value, 0.01)
+
+        threads = [threading.Thread(target=call, args=(value,)) for value in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # One call at a time on the pipe, every thread reads its own result
+        assert {value: value for value in range(8)} == results
+
+    @pytest.mark.asyncio
+    async def test_async_client(self, server_module):
+        client = AsyncIPCModuleClient(*server_module)
+        try:
+            assert {'a': 1} == await client.echo({'a': 1})
+            with pytest.raises(ValueError):
+                await client.fail('async failure')
+        finally:
+            _close(client)
+
+    def test_pool(self, server_module):
+        pool = IPCModuleClientPool(*server_module, size=2)
+        try:
+            assert 2 == len(set(pool.broadcast('pid')))
+            assert list(range(10)) == pool.map('slow_echo', [(value, 0.01) for value in range(10)])
+            assert 'proxied' == pool.echo('proxied')
+        finally:
+            for pool_client in pool._clients:
+                _close(pool_client)
+            pool._executor.shutdown()
@@ -6,6 +6,7 @@
 
 import pytest
 import logging
+from unittest.mock import patch, mock_open
 
 from fledge.common import logger
 
@@ -95,3 +96,101 @@ class TestLogger:
                     log.setLevel(level) 
                     log.propagate = propagate
                     assert log is logger.setup(name, propagate=propagate, level=level)
+
+    @pytest.mark.parametrize("cmdline, expected", [
+        (b"python3\0-m\0fledge.tasks.purge\0--port=40773\0--address=0.0.0.0\0--name=purge\0", "Fledge purge"),
+        (b"python3\0-m\0fledge.tasks.north\0--name=OMF to PI\0--port=1\0", "Fledge OMF to PI"),
+        (b"python3\0-m\0fledge.services.core\0", "Fledge")
+    ])
+    def test_get_process_name(self, cmdline, expected):
+        with patch.object(logger, "_process_name", None):
+            with patch("builtins.open", mock_open(read_data=cmdline)) as patch_open:
+                assert expected == logger.get_process_name()
+                # Resolved once
+                assert expected == logger.get_process_name()
+            patch_open.assert_called_once_with('/proc/self/cmdline', 'rb')
+
+    def test_get_process_name_without_proc(self):
+        with patch.object(logger, "_process_name", None):
+            with patch("builtins.open", side_effect=OSError):
+                with patch.object(logger.sys, "argv", ["fledge.tasks.statistics", "--name=stats collector"]):
+                    assert "Fledge stats collector" == logger.get_process_name()
+
+
+class ListHandler(logging.Handler):
+    """Keeps the messages written"""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+
+
+@pytest.fixture
+def queued_logger():
+    _logger = logging.getLogger("test_queued_logger")
+    target = ListHandler()
+    _logger.handlers = [logger.QueuedHandler(target)]
+    _logger.propagate = False
+    logger.error_override(_logger)
+    yield _logger, target
+    _logger.handlers = []
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("common", "logger")
+class TestQueuedHandler:
+
+    def test_records_written(self, queued_logger):
+        _logger, target = queued_logger
+        _logger.warning("Retry %d of %s", 1, "insert")
+        _logger.warning("First line\nSecond line")
+        logger.flush()
+        assert ["Retry 1 of insert", "First line", "Second line"] == target.messages
+
+    def test_error_with_traceback(self, queued_logger):
+        _logger, target = queued_logger
+        try:
+            raise ValueError("Bad value")
+        except ValueError as ex:
+            _logger.error(ex, "Failed to add data.")
+        _logger.error("Failed for code: %s", "CONCH")
+        logger.flush()
+        assert "Failed to add data." == target.messages[0]
+        assert "Traceback (most recent call last):" == target.messages[1]
+        assert "ValueError: Bad value" == target.messages[-2]
+        assert "Failed for code: CONCH" == target.messages[-1]
+
+    def test_rate_limit(self, queued_logger):
+        _logger, target = queued_logger
+        counts = logger.log_drop_counts()
+        with patch.object(logger, "RATE_LIMIT_RECORDS", 3):
+            with patch.object(logger.time, "monotonic", return_value=100.0):
+                for i in range(5):
+                    _logger.warning("Storage unavailable, retry %d", i)
+                _logger.warning("Another message")
+            with patch.object(logger.time, "monotonic", return_value=100.0 + logger.RATE_LIMIT_INTERVAL):
+                _logger.warning("Storage unavailable, retry %d", 5)
+        logger.flush()
+        assert ["Storage unavailable, retry 0", "Storage unavailable, retry 1", "Storage unavailable, retry 2",
+                "Another message",
+                "2 similar log records dropped in {} seconds: Storage unavailable, retry %d".format(
+                    logger.RATE_LIMIT_INTERVAL),
+                "Storage unavailable, retry 5"] == target.messages
+        assert counts['rateLimited'] + 2 == logger.log_drop_counts()['rateLimited']
+
+    def test_queue_full(self):
+        writer = logger._LogWriter(size=2)
+        target = ListHandler()
+        blocked = logger.threading.Event()
+        target.emit = lambda record: blocked.wait(5) and ListHandler.emit(target, record)
+        for i in range(5):
+            writer.put(target, logging.makeLogRecord({'msg': 'record {}'.format(i)}))
+        # One record being written, two queued
+        assert 2 <= writer.dropped <= 3
+        blocked.set()
+        writer.flush(timeout=5)
+        assert 5 - writer.dropped + 1 == len(target.messages)
+        assert "{} log records dropped, the log queue was full".format(writer.dropped) in target.messages
@@ -7,10 +7,12 @@
 import asyncio
 import os
 import copy
+import sys
 from unittest.mock import patch
 import pytest
 
 from fledge.common.plugin_discovery import PluginDiscovery, _logger
+from fledge.common.plugin_index import PluginInfoIndex
 from fledge.services.core.api import utils
 from fledge.services.core.api.plugins import common
 from fledge.plugins.common import utils as api_utils
@@ -448,6 +450,25 @@ class TestPluginDiscovery:
                                                        installed_dir_name, is_config)
             assert expected == actual
 
+    def test_get_plugin_config_indexed(self, tmpdir):
+        info = {'name': "modbus", 'version': "1.1", 'type': "south", 'interface': "1.0",
+                'config': {'plugin': {'description': 'Modbus RTU plugin', 'type': 'string', 'default': 'modbus'}}}
+        plugin_dir = tmpdir.mkdir("modbus")
+        plugin_dir.join("modbus.py").write("")
+        module_name = "fledge.plugins.south.modbus.modbus"
+        with patch('fledge.common.plugin_discovery.plugin_index', PluginInfoIndex()):
+            with patch.object(common, 'load_and_fetch_python_plugin_info', return_value=info) as patch_load:
+                first = PluginDiscovery.get_plugin_config(str(plugin_dir), "south", "south", True)
+                assert first == PluginDiscovery.get_plugin_config(str(plugin_dir), "south", "south", True)
+                assert 1 == patch_load.call_count
+                # An updated plugin is imported again
+                plugin_dir.join("modbus.py").write("# updated")
+                with patch.dict('sys.modules', {module_name: object()}):
+                    PluginDiscovery.get_plugin_config(str(plugin_dir), "south", "south", True)
+                    assert module_name not in sys.modules
+                assert 2 == patch_load.call_count
+        assert info['config'] == first['config']
+
     @pytest.mark.parametrize("info, warn_count", [
         ({'name': "modbus", 'version': "1.1", 'type': "south", 'interface': "1.0",
           'config': {'plugin': {'description': 'Modbus RTU plugin', 'type': 'string', 'default': 'modbus'}}}, 0),
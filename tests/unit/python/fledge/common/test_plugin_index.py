@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+# FLEDGE_BEGIN
+# See: http://fledge-iot.readthedocs.io/
+# FLEDGE_END
+
+import json
+import os
+
+import pytest
+
+from fledge.common.plugin_index import PluginInfoIndex
+
+__copyright__ = "Copyright (c) 2023 Dianomic Systems Inc."
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+INFO = {"name": "Random", "version": "1.0.0", "type": "south", "config": {"plugin": {"default": "Random"}}}
+
+
+@pytest.fixture
+def plugin_file(tmpdir):
+    lib = tmpdir.mkdir("Random").join("libRandom.so")
+    lib.write("v1")
+    return str(lib)
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("common", "plugin-index")
+class TestPluginInfoIndex:
+
+    def test_get_miss(self, plugin_file):
+        index = PluginInfoIndex()
+        assert index.get(plugin_file) is None
+        assert 1 == index.misses
+
+    def test_put_and_get(self, plugin_file):
+        index = PluginInfoIndex()
+        index.put(plugin_file, INFO)
+        info = index.get(plugin_file)
+        assert INFO == info
+        assert 1 == index.hits
+        # A copy is returned
+        info["config"]["plugin"]["default"] = "changed"
+        assert INFO == index.get(plugin_file)
+
+    def test_changed_file(self, plugin_file):
+        index = PluginInfoIndex()
+        index.put(plugin_file, INFO)
+        with open(plugin_file, 'w') as f:
+            f.write("version 2")
+        assert index.is_stale(plugin_file)
+        assert index.get(plugin_file) is None
+
+    @pytest.mark.parametrize("file_name", ["helper.py", "lib/helper.py"])
+    def test_changed_directory(self, plugin_file, file_name):
+        index = PluginInfoIndex()
+        helper = os.path.join(os.path.dirname(plugin_file), file_name)
+        os.makedirs(os.path.dirname(helper), exist_ok=True)
+        with open(helper, 'w') as f:
+            f.write("v1")
+        index.put(plugin_file, INFO)
+        assert INFO == index.get(plugin_file)
+        # A module the plugin imports is updated, the plugin file itself is unchanged
+        with open(helper, 'w') as f:
+            f.write("version 2")
+        assert index.is_stale(plugin_file)
+        assert index.get(plugin_file) is None
+
+    def test_added_file_and_pycache(self, plugin_file):
+        index = PluginInfoIndex()
+        plugin_dir = os.path.dirname(plugin_file)
+        index.put(plugin_file, INFO)
+        # Byte code written by the import of the plugin is not a change of the plugin
+        os.makedirs(os.path.join(plugin_dir, "__pycache__"))
+        with open(os.path.join(plugin_dir, "__pycache__", "Random.cpython-38.pyc"), 'w') as f:
+            f.write("byte code")
+        assert INFO == index.get(plugin_file)
+        with open(os.path.join(plugin_dir, "libRandomHelper.so"), 'w') as f:
+            f.write("v1")
+        assert index.get(plugin_file) is None
+
+    @pytest.mark.parametrize("file_name, info", [
+        ("missing.so", INFO),
+        ("libRandom.so", {}),
+        ("libRandom.so", {"handle": object()})
+    ])
+    def test_put_ignored(self, tmpdir, plugin_file, file_name, info):
+        index = PluginInfoIndex()
+        index.put(str(tmpdir.join("Random", file_name)), info)
+        assert 0 == index.size
+
+    def test_save_and_load(self, tmpdir, plugin_file):
+        path = str(tmpdir.join("cache", "plugin_index.json"))
+        index = PluginInfoIndex(path)
+        index.put(plugin_file, INFO)
+        index.put(str(tmpdir.join("Random", "removed.so")), INFO)
+        index.save()
+        assert not os.path.exists(path + '.tmp')
+        loaded = PluginInfoIndex(path)
+        assert INFO == loaded.get(plugin_file)
+        assert 1 == loaded.size
+
+    def test_save_not_dirty(self, tmpdir):
+        path = str(tmpdir.join("plugin_index.json"))
+        PluginInfoIndex(path).save()
+        assert not os.path.exists(path)
+
+    @pytest.mark.parametrize("content", ["not json", json.dumps({"version": 1, "plugins": {}}), "[]"])
+    def test_load_invalid_file(self, tmpdir, plugin_file, content):
+        path = tmpdir.join("plugin_index.json")
+        path.write(content)
+        index = PluginInfoIndex(str(path))
+        assert index.get(plugin_file) is None
+        index.put(plugin_file, INFO)
+        index.save()
+        assert INFO == PluginInfoIndex(str(path)).get(plugin_file)
@@ -3,7 +3,7 @@
 import pytest
 import sys
 
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 from fledge.common import process
 from fledge.common.storage_client.storage_client import ReadingsStorageClientAsync, StorageClientAsync
@@ -56,8 +56,8 @@ class TestFledgeProcess:
                     with patch.object(StorageClientAsync, '__init__', return_value=None) as sc_async_patch:
                         fp = FledgeProcessImp()
         mmc_patch.assert_called_once_with('corehost', 32333)
-        rsc_async_patch.assert_called_once_with('corehost', 32333)
-        sc_async_patch.assert_called_once_with('corehost', 32333)
+        rsc_async_patch.assert_called_once_with('corehost', 32333, pooled=True)
+        sc_async_patch.assert_called_once_with('corehost', 32333, pooled=True)
         assert fp._core_management_host is 'corehost'
         assert fp._core_management_port == 32333
         assert fp._name is 'sname'
@@ -66,6 +66,29 @@ class TestFledgeProcess:
         assert hasattr(fp, '_storage_async')
         assert hasattr(fp, '_start_time')
 
+    @pytest.mark.asyncio
+    async def test_close_storage_clients(self):
+        class FledgeProcessImp(FledgeProcess):
+            def run(self):
+                pass
+        with patch.object(sys, 'argv', ['pytest', '--address', 'corehost', '--port', '32333', '--name', 'sname']):
+            with patch.object(MicroserviceManagementClient, '__init__', return_value=None):
+                with patch.object(ReadingsStorageClientAsync, '__init__', return_value=None):
+                    with patch.object(StorageClientAsync, '__init__', return_value=None):
+                        fp = FledgeProcessImp()
+        stats = {"hits": 9, "misses": 1, "sessions": 1, "pool_size": 10, "idle_timeout": 60}
+        fp._storage_async = MagicMock(spec=StorageClientAsync, pooled=True)
+        fp._storage_async.pool_stats.return_value = stats
+        fp._readings_storage_async = MagicMock(spec=ReadingsStorageClientAsync, pooled=False)
+        fp._core_microservice_management_client_async = None
+        assert {"storage": stats} == fp.storage_pool_stats()
+        with patch.object(process._logger, "info") as patch_logger:
+            await fp.close_storage_clients()
+        # The counters are logged before the pooled connections are closed
+        patch_logger.assert_called_once_with('Storage connection pools of %s: %s', 'sname', {"storage": stats})
+        fp._storage_async.close.assert_called_once_with()
+        fp._readings_storage_async.close.assert_called_once_with()
+
     def test_get_services_from_core(self):
         class FledgeProcessImp(FledgeProcess):
             def run(self):
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+# FLEDGE_BEGIN
+# See: http://fledge-iot.readthedocs.io/
+# FLEDGE_END
+
+import builtins
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from fledge.common import startup_profile
+
+__copyright__ = "Copyright (c) 2023 Dianomic Systems Inc."
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+@pytest.fixture
+def modules(tmpdir):
+    """A package importing a module, which are not imported yet"""
+    package = tmpdir.mkdir("profiled_pkg")
+    package.join("__init__.py").write("from . import child\n")
+    package.join("child.py").write("import time\ntime.sleep(0.01)\n")
+    sys.path.insert(0, str(tmpdir))
+    yield
+    sys.path.remove(str(tmpdir))
+    for name in ("profiled_pkg", "profiled_pkg.child"):
+        sys.modules.pop(name, None)
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("common", "startup-profile")
+class TestStartupProfile:
+
+    def test_not_enabled(self):
+        assert not startup_profile.is_enabled()
+        with startup_profile.phase("storage"):
+            pass
+        assert [] == startup_profile.report("Core")
+
+    def test_profile_imports(self, modules):
+        original_import = builtins.__import__
+        with patch.object(startup_profile, "_profile", None):
+            profile = startup_profile.enable()
+            assert startup_profile.is_enabled()
+            with startup_profile.phase("storage"):
+                import profiled_pkg
+            with patch("fledge.common.logger.FLCoreLogger.get_logger") as patch_logger:
+                lines = startup_profile.report("Core", top=2)
+            assert not startup_profile.is_enabled()
+        assert builtins.__import__ is original_import
+        cumulative, own = profile.imports["profiled_pkg"]
+        child_cumulative, child_own = profile.imports["profiled_pkg.child"]
+        assert child_own >= 0.01
+        assert cumulative >= child_cumulative
+        assert own < child_own
+        assert lines[0].startswith("Startup of Core: ")
+        assert lines[1].startswith("Phase storage: ")
+        assert lines[2].startswith("Import profiled_pkg.child: ")
+        assert 4 == len(lines)
+        assert 4 == patch_logger.return_value.info.call_count
+
+    def test_modules_already_imported_not_recorded(self):
+        profile = startup_profile.StartupProfile()
+        profile.install()
+        try:
+            import json
+        finally:
+            profile.uninstall()
+        assert {} == profile.imports
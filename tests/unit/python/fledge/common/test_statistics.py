@@ -192,7 +192,36 @@ class TestStatistics:
         with patch.object(s._storage, 'update_tbl', return_value=_rv) as stat_update:
             await s.update('READING', 5)
             assert expected_result['response'] == "updated"
-        stat_update.assert_called_once_with('statistics', payload)
+        stat_update.assert_called_once_with('statistics', payload.encode())
+
+    async def test_set_bulk(self):
+        storage_client_mock = MagicMock(spec=StorageClientAsync)
+        s = statistics.Statistics(storage_client_mock)
+
+        async def mock_coro():
+            return {"response": "updated", "rows_affected": 2}
+
+        # Changed in version 3.8: patch() now returns an AsyncMock if the target is an async function.
+        if sys.version_info.major == 3 and sys.version_info.minor >= 8:
+            _rv = await mock_coro()
+        else:
+            _rv = asyncio.ensure_future(mock_coro())
+
+        payload = {"updates": [
+            {"values": {"value": 512}, "where": {"column": "key", "condition": "=", "value": "S1-IngestBatchSize"}},
+            {"values": {"value": 20}, "where": {"column": "key", "condition": "=", "value": "S1-IngestLatency"}}]}
+        with patch.object(s._storage, 'update_tbl', return_value=_rv) as stat_update:
+            await s.set_bulk({'S1-IngestBatchSize': 512, 'S1-IngestLatency': 20})
+        args, kwargs = stat_update.call_args
+        assert 'statistics' == args[0]
+        assert payload == json.loads(args[1])
+
+    async def test_set_bulk_with_invalid_params(self):
+        storage_client_mock = MagicMock(spec=StorageClientAsync)
+        s = statistics.Statistics(storage_client_mock)
+        with pytest.raises(TypeError) as excinfo:
+            await s.set_bulk([('S1-IngestBatchSize', 512)])
+        assert 'stat_list must be a dict' == str(excinfo.value)
 
     @pytest.mark.parametrize("key, value_increment, exception_name, exception_message", [
         (123456, 120, TypeError, "key must be a string"),
@@ -238,7 +267,7 @@ class TestStatistics:
 
         with patch.object(s._storage, 'update_tbl', return_value=_rv) as stat_update:
             await s.add_update(stat_dict)
-        stat_update.assert_called_once_with('statistics', payload)
+        stat_update.assert_called_once_with('statistics', payload.encode())
 
     async def test_insert_when_key_error(self):
         stat_dict = {'FOGBENCH/TEMPERATURE': 1}
@@ -274,3 +303,98 @@ class TestStatistics:
                 with patch.object(statistics._logger, 'exception') as logger_exception:
                     await s.add_update(stat_dict)
                 logger_exception.assert_called_once_with(*msg)
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("common", "statistics")
+class TestStatisticsCounters:
+
+    @pytest.mark.parametrize("flush_interval, flush_threshold, exception_message", [
+        (0, 10, "flush_interval must be a positive number"),
+        ('5', 10, "flush_interval must be a positive number"),
+        (5, 0, "flush_threshold must be a positive integer"),
+        (5, 1.5, "flush_threshold must be a positive integer")
+    ])
+    def test_init_with_invalid_params(self, flush_interval, flush_threshold, exception_message):
+        with pytest.raises(ValueError) as excinfo:
+            statistics.StatisticsCounters(MagicMock(), flush_interval, flush_threshold)
+        assert exception_message == str(excinfo.value)
+
+    async def test_flush(self):
+        stats = MagicMock(spec=statistics.Statistics)
+        counters = statistics.StatisticsCounters(stats)
+        counters.increment('READINGS', 2)
+        counters.increment('READINGS', 3)
+        counters.increment('DISCARDED', 0)
+        counters.increment('S1', 5, 'Readings of S1')
+        counters.set('S1-IngestBatchSize', 100)
+        assert 10 == counters.pending
+        assert await counters.flush() is True
+        stats.register.assert_called_once_with('S1', 'Readings of S1')
+        stats.update_bulk.assert_called_once_with({'READINGS': 5, 'S1': 5})
+        stats.set_bulk.assert_called_once_with({'S1-IngestBatchSize': 100})
+        assert 0 == counters.pending
+        assert 1 == counters.flushes
+
+        # Nothing pending and the key is registered only once
+        assert await counters.flush() is True
+        counters.increment('S1', 1, 'Readings of S1')
+        assert await counters.flush() is True
+        assert 1 == stats.register.call_count
+        assert 2 == stats.update_bulk.call_count
+
+    async def test_flush_failure_keeps_counters(self):
+        stats = MagicMock(spec=statistics.Statistics)
+        stats.update_bulk.side_effect = Exception()
+        counters = statistics.StatisticsCounters(stats)
+        counters.increment('READINGS', 2)
+        counters.set('S1-IngestLatency', 20)
+        with patch.object(statistics._logger, 'exception') as logger_exception:
+            assert await counters.flush() is False
+        assert 1 == logger_exception.call_count
+        assert 1 == counters.failures
+        assert 2 == counters.pending
+        counters.increment('READINGS', 1)
+        stats.update_bulk.side_effect = None
+        assert await counters.flush() is True
+        stats.update_bulk.assert_called_with({'READINGS': 3})
+        stats.set_bulk.assert_called_once_with({'S1-IngestLatency': 20})
+
+    async def test_threshold_and_stop(self):
+        stats = MagicMock(spec=statistics.Statistics)
+        counters = statistics.StatisticsCounters(stats, flush_interval=60, flush_threshold=10)
+        counters.start()
+        counters.increment('READINGS', 10)
+        await asyncio.sleep(0.1)
+        stats.update_bulk.assert_called_once_with({'READINGS': 10})
+        counters.increment('READINGS', 4)
+        assert await counters.stop() is True
+        stats.update_bulk.assert_called_with({'READINGS': 4})
+        assert 0 == counters.pending
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("common", "statistics")
+class TestStatisticsCollector:
+
+    async def test_collect(self):
+        storage = MagicMock(spec=StorageClientAsync)
+        storage.query_tbl.return_value = {'count': 2, 'rows': [
+            {'key': 'READINGS', 'value': 12, 'previous_value': 2},
+            {'key': 'PURGED', 'value': 5, 'previous_value': 5}]}
+        await statistics.StatisticsCollector(storage).collect()
+        storage.query_tbl.assert_called_once_with('statistics')
+        args, kwargs = storage.insert_into_tbl.call_args
+        assert 'statistics_history' == args[0]
+        inserts = json.loads(args[1])['inserts']
+        assert [('READINGS', 10), ('PURGED', 0)] == [(row['key'], row['value']) for row in inserts]
+        # Only the changed key is updated
+        storage.update_tbl.assert_called_once_with('statistics', json.dumps({'updates': [
+            {"values": {"previous_value": 12}, "where": {"column": "key", "condition": "=", "value": "READINGS"}}]}))
+
+    async def test_collect_no_change(self):
+        storage = MagicMock(spec=StorageClientAsync)
+        storage.query_tbl.return_value = {'count': 1, 'rows': [{'key': 'PURGED', 'value': 5, 'previous_value': 5}]}
+        await statistics.StatisticsCollector(storage).collect()
+        assert 1 == storage.insert_into_tbl.call_count
+        assert 0 == storage.update_tbl.call_count
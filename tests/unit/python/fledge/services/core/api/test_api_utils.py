@@ -1,8 +1,10 @@
+import json
 import subprocess
 
 from unittest.mock import MagicMock, patch
 import pytest
 
+from fledge.common.plugin_index import PluginInfoIndex
 from fledge.services.core.api import utils
 
 __author__ = "Ashish Jabble"
@@ -74,3 +76,29 @@ class TestUtils:
                                           'default': 'Random'},
                                'asset': {'description': 'Asset name', 'type': 'string', 'default': 'Random'}}} == j
         patch_lib.assert_called_once_with('Random', 'south')
+
+    def test_get_plugin_info_indexed(self, tmpdir):
+        lib = tmpdir.join('libRandom.so')
+        lib.write('')
+        info = {"name": "Random", "version": "1.0.0", "type": "south", "config": {}}
+        process_mock = MagicMock()
+        process_mock.communicate.return_value = (json.dumps(info).encode(), b'')
+        with patch.object(utils, 'plugin_index', PluginInfoIndex()):
+            with patch.object(utils, '_find_c_lib', return_value=str(lib)):
+                with patch.object(utils.subprocess, 'Popen', return_value=process_mock) as patch_popen:
+                    assert info == utils.get_plugin_info('Random', dir='south')
+                    assert info == utils.get_plugin_info('Random', dir='south')
+                    assert 1 == patch_popen.call_count
+                    lib.write('updated')
+                    assert info == utils.get_plugin_info('Random', dir='south')
+                    assert 2 == patch_popen.call_count
+
+    @pytest.mark.parametrize("names", [[], ['Random'], ['Random', 'Sinusoid', 'Random', 'OMF']])
+    def test_get_plugins_info(self, names):
+        def plugin_info(name, dir):
+            return {} if name == 'OMF' else {"name": name, "type": dir}
+
+        with patch.object(utils, 'get_plugin_info', side_effect=plugin_info) as patch_info:
+            infos = utils.get_plugins_info(names, dir='south')
+        assert {name: plugin_info(name, 'south') for name in names} == infos
+        assert len(set(names)) == patch_info.call_count
@@ -71,6 +71,27 @@ class TestAssetTracker:
             assert 'asset_tracker' == args[0]
             assert payload == json.loads(args[1])
 
+    async def test_get_asset_track_stream(self, client):
+        rows = [{'id': 1, 'asset': 'AirIntake', 'event': 'Ingest', 'fledge': 'Booth1', 'service': 'PT100_In1',
+                 'plugin': 'PT100', "timestamp": "2018-08-13 15:39:48.796", "deprecatedTimestamp": "", 'data': '{}'}]
+        _rv = await mock_coro({"rows": rows, 'count': 1}) if sys.version_info >= (3, 8) else \
+            asyncio.ensure_future(mock_coro({"rows": rows, 'count': 1}))
+        storage_client_mock = MagicMock(StorageClientAsync)
+        with patch.object(connect, 'get_storage_async', return_value=storage_client_mock):
+            with patch.object(storage_client_mock, 'query_tbl_with_payload', return_value=_rv) as patch_query_payload:
+                resp = await client.get('/fledge/track?stream=true&asset=AirIntake')
+                assert 200 == resp.status
+                json_response = json.loads(await resp.text())
+        # The id is only read for the paging
+        assert 'id' not in json_response['track'][0]
+        assert 'AirIntake' == json_response['track'][0]['asset']
+        args, kwargs = patch_query_payload.call_args
+        assert 'asset_tracker' == args[0]
+        payload = json.loads(args[1])
+        assert 'id' == payload['return'][0]
+        assert {"column": "asset", "condition": "=", "value": "AirIntake"} == payload['where']['and']
+        assert {"column": "id", "direction": "asc"} == payload['sort']
+
     @pytest.mark.skip("Once initial code version approve, will add more tests")
     @pytest.mark.parametrize("request_params, payload", [
         ("asset", {}),
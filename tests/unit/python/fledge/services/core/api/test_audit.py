@@ -16,8 +16,9 @@ import sys
 from fledge.services.core import routes
 from fledge.services.core import connect
 from fledge.common.storage_client.storage_client import StorageClientAsync
-from fledge.services.core.api import audit
-from fledge.common.audit_logger import AuditLogger
+from fledge.services.core.api import audit, json_stream
+from fledge.common.audit_logger import AuditLogger, AuditLoggerSingleton
+from fledge.common.storage_client.exceptions import StorageServerError
 
 __author__ = "Ashish Jabble"
 __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
@@ -186,6 +187,28 @@ class TestAudit:
                 assert msg == resp.reason
             assert 1 == patch_logger.call_count
 
+    async def test_get_audit_stream(self, client):
+        storage_client_mock = MagicMock(StorageClientAsync)
+        rows = [{"id": 5 - i, "log": {"rowsRemoved": i}, "code": "PURGE", "level": "4",
+                 "timestamp": "2018-01-30 18:39:4{}.796".format(5 - i)} for i in range(5)]
+        pages = [{"rows": [{"count": 5}]}, {"rows": rows[:2]}, {"rows": rows[2:4]}, {"rows": rows[4:]}]
+
+        with patch.object(connect, 'get_storage_async', return_value=storage_client_mock):
+            with patch.object(json_stream, 'PAGE_ROWS', 2):
+                with patch.object(storage_client_mock, 'query_tbl_with_payload',
+                                  side_effect=pages) as query_patch:
+                    resp = await client.get('/fledge/audit?stream=true&since=2018-01-30%2018:39:42')
+                    assert 200 == resp.status
+                    json_response = json.loads(await resp.text())
+        assert 4 == json_response['totalCount']
+        assert [{"details": {"rowsRemoved": i}, "severity": "INFORMATION", "source": "PURGE",
+                 "timestamp": "2018-01-30 18:39:4{}.796".format(5 - i)} for i in range(4)] == json_response['audit']
+        assert 4 == query_patch.call_count
+        args, _ = query_patch.call_args_list[2]
+        payload = json.loads(args[1])
+        assert {"column": "id", "condition": "<", "value": 4} == payload['where']['and']
+        assert {"column": "id", "direction": "desc"} == payload['sort']
+
     async def test_create_audit_entry(self, client, loop):
         request_data = {"source": "LMTR", "severity": "warning", "details": {"message": "Engine oil pressure low"}}
         response = {'details': {'message': 'Engine oil pressure low'}, 'source': 'LMTR',
@@ -225,6 +248,24 @@ class TestAudit:
         assert 400 == resp.status
         assert expected_response == resp.reason
 
+    async def test_create_audit_entry_refused_with_writer(self, client):
+        request_data = {"source": "LMTR", "severity": "warning", "details": {"message": "Engine oil pressure low"}}
+        storage_mock = MagicMock(spec=StorageClientAsync)
+        storage_mock.insert_into_tbl.side_effect = StorageServerError(
+            code=400, reason="Bad Request", error={"message": "foreign key constraint"})
+        with patch.dict(AuditLoggerSingleton._shared_state, clear=True):
+            audit_logger = AuditLogger(storage_mock)
+            audit_logger.start_writer()
+            try:
+                resp = await client.post('/fledge/audit', data=json.dumps(request_data))
+                assert 400 == resp.status
+                assert 'Audit entry cannot be logged. foreign key constraint' == resp.reason
+                # Written by the request rather than queued
+                assert 0 == audit_logger.queue_depth
+                assert 1 == storage_mock.insert_into_tbl.call_count
+            finally:
+                assert await audit_logger.stop_writer() is True
+
     async def test_create_audit_entry_with_attribute_error(self, client):
         request_data = {"source": "LMTR", "severity": "blah", "details": {"message": "Engine oil pressure low"}}
         with patch.object(AuditLogger, "__init__", return_value=None):
@@ -650,3 +650,120 @@ class TestBrowserAssets:
             args, _ = query_patch.call_args
             assert json.loads(payload) == json.loads(args[0])
             query_patch.assert_called_once_with(args[0])
+
+    async def test_asset_readings_with_bucket_size_cached(self, client):
+        # 2019-10-11 00:00:00 UTC, long closed so every bucket is cached
+        start = 1570752000
+        first_rows = [{"min": 2, "max": 2, "average": 2, "timestamp": "2019-10-11 00:02:00"},
+                      {"min": 1, "max": 1, "average": 1, "timestamp": "2019-10-11 00:01:00"},
+                      {"min": 0, "max": 0, "average": 0, "timestamp": "2019-10-11 00:00:00"}]
+        tail_rows = [{"min": 10, "max": 10, "average": 10, "timestamp": "2019-10-11 00:10:00"}]
+        readings_storage_client_mock = MagicMock(ReadingsStorageClientAsync)
+        # Changed in version 3.8: patch() now returns an AsyncMock if the target is an async function.
+        if sys.version_info.major == 3 and sys.version_info.minor >= 8:
+            _se1 = await mock_coro({'rows': first_rows, 'count': 3})
+            _se2 = await mock_coro({'rows': tail_rows, 'count': 1})
+        else:
+            _se1 = asyncio.ensure_future(mock_coro({'rows': first_rows, 'count': 3}))
+            _se2 = asyncio.ensure_future(mock_coro({'rows': tail_rows, 'count': 1}))
+        with patch.object(browser, '_bucket_cache', browser.browser_cache.BucketCache()):
+            with patch.object(connect, 'get_readings_async', return_value=readings_storage_client_mock):
+                with patch.object(readings_storage_client_mock, 'query', side_effect=[_se1, _se2]) as query_patch:
+                    resp = await client.get('fledge/asset/sinusoid/sinusoid/bucket/60?start={}&length=600'.format(
+                        start))
+                    assert 200 == resp.status
+                    assert first_rows == json.loads(await resp.text())
+                    # one minute later only the buckets after the cached ones are read
+                    resp = await client.get('fledge/asset/sinusoid/sinusoid/bucket/60?start={}&length=600'.format(
+                        start + 60))
+                    assert 200 == resp.status
+                    assert tail_rows + first_rows[:2] == json.loads(await resp.text())
+                assert 2 == query_patch.call_count
+                args, _ = query_patch.call_args_list[0]
+                where = json.loads(args[0])['where']
+                assert {"column": "user_ts", "condition": ">=", "value": "2019-10-11 00:00:00",
+                        "and": {"column": "user_ts", "condition": "<=", "value": "2019-10-11 00:10:00"}} == where['and']
+                assert 10 == json.loads(args[0])['limit']
+                args, _ = query_patch.call_args_list[1]
+                where = json.loads(args[0])['where']
+                assert {"column": "user_ts", "condition": ">=", "value": "2019-10-11 00:10:00",
+                        "and": {"column": "user_ts", "condition": "<=", "value": "2019-10-11 00:11:00"}} == where['and']
+
+    async def test_asset_readings_with_bucket_size_late_reading(self, client):
+        # 2019-10-11 00:00:00 UTC, long closed so every bucket is cached
+        start = 1570752000
+        first_rows = [{"min": 1, "max": 1, "average": 1, "timestamp": "2019-10-11 00:01:00"},
+                      {"min": 0, "max": 0, "average": 0, "timestamp": "2019-10-11 00:00:00"}]
+        # A reading replayed by a south service lands in the closed bucket of 00:01:00
+        late_rows = [{"min": 1, "max": 9, "average": 5, "timestamp": "2019-10-11 00:01:00"},
+                     {"min": 0, "max": 0, "average": 0, "timestamp": "2019-10-11 00:00:00"}]
+        readings_storage_client_mock = MagicMock(ReadingsStorageClientAsync)
+        results = [{'rows': first_rows, 'count': 2}, {'rows': [], 'count': 0}, {'rows': late_rows, 'count': 2}]
+        if sys.version_info.major == 3 and sys.version_info.minor >= 8:
+            _se = [await mock_coro(result) for result in results]
+        else:
+            _se = [asyncio.ensure_future(mock_coro(result)) for result in results]
+        cache = browser.browser_cache.BucketCache(max_age_seconds=60)
+        url = 'fledge/asset/sinusoid/sinusoid/bucket/60?start={}&length=600'.format(start)
+        with patch.object(browser, '_bucket_cache', cache):
+            with patch.object(connect, 'get_readings_async', return_value=readings_storage_client_mock):
+                with patch.object(readings_storage_client_mock, 'query', side_effect=_se) as query_patch:
+                    resp = await client.get(url)
+                    assert first_rows == json.loads(await resp.text())
+                    resp = await client.get(url)
+                    assert first_rows == json.loads(await resp.text())
+                    # Once the entry expires, all the buckets are read again
+                    for entry in cache._entries.values():
+                        entry.cached_at -= 60
+                    resp = await client.get(url)
+                    assert 200 == resp.status
+                    assert late_rows == json.loads(await resp.text())
+                assert 3 == query_patch.call_count
+                args, _ = query_patch.call_args_list[2]
+                assert "2019-10-11 00:00:00" == json.loads(args[0])['where']['and']['value']
+
+    @pytest.mark.parametrize("request_params, response_message", [
+        ('?downsample=2', 'downsample must be an integer greater than 2.'),
+        ('?downsample=ab', 'downsample must be an integer greater than 2.'),
+        ('?downsample=100&method=avg', 'method must be one of lttb, minmax.')
+    ])
+    async def test_bad_downsample_params(self, client, request_params, response_message):
+        resp = await client.get('fledge/asset/sinusoid{}'.format(request_params))
+        assert 400 == resp.status
+        assert response_message == resp.reason
+
+    async def test_asset_reading_downsample(self, client):
+        rows = [{"timestamp": "2019-10-11 00:00:{:02d}".format(i), "sinusoid": float(i % 5)} for i in range(50)]
+        readings_storage_client_mock = MagicMock(ReadingsStorageClientAsync)
+        _rv = await mock_coro({'rows': rows, 'count': 50}) if sys.version_info.major == 3 and \
+            sys.version_info.minor >= 8 else asyncio.ensure_future(mock_coro({'rows': rows, 'count': 50}))
+        with patch.object(connect, 'get_readings_async', return_value=readings_storage_client_mock):
+            with patch.object(readings_storage_client_mock, 'query', return_value=_rv):
+                resp = await client.get('fledge/asset/sinusoid/sinusoid?seconds=600&downsample=10')
+                assert 200 == resp.status
+                json_response = json.loads(await resp.text())
+        assert 10 == len(json_response)
+        assert rows[0] == json_response[0]
+        assert rows[-1] == json_response[-1]
+
+    async def test_asset_stream(self, client):
+        rows = [{"id": 3 - i, "reading": {"sinusoid": i, "image": "__DPIMAGE:1"},
+                 "timestamp": "2019-10-11 00:00:0{}.000000".format(3 - i)} for i in range(3)]
+        readings_storage_client_mock = MagicMock(ReadingsStorageClientAsync)
+        _rv = await mock_coro({'rows': rows, 'count': 3}) if sys.version_info.major == 3 and \
+            sys.version_info.minor >= 8 else asyncio.ensure_future(mock_coro({'rows': rows, 'count': 3}))
+        with patch.object(connect, 'get_readings_async', return_value=readings_storage_client_mock):
+            with patch.object(readings_storage_client_mock, 'query', return_value=_rv) as query_patch:
+                resp = await client.get('fledge/asset/sinusoid?seconds=600&stream=true&images=exclude')
+                assert 200 == resp.status
+                assert 'chunked' == resp.headers['Transfer-Encoding']
+                json_response = json.loads(await resp.text())
+        assert [{"reading": {"sinusoid": i, "image": browser.IMAGE_PLACEHOLDER},
+                 "timestamp": "2019-10-11 00:00:0{}.000000".format(3 - i)} for i in range(3)] == json_response
+        # Fewer rows than a page, the rows were read by a single query
+        args, _ = query_patch.call_args
+        payload = json.loads(args[0])
+        assert 'id' in payload['return']
+        assert [{"column": "user_ts", "direction": "desc"}, {"column": "id", "direction": "desc"}] == payload['sort']
+        assert 1000 == payload['limit']
+        assert 1 == query_patch.call_count
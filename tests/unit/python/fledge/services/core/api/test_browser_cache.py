@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+# FLEDGE_BEGIN
+# See: http://fledge-iot.readthedocs.io/
+# FLEDGE_END
+
+import pytest
+
+from fledge.services.core.api.browser_cache import BucketCache, bucket_epoch, downsample_rows, lttb, min_max
+
+__copyright__ = "Copyright (c) 2023 Dianomic Systems Inc."
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+KEY = ('sinusoid', 'sinusoid', 60)
+START = 1570752000
+"""2019-10-11 00:00:00 UTC"""
+
+
+def _row(epoch, value=1.0):
+    return {"timestamp": "2019-10-11 00:{:02d}:00".format((epoch - START) // 60),
+            "min": value, "max": value, "average": value}
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("api", "assets")
+class TestBucketCache:
+
+    def test_bucket_epoch(self):
+        assert START == bucket_epoch("2019-10-11 00:00:00")
+        assert START + 90 == bucket_epoch("2019-10-11 00:01:30")
+
+    def test_get_miss(self):
+        cache = BucketCache()
+        assert (None, []) == cache.get(KEY, START, START + 600)
+        assert 1 == cache.miss
+        assert 0 == cache.hit
+
+    def test_update_and_get(self):
+        cache = BucketCache()
+        rows = [_row(START + 120), _row(START + 60), _row(START)]
+        cache.update(KEY, START, START, START + 120, rows)
+        assert 1 == cache.size
+        # the bucket at START + 120 is not closed
+        assert (START + 120, [rows[1], rows[2]]) == cache.get(KEY, START, START + 600)
+        assert (START + 120, [rows[1]]) == cache.get(KEY, START + 60, START + 600)
+        assert 2 == cache.hit
+
+    @pytest.mark.parametrize("first_bucket, stop", [
+        (START - 60, START + 600),
+        (START + 120, START + 600),
+        (START, START + 60)
+    ])
+    def test_get_not_covered(self, first_bucket, stop):
+        cache = BucketCache()
+        cache.update(KEY, START, START, START + 120, [_row(START)])
+        assert (None, []) == cache.get(KEY, first_bucket, stop)
+
+    def test_update_extends_contiguous(self):
+        cache = BucketCache()
+        cache.update(KEY, START, START, START + 120, [_row(START + 60), _row(START)])
+        cache.update(KEY, START + 60, START + 120, START + 180, [_row(START + 120, 2.0)])
+        end, rows = cache.get(KEY, START + 60, START + 600)
+        assert START + 180 == end
+        assert [_row(START + 120, 2.0), _row(START + 60)] == rows
+        # buckets older than the first bucket of the last request are dropped
+        assert (None, []) == cache.get(KEY, START, START + 600)
+
+    def test_update_truncated(self):
+        cache = BucketCache()
+        cache.update(KEY, START, START, START + 180, [_row(START + 120), _row(START + 60)], truncated=True)
+        assert (None, []) == cache.get(KEY, START, START + 600)
+        assert START + 180 == cache.get(KEY, START + 60, START + 600)[0]
+
+    def test_update_bad_rows(self):
+        cache = BucketCache()
+        cache.update(KEY, START, START, START + 120, [_row(START)])
+        cache.update(KEY, START, START + 120, START + 180, [{"timestamp": "bad"}])
+        assert 0 == cache.size
+
+    def test_lru_eviction(self):
+        cache = BucketCache(max_cache_size=2)
+        for asset in ('a', 'b', 'c'):
+            cache.update((asset, 'x', 60), START, START, START + 60, [_row(START)])
+        assert 2 == cache.size
+        assert (None, []) == cache.get(('a', 'x', 60), START, START + 600)
+
+    def test_expired_entry(self):
+        cache = BucketCache(max_age_seconds=60)
+        cache.update(KEY, START, START, START + 120, [_row(START + 60), _row(START)])
+        assert START + 120 == cache.get(KEY, START, START + 600)[0]
+        # Readings inserted or purged since with a timestamp in a cached bucket are read once the entry expires
+        cache._entries[KEY].cached_at -= 60
+        assert (None, []) == cache.get(KEY, START, START + 600)
+        assert 0 == cache.size
+        # Extending an expired entry starts a new one
+        cache.update(KEY, START, START, START + 120, [_row(START + 60, 5.0), _row(START)])
+        cache._entries[KEY].cached_at -= 60
+        cache.update(KEY, START, START + 120, START + 180, [_row(START + 120)])
+        assert (START + 180, [_row(START + 120)]) == cache.get(KEY, START + 120, START + 600)
+        assert (None, []) == cache.get(KEY, START, START + 600)
+
+    def test_invalidate(self):
+        cache = BucketCache()
+        for asset in ('a', 'b'):
+            for bucket in (10, 60):
+                cache.update((asset, 'x', bucket), START, START, START + 60, [_row(START)])
+        cache.invalidate('a')
+        assert 2 == cache.size
+        cache.invalidate()
+        assert 0 == cache.size
+
+
+@pytest.mark.parametrize("method", [lttb, min_max])
+@pytest.allure.feature("unit")
+@pytest.allure.story("api", "assets")
+class TestDownsampling:
+
+    def test_fewer_points_than_threshold(self, method):
+        points = [(0, 1), (1, 2), (2, 3)]
+        assert points == method(points, 10)
+
+    def test_keeps_extremes(self, method):
+        points = [(x, 0) for x in range(1000)]
+        points[400] = (400, 100)
+        points[700] = (700, -100)
+        sampled = method(points, 50)
+        assert len(sampled) <= 50
+        assert (400, 100) in sampled
+        assert (700, -100) in sampled
+        assert sorted(sampled) == sampled
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("api", "assets")
+class TestDownsampleRows:
+
+    def test_lttb_keeps_first_and_last(self):
+        rows = [{"timestamp": str(i), "sinusoid": float(i % 7)} for i in range(100)]
+        result = downsample_rows(rows, 10)
+        assert 10 == len(result)
+        assert rows[0] is result[0]
+        assert rows[-1] is result[-1]
+
+    def test_reading_rows_union_of_datapoints(self):
+        rows = [{"timestamp": str(i), "reading": {"a": 0, "b": 0, "image": "__DPIMAGE:1"}} for i in range(100)]
+        rows[10]["reading"]["a"] = 50
+        rows[20]["reading"]["b"] = 50
+        result = downsample_rows(rows, 10, 'minmax')
+        assert rows[10] in result
+        assert rows[20] in result
+        assert len(result) <= 20
+
+    def test_rows_without_numeric_datapoints(self):
+        rows = [{"timestamp": str(i), "reading": {"image": "__DPIMAGE:1"}} for i in range(100)]
+        result = downsample_rows(rows, 10)
+        assert 10 == len(result)
+        assert rows[0] is result[0]
@@ -68,6 +68,19 @@ class TestConfiguration:
                 assert result == json_response
             patch_get_all_items.assert_called_once_with()
 
+    async def test_get_configuration_cache(self, client, reset_singleton):
+        storage_client_mock = MagicMock(StorageClientAsync)
+        c_mgr = ConfigurationManager(storage_client_mock)
+        c_mgr._cacheManager.update('rest_api', 'User REST API', {}, 'API')
+        assert 'rest_api' in c_mgr._cacheManager
+        assert 'service' not in c_mgr._cacheManager
+        with patch.object(connect, 'get_storage_async', return_value=storage_client_mock):
+            resp = await client.get('/fledge/configuration/cache')
+            assert 200 == resp.status
+            json_response = json.loads(await resp.text())
+            assert {'size': 1, 'maxSize': 100, 'ttl': 0, 'hit': 1, 'miss': 1, 'evictions': 0,
+                    'expirations': 0} == json_response
+
     @pytest.mark.parametrize("value", [
         "True", "true", "trUe", "TRUE"
     ])
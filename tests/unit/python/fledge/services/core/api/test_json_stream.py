@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+# FLEDGE_BEGIN
+# See: http://fledge-iot.readthedocs.io/
+# FLEDGE_END
+
+import json
+
+import pytest
+from aiohttp import web
+
+from fledge.services.core.api.json_stream import KeysetPager, stream_json
+
+__copyright__ = "Copyright (c) 2023 Dianomic Systems Inc."
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+class FakeTable(object):
+    """Rows with an id and a timestamp, several rows sharing a timestamp, answering the queries of the pager"""
+
+    def __init__(self, count, per_timestamp=3):
+        self.rows = [{'id': i, 'timestamp': '2023-01-01 00:00:00.{:06d}'.format(i // per_timestamp),
+                      'value': i} for i in range(1, count + 1)]
+        self.payloads = []
+        self.fail_after = None
+        """Number of queries answered before the storage fails"""
+
+    def _matches(self, row, where):
+        column = 'timestamp' if where['column'] == 'user_ts' else where['column']
+        ops = {'=': lambda a, b: a == b, '<': lambda a, b: a < b, '>': lambda a, b: a > b,
+               '<=': lambda a, b: a <= b, '>=': lambda a, b: a >= b}
+        if column != '1' and not ops[where['condition']](row[column], where['value']):
+            return False
+        return 'and' not in where or self._matches(row, where['and'])
+
+    async def query(self, payload):
+        payload = json.loads(payload)
+        self.payloads.append(payload)
+        if self.fail_after is not None and len(self.payloads) > self.fail_after:
+            raise RuntimeError("Storage unavailable")
+        rows = [dict(row) for row in self.rows if self._matches(row, payload['where'])]
+        sorts = payload['sort'] if isinstance(payload['sort'], list) else [payload['sort']]
+        for sort in reversed(sorts):
+            column = 'timestamp' if sort['column'] == 'user_ts' else sort['column']
+            rows.sort(key=lambda row: row[column], reverse=sort['direction'] == 'desc')
+        rows = rows[payload.get('skip', 0):]
+        return {'rows': rows[:payload['limit']], 'count': len(rows[:payload['limit']])}
+
+
+async def _all_pages(pager):
+    rows = []
+    while True:
+        page = await pager.next_page()
+        if not page:
+            return rows
+        rows.extend(page)
+
+
+WHERE = {"where": {"column": "1", "condition": "=", "value": 1}}
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("api", "json-stream")
+class TestKeysetPager:
+
+    @pytest.mark.parametrize("direction", ['asc', 'desc'])
+    @pytest.mark.parametrize("page_rows", [1, 2, 4, 10, 100])
+    async def test_pages_by_timestamp(self, direction, page_rows):
+        table = FakeTable(25)
+        pager = KeysetPager(table.query, WHERE, 'user_ts', 'timestamp', direction, page_rows=page_rows)
+        rows = await _all_pages(pager)
+        expected = [row['value'] for row in sorted(table.rows, key=lambda row: row['id'],
+                                                   reverse=direction == 'desc')]
+        assert expected == [row['value'] for row in rows]
+        assert all('id' not in row for row in rows)
+        assert 25 == pager.rows_returned
+        assert pager.done
+
+    async def test_pages_by_id(self):
+        table = FakeTable(10)
+        pager = KeysetPager(table.query, WHERE, page_rows=4, keep_id=True)
+        rows = await _all_pages(pager)
+        assert list(range(10, 0, -1)) == [row['id'] for row in rows]
+        assert {"column": "id", "condition": "<", "value": 7} == table.payloads[1]['where']['and']
+        assert {"column": "id", "direction": "desc"} == table.payloads[1]['sort']
+
+    @pytest.mark.parametrize("limit, skip, expected", [
+        (5, 0, [25, 24, 23, 22, 21]),
+        (3, 20, [5, 4, 3]),
+        (None, 22, [3, 2, 1]),
+        (0, 0, [])
+    ])
+    async def test_limit_and_skip(self, limit, skip, expected):
+        table = FakeTable(25)
+        pager = KeysetPager(table.query, WHERE, 'user_ts', 'timestamp', page_rows=2, limit=limit, skip=skip)
+        assert expected == [row['value'] for row in await _all_pages(pager)]
+
+    async def test_rows_added_while_paging(self):
+        table = FakeTable(6)
+        pager = KeysetPager(table.query, WHERE, 'user_ts', 'timestamp', 'asc', page_rows=4)
+        first = await pager.next_page()
+        table.rows.append({'id': 7, 'timestamp': '2023-01-01 00:00:00.000005', 'value': 7})
+        rows = first + await _all_pages(pager)
+        assert [1, 2, 3, 4, 5, 6, 7] == [row['value'] for row in rows]
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("api", "json-stream")
+class TestStreamJson:
+
+    @pytest.fixture
+    def client(self, loop, test_client):
+        table = FakeTable(2500)
+
+        async def handler(request):
+            pager = KeysetPager(table.query, WHERE, 'user_ts', 'timestamp')
+            if 'fail' in request.query:
+                table.fail_after = int(request.query['fail'])
+            return await stream_json(request, pager, prefix='{"rows": [', suffix=lambda: '], "count": 2500}',
+                                     transform=lambda rows: [row for row in rows if row['value'] % 2])
+
+        app = web.Application(loop=loop)
+        app.router.add_route('GET', '/rows', handler)
+        return loop.run_until_complete(test_client(app))
+
+    async def test_stream(self, client):
+        resp = await client.get('/rows')
+        assert 200 == resp.status
+        assert 'chunked' == resp.headers['Transfer-Encoding']
+        result = json.loads(await resp.text())
+        assert 2500 == result['count']
+        assert 1250 == len(result['rows'])
+        assert 2499 == result['rows'][0]['value']
+
+    async def test_stream_error(self, client):
+        resp = await client.get('/rows?fail=1')
+        assert 200 == resp.status
+        with pytest.raises(ValueError):
+            json.loads(await resp.text())
+
+    async def test_first_page_error(self, client):
+        resp = await client.get('/rows?fail=0')
+        assert 500 == resp.status
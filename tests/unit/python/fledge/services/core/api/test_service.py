@@ -16,6 +16,7 @@ from fledge.services.core import routes
 from fledge.services.core import connect
 from fledge.common.storage_client.storage_client import StorageClientAsync
 from fledge.services.core.service_registry.service_registry import ServiceRegistry
+from fledge.services.core.service_registry.monitor import Monitor
 from fledge.common.service_record import ServiceRecord
 from fledge.services.core.interest_registry.interest_registry import InterestRegistry
 from fledge.services.core import server
@@ -1092,6 +1093,37 @@ class TestService:
             assert json_response == {'services': exp_result}
         assert 2 == mockwalk.call_count
 
+    async def test_get_monitor_stats(self, client):
+        monitor = Monitor()
+        monitor.rounds = 2
+        monitor.last_round_seconds = 0.012
+        monitor.max_round_seconds = 0.02
+        monitor.ping_latency = {}
+        with patch.object(server.Server, 'service_monitor', monitor):
+            resp = await client.get('/fledge/service/monitor')
+            assert 200 == resp.status
+            result = await resp.text()
+            json_response = json.loads(result)
+            assert {'rounds': 2, 'last_round_ms': 12.0, 'max_round_ms': 20.0, 'max_concurrent_pings': 10,
+                    'services': {}} == json_response
+
+    async def test_get_monitor_stats_not_running(self, client):
+        with patch.object(server.Server, 'service_monitor', None):
+            resp = await client.get('/fledge/service/monitor')
+            assert 404 == resp.status
+            assert 'Service monitor is not running.' == resp.reason
+
+    async def test_get_storage_pool_stats(self, client):
+        stats = {"hits": 40, "misses": 2, "sessions": 1, "pool_size": 10, "idle_timeout": 60}
+        storage_client = MagicMock(spec=StorageClientAsync)
+        storage_client.pool_stats.return_value = stats
+        with patch.object(server.Server, '_storage_client_async', storage_client):
+            with patch.object(server.Server, '_readings_client_async', None):
+                resp = await client.get('/fledge/service/storage/pool')
+                assert 200 == resp.status
+                result = await resp.text()
+                assert {"storage": stats} == json.loads(result)
+
     p1 = '{"name": "FL Agent", "type": "management"}'
     p2 = '{"name": "FL #1", "type": "management", "enabled": false}'
     p3 = '{"name": "FL_MGT", "type": "management", "enabled": true}'
@@ -16,6 +16,8 @@ import pytest
 
 from fledge.services.core import routes
 from fledge.services.core import connect
+from fledge.services.core.api import statistics as api_statistics
+from fledge.services.core.api.statistics_rollup import StatisticsRollup
 from fledge.common.storage_client.storage_client import StorageClientAsync
 
 __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
@@ -531,3 +533,42 @@ class TestStatistics:
             args, _ = query_patch.call_args_list[2]
             assert 'statistics_history' == args[0]
             assert p3 == json.loads(args[1])
+
+    async def test_get_statistics_history_rollup(self, client):
+        rows = [{"id": 4, "key": "READINGS", "value": 5, "history_ts": "2018-02-20 13:16:24.321"},
+                {"id": 3, "key": "BUFFERED", "value": 0, "history_ts": "2018-02-20 13:16:24.321"},
+                {"id": 2, "key": "READINGS", "value": 10, "history_ts": "2018-02-20 13:16:09.321"},
+                {"id": 1, "key": "BUFFERED", "value": 1, "history_ts": "2018-02-20 12:59:09.321"}]
+
+        async def q_result(*args):
+            table = args[0]
+            payload = json.loads(args[1])
+            if table == 'schedules':
+                return {"rows": [{"schedule_interval": "00:00:15"}]}
+            assert 'statistics_history' == table
+            if payload['sort']['direction'] == 'asc':
+                if payload['where']['column'] == '1':
+                    # The oldest row, none has been removed
+                    return {"rows": rows[-1:], "count": 1}
+                # No row written since
+                return {"rows": [], "count": 0}
+            return {"rows": rows, "count": 4}
+
+        mock_async_storage_client = MagicMock(StorageClientAsync)
+        with patch.object(api_statistics, '_rollup', StatisticsRollup()):
+            with patch.object(connect, 'get_storage_async', return_value=mock_async_storage_client):
+                with patch.object(mock_async_storage_client, 'query_tbl_with_payload',
+                                  side_effect=q_result) as query_patch:
+                    resp = await client.get("/fledge/statistics/history?days=7")
+                    assert 200 == resp.status
+                    assert {"interval": 3600, "statistics": [
+                        {"history_ts": "2018-02-20 13:00:00.000", "BUFFERED": 0, "READINGS": 15},
+                        {"history_ts": "2018-02-20 12:00:00.000", "BUFFERED": 1, "READINGS": 0}]
+                    } == json.loads(await resp.text())
+                    resp = await client.get("/fledge/statistics/rate?periods=1440&statistics=READINGS")
+                    assert 200 == resp.status
+                    assert {"rates": {"READINGS": {"1440": 15 / 1440}}} == json.loads(await resp.text())
+        # The rows already in the rollup are not read again, only the oldest row is checked
+        assert 5 == query_patch.call_count
+        args, _ = query_patch.call_args_list[-1]
+        assert {"column": "id", "condition": ">", "value": 4} == json.loads(args[1])['where']
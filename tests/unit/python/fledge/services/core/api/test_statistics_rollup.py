@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+# FLEDGE_BEGIN
+# See: http://fledge-iot.readthedocs.io/
+# FLEDGE_END
+
+import json
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from fledge.common.storage_client.storage_client import StorageClientAsync
+from fledge.services.core.api.statistics_rollup import StatisticsRollup, history_epoch, select_tier
+
+__copyright__ = "Copyright (c) 2023 Dianomic Systems Inc."
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+START = 1570752000
+"""2019-10-11 00:00:00 UTC"""
+
+
+def _ts(epoch):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(epoch)) + '.123'
+
+
+class FakeHistory(object):
+    """statistics_history rows of READINGS and PURGED every 15 seconds, answering the queries of the rollup"""
+
+    def __init__(self, seconds):
+        self.rows = []
+        self.queries = []
+        self.append(START, seconds)
+
+    def append(self, start, seconds):
+        for epoch in range(start, start + seconds, 15):
+            for key, value in (('READINGS', 2), ('PURGED', 0)):
+                self.rows.append({'id': len(self.rows) + 1, 'history_ts': _ts(epoch), 'key': key, 'value': value})
+
+    async def query(self, table, payload):
+        assert 'statistics_history' == table
+        payload = json.loads(payload)
+        self.queries.append(payload)
+        where = payload['where']
+        rows = self.rows
+        if where['column'] == 'id':
+            op = {'>': lambda a, b: a > b, '<': lambda a, b: a < b}[where['condition']]
+            rows = [row for row in rows if op(row['id'], where['value'])]
+        if payload['sort']['direction'] == 'desc':
+            rows = list(reversed(rows))
+        return {'rows': rows[:payload['limit']], 'count': len(rows[:payload['limit']])}
+
+    def storage(self):
+        storage = MagicMock(spec=StorageClientAsync)
+        storage.query_tbl_with_payload.side_effect = self.query
+        return storage
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("api", "statistics")
+class TestStatisticsRollup:
+
+    @pytest.mark.parametrize("window, interval, expected", [
+        (0, 15, None),
+        (3600, 15, None),
+        (86400, 60, None),
+        (86400, 15, 60),
+        (7 * 86400, 15, 3600),
+        (30 * 86400, 15, 3600),
+        (365 * 86400, 15, 86400),
+        (7 * 86400, 0, None)
+    ])
+    def test_select_tier(self, window, interval, expected):
+        assert expected == select_tier(window, interval)
+
+    def test_history_epoch(self):
+        assert START + 15 == history_epoch("2019-10-11 00:00:15.321")
+
+    async def test_refresh_and_buckets(self):
+        history = FakeHistory(2 * 3600)
+        rollup = StatisticsRollup(page_rows=100)
+        storage = history.storage()
+        await rollup.refresh(storage, 3600)
+        # Pages of older rows are read until the window is covered
+        assert rollup.covered_from <= rollup.newest - 3600
+        assert rollup.covered_from > START
+        buckets = rollup.buckets(3600, 3600)
+        assert {'history_ts': '2019-10-11 01:00:00.000', 'PURGED': 0, 'READINGS': 480} == buckets[0]
+        minutes = rollup.buckets(60, 1800, ['READINGS'])
+        # The minute holding the start of the window is only partly in it
+        assert 30 == len(minutes)
+        assert {'history_ts': '2019-10-11 01:59:00.000', 'READINGS': 8} == minutes[0]
+
+    async def test_refresh_reads_new_rows_only(self):
+        history = FakeHistory(3600)
+        rollup = StatisticsRollup()
+        storage = history.storage()
+        await rollup.refresh(storage, 3600)
+        assert 0 == rollup.covered_from
+        assert 240 * 2 == rollup.total(60, 7200, 'READINGS')
+        history.append(START + 3600, 60)
+        await rollup.refresh(storage, 3600)
+        assert 3 == len(history.queries)
+        assert {"column": "1", "condition": "=", "value": 1} == history.queries[1]['where']
+        assert 1 == history.queries[1]['limit']
+        assert {"column": "id", "condition": ">", "value": 480} == history.queries[-1]['where']
+        assert 244 * 2 == rollup.total(3600, 7200, 'READINGS')
+        assert 8 == rollup.total(60, 60, 'READINGS')
+
+    async def test_refresh_no_history(self):
+        rollup = StatisticsRollup()
+        history = FakeHistory(0)
+        await rollup.refresh(history.storage(), 3600)
+        assert [] == rollup.buckets(60, 3600)
+        assert 0 == rollup.size
+
+    async def test_rows_removed(self):
+        history = FakeHistory(3 * 3600)
+        rollup = StatisticsRollup()
+        storage = history.storage()
+        await rollup.refresh(storage, 3 * 3600)
+        assert 3 == len(rollup.buckets(3600, 4 * 3600))
+        # The purge task removes the rows older than 01:30
+        history.rows = [row for row in history.rows if history_epoch(row['history_ts']) >= START + 5400]
+        await rollup.refresh(storage, 3 * 3600)
+        hours = rollup.buckets(3600, 4 * 3600)
+        # The hour of 01:00 has lost part of its rows and is dropped with the older ones
+        assert ['2019-10-11 02:00:00.000'] == [bucket['history_ts'] for bucket in hours]
+        assert 2 * 240 == rollup.total(3600, 4 * 3600, 'READINGS')
+        # The minutes from 01:30 are kept
+        assert 90 * 8 == rollup.total(60, 4 * 3600, 'READINGS')
+        assert '2019-10-11 01:30:00.000' == rollup.buckets(60, 4 * 3600)[-1]['history_ts']
+
+    async def test_rows_reset(self):
+        history = FakeHistory(3600)
+        rollup = StatisticsRollup()
+        storage = history.storage()
+        await rollup.refresh(storage, 3600)
+        # A statistics reset removes all the rows, new ones are then written
+        history.rows = []
+        await rollup.refresh(storage, 3600)
+        assert 0 == rollup.size
+        assert rollup.newest is None
+        history.append(START + 7200, 60)
+        for index, row in enumerate(history.rows):
+            row['id'] = 1000 + index
+        await rollup.refresh(storage, 3600)
+        assert 8 == rollup.total(60, 3600, 'READINGS')
+
+    async def test_partial_first_bucket(self):
+        history = FakeHistory(3600)
+        rollup = StatisticsRollup()
+        await rollup.refresh(history.storage(), 3600)
+        # newest is 00:59:45, the window of 30 minutes starts within the minute of 00:29
+        minutes = rollup.buckets(60, 1800, ['READINGS'])
+        assert '2019-10-11 00:30:00.000' == minutes[-1]['history_ts']
+        assert 30 * 8 == rollup.total(60, 1800, 'READINGS')
+
+    async def test_trim(self):
+        history = FakeHistory(60)
+        history.append(START + 200 * 3600, 60)
+        rollup = StatisticsRollup()
+        await rollup.refresh(history.storage(), 3600)
+        # The minute buckets older than the windows the minute tier is used for are dropped
+        assert 1 == len(rollup.buckets(60, 300 * 3600))
+        assert 2 == len(rollup.buckets(3600, 300 * 3600))
+        rollup.clear()
+        assert 0 == rollup.size
+        assert rollup.newest is None
@@ -10,6 +10,7 @@ import pytest
 import sys
 import asyncio
 
+from fledge.services.core.asset_tracker import asset_tracker as asset_tracker_module
 from fledge.services.core.asset_tracker.asset_tracker import AssetTracker
 from fledge.common.storage_client.storage_client import StorageClientAsync
 from fledge.common.configuration_manager import ConfigurationManager
@@ -83,4 +84,76 @@ class TestAssetTracker:
             assert payload == json.loads(args[1])
         patch_get_cat_item.assert_called_once_with(category_name='service', item_name='name')
 
+    async def test_add_asset_record_already_registered(self):
+        storage_client_mock = MagicMock(spec=StorageClientAsync)
+        asset_tracker = AssetTracker(storage_client_mock)
+        asset_tracker._registered_asset_records = [
+            {'event': 'Ingest', 'service': 'sine', 'asset': 'sinusoid', 'plugin': 'sinusoid', 'data': {}}]
+        with patch.object(asset_tracker._storage, 'insert_into_tbl') as patch_insert_tbl:
+            result = await asset_tracker.add_asset_record(asset='sinusoid', event='Ingest', service='sine',
+                                                          plugin='sinusoid')
+            assert {} == result
+        patch_insert_tbl.assert_not_called()
+
+    async def test_add_asset_records(self):
+        storage_client_mock = MagicMock(spec=StorageClientAsync)
+        asset_tracker = AssetTracker(storage_client_mock)
+        asset_tracker.fledge_svc_name = 'Fledge'
+        asset_tracker._registered_asset_records = [
+            {'event': 'Ingest', 'service': 'sine', 'asset': 'sinusoid', 'plugin': 'sinusoid', 'data': {}}]
+        records = [{"asset": "sinusoid", "event": "Ingest", "service": "sine", "plugin": "sinusoid"},
+                   {"asset": "pump1", "event": "Ingest", "service": "sine", "plugin": "sinusoid"},
+                   {"asset": "pump1", "event": "Ingest", "service": "sine", "plugin": "sinusoid"}]
+        expected = [{"asset": "pump1", "event": "Ingest", "service": "sine", "plugin": "sinusoid", "data": {},
+                     "fledge": "Fledge"}]
+
+        async def mock_coro():
+            return {"response": "inserted", "rows_affected": 1}
+
+        # Changed in version 3.8: patch() now returns an AsyncMock if the target is an async function.
+        if sys.version_info.major == 3 and sys.version_info.minor >= 8:
+            _rv = await mock_coro()
+        else:
+            _rv = asyncio.ensure_future(mock_coro())
+
+        with patch.object(asset_tracker._storage, 'insert_into_tbl', return_value=_rv) as patch_insert_tbl:
+            assert expected == await asset_tracker.add_asset_records(records)
+            # registered now, not inserted again
+            assert [] == await asset_tracker.add_asset_records(records)
+        patch_insert_tbl.assert_called_once_with('asset_tracker', json.dumps({"inserts": expected}))
+        assert 2 == len(asset_tracker._registered_asset_records)
+
+    async def test_add_asset_records_refused(self):
+        storage_client_mock = MagicMock(spec=StorageClientAsync)
+        asset_tracker = AssetTracker(storage_client_mock)
+        asset_tracker.fledge_svc_name = 'Fledge'
+        asset_tracker._registered_asset_records = []
+        records = [{"asset": "pump1", "event": "Ingest", "service": "sine", "plugin": "sinusoid"},
+                   {"asset": "pump2", "event": "Ingest", "service": "sine", "plugin": "sinusoid"}]
+        results = [{"message": "bulk insert refused"}, {"response": "inserted", "rows_affected": 1},
+                   {"message": "insert refused"}]
+
+        async def insert_into_tbl(table, payload):
+            return results.pop(0)
+
+        # The bulk insert is refused, the records are then inserted one at a time
+        with patch.object(asset_tracker._storage, 'insert_into_tbl', side_effect=insert_into_tbl) as patch_insert_tbl:
+            with patch.object(asset_tracker_module._logger, 'warning') as patch_warning:
+                with patch.object(asset_tracker_module._logger, 'error') as patch_error:
+                    added = await asset_tracker.add_asset_records(records)
+        assert [dict(records[0], data={}, fledge='Fledge')] == added
+        assert 3 == patch_insert_tbl.call_count
+        patch_warning.assert_called_once_with('Bulk insert of 2 asset tracker records failed, inserting them one by '
+                                              'one. bulk insert refused')
+        assert 1 == patch_error.call_count
+        assert 1 == len(asset_tracker._registered_asset_records)
+
+    async def test_add_asset_records_bad_record(self):
+        storage_client_mock = MagicMock(spec=StorageClientAsync)
+        asset_tracker = AssetTracker(storage_client_mock)
+        asset_tracker._registered_asset_records = []
+        with pytest.raises(TypeError) as excinfo:
+            await asset_tracker.add_asset_records(["sinusoid"])
+        assert 'Asset tracker record must be a dictionary' == str(excinfo.value)
+
     # TODO: will add -ve tests later
@@ -10,7 +10,10 @@ import logging
 import uuid
 import time
 import json
-from unittest.mock import MagicMock, call
+import os
+import signal
+import subprocess
+from unittest.mock import MagicMock, call, patch
 import sys
 
 import copy
@@ -89,20 +92,18 @@ class TestScheduler:
         scheduler._storage_async = MockStorageAsync(core_management_host=None, core_management_port=None)
 
         # WHEN
-        # Check IF part
-        mocker.patch.object(scheduler, '_scheduler_loop_sleep_task', asyncio.Task(asyncio.sleep(5)))
+        # Scheduler loop not started
         scheduler._resume_check_schedules()
 
         # THEN
-        assert scheduler._check_processes_pending is False
+        assert scheduler._scheduler_loop_wake is None
 
         # WHEN
-        # Check ELSE part
-        mocker.patch.object(scheduler, '_scheduler_loop_sleep_task', None)
+        mocker.patch.object(scheduler, '_scheduler_loop_wake', asyncio.Event())
         scheduler._resume_check_schedules()
 
         # THEN
-        assert scheduler._check_processes_pending is True
+        assert scheduler._scheduler_loop_wake.is_set() is True
 
     @pytest.mark.asyncio
     async def test__wait_for_task_completion(self, mocker):
@@ -218,6 +219,49 @@ class TestScheduler:
         assert 'OMF to PI north' in args
         assert 'North Readings to PI' in args
 
+    @pytest.mark.asyncio
+    async def test__start_task_resident_process(self, mocker):
+        # GIVEN
+        scheduler = Scheduler()
+        scheduler._storage = MockStorage(core_management_host=None, core_management_port=None)
+        scheduler._storage_async = MockStorageAsync(core_management_host=None, core_management_port=None)
+        mocker.patch.object(scheduler._logger, "info")
+        mocker.patch.object(scheduler, '_schedule_first_task')
+        await scheduler._get_schedules()
+        mocker.patch.object(scheduler, '_ready', True)
+        mocker.patch.object(scheduler, '_resume_check_schedules')
+        schedule = scheduler._schedules[uuid.UUID("2176eb68-7303-11e7-8cf7-a6006ad3dba0")]  # stat collector
+        await scheduler.queue_task(schedule.id)
+        collected = []
+
+        async def collect():
+            collected.append(1)
+
+        scheduler.add_resident_process(schedule.process_name, collect)
+        mock_subprocess = mocker.patch.object(asyncio, 'create_subprocess_exec')
+        mocker.patch.object(scheduler, '_process_scripts', {schedule.process_name: (["tasks/statistics"], 999)})
+        mocker.patch.object(scheduler, '_wait_for_task_completion', return_value=asyncio.ensure_future(mock_task()))
+
+        # WHEN
+        await scheduler._start_task(schedule)
+
+        # THEN
+        assert 0 == mock_subprocess.call_count
+        task_process = list(scheduler._schedule_executions[schedule.id].task_processes.values())[0]
+        assert os.getpid() == task_process.process.pid
+        assert 0 == await task_process.process.wait()
+        assert [1] == collected
+        # The children of the core are not terminated
+        with patch.object(subprocess, 'Popen') as mock_popen:
+            scheduler._terminate_child_processes(task_process.process.pid)
+        assert 0 == mock_popen.call_count
+
+    @pytest.mark.asyncio
+    async def test_resident_process_terminate(self):
+        process = Scheduler._ResidentProcess(asyncio.sleep(60))
+        process.terminate()
+        assert -signal.SIGTERM == await process.wait()
+
     @pytest.mark.asyncio
     async def test_purge_tasks(self, mocker):
         # TODO: Mandatory - Add negative tests for full code coverage
@@ -281,6 +325,69 @@ class TestScheduler:
         assert 'COAP listener south' in args1
         assert 'OMF to PI north' in args2
 
+    @pytest.mark.asyncio
+    async def test__check_schedules_heap(self, mocker):
+        # GIVEN
+        scheduler = Scheduler()
+        scheduler._storage = MockStorage(core_management_host=None, core_management_port=None)
+        scheduler._storage_async = MockStorageAsync(core_management_host=None, core_management_port=None)
+        mocker.patch.object(scheduler._logger, "info")
+        current_time = time.time()
+        mocker.patch.multiple(scheduler, _max_running_tasks=10, _start_time=current_time)
+        await scheduler._get_schedules()
+        mock_start_task = mocker.patch.object(scheduler, '_start_task', return_value=asyncio.ensure_future(mock_task()))
+        sch_id = uuid.UUID("2176eb68-7303-11e7-8cf7-a6006ad3dba0")  # stat collector
+        sch_execution = scheduler._schedule_executions[sch_id]
+        planned_time = sch_execution.next_start_time
+        earliest_start_time = min(e.next_start_time for e in scheduler._schedule_executions.values()
+                                  if e.next_start_time)
+
+        # WHEN
+        # Nothing is due yet
+        mocker.patch.object(scheduler, 'current_time', earliest_start_time - 1)
+        next_start_time = await scheduler._check_schedules()
+
+        # THEN
+        assert earliest_start_time == next_start_time
+        assert 0 == mock_start_task.call_count
+
+        # WHEN
+        # Only the due schedule starts, with its lag recorded, and it is pushed back on the heap
+        mocker.patch.object(scheduler, 'current_time', planned_time + 2)
+        next_start_time = await scheduler._check_schedules()
+
+        # THEN
+        assert sch_id in [args[0].id for args, kwargs in mock_start_task.call_args_list]
+        assert 2 == sch_execution.start_lag
+        assert 2 == sch_execution.max_start_lag
+        assert sch_execution.next_start_time > planned_time
+        assert next_start_time is not None and next_start_time > planned_time
+        assert all(scheduler._is_heap_entry_current(entry) or entry[0] > planned_time + 2
+                   for entry in scheduler._schedule_heap)
+        assert not scheduler._pending_schedule_ids
+
+    @pytest.mark.asyncio
+    async def test__check_schedules_max_running_tasks(self, mocker):
+        # GIVEN
+        scheduler = Scheduler()
+        scheduler._storage = MockStorage(core_management_host=None, core_management_port=None)
+        scheduler._storage_async = MockStorageAsync(core_management_host=None, core_management_port=None)
+        mocker.patch.object(scheduler._logger, "info")
+        current_time = time.time()
+        mocker.patch.multiple(scheduler, _max_running_tasks=0, _start_time=current_time)
+        await scheduler._get_schedules()
+        mock_start_task = mocker.patch.object(scheduler, '_start_task', return_value=asyncio.ensure_future(mock_task()))
+
+        # WHEN
+        mocker.patch.object(scheduler, 'current_time', current_time + 3600 * 24 * 8)
+        next_start_time = await scheduler._check_schedules()
+
+        # THEN
+        # The due schedules are kept pending until a task completes
+        assert next_start_time is None
+        assert 0 == mock_start_task.call_count
+        assert scheduler._pending_schedule_ids
+
     @pytest.mark.asyncio
     @pytest.mark.skip("_scheduler_loop() not suitable for unit testing. Will be tested during System tests.")
     async def test__scheduler_loop(self, mocker):
@@ -7,7 +7,7 @@ import sys
 import asyncio
 
 import aiohttp
-from fledge.services.core.service_registry.monitor import Monitor
+from fledge.services.core.service_registry.monitor import Monitor, LatencyHistogram
 from fledge.services.core.service_registry.service_registry import ServiceRegistry
 from fledge.common.storage_client.storage_client import StorageClientAsync
 from fledge.common.service_record import ServiceRecord
@@ -70,6 +70,7 @@ class TestMonitor:
         monitor = Monitor()
         monitor._sleep_interval = Monitor._DEFAULT_SLEEP_INTERVAL
         monitor._max_attempts = Monitor._DEFAULT_MAX_ATTEMPTS
+        monitor._ping_timeout = Monitor._DEFAULT_PING_TIMEOUT
 
         storage_client_mock = MagicMock(StorageClientAsync)
 
@@ -123,6 +124,7 @@ class TestMonitor:
         monitor = Monitor()
         monitor._sleep_interval = Monitor._DEFAULT_SLEEP_INTERVAL
         monitor._max_attempts = Monitor._DEFAULT_MAX_ATTEMPTS
+        monitor._ping_timeout = Monitor._DEFAULT_PING_TIMEOUT
 
         # Changed in version 3.8: patch() now returns an AsyncMock if the target is an async function.
         if sys.version_info.major == 3 and sys.version_info.minor >= 8:
@@ -143,3 +145,112 @@ class TestMonitor:
                 assert excinfo.type in [TestMonitorException, TypeError]
 
         assert ServiceRegistry.get(idx=s_id_1)[0]._status is ServiceRecord.Status.Failed
+        # Every failed ping counts as lasting the whole timeout
+        stats = monitor.stats()['services']['sname1']
+        assert 15 == stats['count']
+        assert 1000 == stats['max_ms']
+        assert 15 == stats['buckets']['le_1000']
+
+    @pytest.mark.asyncio
+    async def test__monitor_concurrent_pings(self):
+        class ClientResponseMock:
+            async def text(self):
+                return '{"uptime": 1}'
+
+        class SlowSessionContextManagerMock:
+            async def __aenter__(self):
+                await asyncio.sleep(0.2)
+                return ClientResponseMock()
+
+            async def __aexit__(self, *args):
+                return None
+
+        class TestMonitorException(Exception):
+            pass
+
+        with patch.object(ServiceRegistry._logger, 'info'):
+            for i in range(4):
+                ServiceRegistry.register('sname{}'.format(i), 'Southbound', 'saddress', i + 1, i + 1, 'http')
+        monitor = Monitor()
+        monitor._sleep_interval = Monitor._DEFAULT_SLEEP_INTERVAL
+        monitor._max_attempts = Monitor._DEFAULT_MAX_ATTEMPTS
+        monitor._ping_timeout = Monitor._DEFAULT_PING_TIMEOUT
+        monitor._max_concurrent_pings = 4
+
+        async def resolve_pending_notification_for_acl_change(name):
+            return None
+        monitor._acl_handler = MagicMock()
+        monitor._acl_handler.resolve_pending_notification_for_acl_change = resolve_pending_notification_for_acl_change
+
+        with patch.object(Monitor, '_sleep', side_effect=TestMonitorException()):
+            with patch.object(aiohttp.ClientSession, 'get', return_value=SlowSessionContextManagerMock()):
+                with pytest.raises(TestMonitorException):
+                    await monitor._monitor_loop()
+        await monitor._session.close()
+
+        # pings ran concurrently, the round lasts as long as a single ping
+        assert 1 == monitor.rounds
+        assert monitor.last_round_seconds < 0.6
+        stats = monitor.stats()
+        assert ['sname0', 'sname1', 'sname2', 'sname3'] == sorted(stats['services'])
+        assert 1 == stats['services']['sname0']['count']
+        for record in ServiceRegistry.all():
+            assert record._status is ServiceRecord.Status.Running
+
+    @pytest.mark.asyncio
+    async def test__monitor_unregistered_service_stats(self):
+        class ClientResponseMock:
+            async def text(self):
+                return '{"uptime": 1}'
+
+        class SessionContextManagerMock:
+            async def __aenter__(self):
+                return ClientResponseMock()
+
+            async def __aexit__(self, *args):
+                return None
+
+        class TestMonitorException(Exception):
+            pass
+
+        with patch.object(ServiceRegistry._logger, 'info'):
+            s_id_1 = ServiceRegistry.register('sname1', 'Southbound', 'saddress', 1, 1, 'http')
+            ServiceRegistry.register('sname2', 'Southbound', 'saddress', 2, 2, 'http')
+        monitor = Monitor()
+        monitor._sleep_interval = Monitor._DEFAULT_SLEEP_INTERVAL
+        monitor._max_attempts = Monitor._DEFAULT_MAX_ATTEMPTS
+        monitor._ping_timeout = Monitor._DEFAULT_PING_TIMEOUT
+
+        async def resolve_pending_notification_for_acl_change(name):
+            return None
+        monitor._acl_handler = MagicMock()
+        monitor._acl_handler.resolve_pending_notification_for_acl_change = resolve_pending_notification_for_acl_change
+
+        with patch.object(aiohttp.ClientSession, 'get', return_value=SessionContextManagerMock()):
+            with patch.object(Monitor, '_sleep', side_effect=TestMonitorException()):
+                with pytest.raises(TestMonitorException):
+                    await monitor._monitor_loop()
+            assert ['sname1', 'sname2'] == sorted(monitor.stats()['services'])
+            # Unregistered, the service record is kept with the Shutdown status
+            ServiceRegistry.get(idx=s_id_1)[0]._status = ServiceRecord.Status.Shutdown
+            with patch.object(Monitor, '_sleep', side_effect=TestMonitorException()):
+                with pytest.raises(TestMonitorException):
+                    await monitor._monitor_loop()
+        await monitor._session.close()
+
+        # The next round removes the latencies of the unregistered service
+        assert ['sname2'] == sorted(monitor.stats()['services'])
+
+    def test_latency_histogram(self):
+        histogram = LatencyHistogram()
+        for latency in (1, 5, 7, 30, 6000):
+            histogram.add(latency)
+        result = histogram.to_dict()
+        assert 5 == result['count']
+        assert 6000 == result['max_ms']
+        assert 6000 == result['last_ms']
+        assert 1208.6 == result['mean_ms']
+        assert 2 == result['buckets']['le_5']
+        assert 1 == result['buckets']['le_10']
+        assert 1 == result['buckets']['le_50']
+        assert 1 == result['buckets']['gt_5000']
@@ -31,6 +31,7 @@ from fledge.services.core.api import configuration as conf_api
 from fledge.common.storage_client.storage_client import StorageClientAsync
 from fledge.common.configuration_manager import ConfigurationManager
 from fledge.common.audit_logger import AuditLogger
+from fledge.services.core.asset_tracker.asset_tracker import AssetTracker
 
 
 __author__ = "Vaibhav Singhal, Ashish Jabble"
@@ -502,6 +503,32 @@ class TestServer:
         args, kwargs = patch_reg_interest_reg.call_args
         assert (request_data['service'], request_data['category']) == args
 
+    @pytest.mark.parametrize("request_data", [[], {"track": {"asset": "sinusoid"}}])
+    async def test_bad_add_track_bulk(self, client, request_data):
+        resp = await client.post('/fledge/track/bulk', data=json.dumps(request_data))
+        assert 400 == resp.status
+        assert 'Data payload must be a dictionary with a track list' == resp.reason
+
+    async def test_add_track_bulk(self, client):
+        Server._asset_tracker = AssetTracker(MagicMock(StorageClientAsync))
+        request_data = {"track": [{"asset": "sinusoid", "event": "Ingest", "service": "sine", "plugin": "sinusoid"}]}
+        added = [dict(request_data["track"][0], data={}, fledge="Fledge")]
+
+        async def mock_coro():
+            return added
+
+        # Changed in version 3.8: patch() now returns an AsyncMock if the target is an async function.
+        if sys.version_info.major == 3 and sys.version_info.minor >= 8:
+            _rv = await mock_coro()
+        else:
+            _rv = asyncio.ensure_future(mock_coro())
+
+        with patch.object(Server._asset_tracker, 'add_asset_records', return_value=_rv) as patch_add_records:
+            resp = await client.post('/fledge/track/bulk', data=json.dumps(request_data))
+            assert 200 == resp.status
+            assert {"track": added} == json.loads(await resp.text())
+        patch_add_records.assert_called_once_with(request_data["track"])
+
     async def test_bad_uuid_unregister_interest(self, client):
         resp = await client.delete('/fledge/interest/blah')
         assert 400 == resp.status
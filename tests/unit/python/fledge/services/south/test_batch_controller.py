@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+# FLEDGE_BEGIN
+# See: http://fledge-iot.readthedocs.io/
+# FLEDGE_END
+
+""" Test services/south/batch_controller.py
+
+"""
+import pytest
+
+from fledge.services.south.batch_controller import BatchController
+
+__copyright__ = "Copyright (c) 2023 Dianomic Systems Inc."
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("services", "south", "batch_controller")
+class TestBatchController:
+
+    @pytest.mark.parametrize("min_batch_size, max_batch_size, target, message", [
+        (0, 10, 1, 'min_batch_size must be between 1 and max_batch_size'),
+        (20, 10, 1, 'min_batch_size must be between 1 and max_batch_size'),
+        (1, 10, 0, 'target_latency_seconds must be greater than 0'),
+    ])
+    def test_init_bad_bounds(self, min_batch_size, max_batch_size, target, message):
+        with pytest.raises(ValueError) as excinfo:
+            BatchController(8, min_batch_size, max_batch_size, target)
+        assert message == str(excinfo.value)
+
+    def test_init_clamps_batch_size(self):
+        assert 64 == BatchController(1024, 8, 64, 1).batch_size
+        assert 8 == BatchController(2, 8, 64, 1).batch_size
+
+    def test_grows_while_fast_and_queuing(self):
+        controller = BatchController(100, 10, 200, 0.5)
+        assert 125 == controller.observe(0.1, 100, 500)
+        assert 150 == controller.observe(0.1, 125, 500)
+        assert 175 == controller.observe(0.1, 150, 500)
+        assert 200 == controller.observe(0.1, 175, 500)
+        assert 200 == controller.observe(0.1, 200, 500)
+        assert 4 == controller.increases
+
+    def test_steady_when_not_queuing(self):
+        controller = BatchController(100, 10, 200, 0.5)
+        # partial batch sent on timeout
+        assert 100 == controller.observe(0.1, 40, 0)
+        # full batch but nothing left behind
+        assert 100 == controller.observe(0.1, 100, 10)
+        assert 0 == controller.increases
+        assert 0 == controller.decreases
+
+    def test_shrinks_when_slow(self):
+        controller = BatchController(100, 30, 200, 0.5)
+        assert 50 == controller.observe(2, 100, 500)
+        assert 30 == controller.observe(2, 50, 500)
+        assert 30 == controller.observe(2, 30, 500)
+        assert 2 == controller.decreases
+        assert 2000 == controller.state()['latency_ms']
+
+    def test_latency_is_smoothed(self):
+        controller = BatchController(100, 10, 200, 0.5)
+        controller.observe(0.1, 100, 0)
+        # a single slow insert does not push the average over the target
+        assert 100 == controller.observe(1.0, 100, 0)
+        assert 280 == controller.state()['latency_ms']
+
+    @pytest.mark.parametrize("buffered, capacity, expected", [
+        (0, 100, False),
+        (79, 100, False),
+        (80, 100, True),
+        (100, 100, True),
+        (0, 0, False)
+    ])
+    def test_is_congested(self, buffered, capacity, expected):
+        assert expected is BatchController.is_congested(buffered, capacity)
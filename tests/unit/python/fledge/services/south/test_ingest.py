@@ -11,11 +11,15 @@ import copy
 import pytest
 import sys
 import asyncio
-from unittest.mock import MagicMock, call
+from unittest.mock import MagicMock, call, patch
 from fledge.services.south.ingest import *
 from fledge.services.south import ingest
+from fledge.services.south.batch_controller import BatchController
+from fledge.services.south.poll_executor import PollExecutor
+from fledge.services.south.spill_buffer import SpillBuffer
 from fledge.common.storage_client.storage_client import StorageClientAsync, ReadingsStorageClientAsync
 from fledge.common.microservice_management_client.microservice_management_client import MicroserviceManagementClient
+from fledge.common.microservice_management_client.exceptions import MicroserviceManagementClientError
 
 __author__ = "Amarendra K Sinha"
 __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
@@ -67,6 +71,11 @@ class TestIngest:
         Ingest._readings_insert_batch_timeout_seconds = 1
         Ingest._max_readings_insert_batch_connection_idle_seconds = 60
         Ingest._max_readings_insert_batch_reconnect_wait_seconds = 10
+        Ingest._backpressure_stats = 0
+        Ingest._batch_controller = None
+        Ingest._spill_buffer = None
+        Ingest._spill_replayed_stats = 0
+        Ingest._statistics_counters = None
         Ingest.category = 'South'
         Ingest.default_config = {
             "readings_buffer_size": {
@@ -103,6 +112,50 @@ class TestIngest:
                 "type": "integer",
                 "default": str(Ingest._max_readings_insert_batch_reconnect_wait_seconds)
             },
+            "adaptive_batching": {
+                "description": "Adapt the batch size to the measured storage insert latency",
+                "type": "boolean",
+                "default": "false"
+            },
+            "readings_insert_target_latency_ms": {
+                "description": "Target time in milliseconds to insert a batch of readings in storage, "
+                               "used by adaptive batching",
+                "type": "integer",
+                "default": "500"
+            },
+            "spill_to_disk": {
+                "description": "Write readings to a file on disk when they can not be inserted in storage or "
+                               "the buffers are full, and insert them once storage is available",
+                "type": "boolean",
+                "default": "false"
+            },
+            "spill_buffer_size_mb": {
+                "description": "Maximum size in megabytes of the file used to spill readings to disk",
+                "type": "integer",
+                "default": "100"
+            },
+            "write_statistics_frequency_seconds": {
+                "description": "Number of seconds between two writes of the ingest statistics to storage",
+                "type": "integer",
+                "default": "5"
+            },
+            "write_statistics_threshold": {
+                "description": "Number of readings counted in the ingest statistics above which they are written "
+                               "to storage before the write interval",
+                "type": "integer",
+                "default": "100000"
+            },
+            "poll_executor": {
+                "description": "Where the plugin polls run",
+                "type": "enumeration",
+                "options": ["none", "thread", "process"],
+                "default": "none"
+            },
+            "max_concurrent_polls": {
+                "description": "Maximum number of plugin polls running at the same time",
+                "type": "integer",
+                "default": "1"
+            },
         }
 
     @pytest.mark.asyncio
@@ -133,6 +186,14 @@ class TestIngest:
                int(new_config['max_readings_insert_batch_connection_idle_seconds']['value'])
         assert Ingest._max_readings_insert_batch_reconnect_wait_seconds == \
                int(new_config['max_readings_insert_batch_reconnect_wait_seconds']['value'])
+        assert Ingest._adaptive_batching is False
+        assert Ingest._readings_insert_target_latency_ms == 500
+        assert Ingest._spill_to_disk is False
+        assert Ingest._spill_buffer_size_mb == 100
+        assert Ingest._write_statistics_frequency_seconds == 5
+        assert Ingest._write_statistics_threshold == 100000
+        assert Ingest._poll_executor_mode == 'none'
+        assert Ingest._max_concurrent_polls == 1
 
     @pytest.mark.asyncio
     async def test_read_config_filter(self, mocker):
@@ -239,6 +300,8 @@ class TestIngest:
         assert Ingest._max_concurrent_readings_inserts == len(Ingest._readings_list_not_empty)
         assert Ingest._max_concurrent_readings_inserts == len(Ingest._readings_lists)
         assert 0 == log_warning.call_count
+        assert Ingest._statistics_counters is not None
+        await Ingest._statistics_counters.stop()
 
     @pytest.mark.asyncio
     async def test_stop(self, mocker):
@@ -307,10 +370,42 @@ class TestIngest:
     async def test__insert_readings(self, mocker):
         pass
 
-    @pytest.mark.skip(reason="This method uses a while True loop. Investigate as to how to write unit test for an infinite loop.")
-    @pytest.mark.asyncio
-    async def test_write_statistics(self, mocker):
-        pass
+    def test_write_statistics(self):
+        # GIVEN
+        Ingest._parent_service = MagicMock(_name='S1')
+        Ingest._statistics_counters = MagicMock(spec=statistics.StatisticsCounters)
+        Ingest._readings_stats = 3
+        Ingest._discarded_readings_stats = 1
+        Ingest._sensor_stats = {'PUMP1': 3}
+
+        # WHEN
+        Ingest._write_statistics()
+
+        # THEN
+        Ingest._statistics_counters.increment.assert_has_calls([
+            call('READINGS', 3), call('DISCARDED', 1), call('S1-IngestBackpressure', 0),
+            call('PUMP1', 3, 'Readings received by Fledge since startup for sensor PUMP1')])
+        assert 0 == Ingest._statistics_counters.set.call_count
+        assert 0 == Ingest._readings_stats
+        assert 0 == Ingest._discarded_readings_stats
+        assert {} == Ingest._sensor_stats
+
+    def test_write_statistics_poll_executor(self):
+        Ingest._parent_service = MagicMock(_name='S1')
+        Ingest._statistics_counters = MagicMock(spec=statistics.StatisticsCounters)
+        Ingest._batch_controller = None
+        Ingest._spill_buffer = None
+        Ingest._poll_executor = PollExecutor(MagicMock(), 'none')
+        Ingest._poll_executor._observe(0.25)
+        Ingest._poll_executor.overrun(2)
+
+        Ingest._write_statistics()
+
+        Ingest._statistics_counters.set.assert_has_calls([
+            call('S1-PollLatency', 250, 'Average plugin poll time in milliseconds of service S1'),
+            call('S1-PollOverruns', 2, 'Plugin polls of service S1 skipped because the service could not keep up '
+                                       'with its poll interval')])
+        Ingest._poll_executor = None
 
     @pytest.mark.asyncio
     async def test_is_available_at_start(self, mocker):
@@ -413,6 +508,17 @@ class TestIngest:
 
         # THEN
         assert 1 == len(Ingest._readings_lists[0])
+        # readings are held as pre-encoded JSON reading objects
+        assert {"asset_code": "pump1", "reading": data['readings'], "user_ts": data['timestamp']} == \
+            json.loads(Ingest._readings_lists[0][0])
+        assert 1 == Ingest._sensor_stats['PUMP1']
+
+    def test_encode_asset_code(self):
+        Ingest._asset_codes = {}
+        encoded = Ingest._encode_asset_code("pump\"1")
+        assert ('"pump\\"1"', 'PUMP"1') == encoded
+        assert encoded is Ingest._encode_asset_code("pump\"1")
+        assert 1 == len(Ingest._asset_codes)
 
     @pytest.mark.asyncio
     async def test_add_readings_if_stop(self, mocker):
@@ -451,6 +557,211 @@ class TestIngest:
         assert 1 == log_warning.call_count
         log_warning.assert_called_with('The South Service is stopping')
 
+    @pytest.mark.asyncio
+    async def test_add_readings_when_all_lists_full(self, mocker):
+        # GIVEN
+        Ingest._max_concurrent_readings_inserts = 1
+        Ingest._readings_list_size = 1
+        Ingest._current_readings_list_index = 0
+        Ingest._readings_lists = [['{}']]
+        Ingest._started = True
+        log_warning = mocker.patch.object(ingest._LOGGER, "warning")
+
+        # WHEN
+        accepted = await Ingest.add_readings(asset='pump1', timestamp="2017-01-02T01:02:03.23232Z-05:00",
+                                             readings={"velocity": "500"})
+
+        # THEN
+        assert accepted is False
+        assert 1 == len(Ingest._readings_lists[0])
+        assert 1 == Ingest._discarded_readings_stats
+        assert 1 == Ingest._backpressure_stats
+        log_warning.assert_called_once_with('The ingest service is unavailable %s', 0)
+
+    @pytest.mark.asyncio
+    async def test_add_readings_spilled_when_all_lists_full(self, tmpdir, mocker):
+        track_asset = mocker.patch.object(Ingest, '_track_asset')
+        Ingest._max_concurrent_readings_inserts = 1
+        Ingest._readings_list_size = 1
+        Ingest._current_readings_list_index = 0
+        Ingest._readings_lists = [['{}']]
+        Ingest._started = True
+        Ingest._spill_buffer = SpillBuffer(str(tmpdir.join('S1.spill')), 1024)
+
+        accepted = await Ingest.add_readings(asset='pump1', timestamp="2017-01-02 01:02:03.232320+00:00",
+                                             readings={"velocity": 500})
+
+        assert accepted is True
+        assert 1 == len(Ingest._readings_lists[0])
+        assert 0 == Ingest._discarded_readings_stats
+        assert 1 == Ingest._sensor_stats['PUMP1']
+        track_asset.assert_called_once_with('pump1')
+        records, _ = Ingest._spill_buffer.read(10)
+        assert [{"asset_code": "pump1", "reading": {"velocity": 500},
+                 "user_ts": "2017-01-02 01:02:03.232320+00:00"}] == [json.loads(r) for r in records]
+        Ingest._spill_buffer.close()
+
+    @pytest.mark.asyncio
+    async def test_replay_spilled_readings(self, tmpdir):
+        payloads = []
+
+        class FakeReadingsStorage:
+            async def append(self, payload, raw=False):
+                payloads.append(json.loads(payload))
+                if len(payloads) > 2:
+                    raise Exception('Storage went away')
+                return {"response": "appended"}
+
+        Ingest.readings_storage_async = FakeReadingsStorage()
+        Ingest._max_concurrent_readings_inserts = 4
+        Ingest._readings_insert_batch_size = 2
+        Ingest._spill_buffer = SpillBuffer(str(tmpdir.join('S1.spill')), 4096)
+        Ingest._spill_buffer.append(['{"asset_code":"a","reading":{"x":%d},"user_ts":"t"}' % i for i in range(7)])
+
+        with patch.object(ingest, '_LOGGER'):
+            await Ingest._replay_spilled_readings()
+
+        # two batches stored, the third one failed and stays on disk
+        assert 3 == len(payloads)
+        assert [0, 1] == [r["reading"]["x"] for r in payloads[0]["readings"]]
+        assert [2, 3] == [r["reading"]["x"] for r in payloads[1]["readings"]]
+        assert 4 == Ingest._readings_stats
+        assert 4 == Ingest._spill_replayed_stats
+        assert 3 == Ingest._spill_buffer.records
+        records, _ = Ingest._spill_buffer.read(10)
+        assert [4, 5, 6] == [json.loads(r)["reading"]["x"] for r in records]
+        Ingest._spill_buffer.close()
+
+    @pytest.mark.asyncio
+    async def test_insert_loop_replays_without_new_readings(self, tmpdir):
+        payloads = []
+
+        class FakeReadingsStorage:
+            async def append(self, payload, raw=False):
+                payloads.append(json.loads(payload))
+                return {"response": "appended"}
+
+        Ingest._parent_service = MagicMock(_name='S1')
+        Ingest._statistics_counters = MagicMock(spec=statistics.StatisticsCounters)
+        Ingest.readings_storage_async = FakeReadingsStorage()
+        Ingest._max_concurrent_readings_inserts = 1
+        Ingest._readings_insert_batch_size = 2
+        Ingest._readings_insert_batch_timeout_seconds = 0.01
+        Ingest._readings_lists = [[]]
+        Ingest._readings_list_batch_size_reached = [asyncio.Event()]
+        Ingest._readings_lists_not_full = asyncio.Event()
+        Ingest._insert_readings_wait_tasks = [None]
+        Ingest._spill_buffer = SpillBuffer(str(tmpdir.join('S1.spill')), 4096)
+        Ingest._spill_buffer.append(['{"asset_code":"a","reading":{"x":%d},"user_ts":"t"}' % i for i in range(3)])
+
+        task = asyncio.ensure_future(Ingest._insert_readings())
+        try:
+            # No reading is added, the replay is started when the wait for a batch times out
+            for _ in range(100):
+                if not Ingest._spill_buffer.records:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            Ingest._stop = True
+            await asyncio.wait_for(task, 1)
+
+        assert 0 == Ingest._spill_buffer.records
+        assert [0, 1, 2] == [r["reading"]["x"] for payload in payloads for r in payload["readings"]]
+        # One batch per readings list at each timeout
+        Ingest._statistics_counters.increment.assert_has_calls([call('S1-SpillReplayed', 2),
+                                                                call('S1-SpillReplayed', 1)], any_order=True)
+        Ingest._spill_buffer.close()
+
+    @pytest.mark.asyncio
+    async def test_insert_not_sent_again_on_spill_error(self, tmpdir):
+        payloads = []
+
+        class FakeReadingsStorage:
+            async def append(self, payload, raw=False):
+                payloads.append(json.loads(payload))
+                return {"response": "appended"}
+
+        Ingest._parent_service = MagicMock(_name='S1')
+        Ingest._statistics_counters = MagicMock(spec=statistics.StatisticsCounters)
+        Ingest.readings_storage_async = FakeReadingsStorage()
+        Ingest._max_concurrent_readings_inserts = 1
+        Ingest._readings_insert_batch_size = 2
+        Ingest._readings_lists = [['{"asset_code":"a","reading":{"x":1},"user_ts":"t"}'] * 2]
+        Ingest._readings_list_batch_size_reached = [asyncio.Event()]
+        Ingest._readings_lists_not_full = asyncio.Event()
+        Ingest._insert_readings_wait_tasks = [None]
+        Ingest._spill_buffer = SpillBuffer(str(tmpdir.join('S1.spill')), 4096)
+        Ingest._spill_buffer.append(['{"asset_code":"a","reading":{"x":0},"user_ts":"t"}'])
+        Ingest._stop = True
+
+        with patch.object(Ingest._spill_buffer, 'read', side_effect=OSError('Input/output error')):
+            with patch.object(ingest, '_LOGGER') as patch_logger:
+                await asyncio.wait_for(Ingest._insert_readings(), 1)
+
+        # The batch stored before the replay failed is neither sent again nor discarded
+        assert 1 == len(payloads)
+        assert [] == Ingest._readings_lists[0]
+        Ingest._statistics_counters.increment.assert_any_call('READINGS', 2)
+        Ingest._statistics_counters.increment.assert_any_call('DISCARDED', 0)
+        patch_logger.error.assert_called_once_with('Unable to replay the readings spilled to disk, %s',
+                                                   'Input/output error')
+        assert 1 == Ingest._spill_buffer.records
+        Ingest._spill_buffer.close()
+
+    @pytest.mark.asyncio
+    async def test_spill_error(self, tmpdir):
+        Ingest._spill_buffer = SpillBuffer(str(tmpdir.join('S1.spill')), 4096)
+        with patch.object(Ingest._spill_buffer, 'append', side_effect=OSError('No space left on device')):
+            with patch.object(ingest, '_LOGGER') as patch_logger:
+                assert 0 == Ingest._spill(['{}', '{}'])
+        patch_logger.error.assert_called_once_with('Unable to spill %s readings to disk, %s', 2,
+                                                   'No space left on device')
+        Ingest._spill_buffer.close()
+
+    def test_is_congested(self):
+        Ingest._max_concurrent_readings_inserts = 2
+        Ingest._readings_list_size = 5
+        Ingest._readings_lists = [['{}'] * 5, ['{}'] * 2]
+        assert Ingest.is_congested() is False
+        Ingest._started = True
+        assert Ingest.is_congested() is False
+        Ingest._readings_lists[1].extend(['{}'] * 1)
+        assert Ingest.is_congested() is True
+        Ingest._stop = True
+        assert Ingest.is_congested() is False
+
+    @pytest.mark.asyncio
+    async def test_wait_for_capacity(self):
+        Ingest._max_concurrent_readings_inserts = 1
+        Ingest._readings_list_size = 5
+        Ingest._readings_lists = [['{}'] * 5]
+        Ingest._readings_lists_not_full = asyncio.Event()
+        Ingest._started = True
+
+        assert await Ingest.wait_for_capacity(0.1) is False
+
+        async def flush():
+            await asyncio.sleep(0.1)
+            del Ingest._readings_lists[0][:]
+            Ingest._readings_lists_not_full.set()
+
+        asyncio.ensure_future(flush())
+        assert await Ingest.wait_for_capacity(5) is True
+
+    def test_adapt_batch_size(self):
+        Ingest._parent_service = MagicMock(_name="S1")
+        Ingest._readings_insert_batch_size = 100
+        Ingest._readings_lists = [['{}'] * 100, ['{}'] * 100]
+        Ingest._batch_controller = BatchController(batch_size=100, min_batch_size=10, max_batch_size=400,
+                                                   target_latency_seconds=0.5)
+        Ingest._adapt_batch_size(0.1, 100)
+        assert 125 == Ingest._readings_insert_batch_size
+        Ingest._adapt_batch_size(5, 100)
+        assert 62 == Ingest._readings_insert_batch_size
+        assert {"batch_size": 62, "buffered": 200, "congested": False, "adaptive": True, "latency_ms": 1080,
+                "target_latency_ms": 500, "inserts": 2, "increases": 1, "decreases": 1} == Ingest.batch_state()
+        Ingest._batch_controller = None
+
     @pytest.mark.asyncio
     async def test_add_readings_not_started(self, mocker):
         # GIVEN
@@ -536,8 +847,15 @@ class TestIngest:
             await Ingest.add_readings(asset=data['asset'],
                                       timestamp=data['timestamp'],
                                       readings=123)
+
+        # Check for readings which can not be serialized to JSON
+        with pytest.raises(TypeError):
+            await Ingest.add_readings(asset=data['asset'],
+                                      timestamp=data['timestamp'],
+                                      readings={"velocity": object()})
         # THEN
         assert 0 == len(Ingest._readings_lists[0])
+        assert 5 == Ingest._discarded_readings_stats
 
     @pytest.mark.asyncio
     async def test_add_readings_when_one_list_becomes_full(self, mocker):
@@ -587,3 +905,161 @@ class TestIngest:
         # THEN
         assert 1 == len(Ingest._readings_lists[0])
         assert 1 == len(Ingest._readings_lists[1])
+
+    def _setup_lists(self, list_count, list_size, batch_size):
+        Ingest._max_concurrent_readings_inserts = list_count
+        Ingest._readings_list_size = list_size
+        Ingest._readings_insert_batch_size = batch_size
+        Ingest._current_readings_list_index = 0
+        Ingest._readings_lists = [[] for _ in range(list_count)]
+        Ingest._readings_list_not_empty = [asyncio.Event() for _ in range(list_count)]
+        Ingest._readings_list_batch_size_reached = [asyncio.Event() for _ in range(list_count)]
+        Ingest._parent_service = MagicMock(_name='S1')
+        Ingest._payload_events = set()
+        Ingest._asset_tracker_queue = []
+        Ingest._started = True
+
+    @pytest.mark.asyncio
+    async def test_add_readings_batch(self):
+        self._setup_lists(list_count=2, list_size=5, batch_size=3)
+        readings = [{"asset": "pump1" if i % 2 else "pump2", "timestamp": "2017-01-02 01:02:03.23232+00:00",
+                     "readings": {"velocity": i}} for i in range(7)]
+
+        accepted = await Ingest.add_readings_batch(readings)
+
+        assert 7 == accepted
+        # the lists are filled up to the batch size first
+        assert [3, 4] == [len(readings_list) for readings_list in Ingest._readings_lists]
+        assert [0, 1, 2] == [json.loads(r)["reading"]["velocity"] for r in Ingest._readings_lists[0]]
+        assert [3, 4, 5, 6] == [json.loads(r)["reading"]["velocity"] for r in Ingest._readings_lists[1]]
+        assert all(event.is_set() for event in Ingest._readings_list_not_empty)
+        assert all(event.is_set() for event in Ingest._readings_list_batch_size_reached)
+        assert {'PUMP1': 3, 'PUMP2': 4} == Ingest._sensor_stats
+        # one asset tracker event per asset, queued for the core
+        assert 0 == Ingest._parent_service._core_microservice_management_client.create_asset_tracker_event.call_count
+        assert ['pump1', 'pump2'] == sorted(event['asset'] for event in Ingest._asset_tracker_queue)
+
+    @pytest.mark.asyncio
+    async def test_add_readings_batch_columnar(self):
+        self._setup_lists(list_count=1, list_size=10, batch_size=10)
+        block = {"asset": "pump1", "timestamps": ["t1", "t2"], "readings": {"velocity": [500, 510], "flow": [1, 2]}}
+
+        accepted = await Ingest.add_readings_batch(block)
+
+        assert 2 == accepted
+        assert [{"asset_code": "pump1", "reading": {"velocity": 500, "flow": 1}, "user_ts": "t1"},
+                {"asset_code": "pump1", "reading": {"velocity": 510, "flow": 2}, "user_ts": "t2"}] == \
+            [json.loads(r) for r in Ingest._readings_lists[0]]
+        assert {'PUMP1': 2} == Ingest._sensor_stats
+
+    @pytest.mark.asyncio
+    async def test_add_readings_batch_single_reading(self):
+        self._setup_lists(list_count=1, list_size=10, batch_size=10)
+
+        accepted = await Ingest.add_readings_batch({"asset": "pump1", "timestamp": "t1", "readings": {"x": 1}})
+
+        assert 1 == accepted
+        assert 1 == len(Ingest._readings_lists[0])
+
+    @pytest.mark.asyncio
+    async def test_add_readings_batch_invalid_readings_discarded(self):
+        self._setup_lists(list_count=1, list_size=10, batch_size=10)
+        readings = [{"asset": "pump1", "timestamp": "t1", "readings": {"x": 1}},
+                    {"asset": None, "timestamp": "t1", "readings": {"x": 1}},
+                    {"asset": "pump1", "readings": {"x": 1}},
+                    {"asset": "pump1", "timestamp": "t1", "readings": 5}]
+
+        accepted = await Ingest.add_readings_batch(readings)
+
+        assert 1 == accepted
+        assert 1 == len(Ingest._readings_lists[0])
+        assert 3 == Ingest._discarded_readings_stats
+
+    @pytest.mark.asyncio
+    async def test_add_readings_batch_when_lists_full(self, mocker):
+        self._setup_lists(list_count=1, list_size=2, batch_size=2)
+        log_warning = mocker.patch.object(ingest._LOGGER, "warning")
+        readings = [{"asset": "pump1", "timestamp": "t1", "readings": {"x": i}} for i in range(5)]
+
+        accepted = await Ingest.add_readings_batch(readings)
+
+        assert 2 == accepted
+        assert 3 == Ingest._discarded_readings_stats
+        assert 3 == Ingest._backpressure_stats
+        assert {'PUMP1': 2} == Ingest._sensor_stats
+        log_warning.assert_called_once_with('The ingest service is unavailable %s', 0)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("readings, exc, message", [
+        ("pump1", TypeError, "readings must be a list or a dictionary"),
+        ({"asset": "pump1", "timestamps": ["t1"], "readings": {"x": [1, 2]}}, ValueError,
+         "datapoint x must have one value per timestamp"),
+        ({"asset": "pump1", "timestamps": "t1", "readings": {"x": [1]}}, TypeError,
+         "timestamps must be a list and readings a dictionary of lists")
+    ])
+    async def test_add_readings_batch_bad_type(self, readings, exc, message):
+        self._setup_lists(list_count=1, list_size=10, batch_size=10)
+        with pytest.raises(exc) as excinfo:
+            await Ingest.add_readings_batch(readings)
+        assert message == str(excinfo.value)
+
+    @pytest.mark.asyncio
+    async def test_add_readings_batch_not_started(self):
+        self._setup_lists(list_count=1, list_size=10, batch_size=10)
+        Ingest._started = False
+        with pytest.raises(RuntimeError):
+            await Ingest.add_readings_batch([])
+
+    def test_track_asset(self):
+        Ingest._parent_service = MagicMock(_name='S1', _plugin_info={'config': {'plugin': {'default': 'sinusoid'}}})
+        Ingest._asset_tracker_queue = []
+        Ingest._payload_events = {('sinusoid', 'Ingest', 'S1', 'sinusoid')}
+
+        for asset in ('sinusoid', 'pump1', 'pump1'):
+            Ingest._track_asset(asset)
+
+        assert [{"asset": "pump1", "event": "Ingest", "service": "S1", "plugin": "sinusoid"}] == \
+            Ingest._asset_tracker_queue
+        assert ('pump1', 'Ingest', 'S1', 'sinusoid') in Ingest._payload_events
+
+    def _asset_tracker_client(self, error=None):
+        sent = []
+
+        class Client:
+            async def create_asset_tracker_events(self, events):
+                sent.append(events)
+                if error is not None:
+                    raise error
+                return events
+
+        Ingest._parent_service = MagicMock(_name='S1', _core_microservice_management_client_async=Client())
+        return sent
+
+    @pytest.mark.asyncio
+    async def test_flush_asset_tracker_events(self):
+        sent = self._asset_tracker_client()
+        Ingest._asset_tracker_queue = [{"asset": "pump1"}, {"asset": "pump2"}]
+
+        assert await Ingest._flush_asset_tracker_events() is True
+
+        assert [[{"asset": "pump1"}, {"asset": "pump2"}]] == sent
+        assert [] == Ingest._asset_tracker_queue
+        # nothing queued, no request
+        assert await Ingest._flush_asset_tracker_events() is True
+        assert 1 == len(sent)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("error, requeued", [
+        (MicroserviceManagementClientError(status=503), True),
+        (ConnectionRefusedError(), True),
+        (MicroserviceManagementClientError(status=400, reason='bad'), False)
+    ])
+    async def test_flush_asset_tracker_events_failure(self, mocker, error, requeued):
+        mocker.patch.object(ingest._LOGGER, "warning")
+        mocker.patch.object(ingest._LOGGER, "error")
+        self._asset_tracker_client(error)
+        Ingest._asset_tracker_queue = [{"asset": "pump1"}]
+
+        assert (not requeued) is await Ingest._flush_asset_tracker_events()
+
+        assert ([{"asset": "pump1"}] if requeued else []) == Ingest._asset_tracker_queue
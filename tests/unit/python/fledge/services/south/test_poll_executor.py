@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+# FLEDGE_BEGIN
+# See: http://fledge-iot.readthedocs.io/
+# FLEDGE_END
+
+""" Test services/south/poll_executor.py
+
+"""
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+from aiohttp import web
+
+from fledge.services.common.microservice import FledgeMicroservice
+from fledge.services.south import exceptions
+from fledge.services.south.ingest import Ingest
+from fledge.services.south.poll_executor import PollExecutor, next_due
+from fledge.services.south.server import Server
+
+__copyright__ = "Copyright (c) 2023 Dianomic Systems Inc."
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("services", "south", "poll_executor")
+class TestPollExecutor:
+
+    @pytest.mark.parametrize("mode, max_concurrent_polls, message", [
+        ('fork', 1, 'mode must be one of none, thread, process'),
+        ('thread', 0, 'max_concurrent_polls must be greater than 0'),
+    ])
+    def test_init_bad_values(self, mode, max_concurrent_polls, message):
+        with pytest.raises(ValueError) as excinfo:
+            PollExecutor(MagicMock(), mode, max_concurrent_polls)
+        assert message == str(excinfo.value)
+
+    @pytest.mark.parametrize("due, now, expected", [
+        (10.0, 10.2, (11.0, 0)),
+        (10.0, 11.0, (12.0, 1)),
+        (10.0, 13.5, (14.0, 3)),
+    ])
+    def test_next_due(self, due, now, expected):
+        assert expected == next_due(due, now, 1.0)
+
+    @pytest.mark.asyncio
+    async def test_poll_in_thread(self):
+        plugin = MagicMock()
+        plugin.plugin_poll.side_effect = lambda handle: [{"thread": threading.current_thread().name}]
+        executor = PollExecutor(plugin, 'thread', 2)
+
+        data = await executor.poll({"pollInterval": 1})
+
+        assert data[0]["thread"].startswith('south-poll')
+        plugin.plugin_poll.assert_called_once_with({"pollInterval": 1})
+        assert 1 == executor.polls
+        assert await executor.stop() is True
+        with pytest.raises(RuntimeError):
+            await executor.poll({})
+
+    @pytest.mark.asyncio
+    async def test_poll_on_event_loop(self):
+        plugin = MagicMock()
+        plugin.plugin_poll.side_effect = lambda handle: threading.current_thread().name
+        executor = PollExecutor(plugin, 'none')
+        assert threading.current_thread().name == await executor.poll({})
+
+    @pytest.mark.asyncio
+    async def test_poll_failure(self):
+        plugin = MagicMock()
+        plugin.plugin_poll.side_effect = OSError('device unavailable')
+        executor = PollExecutor(plugin, 'thread')
+
+        with pytest.raises(OSError):
+            await executor.poll({})
+
+        assert 1 == executor.failures
+        assert 1 == executor.polls
+        await executor.stop()
+
+    def test_default_mode(self):
+        assert 'none' == PollExecutor(MagicMock()).mode
+
+    @pytest.mark.asyncio
+    async def test_stop_waits_for_running_poll(self):
+        completed = []
+        started = threading.Event()
+
+        def plugin_poll(handle):
+            started.set()
+            time.sleep(0.2)
+            completed.append(handle)
+            return []
+
+        plugin = MagicMock()
+        plugin.plugin_poll.side_effect = plugin_poll
+        executor = PollExecutor(plugin, 'thread')
+        task = asyncio.ensure_future(executor.poll({}))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        # Cancelling the task does not stop the thread, stop waits for it
+        task.cancel()
+        assert await executor.stop() is True
+        assert [{}] == completed
+
+    @pytest.mark.asyncio
+    async def test_stop_timeout(self):
+        release = threading.Event()
+        plugin = MagicMock()
+        plugin.plugin_poll.side_effect = lambda handle: release.wait(5)
+        executor = PollExecutor(plugin, 'thread')
+        task = asyncio.ensure_future(executor.poll({}))
+        await asyncio.sleep(0.05)
+        assert await executor.stop(timeout=0.1) is False
+        release.set()
+        await task
+
+    def test_state(self):
+        executor = PollExecutor(MagicMock(), 'none', 3)
+        executor._observe(0.2)
+        executor._observe(0.7)
+        executor.overrun()
+        executor.overrun(2)
+        assert {"mode": "none", "max_concurrent_polls": 3, "polls": 2, "failures": 0, "overruns": 3,
+                "latency_ms": 300, "max_latency_ms": 700} == executor.state()
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("services", "south", "poll_executor")
+class TestServerStopPolling:
+
+    @pytest.mark.asyncio
+    async def test_stop_polling_waits_for_running_poll(self):
+        events = []
+        started = threading.Event()
+
+        def plugin_poll(handle):
+            started.set()
+            time.sleep(0.2)
+            events.append('poll completed')
+            return []
+
+        plugin = MagicMock()
+        plugin.plugin_poll.side_effect = plugin_poll
+        with patch.object(FledgeMicroservice, "__init__", return_value=None):
+            server = Server()
+        server._name = 'test'
+        server._event_loop = asyncio.get_event_loop()
+        server._plugin = plugin
+        server._plugin_info = {'mode': 'poll'}
+        server._plugin_handle = {'pollInterval': {'value': '1000'}}
+        with patch.object(Ingest, '_poll_executor_mode', 'thread'):
+            with patch('fledge.services.south.server._LOGGER'):
+                server._task_main = asyncio.ensure_future(server._exec_plugin_poll())
+                while not started.is_set():
+                    await asyncio.sleep(0.01)
+                await server._stop_polling()
+        events.append('polling stopped')
+        # The plugin may be shut down or reconfigured once no poll is running
+        assert ['poll completed', 'polling stopped'] == events
+        assert server._task_main is None
+        assert Ingest._poll_executor is None
+
+    @pytest.mark.asyncio
+    async def test_polls_resumed_when_reconfigure_fails(self):
+        polled = threading.Event()
+
+        def plugin_poll(handle):
+            polled.set()
+            return []
+
+        async def get_configuration_category(category_name):
+            return {}
+
+        plugin = MagicMock()
+        plugin.plugin_poll.side_effect = plugin_poll
+        plugin.plugin_reconfigure.side_effect = exceptions.DataRetrievalError('device unreachable')
+        with patch.object(FledgeMicroservice, "__init__", return_value=None):
+            server = Server()
+        server._name = 'test'
+        server._event_loop = asyncio.get_event_loop()
+        server._plugin = plugin
+        server._plugin_info = {'mode': 'poll'}
+        server._plugin_handle = {'pollInterval': {'value': '50'}}
+        server._core_microservice_management_client_async = MagicMock()
+        server._core_microservice_management_client_async.get_configuration_category = get_configuration_category
+        with patch.object(Ingest, '_poll_executor_mode', 'thread'):
+            with patch('fledge.services.south.server._LOGGER'):
+                server._task_main = asyncio.ensure_future(server._exec_plugin_poll())
+                while not polled.is_set():
+                    await asyncio.sleep(0.01)
+                with pytest.raises(web.HTTPInternalServerError):
+                    await server.change(None)
+                polled.clear()
+                # The poll task is started again, the service keeps ingesting
+                assert server._task_main is not None
+                for _ in range(100):
+                    if polled.is_set():
+                        break
+                    await asyncio.sleep(0.01)
+                assert polled.is_set()
+                await server._stop_polling()
+        plugin.plugin_reconfigure.assert_called_once_with({'pollInterval': {'value': '50'}}, {})
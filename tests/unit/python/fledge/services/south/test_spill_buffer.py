@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+# FLEDGE_BEGIN
+# See: http://fledge-iot.readthedocs.io/
+# FLEDGE_END
+
+""" Test services/south/spill_buffer.py
+
+"""
+import os
+from unittest.mock import patch
+import pytest
+
+from fledge.services.south import spill_buffer
+from fledge.services.south.spill_buffer import SpillBuffer
+
+__copyright__ = "Copyright (c) 2023 Dianomic Systems Inc."
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("services", "south", "spill_buffer")
+class TestSpillBuffer:
+
+    def test_spill_path(self):
+        with patch.object(spill_buffer, '_FLEDGE_DATA', '/data'):
+            assert '/data/buffer/Sine_1.spill' == spill_buffer.spill_path('Sine/1')
+        with patch.object(spill_buffer, '_FLEDGE_DATA', None):
+            with patch.object(spill_buffer, '_FLEDGE_ROOT', '/usr/local/fledge'):
+                assert '/usr/local/fledge/data/buffer/S1.spill' == spill_buffer.spill_path('S1')
+
+    def test_append_read_commit(self, tmpdir):
+        buffer = SpillBuffer(str(tmpdir.join('buffer', 'S1.spill')), 1024)
+        assert 0 == buffer.records
+        assert [] == buffer.read(10)[0]
+
+        assert 3 == buffer.append(['{"a":1}', b'{"a":2}', '{"a":3}'])
+        assert 3 == buffer.records
+        records, position = buffer.read(2)
+        assert [b'{"a":1}', b'{"a":2}'] == records
+        # nothing is removed until commit
+        assert records == buffer.read(2)[0]
+
+        buffer.commit(position, 2)
+        assert 1 == buffer.records
+        assert [b'{"a":3}'] == buffer.read(10)[0]
+
+        records, position = buffer.read(10)
+        buffer.commit(position, len(records))
+        assert 0 == buffer.records
+        # the file is emptied once everything has been replayed
+        assert 8 == buffer.disk_usage
+        assert {"records": 0, "disk_usage": 8, "max_bytes": 1024, "spilled": 3, "replayed": 3,
+                "dropped": 0} == buffer.state()
+        buffer.close()
+
+    def test_append_drops_when_full(self, tmpdir):
+        buffer = SpillBuffer(str(tmpdir.join('S1.spill')), 8 + 3 * 8)
+        assert 3 == buffer.append(['{"a":1}'] * 5)
+        assert 3 == buffer.records
+        assert 2 == buffer.dropped
+        buffer.close()
+
+    def test_append_bound_on_pending_readings(self, tmpdir):
+        path = str(tmpdir.join('S1.spill'))
+        buffer = SpillBuffer(path, 8 + 4 * 8)
+        assert 4 == buffer.append(['{"a":1}', '{"a":2}', '{"a":3}', '{"a":4}'])
+        records, position = buffer.read(1)
+        buffer.commit(position, 1)
+        # The replayed reading leaves room for a new one, the file is compacted to make it fit
+        assert 1 == buffer.append(['{"a":5}', '{"a":6}'])
+        assert 1 == buffer.dropped
+        assert 8 + 4 * 8 == buffer.disk_usage == os.path.getsize(path)
+        assert [b'{"a":2}', b'{"a":3}', b'{"a":4}', b'{"a":5}'] == buffer.read(10)[0]
+        buffer.close()
+
+    def test_commit_compacts(self, tmpdir):
+        path = str(tmpdir.join('S1.spill'))
+        buffer = SpillBuffer(path, 8 + 10 * 8)
+        buffer.append(['{"a":%d}' % i for i in range(8)])
+        records, position = buffer.read(4)
+        buffer.commit(position, 4)
+        assert 8 + 8 * 8 == buffer.disk_usage
+        # Half of the maximum size replayed, the readings left are moved to the start of the file
+        records, position = buffer.read(2)
+        buffer.commit(position, 2)
+        assert 8 + 2 * 8 == buffer.disk_usage == os.path.getsize(path)
+        assert not os.path.exists(path + '.tmp')
+        buffer.close()
+
+        buffer = SpillBuffer(path, 8 + 10 * 8)
+        assert 2 == buffer.records
+        assert [b'{"a":6}', b'{"a":7}'] == buffer.read(10)[0]
+        buffer.close()
+
+    def test_survives_restart(self, tmpdir):
+        path = str(tmpdir.join('S1.spill'))
+        buffer = SpillBuffer(path, 1024)
+        buffer.append(['{"a":1}', '{"a":2}', '{"a":3}'])
+        records, position = buffer.read(1)
+        buffer.commit(position, 1)
+        buffer.close()
+
+        # interrupted write of a fourth reading
+        with open(path, 'ab') as f:
+            f.write(b'{"a":')
+
+        buffer = SpillBuffer(path, 1024)
+        assert 2 == buffer.records
+        assert [b'{"a":2}', b'{"a":3}'] == buffer.read(10)[0]
+        buffer.append(['{"a":4}'])
+        assert [b'{"a":2}', b'{"a":3}', b'{"a":4}'] == buffer.read(10)[0]
+        buffer.close()
+
+    def test_corrupted_header(self, tmpdir):
+        path = str(tmpdir.join('S1.spill'))
+        with open(path, 'wb') as f:
+            f.write(b'\xff' * 8 + b'{"a":1}\n')
+        buffer = SpillBuffer(path, 1024)
+        assert 0 == buffer.records
+        assert 8 == os.path.getsize(path)
+        buffer.close()
+
+    def test_bad_size(self, tmpdir):
+        with pytest.raises(ValueError):
+            SpillBuffer(str(tmpdir.join('S1.spill')), 8)
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+
+# FLEDGE_BEGIN
+# See: http://fledge-iot.readthedocs.io/
+# FLEDGE_END
+
+"""Test tasks/north/sending_process.py"""
+
+import asyncio
+import copy
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import fledge.plugins.north.common.common as plugin_common
+from fledge.common.audit_logger import AuditLogger
+from fledge.common.process import FledgeProcess
+from fledge.tasks.north.sending_process import SendingProcess, apply_date_format
+
+__copyright__ = "Copyright (c) 2023 Dianomic Systems Inc."
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+def _old_transform(raw_data):
+    """The readings conversion as it was before the per asset code cache and the fast paths"""
+
+    def recurse(reading_payload):
+        for k, v in reading_payload.items():
+            if isinstance(v, dict):
+                for k1, v1 in v.items():
+                    if isinstance(v1, dict):
+                        reading_payload[k][k1] = plugin_common.convert_to_type(v1)
+                        recurse(v1)
+            else:
+                reading_payload[k] = plugin_common.convert_to_type(v)
+        return reading_payload
+
+    converted_data = []
+    for row in raw_data:
+        try:
+            asset_code = row['asset_code'].replace(" ", "")
+            if asset_code != "":
+                converted_data.append({'id': row['id'], 'asset_code': asset_code,
+                                       'reading': recurse(row['reading']),
+                                       'user_ts': apply_date_format(row['user_ts'])})
+        except Exception:
+            pass
+    return converted_data
+
+
+def _rows(first_id, count):
+    return [{'id': row_id, 'asset_code': 'sinusoid', 'reading': {'sinusoid': row_id / 10},
+             'user_ts': '2023-01-01 00:00:00.{:06d}+00:00'.format(row_id)} for row_id in range(first_id,
+                                                                                            first_id + count)]
+
+
+class FakeReadings(object):
+    """Readings of the storage layer, recording the fetches"""
+
+    def __init__(self, count, delay=0.0):
+        self.rows = _rows(1, count)
+        self.delay = delay
+        self.events = []
+        self.fetch_started = {}
+        """first id -> threading.Event set when the fetch starts"""
+
+    def started(self, first_id):
+        return self.fetch_started.setdefault(first_id, threading.Event())
+
+    async def fetch(self, reading_id, size):
+        self.events.append(('fetch', reading_id))
+        self.started(reading_id).set()
+        await asyncio.sleep(self.delay)
+        rows = [dict(row, reading=dict(row['reading'])) for row in self.rows if row['id'] >= reading_id][:size]
+        return {'rows': rows, 'count': len(rows)}
+
+
+@pytest.fixture
+def sending_process(event_loop):
+    with patch.object(FledgeProcess, '__init__', return_value=None):
+        sending_process = SendingProcess(loop=event_loop)
+    sending_process._config.update({'source': 'readings', 'blockSize': 2, 'memory_buffer_size': 10,
+                                    'memory_buffer_readings': 0, 'duration': 1, 'sleepInterval': 0.05})
+    sending_process._stream_id = 1
+    sending_process._audit = MagicMock(spec=AuditLogger)
+    return sending_process
+
+
+async def _run_send_data(sending_process, readings, plugin_send):
+    sending_process._readings = readings
+    sending_process._plugin = MagicMock()
+    sending_process._plugin.plugin_send.side_effect = plugin_send
+    with patch.object(sending_process, '_last_object_id_read', return_value=0), \
+            patch.object(sending_process, '_track_assets'), \
+            patch.object(sending_process, '_update_position_reached'), \
+            patch.object(SendingProcess, 'TASK_FETCH_SLEEP', 0.05), \
+            patch.object(SendingProcess, 'TASK_SEND_SLEEP', 0.05), \
+            patch.object(SendingProcess, '_logger'):
+        await sending_process.send_data()
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("tasks", "north", "sending_process")
+class TestReadingsPipeline:
+
+    @pytest.mark.asyncio
+    async def test_prefetch_overlaps_conversion(self, sending_process):
+        readings = FakeReadings(5)
+        sending_process._readings = readings
+        overlapped = []
+
+        def transform(raw_data):
+            # Runs in the default executor while the fetch of the next block progresses on the event loop
+            overlapped.append(readings.started(raw_data[-1]['id'] + 1).wait(5))
+            return SendingProcess._transform_in_memory_data_readings(raw_data)
+
+        with patch.object(sending_process, '_transform_in_memory_data_readings', side_effect=transform):
+            first = await sending_process._load_data_into_memory_readings(0)
+            second = await sending_process._load_data_into_memory_readings(first[-1]['id'])
+        assert [1, 2] == [row['id'] for row in first]
+        assert [3, 4] == [row['id'] for row in second]
+        assert [True, True] == overlapped
+        # The second block is the prefetched one, it is not fetched again
+        assert [('fetch', 1), ('fetch', 3), ('fetch', 5)] == readings.events
+        assert 4 == sending_process._readings_prefetch[0]
+        sending_process._cancel_readings_prefetch()
+
+    @pytest.mark.asyncio
+    async def test_prefetch_not_used_for_another_position(self, sending_process):
+        readings = FakeReadings(6)
+        sending_process._readings = readings
+        await sending_process._load_data_into_memory_readings(0)
+        prefetch_task = sending_process._readings_prefetch[1]
+        # The position changed, for example by a filter
+        rows = await sending_process._load_data_into_memory_readings(3)
+        assert [4, 5] == [row['id'] for row in rows]
+        assert prefetch_task.cancelled() or prefetch_task.done()
+        assert ('fetch', 4) in readings.events
+        sending_process._cancel_readings_prefetch()
+
+    @pytest.mark.asyncio
+    async def test_prefetch_cancelled_on_error(self, sending_process):
+        readings = FakeReadings(6)
+        sending_process._readings = readings
+        prefetches = []
+
+        async def fetch(reading_id, size):
+            if reading_id == 1:
+                return await FakeReadings(6).fetch(reading_id, size)
+            prefetches.append(asyncio.Task.current_task())
+            await asyncio.sleep(10)
+
+        with patch.object(readings, 'fetch', side_effect=fetch):
+            with patch.object(sending_process, '_transform_in_memory_data_readings',
+                              side_effect=RuntimeError('conversion failed')):
+                with patch.object(SendingProcess, '_logger'):
+                    with pytest.raises(RuntimeError):
+                        await sending_process._load_data_into_memory_readings(0)
+        assert sending_process._readings_prefetch is None
+        await asyncio.sleep(0)
+        assert 1 == len(prefetches)
+        assert prefetches[0].cancelled()
+
+    @pytest.mark.asyncio
+    async def test_prefetch_cancelled_on_stop(self, sending_process):
+        sending_process._config['memory_buffer_readings'] = 2
+        readings = FakeReadings(6)
+        prefetches = []
+        fetch = readings.fetch
+
+        async def slow_prefetch(reading_id, size):
+            if reading_id == 1:
+                return await fetch(reading_id, size)
+            # Still running when the process stops, as the fetch task waits for room in the memory buffer
+            prefetches.append(asyncio.Task.current_task())
+            await asyncio.sleep(10)
+
+        async def plugin_send(handle, data, stream_id):
+            await asyncio.sleep(0.05)
+            return False, None, 0
+
+        with patch.object(readings, 'fetch', side_effect=slow_prefetch):
+            await _run_send_data(sending_process, readings, plugin_send)
+        assert sending_process._readings_prefetch is None
+        assert 1 == len(prefetches)
+        await asyncio.sleep(0)
+        assert prefetches[0].cancelled()
+
+    @pytest.mark.asyncio
+    async def test_send_overlaps_fetch(self, sending_process):
+        readings = FakeReadings(8, delay=0.01)
+        sent = []
+
+        async def plugin_send(handle, data, stream_id):
+            readings.events.append(('send', data[0]['id']))
+            await asyncio.sleep(0.05)
+            readings.events.append(('sent', data[0]['id']))
+            sent.extend(row['id'] for row in data)
+            return True, data[-1]['id'], len(data)
+
+        await _run_send_data(sending_process, readings, plugin_send)
+        assert list(range(1, 9)) == sent
+        events = readings.events
+        for first_id in (1, 3, 5):
+            # The next block is fetched while the block is being sent
+            assert events.index(('fetch', first_id + 2)) < events.index(('sent', first_id))
+
+    @pytest.mark.asyncio
+    async def test_memory_ceiling_stops_fetch(self, sending_process):
+        sending_process._config['memory_buffer_readings'] = 4
+        readings = FakeReadings(20)
+        held = []
+        release = asyncio.Event()
+
+        async def plugin_send(handle, data, stream_id):
+            if not held:
+                # The fetch task fills the buffer while the first send is held up
+                try:
+                    await asyncio.wait_for(release.wait(), 0.3)
+                except asyncio.TimeoutError:
+                    pass
+            held.append(sending_process._memory_buffer_readings)
+            return True, data[-1]['id'], len(data)
+
+        await _run_send_data(sending_process, readings, plugin_send)
+        # Two blocks of 2 readings reach the ceiling of 4 readings
+        assert 4 == held[0]
+        assert max(held) <= 4
+
+    @pytest.mark.parametrize("max_readings, buffered, expected", [
+        (0, 1000, False),
+        (4, 0, False),
+        (4, 2, False),
+        (4, 3, True),
+        (1, 0, False)
+    ])
+    def test_memory_buffer_full(self, sending_process, max_readings, buffered, expected):
+        sending_process._config['memory_buffer_readings'] = max_readings
+        sending_process._memory_buffer_readings = buffered
+        assert expected is sending_process._memory_buffer_full()
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("tasks", "north", "sending_process")
+class TestRun:
+
+    @pytest.mark.asyncio
+    async def test_storage_clients_closed_on_exit(self, sending_process):
+        with patch.object(sending_process, 'is_dry_run', return_value=False), \
+                patch('fledge.tasks.north.sending_process.signal'), \
+                patch('fledge.tasks.north.sending_process.handling_input_parameters', return_value=(False, 0)), \
+                patch('fledge.tasks.north.sending_process.StorageClientAsync', side_effect=Exception('no storage')), \
+                patch.object(SendingProcess, '_logger'), \
+                patch.object(sending_process, 'close_storage_clients') as patch_close:
+            with pytest.raises(SystemExit) as excinfo:
+                await sending_process.run()
+        assert 1 == excinfo.value.code
+        patch_close.assert_called_once_with()
+
+    @pytest.mark.asyncio
+    async def test_storage_clients_closed_on_dry_run(self, sending_process):
+        with patch.object(sending_process, 'is_dry_run', return_value=True), \
+                patch.object(sending_process, 'close_storage_clients') as patch_close:
+            await sending_process.run()
+        patch_close.assert_called_once_with()
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("tasks", "north", "sending_process")
+class TestTransformReadings:
+
+    RAW_DATA = [
+        {'id': 1, 'asset_code': 'sinusoid', 'reading': {'sinusoid': 0.5, 'count': 3},
+         'user_ts': '2018-03-22 17:17:17.166347+00:00'},
+        {'id': 2, 'asset_code': 'pump 1', 'reading': {'pressure': '180.2', 'state': 'on'},
+         'user_ts': '2018-05-28 13:42:28.84'},
+        {'id': 3, 'asset_code': 'nested', 'reading': {'motor': {'rpm': '1500', 'temperature': {'c': '20.5'}}},
+         'user_ts': '2018-05-28 16:56:55'},
+        {'id': 4, 'asset_code': ' ', 'reading': {'x': 1}, 'user_ts': '2018-05-28 16:56:55'},
+        {'id': 5, 'asset_code': 'sinusoid', 'reading': {'sinusoid': 1, 'flag': True},
+         'user_ts': '2018-03-22 17:17:17.166347+02:00'},
+        {'id': 6, 'asset_code': 'zulu', 'reading': {'v': 2.5}, 'user_ts': '2020-03-30 05:35:24.066553Z'},
+        {'id': 7, 'asset_code': 'short', 'reading': {'v': 2.5}, 'user_ts': '2018-03-22 17:17:17.166347+00'},
+        {'id': 8, 'asset_code': 'sinusoid', 'reading': {'sinusoid': -0.5},
+         'user_ts': '2018-03-22 17:17:18.000001+00:00'},
+    ]
+
+    def test_same_output_as_recursive_transform(self):
+        with patch.object(SendingProcess, '_logger'), patch('fledge.tasks.north.sending_process._LOGGER'):
+            expected = _old_transform(copy.deepcopy(self.RAW_DATA))
+            actual = SendingProcess._transform_in_memory_data_readings(copy.deepcopy(self.RAW_DATA))
+        assert expected == actual
+        assert 7 == len(actual)
+        assert '2018-03-22T17:17:17.166347Z' == actual[0]['user_ts']
+        assert {'pressure': 180.2, 'state': 'on'} == actual[1]['reading']
+
+    def test_asset_code_cache(self):
+        with patch.object(SendingProcess, '_asset_codes', {}) as asset_codes, \
+                patch.object(SendingProcess, '_MAX_ASSET_CODES', 2), \
+                patch.object(SendingProcess, '_logger'), patch('fledge.tasks.north.sending_process._LOGGER'):
+            SendingProcess._transform_in_memory_data_readings(copy.deepcopy(self.RAW_DATA))
+            # Cleared when full rather than growing with the asset codes
+            assert len(asset_codes) <= 2
+            assert [{'id': 1, 'asset_code': 'pump1', 'reading': {'v': 1}, 'user_ts': '2018-05-28T16:56:55.000000Z'}] \
+                == SendingProcess._transform_in_memory_data_readings([
+                    {'id': 1, 'asset_code': 'pump 1', 'reading': {'v': 1}, 'user_ts': '2018-05-28 16:56:55'}])
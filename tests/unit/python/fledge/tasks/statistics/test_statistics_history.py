@@ -78,7 +78,7 @@ class TestStatisticsHistory:
                                     'value': 0, 'key': 'PURGED', 'previous_value': 0,
                                     'ts': '2018-08-31 17:03:17.597055+05:30'},
                                    {'description': 'Readings received by Fledge',
-                                    'value': 0, 'key': 'READINGS', 'previous_value': 0,
+                                    'value': 10, 'key': 'READINGS', 'previous_value': 0,
                                     'ts': '2018-08-31 17:03:17.597055+05:30'
                                     }]
                           }
@@ -96,4 +96,7 @@ class TestStatisticsHistory:
                             await sh.run()
                     assert 1 == mock_bulk_insert.call_count
                     assert 1 == mock_update.call_count
+                    # previous_value is only updated for the key which changed
+                    args, kwargs = mock_update.call_args
+                    assert ['READINGS'] == [update['where']['value'] for update in args[0]['updates']]
                 mock_keys.assert_called_once_with('statistics')